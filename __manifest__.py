@@ -77,11 +77,20 @@
         'wizards/potting_ot_payment_wizards_views.xml',
         'wizards/potting_cv_tonnage_transfer_wizard_views.xml',
         'wizards/potting_quick_delivery_wizard_views.xml',
+        'wizards/potting_ot_allocation_wizard_views.xml',
+        'wizards/potting_container_planning_wizard_views.xml',
+        'wizards/potting_bulk_delivery_note_wizard_views.xml',
+        'wizards/potting_batch_invoice_wizard_views.xml',
+        'wizards/potting_dataset_generator_wizard_views.xml',
         # Views - CV et Formules (avant les contrats qui les référencent)
+        'views/potting_cv_tonnage_move_views.xml',
         'views/potting_confirmation_vente_views.xml',
         'views/potting_confirmation_vente_transfer_views.xml',
         'views/potting_ot_contract_allocation_views.xml',
         'views/potting_formule_views.xml',
+        'views/potting_repricing_job_views.xml',
+        'views/potting_profile_run_views.xml',
+        'views/potting_report_export_analysis_views.xml',
         # Views - Autres
         'views/potting_certification_views.xml',
         'views/potting_customer_order_views.xml',
@@ -105,6 +114,8 @@
         'data/mail_template_data.xml',
         # Cron for alerts
         'data/potting_alert_cron.xml',
+        # Ouverture du registre de tonnage CV
+        'data/potting_cv_tonnage_ledger_data.xml',
     ],
     'demo': [
         'demo/potting_demo_data.xml',
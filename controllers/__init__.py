@@ -2,3 +2,4 @@
 
 from . import mobile_api
 
+from . import report_export
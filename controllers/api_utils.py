@@ -1030,6 +1030,20 @@ def require_auth(func):
 require_ceo_auth = require_auth
 
 
+def profile_endpoint(func):
+    """
+    Décorateur de profilage à la demande (voir potting.profile.run).
+    À placer après @require_auth pour attribuer le profil à l'utilisateur API.
+    """
+    @wraps(func)
+    def wrapper(self, *args, **kwargs):
+        user = getattr(request, 'api_user', None) or request.env.user
+        return request.env['potting.profile.run'].sudo()._profile_call(
+            request.httprequest.path, 'api', user, func, (self,) + args, kwargs
+        )
+    return wrapper
+
+
 def with_circuit_breaker(breaker):
     """Décorateur pour utiliser un circuit breaker"""
     def decorator(func):
@@ -16,7 +16,9 @@ Endpoints:
 - GET /api/v1/potting/dashboard/orders - Liste des commandes
 - GET /api/v1/potting/dashboard/transit-orders - Liste des OT
 - GET /api/v1/potting/reports/daily - Télécharger rapport quotidien PDF
+- GET /api/v1/potting/reports/daily/xlsx - Export Excel du rapport (quotidien ou campagne)
 - GET /api/v1/potting/reports/summary - Résumé du rapport (JSON)
+- POST /api/v1/potting/production/batch - Ingestion groupée de productions
 - GET /api/v1/potting/health - Vérification de santé
 
 Améliorations v1.1.0:
@@ -33,19 +35,21 @@ import logging
 import hashlib
 import secrets
 from datetime import datetime, timedelta, date
-import re
+
+import psycopg2
 
 from odoo import http, _, fields
 from odoo.http import request, Response
 import json
 
+from .report_export import xlsx_file_response
 from .api_utils import (
     APIErrorCodes,
     rate_limiter, rate_limit, rate_limit_user,
-    InputValidator,
+    InputValidator, MAX_ARRAY_SIZE,
     api_response, api_error, api_validation_error,
     API_VERSION,
-    require_auth, require_ceo_auth,
+    require_auth, require_ceo_auth, profile_endpoint,
     api_exception_handler,
     with_circuit_breaker, report_circuit_breaker,
     get_client_ip, log_api_call,
@@ -405,6 +409,7 @@ class PottingMobileAPIController(http.Controller):
     @api_exception_handler
     @rate_limit(max_requests=60, window_seconds=60)
     @require_auth
+    @profile_endpoint
     def api_dashboard(self, **kwargs):
         """
         Tableau de bord principal du PDG.
@@ -468,6 +473,7 @@ class PottingMobileAPIController(http.Controller):
     @api_exception_handler
     @rate_limit(max_requests=60, window_seconds=60)
     @require_auth
+    @profile_endpoint
     def api_transit_orders_list(self, **kwargs):
         """
         Liste des ordres de transit.
@@ -558,6 +564,7 @@ class PottingMobileAPIController(http.Controller):
     @api_exception_handler
     @rate_limit(max_requests=60, window_seconds=60)
     @require_auth
+    @profile_endpoint
     def api_unsold_transit_orders(self, **kwargs):
         """
         Liste des OTs non vendus avec leurs lots - Vue PDG.
@@ -683,6 +690,7 @@ class PottingMobileAPIController(http.Controller):
     @api_exception_handler
     @rate_limit(max_requests=60, window_seconds=60)
     @require_auth
+    @profile_endpoint
     def api_customer_orders_list(self, **kwargs):
         """
         Liste des commandes clients (contrats).
@@ -758,6 +766,7 @@ class PottingMobileAPIController(http.Controller):
     @api_exception_handler
     @rate_limit(max_requests=30, window_seconds=60)
     @require_auth
+    @profile_endpoint
     def api_report_summary(self, **kwargs):
         """
         Résumé du rapport quotidien en JSON.
@@ -816,43 +825,11 @@ class PottingMobileAPIController(http.Controller):
                 }
             )
         
-        # Calculer les statistiques
-        total_tonnage_kg = sum(transit_orders.mapped('tonnage')) * 1000
-        current_tonnage_kg = sum(transit_orders.mapped('current_tonnage')) * 1000
-        avg_progress = sum(transit_orders.mapped('progress_percentage')) / len(transit_orders)
-        
-        # Par état
-        in_tc = len(transit_orders.filtered(lambda o: o.state == 'done'))
-        prod_100 = len(transit_orders.filtered(lambda o: o.progress_percentage >= 100 and o.state != 'done'))
-        in_prod = len(transit_orders.filtered(lambda o: o.progress_percentage < 100 and o.state not in ['done', 'cancelled']))
-        
-        # Par livraison
-        partial_delivery = len(transit_orders.filtered(lambda o: o.delivery_status == 'partial'))
-        fully_delivered = len(transit_orders.filtered(lambda o: o.delivery_status == 'fully_delivered'))
-        not_delivered = len(transit_orders.filtered(lambda o: o.delivery_status == 'not_delivered'))
-        
-        # Extraire la plage de numéros OT
-        ot_numbers = []
-        for ot in transit_orders:
-            match = re.search(r'(\d+)/', ot.name)
-            if match:
-                ot_numbers.append(int(match.group(1)))
-        
-        ot_range = {}
-        if ot_numbers:
-            ot_range = {'from': min(ot_numbers), 'to': max(ot_numbers)}
-        
-        # Grouper par client
-        customers = {}
-        for ot in transit_orders:
-            customer_name = ot.customer_id.name if ot.customer_id else 'Non défini'
-            consignee_name = ot.consignee_id.name if ot.consignee_id else ''
-            key = f"{customer_name} / {consignee_name}" if consignee_name else customer_name
-            
-            if key not in customers:
-                customers[key] = {'count': 0, 'tonnage': 0}
-            customers[key]['count'] += 1
-            customers[key]['tonnage'] += ot.tonnage * 1000
+        # Lignes et statistiques en une passe (nombre de requêtes constant)
+        report_data = request.env['potting.daily.report.data'].sudo().build(transit_orders)
+        stats = report_data['stats']
+        total_tonnage_kg = stats['total_tonnage_kg']
+        current_tonnage_kg = stats['total_current_kg']
         
         log_api_call('/reports/summary', user_id=user.id, success=True)
         
@@ -861,31 +838,25 @@ class PottingMobileAPIController(http.Controller):
                 'report_date': report_date.isoformat(),
                 'generated_at': datetime.now().isoformat(),
                 'ot_count': len(transit_orders),
-                'ot_range': ot_range,
+                'ot_range': report_data['ot_range'],
                 'tonnage': {
                     'total_kg': round(total_tonnage_kg, 0),
                     'current_kg': round(current_tonnage_kg, 0),
                     'total_formatted': format_currency(total_tonnage_kg, 'Kg'),
                     'current_formatted': format_currency(current_tonnage_kg, 'Kg'),
                 },
-                'average_progress': round(avg_progress, 1),
+                'average_progress': round(stats['avg_progress'], 1),
                 'by_production_state': {
-                    'in_tc': in_tc,
-                    'production_100': prod_100,
-                    'in_production': in_prod,
+                    'in_tc': stats['in_tc_count'],
+                    'production_100': stats['prod_100_count'],
+                    'in_production': stats['in_prod_count'],
                 },
                 'by_delivery_status': {
-                    'fully_delivered': fully_delivered,
-                    'partial': partial_delivery,
-                    'not_delivered': not_delivered,
+                    'fully_delivered': stats['fully_delivered_count'],
+                    'partial': stats['partial_delivery_count'],
+                    'not_delivered': stats['not_delivered_count'],
                 },
-                'by_customer': [
-                    {'name': k, **v} for k, v in sorted(
-                        customers.items(),
-                        key=lambda x: x[1]['tonnage'],
-                        reverse=True
-                    )
-                ]
+                'by_customer': report_data['by_customer'],
             }
         )
 
@@ -893,6 +864,7 @@ class PottingMobileAPIController(http.Controller):
     @api_exception_handler
     @rate_limit(max_requests=10, window_seconds=60)
     @require_auth
+    @profile_endpoint
     @with_circuit_breaker(report_circuit_breaker)
     def api_download_daily_report(self, **kwargs):
         """
@@ -984,10 +956,72 @@ class PottingMobileAPIController(http.Controller):
             status=200
         )
 
+    @http.route('/api/v1/potting/reports/daily/xlsx', type='http', auth='none', methods=['GET'], csrf=False, cors='*')
+    @api_exception_handler
+    @rate_limit(max_requests=10, window_seconds=60)
+    @require_auth
+    @profile_endpoint
+    @with_circuit_breaker(report_circuit_breaker)
+    def api_download_daily_report_xlsx(self, **kwargs):
+        """
+        Télécharger le rapport quotidien ou de campagne au format Excel.
+        
+        Query params:
+        - date: Date du rapport (défaut: aujourd'hui)
+        - date_from: Date début pour les OT
+        - date_to: Date fin pour les OT
+        - campaign_id: Restreindre aux OT d'une campagne
+        - exclude_fully_delivered: Exclure les OT livrés (0 ou 1, défaut: 1)
+        
+        Returns:
+        - XLSX - Une ligne par lot, écrite en flux
+        """
+        user = request.api_user
+        
+        wizard_vals = {
+            'report_date': date.today(),
+            'exclude_fully_delivered': kwargs.get('exclude_fully_delivered', '1') == '1',
+        }
+        
+        for param in ('date', 'date_from', 'date_to'):
+            if kwargs.get(param):
+                valid, parsed, error = InputValidator.validate_date(kwargs[param], param)
+                if not valid:
+                    return api_validation_error(error)
+                wizard_vals['report_date' if param == 'date' else param] = parsed
+        
+        if kwargs.get('campaign_id'):
+            valid, campaign_id, error = InputValidator.validate_id(kwargs['campaign_id'], 'campaign_id')
+            if not valid:
+                return api_validation_error(error)
+            if not request.env['potting.campaign'].sudo().browse(campaign_id).exists():
+                return api_error(APIErrorCodes.RESOURCE_NOT_FOUND, "Campagne non trouvée", status=404)
+            wizard_vals['campaign_id'] = campaign_id
+            # Rapport de campagne : toute la campagne, sans filtre de dates
+            wizard_vals.setdefault('date_from', False)
+            wizard_vals.setdefault('date_to', False)
+        
+        wizard = request.env['potting.daily.report.wizard'].sudo().create(wizard_vals)
+        
+        if not wizard.transit_order_ids:
+            wizard.unlink()
+            return api_error(
+                APIErrorCodes.BUSINESS_NO_TRANSIT_ORDERS,
+                "Aucun OT trouvé pour les critères spécifiés",
+                status=404
+            )
+        
+        response = xlsx_file_response(wizard)
+        log_api_call('/reports/daily/xlsx', user_id=user.id, success=True,
+                    details=f"campaign={wizard.campaign_id.id or '-'}, ot_count={len(wizard.transit_order_ids)}")
+        wizard.unlink()
+        return response
+
     @http.route('/api/v1/potting/transit-orders/<int:ot_id>', type='http', auth='none', methods=['GET'], csrf=False, cors='*')
     @api_exception_handler
     @rate_limit(max_requests=60, window_seconds=60)
     @require_auth
+    @profile_endpoint
     def api_transit_order_detail(self, ot_id, **kwargs):
         """
         Détails d'un ordre de transit spécifique.
@@ -1026,6 +1060,74 @@ class PottingMobileAPIController(http.Controller):
         
         return api_response(data=data)
 
+    # ==================== ENDPOINTS PRODUCTION ====================
+
+    @http.route('/api/v1/potting/production/batch', type='http', auth='none', methods=['POST'], csrf=False, cors='*')
+    @api_exception_handler
+    @rate_limit(max_requests=120, window_seconds=60)
+    @require_auth
+    @profile_endpoint
+    def api_production_batch(self, **kwargs):
+        """
+        Ingestion groupée de productions (balance, terminal de ligne).
+        
+        Body JSON:
+        {
+            "rows": [
+                {
+                    "idempotency_key": "SCALE01-20250115-000123",
+                    "lot_name": "M10045",
+                    "units_produced": 40,
+                    "date": "2025-01-15",
+                    "shift": "morning",
+                    "operator_login": "operateur@example.com",
+                    "batch_number": "B-0042"
+                },
+                ...
+            ]
+        }
+        
+        Les lignes dont la clé d'idempotence a déjà été ingérée sont renvoyées
+        dans "duplicates" sans être recréées : le client peut renvoyer le même
+        lot après une coupure réseau sans risque de doublon.
+        """
+        user = request.api_user
+        
+        payload = json.loads(request.httprequest.get_data(as_text=True) or '{}')
+        valid, rows, error = InputValidator.validate_array(
+            payload.get('rows') if isinstance(payload, dict) else None,
+            'rows', max_size=MAX_ARRAY_SIZE
+        )
+        if not valid:
+            return api_validation_error(error)
+        
+        # Les droits d'accès de l'utilisateur API s'appliquent (pas de sudo)
+        ProductionLine = request.env['potting.production.line'].with_user(user)
+        try:
+            with request.env.cr.savepoint():
+                result = ProductionLine.ingest_production_batch(rows)
+        except psycopg2.IntegrityError:
+            # Envoi concurrent des mêmes clés : le renvoi les classera en doublons
+            return api_error(
+                APIErrorCodes.RESOURCE_CONFLICT,
+                "Lot d'ingestion en conflit avec un envoi concurrent, veuillez réessayer",
+                status=409
+            )
+        
+        log_api_call('/production/batch', user_id=user.id, success=True,
+                     details=f"rows={len(rows)}, created={len(result['created'])}, "
+                             f"duplicates={len(result['duplicates'])}, errors={len(result['errors'])}")
+        
+        return api_response(
+            data=result,
+            meta={
+                'received': len(rows),
+                'created': len(result['created']),
+                'duplicates': len(result['duplicates']),
+                'errors': len(result['errors']),
+            }
+        )
+
     # ==================== ENDPOINT SANTÉ ====================
 
     @http.route('/api/v1/potting/health', type='http', auth='none', methods=['GET'], csrf=False, cors='*')
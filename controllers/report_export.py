@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""
+Téléchargement des exports Excel du rapport de production (backend)
+Module: potting_management
+
+Le fichier est écrit dans un fichier temporaire puis renvoyé en flux :
+ni le classeur ni le contenu binaire ne sont conservés en mémoire.
+"""
+
+import tempfile
+
+from werkzeug.wsgi import wrap_file
+
+from odoo import http
+from odoo.http import request, Response, content_disposition
+
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def xlsx_file_response(wizard):
+    """Générer l'export Excel du wizard et le renvoyer en flux."""
+    tmp = tempfile.TemporaryFile()
+    wizard.export_xlsx(tmp)
+    size = tmp.tell()
+    tmp.seek(0)
+    return Response(
+        wrap_file(request.httprequest.environ, tmp),
+        headers={
+            'Content-Type': XLSX_MIMETYPE,
+            'Content-Disposition': content_disposition(wizard.get_xlsx_filename()),
+            'Content-Length': size,
+            'X-Content-Type-Options': 'nosniff',
+        },
+        direct_passthrough=True,
+        status=200,
+    )
+
+
+class PottingReportExportController(http.Controller):
+
+    @http.route('/potting/report/daily/xlsx/<int:wizard_id>', type='http', auth='user', methods=['GET'])
+    def download_daily_report_xlsx(self, wizard_id, **kwargs):
+        """Télécharger le rapport quotidien / de campagne au format Excel."""
+        wizard = request.env['potting.daily.report.wizard'].browse(wizard_id).exists()
+        if not wizard:
+            return request.not_found()
+        return xlsx_file_response(wizard)
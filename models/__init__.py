@@ -1,11 +1,16 @@
 # -*- coding: utf-8 -*-
 
 from . import res_config_settings
+from . import potting_bulk_mixin
+from . import potting_search_mixin
 from . import potting_campaign
 from . import potting_certification
 from . import potting_confirmation_vente
+from . import potting_cv_tonnage_move
 from . import potting_ot_contract_allocation
 from . import potting_formule
+from . import potting_tax_engine
+from . import potting_repricing_job
 from . import potting_customer_order
 from . import potting_transit_order
 from . import potting_lot
@@ -20,4 +25,11 @@ from . import potting_forwarding_agent_invoice
 from . import account_move
 from . import potting_api_token
 from . import payment_request_potting
+from . import potting_activity_reminder
+from . import potting_alert_snapshot
 from . import potting_alert_service
+from . import potting_daily_report_data
+from . import potting_report_xlsx
+from . import potting_dataset_generator
+from . import potting_profile_run
+from . import potting_report_export_analysis
@@ -47,7 +47,35 @@ class AccountMove(models.Model):
         help="Indique si cette facture est liée à un Ordre de Transit"
     )
     
-    @api.depends('potting_transit_order_id')
+    @api.depends('potting_transit_order_id', 'line_ids.potting_transit_order_id')
     def _compute_is_potting_invoice(self):
         for move in self:
-            move.is_potting_invoice = bool(move.potting_transit_order_id)
+            move.is_potting_invoice = bool(
+                move.potting_transit_order_id or move.line_ids.potting_transit_order_id
+            )
+
+
+class AccountMoveLine(models.Model):
+    """Extension de account.move.line pour les factures groupées de plusieurs OT."""
+    
+    _inherit = 'account.move.line'
+    
+    # Renseignés sur la ligne produit de chaque OT facturé : une facture
+    # groupée (plusieurs OT d'un même client) n'a pas d'OT unique au niveau
+    # de l'en-tête, le tonnage facturé par OT est donc suivi par ligne.
+    potting_transit_order_id = fields.Many2one(
+        'potting.transit.order',
+        string="Ordre de Transit",
+        copy=False,
+        readonly=True,
+        index=True,
+        help="Ordre de Transit facturé par cette ligne"
+    )
+    
+    potting_invoiced_tonnage = fields.Float(
+        string="Tonnage facturé (T)",
+        digits='Product Unit of Measure',
+        copy=False,
+        readonly=True,
+        help="Tonnage de l'OT facturé par cette ligne"
+    )
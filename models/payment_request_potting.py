@@ -6,10 +6,13 @@ Ajoute des hooks pour mettre à jour automatiquement le statut de paiement
 des formules et des transitaires quand le payment.request est validé/signé.
 """
 
-from odoo import api, fields, models, _
-from datetime import date
+from collections import defaultdict
 import logging
 
+from markupsafe import Markup
+
+from odoo import api, fields, models, _
+
 _logger = logging.getLogger(__name__)
 
 
@@ -23,7 +26,7 @@ class PaymentRequestPotting(models.Model):
     
     potting_formule_ids = fields.One2many(
         'potting.formule',
-        compute='_compute_potting_links',
+        'payment_request_avant_vente_id',
         string="Formules liées"
     )
     
@@ -42,23 +45,37 @@ class PaymentRequestPotting(models.Model):
         string="Nb Paiements transitaires",
         compute='_compute_potting_links'
     )
+    
+    potting_fwd_invoice_ids = fields.One2many(
+        'potting.forwarding.agent.invoice',
+        'payment_request_id',
+        string="Factures transitaires"
+    )
 
     # =========================================================================
     # COMPUTE METHODS
     # =========================================================================
     
+    @api.depends('potting_formule_ids', 'potting_fwd_payment_ids')
     def _compute_potting_links(self):
-        """Calculer les liens avec les objets potting"""
+        """Calculer les liens avec les objets potting (une requête groupée par modèle)"""
+        formule_counts = {
+            request.id: count
+            for request, count in self.env['potting.formule']._read_group(
+                [('payment_request_avant_vente_id', 'in', self.ids)],
+                ['payment_request_avant_vente_id'], ['__count']
+            )
+        }
+        payment_counts = {
+            request.id: count
+            for request, count in self.env['potting.forwarding.agent.payment']._read_group(
+                [('payment_request_id', 'in', self.ids)],
+                ['payment_request_id'], ['__count']
+            )
+        }
         for record in self:
-            # Formules liées via paiement producteurs
-            formules = self.env['potting.formule'].search([
-                ('payment_request_avant_vente_id', '=', record.id)
-            ])
-            record.potting_formule_ids = formules
-            record.potting_formule_count = len(formules)
-            
-            # Paiements transitaires
-            record.potting_fwd_payment_count = len(record.potting_fwd_payment_ids)
+            record.potting_formule_count = formule_counts.get(record.id, 0)
+            record.potting_fwd_payment_count = payment_counts.get(record.id, 0)
 
     # =========================================================================
     # OVERRIDE WRITE - DÉTECTER CHANGEMENT D'ÉTAT VERS SIGNED
@@ -66,22 +83,19 @@ class PaymentRequestPotting(models.Model):
     
     def write(self, vals):
         """Surcharge de write pour détecter le passage à l'état 'signed'"""
-        # Sauvegarder les anciens états pour détecter le changement
-        old_states = {record.id: record.state for record in self}
+        # Demandes qui passent à l'état 'signed' (lu seulement si l'état change)
+        to_sign = self.browse()
+        if vals.get('state') == 'signed':
+            to_sign = self.filtered(lambda r: r.state != 'signed')
         
-        # Appeler le write parent
         result = super().write(vals)
         
-        # Vérifier si l'état a changé vers 'signed'
-        if 'state' in vals and vals['state'] == 'signed':
-            for record in self:
-                if old_states.get(record.id) != 'signed':
-                    # L'état vient de passer à 'signed'
-                    _logger.info(
-                        f"🖊️ Payment.request {record.reference} signé - "
-                        f"Mise à jour automatique des formules liées"
-                    )
-                    record._on_signature_complete_hook()
+        if to_sign:
+            _logger.info(
+                "🖊️ Payment.request %s signé(s) - Mise à jour automatique des formules liées",
+                ', '.join(to_sign.mapped('reference'))
+            )
+            to_sign._on_signature_complete_hook()
         
         return result
 
@@ -120,136 +134,136 @@ class PaymentRequestPotting(models.Model):
         self._update_potting_forwarding_payments_status()
     
     def _update_potting_formules_payment_status(self):
-        """Mettre à jour le statut de paiement des formules liées"""
-        for record in self:
-            _logger.info(
-                f"🔍 Recherche formules liées à payment.request {record.reference} (id={record.id})"
-            )
-            
-            # Formules avec paiement avant-vente lié à cette demande
-            formules_avant_vente = self.env['potting.formule'].search([
-                ('payment_request_avant_vente_id', '=', record.id),
-                ('avant_vente_paye', '=', False)
-            ])
-            
-            _logger.info(
-                f"   📋 Formules avant-vente trouvées: {formules_avant_vente.mapped('name')}"
+        """Mettre à jour le statut de paiement des formules liées.
+        
+        Toutes les demandes sont traitées ensemble en écritures groupées ;
+        chaque formule et chaque OT reçoit ensuite sa notification.
+        """
+        formules = self.potting_formule_ids.filtered(lambda f: not f.avant_vente_paye)
+        if not formules:
+            return
+        today = fields.Date.today()
+        
+        # Le passage à payé met à jour l'état et synchronise les OT liés
+        formules.write({
+            'avant_vente_paye': True,
+            'date_paiement_avant_vente': today,
+        })
+        for formule in formules:
+            formule.message_post(
+                body=Markup(_(
+                    "💰 <b>Paiement producteurs validé</b><br/>"
+                    "Demande de paiement: %s<br/>"
+                    "Montant: %s %s<br/>"
+                    "Date: %s"
+                )) % (
+                    formule.payment_request_avant_vente_id.reference,
+                    formule.montant_avant_vente,
+                    formule.currency_id.symbol,
+                    today,
+                ),
+                subject=_("Paiement producteurs validé"),
+                subtype_xmlid='mail.mt_comment'
             )
-            
-            for formule in formules_avant_vente:
-                formule.write({
-                    'avant_vente_paye': True,
-                    'date_paiement_avant_vente': fields.Date.today(),
-                })
-                formule._update_payment_state()
-                
-                _logger.info(
-                    f"✅ Formule {formule.name} - Paiement avant-vente marqué comme payé "
-                    f"(payment.request {record.reference})"
+        _logger.info(
+            "✅ %d formule(s) - Paiement avant-vente marqué comme payé (payment.request %s)",
+            len(formules), ', '.join(self.mapped('reference'))
+        )
+        
+        # ✅ Mettre à jour les OT liés : droits d'exportation encaissés
+        formule_by_ot = {
+            formule.transit_order_id.id: formule
+            for formule in formules
+            if formule.transit_order_id and not formule.transit_order_id.export_duty_collected
+        }
+        if formule_by_ot:
+            transit_orders = self.env['potting.transit.order'].browse(list(formule_by_ot))
+            transit_orders.write({
+                'export_duty_collected': True,
+                'export_duty_collection_date': today,
+            })
+            for ot in transit_orders:
+                formule = formule_by_ot[ot.id]
+                ot.message_post(
+                    body=Markup(_(
+                        "✅ <b>Droits d'exportation encaissés</b><br/>"
+                        "Via paiement avant-vente de la Formule %s<br/>"
+                        "Demande de paiement: %s"
+                    )) % (formule._get_html_link(), formule.payment_request_avant_vente_id.reference),
+                    subject=_("Droits d'exportation encaissés"),
+                    subtype_xmlid='mail.mt_comment'
                 )
-                
-                # ✅ Mettre à jour l'OT lié : droits d'exportation encaissés
-                if formule.transit_order_id and not formule.transit_order_id.export_duty_collected:
-                    formule.transit_order_id.write({
-                        'export_duty_collected': True,
-                        'export_duty_collection_date': fields.Date.today(),
-                    })
-                    formule.transit_order_id.message_post(
-                        body=_(
-                            "✅ <b>Droits d'exportation encaissés</b><br/>"
-                            "Via paiement avant-vente de la Formule %s<br/>"
-                            "Demande de paiement: %s"
-                        ) % (formule.name, record.reference),
-                        subject=_("Droits d'exportation encaissés"),
-                        subtype_xmlid='mail.mt_comment'
-                    )
-                    _logger.info(
-                        f"✅ OT {formule.transit_order_id.name} - Droits d'exportation encaissés "
-                        f"via Formule {formule.name}"
-                    )
-                
-                # Message dans le chatter
-                formule.message_post(
-                    body=_(
-                        "💰 <b>Paiement producteurs validé</b><br/>"
+    
+    def _update_potting_forwarding_payments_status(self):
+        """Mettre à jour le statut des paiements transitaires liés (traitement groupé)"""
+        payments = self.potting_fwd_payment_ids.filtered(
+            lambda p: p.state in ('draft', 'pending')
+        )
+        if not payments:
+            return
+        
+        payments.write({
+            'state': 'confirmed',
+            'payment_date': fields.Date.today(),
+        })
+        _logger.info(
+            "✅ %d paiement(s) transitaire(s) confirmé(s) (payment.request %s)",
+            len(payments), ', '.join(self.mapped('reference'))
+        )
+        
+        # Factures transitaires : celle du paiement, sinon une facture validée de la demande
+        Invoice = self.env['potting.forwarding.agent.invoice']
+        invoice_by_payment = {}
+        for invoice in Invoice.search([('payment_id', 'in', payments.ids)]):
+            invoice_by_payment.setdefault(invoice.payment_id.id, invoice)
+        fallback_invoices = defaultdict(list)
+        for invoice in Invoice.search([
+            ('payment_request_id', 'in', self.ids),
+            ('state', '=', 'validated'),
+        ]):
+            fallback_invoices[invoice.payment_request_id.id].append(invoice)
+        
+        payment_by_invoice = {}
+        for payment in payments:
+            invoice = invoice_by_payment.get(payment.id)
+            if not invoice and fallback_invoices[payment.payment_request_id.id]:
+                invoice = fallback_invoices[payment.payment_request_id.id].pop(0)
+                invoice.payment_id = payment
+            if invoice:
+                payment_by_invoice[invoice] = payment
+        
+        if payment_by_invoice:
+            Invoice.concat(*payment_by_invoice).write({'state': 'paid'})
+            for invoice, payment in payment_by_invoice.items():
+                invoice.message_post(
+                    body=Markup(_(
+                        "💰 <b>Facture payée</b><br/>"
                         "Demande de paiement: %s<br/>"
-                        "Montant: %s %s<br/>"
-                        "Date: %s"
-                    ) % (
-                        record.reference,
-                        formule.montant_avant_vente,
-                        formule.currency_id.symbol,
-                        fields.Date.today()
+                        "Montant: %s %s"
+                    )) % (
+                        payment.payment_request_id.reference,
+                        payment.amount,
+                        payment.currency_id.symbol,
                     ),
-                    subject=_("Paiement producteurs validé"),
+                    subject=_("Facture payée"),
                     subtype_xmlid='mail.mt_comment'
                 )
-    
-    def _update_potting_forwarding_payments_status(self):
-        """Mettre à jour le statut des paiements transitaires liés"""
-        for record in self:
-            # Paiements transitaires liés à cette demande
-            fwd_payments = record.potting_fwd_payment_ids.filtered(
-                lambda p: p.state in ('draft', 'pending')
+        
+        # Message sur le transitaire
+        payment_types = dict(payments._fields['payment_type'].selection)
+        for payment in payments.filtered('forwarding_agent_id'):
+            payment.forwarding_agent_id.message_post(
+                body=Markup(_(
+                    "💰 <b>Paiement confirmé</b><br/>"
+                    "Type: %s<br/>"
+                    "Montant: %s %s<br/>"
+                    "Demande: %s"
+                )) % (
+                    payment_types.get(payment.payment_type),
+                    payment.amount,
+                    payment.currency_id.symbol,
+                    payment.payment_request_id.reference,
+                ),
+                subject=_("Paiement transitaire confirmé"),
+                subtype_xmlid='mail.mt_comment'
             )
-            
-            for payment in fwd_payments:
-                payment.write({
-                    'state': 'confirmed',
-                    'payment_date': fields.Date.today(),
-                })
-                
-                _logger.info(
-                    f"✅ Paiement transitaire {payment.name} confirmé "
-                    f"(payment.request {record.reference})"
-                )
-                
-                # Mettre à jour la facture transitaire si liée
-                invoice = self.env['potting.forwarding.agent.invoice'].search([
-                    ('payment_id', '=', payment.id)
-                ], limit=1)
-                
-                if not invoice:
-                    # Chercher par payment_request_id
-                    invoice = self.env['potting.forwarding.agent.invoice'].search([
-                        ('payment_request_id', '=', record.id),
-                        ('state', '=', 'validated')
-                    ], limit=1)
-                
-                if invoice:
-                    invoice.write({
-                        'state': 'paid',
-                        'payment_id': payment.id,
-                    })
-                    
-                    invoice.message_post(
-                        body=_(
-                            "💰 <b>Facture payée</b><br/>"
-                            "Demande de paiement: %s<br/>"
-                            "Montant: %s %s"
-                        ) % (
-                            record.reference,
-                            payment.amount,
-                            payment.currency_id.symbol
-                        ),
-                        subject=_("Facture payée"),
-                        subtype_xmlid='mail.mt_comment'
-                    )
-                
-                # Message sur le transitaire
-                if payment.forwarding_agent_id:
-                    payment.forwarding_agent_id.message_post(
-                        body=_(
-                            "💰 <b>Paiement confirmé</b><br/>"
-                            "Type: %s<br/>"
-                            "Montant: %s %s<br/>"
-                            "Demande: %s"
-                        ) % (
-                            dict(payment._fields['payment_type'].selection).get(payment.payment_type),
-                            payment.amount,
-                            payment.currency_id.symbol,
-                            record.reference
-                        ),
-                        subject=_("Paiement transitaire confirmé"),
-                        subtype_xmlid='mail.mt_comment'
-                    )
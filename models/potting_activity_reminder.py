@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""
+Planification groupée des activités de rappel
+Module: potting_management
+
+Utilisé par les crons de rappel (taxes OT, expiration CV) : le coût en
+requêtes est constant quel que soit le nombre d'enregistrements à relancer.
+"""
+
+import logging
+
+from odoo import api, models
+
+_logger = logging.getLogger(__name__)
+
+
+class PottingActivityReminder(models.AbstractModel):
+    """Service de planification groupée des activités de rappel"""
+    _name = 'potting.activity.reminder'
+    _description = "Planification groupée des rappels"
+
+    @api.model
+    def _get_reminded_ids(self, records, summary_match, activity_type=None):
+        """Ids des enregistrements ayant déjà une activité de rappel (une requête groupée)."""
+        domain = [
+            ('res_model', '=', records._name),
+            ('res_id', 'in', records.ids),
+            ('summary', 'ilike', summary_match),
+        ]
+        if activity_type:
+            domain.append(('activity_type_id', '=', activity_type.id))
+        return {res_id for res_id, in self.env['mail.activity']._read_group(domain, ['res_id'])}
+
+    @api.model
+    def schedule_reminders(self, records, activity_xmlid, summary, summary_match,
+                           note, date_deadline, match_activity_type=False, label=None):
+        """Planifier une activité de rappel sur les enregistrements qui n'en ont pas.
+
+        :param records: recordset (modèle héritant de mail.activity.mixin)
+        :param activity_xmlid: xmlid du type d'activité
+        :param summary: résumé de l'activité créée
+        :param summary_match: motif (ilike) identifiant un rappel existant
+        :param note: fonction (enregistrement) -> note de l'activité
+        :param date_deadline: date ou fonction (enregistrement) -> date d'échéance
+        :param match_activity_type: ne considérer que les rappels du même type
+        :param label: libellé du rappel pour le journal
+        :return: activités créées (mail.activity)
+        """
+        Activity = self.env['mail.activity']
+        activity_type = self.env.ref(activity_xmlid, raise_if_not_found=False)
+        if not records or not activity_type:
+            return Activity
+
+        reminded_ids = self._get_reminded_ids(
+            records, summary_match, activity_type if match_activity_type else None
+        )
+        to_remind = records.filtered(lambda r: r.id not in reminded_ids)
+
+        res_model_id = self.env['ir.model']._get_id(records._name)
+        user_id = activity_type.default_user_id.id or self.env.uid
+        activities = Activity.create([{
+            'res_model_id': res_model_id,
+            'res_id': record.id,
+            'activity_type_id': activity_type.id,
+            'summary': summary,
+            'note': note(record),
+            'date_deadline': date_deadline(record) if callable(date_deadline) else date_deadline,
+            'user_id': user_id,
+        } for record in to_remind]) if to_remind else Activity
+
+        _logger.info(
+            "Rappels %s: %d activité(s) créée(s), %d déjà relancé(s), %d candidat(s)",
+            label or records._name, len(activities), len(records) - len(to_remind), len(records)
+        )
+        return activities
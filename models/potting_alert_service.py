@@ -9,13 +9,64 @@ Ce module gère les alertes critiques du processus d'exportation :
 - Contrats avec tonnage non couvert
 - Formules non payées
 
-Les alertes sont envoyées par email et affichées sur le dashboard.
+Les alertes sont précalculées dans potting.alert.snapshot, envoyées par
+email et affichées sur le dashboard.
 """
 
 from odoo import api, fields, models, _
 from odoo.exceptions import UserError
 from datetime import date, timedelta
 
+from .potting_alert_snapshot import ALERT_PARENT_FIELDS, ALERT_TRIGGER_FIELDS
+
+
+class PottingAlertSnapshotMixin(models.AbstractModel):
+    """Rafraîchissement incrémental de l'instantané des alertes"""
+    _name = 'potting.alert.snapshot.mixin'
+    _description = 'Mixin rafraîchissement des alertes'
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        self.env['potting.alert.snapshot'].refresh_records(records)
+        records._refresh_alert_parents(records._get_alert_parents())
+        return records
+
+    def write(self, vals):
+        parents = self._get_alert_parents(vals)
+        res = super().write(vals)
+        if ALERT_TRIGGER_FIELDS.get(self._name, set()).intersection(vals):
+            self.env['potting.alert.snapshot'].refresh_records(self)
+        if parents:
+            # Anciens et nouveaux parents
+            self._refresh_alert_parents(parents + self._get_alert_parents(vals))
+        return res
+
+    def unlink(self):
+        parents = self._get_alert_parents()
+        self.env['potting.alert.snapshot'].sudo().search([
+            ('model', '=', self._name), ('res_id', 'in', self.ids),
+        ]).unlink()
+        res = super().unlink()
+        self._refresh_alert_parents(parents)
+        return res
+
+    def _get_alert_parents(self, vals=None):
+        """Parents dont les alertes dépendent de ces enregistrements.
+
+        :param vals: valeurs écrites ; None pour une création ou suppression
+        :return: liste de recordsets (un par champ parent concerné)
+        """
+        return [
+            self.sudo().mapped(parent_field)
+            for parent_field, trigger_fields in ALERT_PARENT_FIELDS.get(self._name, {}).items()
+            if vals is None or trigger_fields.intersection(vals)
+        ]
+
+    def _refresh_alert_parents(self, parents):
+        for records in parents:
+            self.env['potting.alert.snapshot'].refresh_records(records.exists())
+
 
 class PottingAlertService(models.AbstractModel):
     """Service d'alertes critiques pour le module exportations"""
@@ -28,243 +79,35 @@ class PottingAlertService(models.AbstractModel):
     
     @api.model
     def get_all_alerts(self):
-        """Récupère toutes les alertes critiques pour le dashboard"""
+        """Récupère toutes les alertes critiques pour le dashboard.
+        
+        Les alertes sont lues dans l'instantané potting.alert.snapshot
+        (une requête), rafraîchi par cron et à chaque changement d'état.
+        """
+        alerts = self.env['potting.alert.snapshot'].get_alerts()
         return {
-            'critical': self._get_critical_alerts(),
-            'warning': self._get_warning_alerts(),
-            'info': self._get_info_alerts(),
-            'summary': self._get_alert_summary(),
+            'critical': alerts['critical'],
+            'warning': alerts['warning'],
+            'info': alerts['info'],
+            'summary': self._get_alert_summary(alerts),
         }
     
     @api.model
-    def get_alert_counts(self):
-        """Récupère uniquement les compteurs d'alertes (plus rapide)"""
-        return {
-            'ot_taxes_pending': self._count_ot_taxes_pending(),
-            'ot_dus_pending': self._count_ot_dus_pending(),
-            'cv_expiring_7_days': self._count_cv_expiring(7),
-            'cv_expiring_30_days': self._count_cv_expiring(30),
-            'formules_unpaid': self._count_formules_unpaid(),
-            'contracts_uncovered': self._count_contracts_uncovered(),
-            'ot_pending_sale': self._count_ot_pending_sale(),
-        }
-
-    # =========================================================================
-    # ALERTES CRITIQUES (Rouge)
-    # =========================================================================
-    
-    def _get_critical_alerts(self):
-        """Alertes critiques nécessitant une action immédiate"""
-        alerts = []
-        
-        # OT avec formule liée mais taxes non payées depuis plus de 7 jours
-        ots_taxes = self.env['potting.transit.order'].search([
-            ('state', '=', 'formule_linked'),
-            ('taxes_paid', '=', False),
-            ('create_date', '<', fields.Datetime.now() - timedelta(days=7))
-        ])
-        for ot in ots_taxes:
-            alerts.append({
-                'type': 'critical',
-                'category': 'ot_taxes',
-                'title': _("Taxes non payées - OT %s") % ot.name,
-                'message': _("L'OT %s attend le paiement des taxes depuis plus de 7 jours. "
-                           "Formule: %s") % (ot.name, ot.formule_id.name if ot.formule_id else '-'),
-                'model': 'potting.transit.order',
-                'res_id': ot.id,
-                'action': 'open_taxes_payment_wizard',
-                'date': ot.create_date,
-            })
-        
-        # OT vendus mais DUS non payé depuis plus de 3 jours
-        ots_dus = self.env['potting.transit.order'].search([
-            ('state', '=', 'sold'),
-            ('dus_paid', '=', False),
-            ('date_sold', '<', date.today() - timedelta(days=3))
-        ])
-        for ot in ots_dus:
-            alerts.append({
-                'type': 'critical',
-                'category': 'ot_dus',
-                'title': _("DUS non payé - OT %s") % ot.name,
-                'message': _("L'OT %s a été vendu le %s mais le DUS n'est pas encore payé.") % (
-                    ot.name, ot.date_sold),
-                'model': 'potting.transit.order',
-                'res_id': ot.id,
-                'action': 'open_dus_payment_wizard',
-                'date': ot.date_sold,
-            })
-        
-        # CV expirant dans les 7 prochains jours
-        cv_expiring = self.env['potting.confirmation.vente'].search([
-            ('state', '=', 'active'),
-            ('date_end', '>=', date.today()),
-            ('date_end', '<=', date.today() + timedelta(days=7)),
-            ('tonnage_restant', '>', 0)
-        ])
-        for cv in cv_expiring:
-            alerts.append({
-                'type': 'critical',
-                'category': 'cv_expiring',
-                'title': _("CV expire dans %d jours - %s") % (cv.days_remaining, cv.name),
-                'message': _("La CV %s expire le %s avec encore %.2f T de tonnage non utilisé.") % (
-                    cv.name, cv.date_end, cv.tonnage_restant),
-                'model': 'potting.confirmation.vente',
-                'res_id': cv.id,
-                'action': 'open_cv_transfer_wizard',
-                'date': cv.date_end,
-            })
-        
-        return alerts
-
-    # =========================================================================
-    # ALERTES D'AVERTISSEMENT (Orange)
-    # =========================================================================
-    
-    def _get_warning_alerts(self):
-        """Alertes d'avertissement nécessitant attention"""
-        alerts = []
-        
-        # OT avec formule liée récemment (rappel paiement taxes)
-        ots_taxes_recent = self.env['potting.transit.order'].search([
-            ('state', '=', 'formule_linked'),
-            ('taxes_paid', '=', False),
-            ('create_date', '>=', fields.Datetime.now() - timedelta(days=7))
-        ])
-        for ot in ots_taxes_recent:
-            alerts.append({
-                'type': 'warning',
-                'category': 'ot_taxes_reminder',
-                'title': _("Rappel taxes - OT %s") % ot.name,
-                'message': _("L'OT %s attend le paiement des taxes.") % ot.name,
-                'model': 'potting.transit.order',
-                'res_id': ot.id,
-            })
-        
-        # CV expirant dans les 30 prochains jours
-        cv_expiring_30 = self.env['potting.confirmation.vente'].search([
-            ('state', '=', 'active'),
-            ('date_end', '>', date.today() + timedelta(days=7)),
-            ('date_end', '<=', date.today() + timedelta(days=30)),
-            ('tonnage_restant', '>', 0)
-        ])
-        for cv in cv_expiring_30:
-            alerts.append({
-                'type': 'warning',
-                'category': 'cv_expiring_soon',
-                'title': _("CV expire bientôt - %s") % cv.name,
-                'message': _("La CV %s expire le %s. Pensez à reporter le tonnage restant (%.2f T).") % (
-                    cv.name, cv.date_end, cv.tonnage_restant),
-                'model': 'potting.confirmation.vente',
-                'res_id': cv.id,
-            })
-        
-        # OT prêts pour validation
-        ots_validation = self.env['potting.transit.order'].search([
-            ('state', '=', 'ready_validation')
-        ], limit=10)
-        for ot in ots_validation:
-            alerts.append({
-                'type': 'warning',
-                'category': 'ot_validation',
-                'title': _("OT prêt pour validation - %s") % ot.name,
-                'message': _("L'OT %s est prêt pour validation finale.") % ot.name,
-                'model': 'potting.transit.order',
-                'res_id': ot.id,
-            })
-        
-        return alerts
-
-    # =========================================================================
-    # ALERTES INFORMATIVES (Bleu)
-    # =========================================================================
-    
-    def _get_info_alerts(self):
-        """Alertes informatives"""
-        alerts = []
-        
-        # OT récemment créés
-        ots_recent = self.env['potting.transit.order'].search([
-            ('state', '=', 'draft'),
-            ('create_date', '>=', fields.Datetime.now() - timedelta(days=1))
-        ], limit=5)
-        for ot in ots_recent:
-            alerts.append({
-                'type': 'info',
-                'category': 'ot_new',
-                'title': _("Nouvel OT - %s") % ot.name,
-                'message': _("OT %s créé, en attente de liaison avec une formule.") % ot.name,
-                'model': 'potting.transit.order',
-                'res_id': ot.id,
-            })
-        
-        # Formules récemment créées
-        formules_recent = self.env['potting.formule'].search([
-            ('state', '=', 'validated'),
-            ('transit_order_id', '=', False),
-            ('create_date', '>=', fields.Datetime.now() - timedelta(days=3))
-        ], limit=5)
-        for fo in formules_recent:
-            alerts.append({
-                'type': 'info',
-                'category': 'formule_available',
-                'title': _("Formule disponible - %s") % fo.name,
-                'message': _("Formule %s disponible pour liaison avec un OT.") % fo.name,
-                'model': 'potting.formule',
-                'res_id': fo.id,
-            })
-        
-        return alerts
-
-    # =========================================================================
-    # COMPTEURS
-    # =========================================================================
+    def get_alert_counts(self, campaign_id=None):
+        """Récupère uniquement les compteurs d'alertes (une seule requête SQL)"""
+        return self.env['potting.alert.snapshot'].get_counts(campaign_id=campaign_id)
     
-    def _count_ot_taxes_pending(self):
-        return self.env['potting.transit.order'].search_count([
-            ('state', '=', 'formule_linked'),
-            ('taxes_paid', '=', False)
-        ])
-    
-    def _count_ot_dus_pending(self):
-        return self.env['potting.transit.order'].search_count([
-            ('state', '=', 'sold'),
-            ('dus_paid', '=', False)
-        ])
-    
-    def _count_ot_pending_sale(self):
-        return self.env['potting.transit.order'].search_count([
-            ('state', '=', 'taxes_paid'),
-            ('date_sold', '=', False)
-        ])
-    
-    def _count_cv_expiring(self, days):
-        return self.env['potting.confirmation.vente'].search_count([
-            ('state', '=', 'active'),
-            ('date_end', '>=', date.today()),
-            ('date_end', '<=', date.today() + timedelta(days=days)),
-            ('tonnage_restant', '>', 0)
-        ])
-    
-    def _count_formules_unpaid(self):
-        return self.env['potting.formule'].search_count([
-            ('state', '=', 'validated'),
-            ('avant_vente_paye', '=', False)
-        ])
-    
-    def _count_contracts_uncovered(self):
-        """Contrats dont le tonnage n'est pas entièrement couvert par des OT"""
-        return self.env['potting.customer.order'].search_count([
-            ('state', 'in', ['confirmed', 'in_progress']),
-            ('remaining_contract_tonnage', '>', 0)
-        ])
+    @api.model
+    def refresh_alerts(self):
+        """Reconstruit l'instantané des alertes (cron)"""
+        return self.env['potting.alert.snapshot'].refresh_all()
     
-    def _get_alert_summary(self):
+    def _get_alert_summary(self, alerts):
         """Résumé des alertes par catégorie"""
         return {
-            'total_critical': len(self._get_critical_alerts()),
-            'total_warning': len(self._get_warning_alerts()),
-            'total_info': len(self._get_info_alerts()),
+            'total_critical': len(alerts['critical']),
+            'total_warning': len(alerts['warning']),
+            'total_info': len(alerts['info']),
         }
 
     # =========================================================================
@@ -274,11 +117,12 @@ class PottingAlertService(models.AbstractModel):
     @api.model
     def send_daily_alert_email(self):
         """Envoyer un email quotidien avec les alertes critiques aux managers"""
-        alerts = self.get_all_alerts()
-        
-        if alerts['summary']['total_critical'] == 0 and alerts['summary']['total_warning'] == 0:
+        counts = self.get_alert_counts()
+        if counts['total_critical'] == 0 and counts['total_warning'] == 0:
             return True  # Pas d'alertes, pas d'email
         
+        alerts = self.get_all_alerts()
+        
         # Récupérer les managers
         managers = self.env['res.users'].search([
             ('groups_id', 'in', self.env.ref('potting_management.group_potting_manager').id)
@@ -345,7 +189,8 @@ class PottingAlertService(models.AbstractModel):
 
 class PottingTransitOrderAlerts(models.Model):
     """Extension de l'OT pour les alertes"""
-    _inherit = 'potting.transit.order'
+    _name = 'potting.transit.order'
+    _inherit = ['potting.transit.order', 'potting.alert.snapshot.mixin']
     
     has_pending_taxes_alert = fields.Boolean(
         string="Alerte taxes en attente",
@@ -393,3 +238,29 @@ class PottingTransitOrderAlerts(models.Model):
                     ot.alert_level = 'warning'
             else:
                 ot.alert_level = 'none'
+
+
+class PottingConfirmationVenteAlerts(models.Model):
+    _name = 'potting.confirmation.vente'
+    _inherit = ['potting.confirmation.vente', 'potting.alert.snapshot.mixin']
+
+
+class PottingFormuleAlerts(models.Model):
+    _name = 'potting.formule'
+    _inherit = ['potting.formule', 'potting.alert.snapshot.mixin']
+
+
+class PottingCustomerOrderAlerts(models.Model):
+    _name = 'potting.customer.order'
+    _inherit = ['potting.customer.order', 'potting.alert.snapshot.mixin']
+
+
+class PottingCvTonnageMoveAlerts(models.Model):
+    """Le tonnage restant des CV est recalculé à chaque mouvement du registre"""
+    _inherit = 'potting.cv.tonnage.move'
+
+    @api.model
+    def _post(self, vals_list):
+        moves = super()._post(vals_list)
+        self.env['potting.alert.snapshot'].refresh_records(moves.confirmation_vente_id)
+        return moves
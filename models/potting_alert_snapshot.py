@@ -0,0 +1,329 @@
+# -*- coding: utf-8 -*-
+"""
+Instantané des alertes exportations
+
+Table précalculée des alertes (une ligne par enregistrement et par
+catégorie d'alerte), lue par le service d'alertes, le dashboard et
+l'email quotidien des managers.
+
+Rafraîchissement :
+- complet par cron (alertes dépendant de l'âge des enregistrements)
+- incrémental à chaque changement d'état des OT, CV, formules et contrats,
+  ainsi que des enregistrements parents dont un champ calculé stocké change
+  sans passer par write() (contrat d'un OT, CV d'un mouvement de tonnage)
+"""
+
+from datetime import date, datetime, timedelta
+
+from odoo import api, fields, models, tools, _
+
+ALERT_LEVELS = [
+    ('critical', 'Critique'),
+    ('warning', 'Avertissement'),
+    ('info', 'Information'),
+    ('counter', 'Compteur uniquement'),
+]
+
+ALERT_CATEGORIES = [
+    ('ot_taxes', 'Taxes non payées'),
+    ('ot_taxes_reminder', 'Rappel taxes'),
+    ('ot_dus', 'DUS non payé'),
+    ('ot_dus_recent', 'DUS en attente'),
+    ('ot_pending_sale', 'OT en attente de vente'),
+    ('ot_validation', 'OT prêt pour validation'),
+    ('ot_new', 'Nouvel OT'),
+    ('cv_expiring', 'CV expirant sous 7 jours'),
+    ('cv_expiring_soon', 'CV expirant sous 30 jours'),
+    ('formule_available', 'Formule disponible'),
+    ('formule_unpaid', 'Formule non payée'),
+    ('contract_uncovered', 'Contrat non couvert'),
+]
+
+# Nombre maximum d'alertes affichées par catégorie
+ALERT_LIST_LIMITS = {
+    'ot_validation': 10,
+    'ot_new': 5,
+    'formule_available': 5,
+}
+
+# Champs dont la modification déclenche le rafraîchissement incrémental
+ALERT_TRIGGER_FIELDS = {
+    'potting.transit.order': {'state', 'taxes_paid', 'dus_paid', 'date_sold', 'formule_id', 'campaign_id'},
+    'potting.confirmation.vente': {'state', 'date_end', 'tonnage_autorise', 'campaign_id'},
+    'potting.formule': {'state', 'avant_vente_paye', 'transit_order_id', 'campaign_id'},
+    'potting.customer.order': {'state', 'contract_tonnage'},
+}
+
+# Parents à rafraîchir : {modèle: {champ parent: champs déclencheurs}}
+# (tonnage restant du contrat recalculé à partir de ses OT)
+ALERT_PARENT_FIELDS = {
+    'potting.transit.order': {'customer_order_id': {'customer_order_id', 'tonnage'}},
+}
+
+ALERT_COUNTS_QUERY = """
+    SELECT COUNT(*) FILTER (WHERE category IN ('ot_taxes', 'ot_taxes_reminder')),
+           COUNT(*) FILTER (WHERE category IN ('ot_dus', 'ot_dus_recent')),
+           COUNT(*) FILTER (WHERE category = 'cv_expiring'),
+           COUNT(*) FILTER (WHERE category IN ('cv_expiring', 'cv_expiring_soon')),
+           COUNT(*) FILTER (WHERE category = 'formule_unpaid'),
+           COUNT(*) FILTER (WHERE category = 'contract_uncovered'),
+           COUNT(*) FILTER (WHERE category = 'ot_pending_sale'),
+           COUNT(*) FILTER (WHERE level = 'critical'),
+           COUNT(*) FILTER (WHERE level = 'warning')
+      FROM potting_alert_snapshot
+     WHERE company_id = ANY(%s)
+"""
+ALERT_COUNT_KEYS = [
+    'ot_taxes_pending', 'ot_dus_pending', 'cv_expiring_7_days', 'cv_expiring_30_days',
+    'formules_unpaid', 'contracts_uncovered', 'ot_pending_sale',
+    'total_critical', 'total_warning',
+]
+
+
+def _as_date(value):
+    return value.date() if isinstance(value, datetime) else value
+
+
+class PottingAlertSnapshot(models.Model):
+    """Alerte précalculée (une ligne par enregistrement et par catégorie)"""
+    _name = 'potting.alert.snapshot'
+    _description = 'Instantané des alertes exportations'
+    _order = 'level, category, date desc, id'
+    _log_access = False
+
+    category = fields.Selection(ALERT_CATEGORIES, string="Catégorie", required=True)
+    level = fields.Selection(ALERT_LEVELS, string="Niveau", required=True)
+    model = fields.Char(string="Modèle", required=True)
+    res_id = fields.Many2oneReference(string="Enregistrement", model_field='model', required=True)
+    campaign_id = fields.Many2one('potting.campaign', string="Campagne", index=True, ondelete='cascade')
+    company_id = fields.Many2one('res.company', string="Société", index=True, ondelete='cascade')
+    title = fields.Char(string="Titre")
+    message = fields.Text(string="Message")
+    action = fields.Char(string="Action")
+    date = fields.Date(string="Date")
+    refresh_date = fields.Datetime(string="Rafraîchi le")
+
+    def init(self):
+        tools.create_index(
+            self._cr, 'potting_alert_snapshot_level_category_idx',
+            self._table, ['level', 'category'],
+        )
+        tools.create_index(
+            self._cr, 'potting_alert_snapshot_model_res_id_idx',
+            self._table, ['model', 'res_id'],
+        )
+
+    # =========================================================================
+    # DÉFINITION DES ALERTES
+    # =========================================================================
+
+    @api.model
+    def _get_alert_definitions(self):
+        """Liste des conditions d'alerte.
+
+        Chaque définition: (catégorie, niveau, modèle, domaine, champs lus,
+        fonction (valeurs lues) -> (titre, message, date), action).
+        """
+        now = fields.Datetime.now()
+        today = date.today()
+
+        def ot_taxes(r):
+            return (
+                _("Taxes non payées - OT %s") % r['name'],
+                _("L'OT %s attend le paiement des taxes depuis plus de 7 jours. "
+                  "Formule: %s") % (r['name'], r['formule_id'][1] if r['formule_id'] else '-'),
+                _as_date(r['create_date']),
+            )
+
+        def ot_dus(r):
+            return (
+                _("DUS non payé - OT %s") % r['name'],
+                _("L'OT %s a été vendu le %s mais le DUS n'est pas encore payé.") % (
+                    r['name'], r['date_sold']),
+                r['date_sold'],
+            )
+
+        def cv_expiring(r):
+            return (
+                _("CV expire dans %d jours - %s") % ((r['date_end'] - today).days, r['name']),
+                _("La CV %s expire le %s avec encore %.2f T de tonnage non utilisé.") % (
+                    r['name'], r['date_end'], r['tonnage_restant']),
+                r['date_end'],
+            )
+
+        def cv_expiring_soon(r):
+            return (
+                _("CV expire bientôt - %s") % r['name'],
+                _("La CV %s expire le %s. Pensez à reporter le tonnage restant (%.2f T).") % (
+                    r['name'], r['date_end'], r['tonnage_restant']),
+                r['date_end'],
+            )
+
+        def simple(title, message, date_field='create_date'):
+            def build(r):
+                return title % r['name'], message % r['name'], _as_date(r[date_field])
+            return build
+
+        ot_fields = ['name', 'campaign_id', 'create_date', 'formule_id', 'date_sold']
+        cv_fields = ['name', 'campaign_id', 'date_end', 'tonnage_restant']
+        cv_active = [('state', '=', 'active'), ('tonnage_restant', '>', 0)]
+
+        return [
+            # Critiques
+            ('ot_taxes', 'critical', 'potting.transit.order', [
+                ('state', '=', 'formule_linked'), ('taxes_paid', '=', False),
+                ('create_date', '<', now - timedelta(days=7)),
+            ], ot_fields, ot_taxes, 'open_taxes_payment_wizard'),
+            ('ot_dus', 'critical', 'potting.transit.order', [
+                ('state', '=', 'sold'), ('dus_paid', '=', False),
+                ('date_sold', '<', today - timedelta(days=3)),
+            ], ot_fields, ot_dus, 'open_dus_payment_wizard'),
+            ('cv_expiring', 'critical', 'potting.confirmation.vente', cv_active + [
+                ('date_end', '>=', today), ('date_end', '<=', today + timedelta(days=7)),
+            ], cv_fields, cv_expiring, 'open_cv_transfer_wizard'),
+            # Avertissements
+            ('ot_taxes_reminder', 'warning', 'potting.transit.order', [
+                ('state', '=', 'formule_linked'), ('taxes_paid', '=', False),
+                ('create_date', '>=', now - timedelta(days=7)),
+            ], ot_fields, simple(_("Rappel taxes - OT %s"), _("L'OT %s attend le paiement des taxes.")), False),
+            ('cv_expiring_soon', 'warning', 'potting.confirmation.vente', cv_active + [
+                ('date_end', '>', today + timedelta(days=7)), ('date_end', '<=', today + timedelta(days=30)),
+            ], cv_fields, cv_expiring_soon, False),
+            ('ot_validation', 'warning', 'potting.transit.order', [
+                ('state', '=', 'ready_validation'),
+            ], ot_fields, simple(_("OT prêt pour validation - %s"),
+                                 _("L'OT %s est prêt pour validation finale.")), False),
+            # Informations
+            ('ot_new', 'info', 'potting.transit.order', [
+                ('state', '=', 'draft'), ('create_date', '>=', now - timedelta(days=1)),
+            ], ot_fields, simple(_("Nouvel OT - %s"),
+                                 _("OT %s créé, en attente de liaison avec une formule.")), False),
+            ('formule_available', 'info', 'potting.formule', [
+                ('state', '=', 'validated'), ('transit_order_id', '=', False),
+                ('create_date', '>=', now - timedelta(days=3)),
+            ], ['name', 'campaign_id', 'create_date'], simple(
+                _("Formule disponible - %s"), _("Formule %s disponible pour liaison avec un OT.")), False),
+            # Compteurs uniquement
+            ('ot_dus_recent', 'counter', 'potting.transit.order', [
+                ('state', '=', 'sold'), ('dus_paid', '=', False),
+                '|', ('date_sold', '=', False), ('date_sold', '>=', today - timedelta(days=3)),
+            ], ot_fields, simple("%s", "%s", 'date_sold'), False),
+            ('ot_pending_sale', 'counter', 'potting.transit.order', [
+                ('state', '=', 'taxes_paid'), ('date_sold', '=', False),
+            ], ot_fields, simple("%s", "%s"), False),
+            ('formule_unpaid', 'counter', 'potting.formule', [
+                ('state', '=', 'validated'), ('avant_vente_paye', '=', False),
+            ], ['name', 'campaign_id', 'create_date'], simple("%s", "%s"), False),
+            ('contract_uncovered', 'counter', 'potting.customer.order', [
+                ('state', 'in', ['confirmed', 'in_progress']), ('remaining_contract_tonnage', '>', 0),
+            ], ['name', 'create_date'], simple("%s", "%s"), False),
+        ]
+
+    # =========================================================================
+    # RAFRAÎCHISSEMENT
+    # =========================================================================
+
+    @api.model
+    def _collect(self, restrict=None):
+        """Calculer les valeurs des lignes d'alerte.
+
+        :param restrict: dict {modèle: ids} pour limiter le calcul à certains
+                         enregistrements (rafraîchissement incrémental)
+        :return: liste de valeurs pour create()
+        """
+        refresh_date = fields.Datetime.now()
+        vals_list = []
+        for category, level, model, domain, field_names, build, action in self._get_alert_definitions():
+            if restrict is not None:
+                if not restrict.get(model):
+                    continue
+                domain = [('id', 'in', list(restrict[model]))] + domain
+            for values in self.env[model].search_read(domain, field_names + ['company_id']):
+                title, message, alert_date = build(values)
+                campaign = values.get('campaign_id')
+                company = values.get('company_id')
+                vals_list.append({
+                    'category': category,
+                    'level': level,
+                    'model': model,
+                    'res_id': values['id'],
+                    'campaign_id': campaign[0] if campaign else False,
+                    'company_id': company[0] if company else False,
+                    'title': title,
+                    'message': message,
+                    'action': action or False,
+                    'date': alert_date or False,
+                    'refresh_date': refresh_date,
+                })
+        return vals_list
+
+    @api.model
+    def refresh_all(self):
+        """Reconstruire entièrement l'instantané (cron)."""
+        self = self.sudo()
+        vals_list = self._collect()
+        self.env.cr.execute("DELETE FROM potting_alert_snapshot")
+        self.invalidate_model()
+        self.create(vals_list)
+        return True
+
+    @api.model
+    def refresh_records(self, records):
+        """Rafraîchir les alertes d'un ensemble d'enregistrements."""
+        if not records:
+            return True
+        self = self.sudo()
+        self.flush_model()
+        records.flush_recordset()
+        self.env.cr.execute(
+            "DELETE FROM potting_alert_snapshot WHERE model = %s AND res_id = ANY(%s)",
+            [records._name, records.ids],
+        )
+        self.invalidate_model()
+        self.create(self._collect({records._name: records.ids}))
+        return True
+
+    # =========================================================================
+    # LECTURE
+    # =========================================================================
+
+    @api.model
+    def get_counts(self, campaign_id=None):
+        """Tous les compteurs en une seule requête (sociétés actives)."""
+        self.flush_model()
+        query = ALERT_COUNTS_QUERY
+        params = [self.env.companies.ids]
+        if campaign_id:
+            query += " AND campaign_id = %s"
+            params.append(campaign_id)
+        self.env.cr.execute(query, params)
+        return dict(zip(ALERT_COUNT_KEYS, self.env.cr.fetchone()))
+
+    @api.model
+    def get_alerts(self, levels=('critical', 'warning', 'info')):
+        """Alertes affichables des sociétés actives, groupées par niveau (une seule requête)."""
+        alerts = {level: [] for level in levels}
+        per_category = {}
+        rows = self.sudo().search_read(
+            [('level', 'in', list(levels)), ('company_id', 'in', self.env.companies.ids)],
+            ['category', 'level', 'model', 'res_id', 'title', 'message', 'action', 'date'],
+        )
+        for row in rows:
+            limit = ALERT_LIST_LIMITS.get(row['category'])
+            if limit is not None:
+                per_category[row['category']] = per_category.get(row['category'], 0) + 1
+                if per_category[row['category']] > limit:
+                    continue
+            alert = {
+                'type': row['level'],
+                'category': row['category'],
+                'title': row['title'],
+                'message': row['message'],
+                'model': row['model'],
+                'res_id': row['res_id'],
+                'date': row['date'],
+            }
+            if row['action']:
+                alert['action'] = row['action']
+            alerts[row['level']].append(alert)
+        return alerts
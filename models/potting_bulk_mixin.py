@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+Mode « opérations groupées » du chatter
+
+Les traitements de masse (génération de lots, imports, crons, libération de
+conteneurs, BL au départ navire...) postent sinon un message et des valeurs
+de suivi par enregistrement et par étape, ce qui domine le temps de la
+transaction. Dans le contexte ``potting_bulk`` :
+
+- ``message_post`` (notes simples, sans destinataire ni pièce jointe) est
+  mis en attente au lieu de créer un ``mail.message`` ;
+- les champs suivis (``tracking=True``) modifiés par ``write`` ne créent pas
+  de ``mail.tracking.value`` : les changements « ancien → nouveau » sont
+  ajoutés au message en attente ;
+- la création n'écrit ni le message « créé » ni les abonnements.
+
+À la fin du traitement, les messages en attente sont publiés en une fois :
+un message agrégé par parent (``_bulk_parent_field``, ex. l'OT d'un lot) ou
+un seul message par enregistrement. Usage ::
+
+    with records._bulk_mode() as bulk_records:
+        for record in bulk_records:
+            record.write({...})
+            record.message_post(body=...)
+
+Le contexte peut aussi être passé directement (``potting_bulk=True``) : les
+messages en attente sont alors publiés avant le commit.
+"""
+
+from collections import defaultdict
+from contextlib import contextmanager
+
+from markupsafe import Markup
+
+from odoo import api, models
+from odoo.tools import plaintext2html
+
+BULK_CONTEXT = 'potting_bulk'
+BULK_BUFFER_KEY = 'potting.bulk.messages'
+
+# Paramètres de message_post compatibles avec une note différée
+DEFERRABLE_POST_KEYS = {'body', 'subject', 'message_type', 'subtype_xmlid'}
+
+
+class PottingBulkMixin(models.AbstractModel):
+    """Chatter différé et agrégé pour les opérations groupées"""
+    _name = 'potting.bulk.mixin'
+    _inherit = ['mail.thread']
+    _description = 'Mode opérations groupées (chatter différé)'
+
+    # Champ many2one du parent recevant le message agrégé (False : l'enregistrement lui-même)
+    _bulk_parent_field = False
+
+    # -------------------------------------------------------------------------
+    # MODE GROUPÉ
+    # -------------------------------------------------------------------------
+    @contextmanager
+    def _bulk_mode(self):
+        """Exécuter un traitement de masse avec le chatter différé.
+
+        Produit les enregistrements dans le contexte ``potting_bulk`` et publie
+        les messages en attente à la sortie (les modes imbriqués publient avec
+        le mode le plus externe).
+        """
+        if self.env.context.get(BULK_CONTEXT):
+            yield self
+            return
+        yield self.with_context(**{BULK_CONTEXT: True})
+        self.env['potting.bulk.mixin']._bulk_flush()
+
+    def _bulk_enabled(self):
+        return bool(self.env.context.get(BULK_CONTEXT)) and not self.env.context.get('tracking_disable')
+
+    def _bulk_log(self, bodies):
+        """Mettre des messages en attente.
+
+        :param bodies: dict {record_id: texte ou Markup}
+        """
+        data = self.env.cr.precommit.data
+        if BULK_BUFFER_KEY not in data:
+            data[BULK_BUFFER_KEY] = {}
+            self.env.cr.precommit.add(self.env['potting.bulk.mixin']._bulk_flush)
+        buffer = data[BULK_BUFFER_KEY].setdefault(self._name, {})
+        for record_id, body in bodies.items():
+            buffer.setdefault(record_id, []).append(body)
+
+    @api.model
+    def _bulk_flush(self):
+        """Publier les messages en attente : un message par parent ou par enregistrement."""
+        buffer = self.env.cr.precommit.data.pop(BULK_BUFFER_KEY, None)
+        if not buffer:
+            return
+        env = self.with_context(**{BULK_CONTEXT: False}).env
+
+        def to_html(body):
+            return body if isinstance(body, Markup) else plaintext2html(str(body))
+
+        parts_by_model = defaultdict(lambda: defaultdict(list))
+        for model_name, messages in buffer.items():
+            Model = env[model_name]
+            parent_field = Model._bulk_parent_field
+            for record in Model.browse(list(messages)).exists():
+                html = Markup('').join(to_html(body) for body in messages[record.id])
+                parent = record[parent_field] if parent_field else False
+                if parent:
+                    parts_by_model[parent._name][parent.id].append(
+                        Markup('<p><strong>%s</strong></p>%s') % (record.display_name, html)
+                    )
+                else:
+                    parts_by_model[model_name][record.id].append(html)
+
+        for model_name, parts in parts_by_model.items():
+            env[model_name].browse(list(parts))._message_log_batch(bodies={
+                record_id: Markup('').join(record_parts) for record_id, record_parts in parts.items()
+            })
+
+    # -------------------------------------------------------------------------
+    # SURCHARGES
+    # -------------------------------------------------------------------------
+    @api.model_create_multi
+    def create(self, vals_list):
+        if not self._bulk_enabled():
+            return super().create(vals_list)
+        records = super(PottingBulkMixin, self.with_context(
+            mail_create_nolog=True, mail_create_nosubscribe=True, mail_notrack=True
+        )).create(vals_list)
+        return records.with_env(self.env)
+
+    def write(self, vals):
+        if not self._bulk_enabled():
+            return super().write(vals)
+        tracked = [
+            fname for fname in vals
+            if fname in self._fields and getattr(self._fields[fname], 'tracking', False)
+        ]
+        old_values = {record.id: record._bulk_display_values(tracked) for record in self} if tracked else {}
+        result = super(PottingBulkMixin, self.with_context(mail_notrack=True)).write(vals)
+        if tracked:
+            bodies = {}
+            for record in self:
+                new_values = record._bulk_display_values(tracked)
+                changes = [
+                    "%s : %s → %s" % (self._fields[fname].string, old_values[record.id][fname], new_values[fname])
+                    for fname in tracked if old_values[record.id][fname] != new_values[fname]
+                ]
+                if changes:
+                    bodies[record.id] = '\n'.join(changes)
+            self._bulk_log(bodies)
+        return result
+
+    def _bulk_display_values(self, field_names):
+        self.ensure_one()
+        return {
+            fname: self._fields[fname].convert_to_display_name(self[fname], self) or '-'
+            for fname in field_names
+        }
+
+    def message_post(self, **kwargs):
+        if (
+            not self._bulk_enabled()
+            or not set(kwargs) <= DEFERRABLE_POST_KEYS
+            or kwargs.get('subtype_xmlid', 'mail.mt_note') != 'mail.mt_note'
+        ):
+            return super().message_post(**kwargs)
+        body = kwargs.get('body') or ''
+        if kwargs.get('subject'):
+            body = Markup('<p><strong>%s</strong></p>%s') % (
+                kwargs['subject'], body if isinstance(body, Markup) else plaintext2html(str(body))
+            )
+        self._bulk_log({record.id: body for record in self})
+        return self.env['mail.message']
@@ -240,12 +240,10 @@ class PottingCertification(models.Model):
     # -------------------------------------------------------------------------
     # DISPLAY METHODS
     # -------------------------------------------------------------------------
-    def name_get(self):
-        result = []
+    @api.depends('name', 'suffix')
+    def _compute_display_name(self):
         for cert in self:
-            name = f"{cert.name} ({cert.suffix})"
-            result.append((cert.id, name))
-        return result
+            cert.display_name = f"{cert.name} ({cert.suffix})"
 
     @api.model
     def _name_search(self, name, domain=None, operator='ilike', limit=None, order=None):
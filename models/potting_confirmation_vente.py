@@ -1,8 +1,13 @@
 # -*- coding: utf-8 -*-
 
+import logging
+from datetime import date
+
 from odoo import api, fields, models, _
 from odoo.exceptions import UserError, ValidationError
-from datetime import date
+from odoo.tools import float_is_zero
+
+_logger = logging.getLogger(__name__)
 
 
 class PottingConfirmationVente(models.Model):
@@ -216,6 +221,14 @@ class PottingConfirmationVente(models.Model):
         copy=False
     )
     
+    tonnage_move_ids = fields.One2many(
+        'potting.cv.tonnage.move',
+        'confirmation_vente_id',
+        string="Mouvements de tonnage",
+        copy=False,
+        readonly=True
+    )
+    
     formule_count = fields.Integer(
         string="Nombre de formules",
         compute='_compute_formule_count',
@@ -272,19 +285,18 @@ class PottingConfirmationVente(models.Model):
             else:
                 record.days_remaining = 0
     
-    @api.depends('customer_order_ids', 'customer_order_ids.contract_tonnage', 'customer_order_ids.state')
+    @api.depends('tonnage_autorise', 'tonnage_move_ids')
     def _compute_tonnage_utilise(self):
-        """Calcule le tonnage utilisé basé sur les contrats liés"""
+        """Lit le solde du dernier mouvement du registre de tonnage"""
+        balances = self.env['potting.cv.tonnage.move']._get_last_balances(self._origin.ids)
         for record in self:
-            # Calcul basé sur le Many2many direct avec les contrats
-            tonnage_utilise = sum(
-                order.contract_tonnage 
-                for order in record.customer_order_ids 
-                if order.state not in ('cancelled',)
+            # Sans mouvement (CV en cours de création), tout le tonnage est disponible
+            _sequence, tonnage_restant, tonnage_utilise = balances.get(
+                record._origin.id, (0, record.tonnage_autorise, 0.0)
             )
             
             record.tonnage_utilise = tonnage_utilise
-            record.tonnage_restant = record.tonnage_autorise - tonnage_utilise
+            record.tonnage_restant = tonnage_restant
             
             if record.tonnage_autorise > 0:
                 record.tonnage_progress = (tonnage_utilise / record.tonnage_autorise) * 100
@@ -374,7 +386,29 @@ class PottingConfirmationVente(models.Model):
                 vals['name'] = self.env['ir.sequence'].next_by_code(
                     'potting.confirmation.vente'
                 ) or _('Nouveau')
-        return super().create(vals_list)
+        records = super().create(vals_list)
+        # Mouvement d'ouverture du registre (autorisation ou report entrant)
+        records._post_tonnage_moves([
+            record._prepare_tonnage_move(record.tonnage_autorise, 'authorize')
+            for record in records
+        ])
+        if any(vals.get('customer_order_ids') for vals in vals_list):
+            records._sync_tonnage_ledger()
+        return records
+    
+    def write(self, vals):
+        if 'tonnage_autorise' in vals:
+            self._init_tonnage_ledger()
+            old_tonnages = {record.id: record.tonnage_autorise for record in self}
+        res = super().write(vals)
+        if 'tonnage_autorise' in vals:
+            self._post_tonnage_moves([
+                record._prepare_tonnage_move(record.tonnage_autorise - old_tonnages[record.id], 'adjust')
+                for record in self
+            ])
+        if 'customer_order_ids' in vals:
+            self._sync_tonnage_ledger()
+        return res
     
     def unlink(self):
         for record in self:
@@ -471,23 +505,175 @@ class PottingConfirmationVente(models.Model):
     # CRON - VÉRIFICATION DES EXPIRATIONS
     # =========================================================================
     
+    @api.model
+    def _get_expiration_candidates(self, today):
+        """Sélectionner en une requête les CV actives à clôturer.
+        
+        Le tonnage restant est lu tel que stocké (solde du registre de
+        tonnage), sans agréger les contrats liés.
+        
+        :return: dict {'expired': ids, 'consumed': ids}
+        """
+        self.flush_model(['state', 'date_end', 'tonnage_restant'])
+        self.env.cr.execute("""
+            SELECT cv.id,
+                   CASE WHEN cv.date_end < %(today)s THEN 'expired' ELSE 'consumed' END
+              FROM potting_confirmation_vente cv
+             WHERE cv.state = 'active'
+               AND (cv.date_end < %(today)s OR cv.tonnage_restant <= 0)
+        """, {'today': today})
+        candidates = {'expired': [], 'consumed': []}
+        for cv_id, target_state in self.env.cr.fetchall():
+            candidates[target_state].append(cv_id)
+        return candidates
+    
     @api.model
     def _cron_check_expiration(self):
-        """Vérifier et mettre à jour les CV expirées"""
-        today = date.today()
-        expired_cvs = self.search([
-            ('state', '=', 'active'),
-            ('date_end', '<', today)
+        """Vérifier et mettre à jour les CV expirées ou consommées.
+        
+        Transition ensembliste : une requête de sélection, une écriture par
+        état cible (suivi des modifications conservé) et un message de
+        synthèse par campagne.
+        """
+        candidates = self._get_expiration_candidates(date.today())
+        
+        transitioned = self.browse()
+        for target_state in ('expired', 'consumed'):
+            cvs = self.browse(candidates[target_state])
+            if cvs:
+                cvs.write({'state': target_state})
+                transitioned |= cvs
+        
+        if transitioned:
+            self._post_expiration_summary(
+                self.browse(candidates['expired']), self.browse(candidates['consumed'])
+            )
+            _logger.info(
+                "Cron expiration CV: %d expirée(s), %d consommée(s)",
+                len(candidates['expired']), len(candidates['consumed'])
+            )
+        return True
+    
+    @api.model
+    def _post_expiration_summary(self, expired_cvs, consumed_cvs):
+        """Publier un message de synthèse par campagne sur les CV clôturées."""
+        states = dict(self._fields['state'].selection)
+        by_campaign = {}
+        for label, cvs in ((states['expired'], expired_cvs), (states['consumed'], consumed_cvs)):
+            for campaign, campaign_cvs in cvs.grouped('campaign_id').items():
+                by_campaign.setdefault(campaign, []).append((label, campaign_cvs.mapped('name')))
+        
+        for campaign, groups in by_campaign.items():
+            if not campaign:
+                continue
+            campaign.message_post(
+                body=_("Clôture automatique des CV - %s") % ' | '.join(
+                    "%s (%d): %s" % (label, len(names), ', '.join(names))
+                    for label, names in groups
+                ),
+                subtype_xmlid='mail.mt_note',
+            )
+    
+    # =========================================================================
+    # REGISTRE DE TONNAGE
+    # =========================================================================
+    
+    def _prepare_tonnage_move(self, quantity, move_type, customer_order=None, note=None):
+        """Valeurs d'un mouvement de tonnage sur cette CV.
+        
+        Les contextes potting_cv_transfer_from / potting_cv_transfer_note
+        transforment une autorisation ou un ajustement en report entrant.
+        """
+        self.ensure_one()
+        counterpart_id = self.env.context.get('potting_cv_transfer_from')
+        if counterpart_id and move_type in ('authorize', 'adjust'):
+            move_type = 'transfer_in'
+            note = note or self.env.context.get('potting_cv_transfer_note')
+        return {
+            'confirmation_vente_id': self.id,
+            'move_type': move_type,
+            'quantity': quantity,
+            'customer_order_id': customer_order and customer_order.id,
+            'counterpart_cv_id': counterpart_id if move_type == 'transfer_in' else False,
+            'note': note,
+        }
+    
+    def _post_tonnage_moves(self, vals_list):
+        return self.env['potting.cv.tonnage.move']._post(vals_list)
+    
+    def _init_tonnage_ledger(self):
+        """Ouvrir le registre des CV qui n'ont encore aucun mouvement."""
+        balances = self.env['potting.cv.tonnage.move']._get_last_balances(self.ids)
+        self._post_tonnage_moves([
+            record._prepare_tonnage_move(record.tonnage_autorise, 'authorize', note=_("Ouverture du registre"))
+            for record in self.with_context(potting_cv_transfer_from=False)
+            if record.id not in balances
         ])
-        expired_cvs.write({'state': 'expired'})
+    
+    def _sync_tonnage_ledger(self):
+        """Aligner le registre sur les contrats liés (allocations / libérations).
         
-        # Consommer les CV dont le tonnage est épuisé
-        for cv in self.search([('state', '=', 'active')]):
-            if cv.tonnage_restant <= 0:
-                cv.write({'state': 'consumed'})
+        Compare en deux requêtes le tonnage des contrats liés (hors annulés)
+        au tonnage déjà alloué dans le registre, contrat par contrat, et
+        enregistre uniquement les écarts.
+        """
+        if not self:
+            return
+        self._init_tonnage_ledger()
+        self.env['potting.customer.order'].flush_model(['contract_tonnage', 'state'])
+        self.flush_recordset(['customer_order_ids'])
+        self.env.cr.execute("""
+            SELECT rel.confirmation_vente_id, rel.customer_order_id, o.contract_tonnage
+              FROM potting_customer_order_confirmation_vente_rel rel
+              JOIN potting_customer_order o ON o.id = rel.customer_order_id
+             WHERE rel.confirmation_vente_id = ANY(%s)
+               AND o.state != 'cancelled'
+        """, [self.ids])
+        expected = {(cv_id, order_id): tonnage or 0.0 for cv_id, order_id, tonnage in self.env.cr.fetchall()}
+        
+        recorded = {}
+        for cv, order, quantity in self.env['potting.cv.tonnage.move']._read_group(
+            [('confirmation_vente_id', 'in', self.ids), ('move_type', 'in', ['allocate', 'release'])],
+            ['confirmation_vente_id', 'customer_order_id'], ['quantity:sum'],
+        ):
+            recorded[(cv.id, order.id)] = -(quantity or 0.0)
         
+        vals_list = []
+        for cv_id, order_id in sorted(set(expected) | set(recorded)):
+            delta = expected.get((cv_id, order_id), 0.0) - recorded.get((cv_id, order_id), 0.0)
+            if float_is_zero(delta, precision_digits=3):
+                continue
+            cv = self.browse(cv_id)
+            vals_list.append(cv._prepare_tonnage_move(
+                -delta, 'allocate' if delta > 0 else 'release',
+                customer_order=self.env['potting.customer.order'].browse(order_id),
+            ))
+        self._post_tonnage_moves(vals_list)
+    
+    @api.model
+    def _init_all_tonnage_ledgers(self):
+        """Initialiser le registre de toutes les CV (installation / mise à jour)."""
+        self.with_context(active_test=False).search([])._sync_tonnage_ledger()
         return True
     
+    def _transfer_tonnage_to(self, target_cv, tonnage, note=None):
+        """Enregistrer le report sortant d'un tonnage vers une autre CV."""
+        self.ensure_one()
+        self._init_tonnage_ledger()
+        move_vals = self._prepare_tonnage_move(-tonnage, 'transfer_out', note=note)
+        move_vals['counterpart_cv_id'] = target_cv.id
+        return self._post_tonnage_moves([move_vals])
+    
+    def action_view_tonnage_moves(self):
+        """Afficher le registre des mouvements de tonnage de la CV"""
+        self.ensure_one()
+        action = self.env['ir.actions.act_window']._for_xml_id(
+            'potting_management.action_potting_cv_tonnage_move'
+        )
+        action['domain'] = [('confirmation_vente_id', '=', self.id)]
+        action['context'] = {}
+        return action
+    
     # =========================================================================
     # MÉTHODES UTILITAIRES
     # =========================================================================
@@ -686,23 +872,13 @@ class PottingConfirmationVente(models.Model):
             ('tonnage_restant', '>', 0)
         ])
         
-        activity_type = self.env.ref('mail.mail_activity_data_warning', raise_if_not_found=False)
-        if not activity_type:
-            return
-        
-        for cv in cvs_expiring:
-            # Vérifier si une activité existe déjà
-            existing_activity = self.env['mail.activity'].search([
-                ('res_model', '=', self._name),
-                ('res_id', '=', cv.id),
-                ('activity_type_id', '=', activity_type.id),
-                ('summary', 'ilike', 'Expiration')
-            ], limit=1)
-            
-            if not existing_activity:
-                cv.activity_schedule(
-                    'mail.mail_activity_data_warning',
-                    date_deadline=cv.date_end,
-                    summary='⚠️ Expiration CV imminente',
-                    note=f'La CV {cv.name} expire le {cv.date_end}. Tonnage restant: {cv.tonnage_restant} T.'
-                )
+        self.env['potting.activity.reminder'].schedule_reminders(
+            cvs_expiring,
+            'mail.mail_activity_data_warning',
+            summary='⚠️ Expiration CV imminente',
+            summary_match='Expiration',
+            note=lambda cv: f'La CV {cv.name} expire le {cv.date_end}. Tonnage restant: {cv.tonnage_restant} T.',
+            date_deadline=lambda cv: cv.date_end,
+            match_activity_type=True,
+            label='expiration CV',
+        )
@@ -1,5 +1,8 @@
 # -*- coding: utf-8 -*-
 
+from bisect import bisect_left, insort
+from collections import defaultdict
+
 from odoo import api, fields, models, _
 from odoo.exceptions import UserError, ValidationError
 
@@ -7,7 +10,8 @@ from odoo.exceptions import UserError, ValidationError
 class PottingContainer(models.Model):
     _name = 'potting.container'
     _description = 'Conteneur'
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['potting.bulk.mixin', 'potting.search.mixin', 'mail.thread', 'mail.activity.mixin']
+    _trigram_search_fields = ['name', 'booking_number']
     _order = 'create_date desc, name'
     _check_company_auto = True
 
@@ -369,56 +373,58 @@ class PottingContainer(models.Model):
 
     def action_release(self):
         """Release container for a new voyage - reset voyage data but keep history"""
-        for container in self:
-            if container.state != 'delivered':
-                raise UserError(_("Seuls les conteneurs livrés peuvent être libérés pour un nouveau voyage."))
+        # Mode groupé : résumé du voyage, changements et libération en un seul message
+        with self._bulk_mode() as containers:
+            for container in containers:
+                if container.state != 'delivered':
+                    raise UserError(_("Seuls les conteneurs livrés peuvent être libérés pour un nouveau voyage."))
             
-            # Sauvegarder le résumé du voyage dans le chatter
-            voyage_summary = _(
-                "🚢 Voyage #%d terminé:\n"
-                "• Navire: %s\n"
-                "• Scellé: %s\n"
-                "• Réservation: %s\n"
-                "• B/L: %s\n"
-                "• Départ: %s → Arrivée: %s\n"
-                "• Trajet: %s → %s\n"
-                "• Tonnage: %.2f T (%d lots)\n"
-                "• Lots: %s"
-            ) % (
-                container.voyage_count + 1,
-                container.vessel_name or '-',
-                container.seal_number or '-',
-                container.booking_number or '-',
-                container.bill_of_lading or '-',
-                container.date_departure or '-',
-                container.date_arrival or '-',
-                container.port_loading or '-',
-                container.port_discharge or '-',
-                container.total_tonnage,
-                container.lot_count,
-                ', '.join(container.lot_ids.mapped('name')) or '-'
-            )
+                # Sauvegarder le résumé du voyage dans le chatter
+                voyage_summary = _(
+                    "🚢 Voyage #%d terminé:\n"
+                    "• Navire: %s\n"
+                    "• Scellé: %s\n"
+                    "• Réservation: %s\n"
+                    "• B/L: %s\n"
+                    "• Départ: %s → Arrivée: %s\n"
+                    "• Trajet: %s → %s\n"
+                    "• Tonnage: %.2f T (%d lots)\n"
+                    "• Lots: %s"
+                ) % (
+                    container.voyage_count + 1,
+                    container.vessel_name or '-',
+                    container.seal_number or '-',
+                    container.booking_number or '-',
+                    container.bill_of_lading or '-',
+                    container.date_departure or '-',
+                    container.date_arrival or '-',
+                    container.port_loading or '-',
+                    container.port_discharge or '-',
+                    container.total_tonnage,
+                    container.lot_count,
+                    ', '.join(container.lot_ids.mapped('name')) or '-'
+                )
             
-            # Réinitialiser pour nouveau voyage (les lots gardent leur container_id pour l'historique)
-            container.write({
-                'state': 'available',
-                'voyage_count': container.voyage_count + 1,
-                'seal_number': False,
-                'vessel_id': False,
-                'booking_number': False,
-                'bill_of_lading': False,
-                'date_potting': False,
-                'date_departure': False,
-                'date_arrival': False,
-                'port_loading': False,
-                'port_discharge': False,
-                'shipping_line': False,
-            })
+                # Réinitialiser pour nouveau voyage (les lots gardent leur container_id pour l'historique)
+                container.write({
+                    'state': 'available',
+                    'voyage_count': container.voyage_count + 1,
+                    'seal_number': False,
+                    'vessel_id': False,
+                    'booking_number': False,
+                    'bill_of_lading': False,
+                    'date_potting': False,
+                    'date_departure': False,
+                    'date_arrival': False,
+                    'port_loading': False,
+                    'port_discharge': False,
+                    'shipping_line': False,
+                })
             
-            container.message_post(body=voyage_summary)
-            container.message_post(body=_(
-                "🔄 Conteneur libéré et disponible pour un nouveau voyage."
-            ))
+                container.message_post(body=voyage_summary)
+                container.message_post(body=_(
+                    "🔄 Conteneur libéré et disponible pour un nouveau voyage."
+                ))
 
     def action_view_lots(self):
         self.ensure_one()
@@ -485,6 +491,169 @@ class PottingContainer(models.Model):
             } for lot in self.lot_ids.sorted('name')],
         }
 
+    # -------------------------------------------------------------------------
+    # PLANIFICATION DU CHARGEMENT
+    # -------------------------------------------------------------------------
+    @api.model
+    def _plan_loading(self, lots, containers):
+        """Répartir des lots dans des conteneurs en minimisant le nombre de conteneurs.
+        
+        Best-fit decreasing : les lots sont placés du plus lourd au plus léger
+        dans le conteneur déjà entamé (même type de produit) qui a le moins de
+        place restante suffisante ; à défaut, le plus grand conteneur vide est
+        ouvert. Les capacités sont suivies en kg entiers dans des listes triées
+        (recherche par dichotomie).
+        
+        :param lots: dicts id / product_type / tonnage
+        :param containers: dicts id / product_type (False si vide) / remaining
+        :return: (liste de tuples (lot_id, container_id), ids des lots non placés)
+        """
+        def kg(tonnage):
+            return int(round((tonnage or 0.0) * 1000))
+        
+        # Conteneurs entamés par type de produit : liste triée (place restante, id)
+        open_bins = defaultdict(list)
+        empty = []
+        for row in containers:
+            remaining = kg(row['remaining'])
+            if remaining <= 0:
+                continue
+            if row['product_type']:
+                insort(open_bins[row['product_type']], (remaining, row['id']))
+            else:
+                empty.append((remaining, row['id']))
+        # Conteneurs vides : les plus grands d'abord
+        empty.sort(key=lambda row: (-row[0], row[1]))
+        next_empty = 0
+        
+        assignments = []
+        unplaced = []
+        for lot in sorted(lots, key=lambda row: (-row['tonnage'], row['id'])):
+            weight = kg(lot['tonnage'])
+            if weight <= 0:
+                unplaced.append(lot['id'])
+                continue
+            bins = open_bins[lot['product_type']]
+            index = bisect_left(bins, (weight, 0))
+            if index < len(bins):
+                remaining, container_id = bins.pop(index)
+            elif next_empty < len(empty) and empty[next_empty][0] >= weight:
+                remaining, container_id = empty[next_empty]
+                next_empty += 1
+            else:
+                unplaced.append(lot['id'])
+                continue
+            assignments.append((lot['id'], container_id))
+            if remaining > weight:
+                insort(bins, (remaining - weight, container_id))
+        return assignments, unplaced
+    
+    @api.model
+    def _estimate_containers_needed(self, lots, container_type):
+        """Nombre de conteneurs neufs d'un type nécessaires pour des lots."""
+        capacity = self.CONTAINER_CAPACITIES.get(container_type, 25.0)
+        assignments, _unplaced = self._plan_loading(lots, [
+            {'id': -index, 'product_type': False, 'remaining': capacity}
+            for index in range(1, len(lots) + 1)
+        ])
+        return len({container_id for _lot_id, container_id in assignments})
+    
+    @api.model
+    def compute_loading_plan(self, lots, containers):
+        """Calculer le plan de chargement de lots prêts dans des conteneurs.
+        
+        Un conteneur déjà chargé garde son type de produit ; les conteneurs
+        contenant déjà plusieurs types de produits sont ignorés.
+        
+        :param lots: recordset potting.lot (seuls les lots prêts sans conteneur sont placés)
+        :param containers: recordset potting.container (disponibles ou en chargement)
+        :return: dict avec 'assignments' [(lot_id, container_id)] et 'unplaced' [lot_id]
+        """
+        lots = lots.filtered(lambda lot: lot.state == 'ready' and not lot.container_id)
+        containers = containers.filtered(lambda c: c.state in ('available', 'loading'))
+        
+        loaded_types = defaultdict(set)
+        for container, product_type in self.env['potting.lot']._read_group(
+            [('container_id', 'in', containers.ids)], ['container_id', 'product_type']
+        ):
+            loaded_types[container.id].add(product_type)
+        
+        container_rows = [{
+            'id': row['id'],
+            'product_type': next(iter(loaded_types[row['id']]), False),
+            'remaining': row['remaining_capacity'],
+        } for row in containers.read(['remaining_capacity'], load=None)
+            if len(loaded_types[row['id']]) <= 1]
+        lot_rows = [{
+            'id': row['id'],
+            'product_type': row['product_type'],
+            'tonnage': row['current_tonnage'],
+        } for row in lots.read(['product_type', 'current_tonnage'], load=None)]
+        
+        assignments, unplaced = self._plan_loading(lot_rows, container_rows)
+        return {'assignments': assignments, 'unplaced': unplaced}
+    
+    @api.model
+    def apply_loading_plan(self, assignments):
+        """Empoter des lots selon un plan de chargement, en écritures groupées.
+        
+        :param assignments: liste de tuples (lot_id, container_id)
+        :return: lots empotés
+        """
+        Lot = self.env['potting.lot']
+        lot_ids_by_container = defaultdict(list)
+        for lot_id, container_id in assignments:
+            lot_ids_by_container[container_id].append(lot_id)
+        lots = Lot.browse([lot_id for lot_id, _container_id in assignments])
+        containers = self.browse(list(lot_ids_by_container))
+        
+        invalid_lots = lots.filtered(lambda lot: lot.state != 'ready' or lot.container_id)
+        if invalid_lots:
+            raise UserError(_(
+                "Les lots suivants ne sont plus prêts pour l'empotage: %s"
+            ) % ', '.join(invalid_lots.mapped('name')))
+        invalid_containers = containers.filtered(lambda c: c.state not in ('available', 'loading'))
+        if invalid_containers:
+            raise UserError(_(
+                "Les conteneurs suivants ne sont pas disponibles pour le chargement: %s"
+            ) % ', '.join(invalid_containers.mapped('name')))
+        tonnage_by_lot = {lot.id: lot.current_tonnage for lot in lots}
+        for container in containers:
+            tonnage = sum(tonnage_by_lot[lot_id] for lot_id in lot_ids_by_container[container.id])
+            if tonnage > container.remaining_capacity * 1.05:  # 5% tolerance
+                raise UserError(_(
+                    "Le plan dépasse la capacité du conteneur %s. "
+                    "Capacité restante: %.2f T, Lots: %.2f T"
+                ) % (container.name, container.remaining_capacity, tonnage))
+        
+        # Mode groupé : un message par conteneur et un message agrégé par OT
+        now = fields.Datetime.now()
+        container_names = {container.id: container.name for container in containers}
+        with lots._bulk_mode() as bulk_lots:
+            to_start = containers.with_env(bulk_lots.env).filtered(lambda c: c.state == 'available')
+            if to_start:
+                to_start.write({'state': 'loading', 'date_potting': now})
+                to_start._bulk_log({container.id: _("Chargement démarré.") for container in to_start})
+            
+            for container_id, lot_ids in lot_ids_by_container.items():
+                bulk_lots.browse(lot_ids).write({
+                    'container_id': container_id,
+                    'date_potted': now,
+                    'potted_by_id': self.env.user.id,
+                    'state': 'potted',
+                })
+            bulk_lots._bulk_log({
+                lot_id: _("Lot empoté dans le conteneur %s par %s.") % (container_names[container_id], self.env.user.name)
+                for lot_id, container_id in assignments
+            })
+            
+            # OT dont tous les lots sont empotés
+            bulk_lots.transit_order_id.filtered(
+                lambda order: order.state == 'in_progress'
+                and all(lot.state == 'potted' for lot in order.lot_ids)
+            ).action_mark_ready()
+        return lots
+
     @api.model
     def get_available_containers(self, container_type=None):
         """Get available containers for loading"""
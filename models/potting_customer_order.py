@@ -16,7 +16,7 @@ class PottingCustomerOrder(models.Model):
     """
     _name = 'potting.customer.order'
     _description = 'Contrat / Commande Client'
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['potting.bulk.mixin', 'mail.thread', 'mail.activity.mixin']
     _order = 'create_date desc'
     _check_company_auto = True
 
@@ -580,6 +580,17 @@ class PottingCustomerOrder(models.Model):
                 vals['contract_number'] = self.env['ir.sequence'].next_by_code('potting.contract') or False
         return super().create(vals_list)
 
+    def write(self, vals):
+        res = super().write(vals)
+        if 'contract_tonnage' in vals or 'state' in vals:
+            # Répercuter le tonnage des contrats sur le registre des CV liées
+            self._get_confirmation_ventes()._sync_tonnage_ledger()
+        return res
+
+    def _get_confirmation_ventes(self):
+        """CV liées à ces contrats (une requête sur la table de relation)."""
+        return self.env['potting.confirmation.vente'].search([('customer_order_ids', 'in', self.ids)])
+
     def copy(self, default=None):
         self.ensure_one()
         default = dict(default or {})
@@ -607,7 +618,10 @@ class PottingCustomerOrder(models.Model):
                         "Impossible de supprimer la commande '%s': "
                         "l'OT '%s' a des lots avec de la production."
                     ) % (order.name, ot.name))
-        return super().unlink()
+        confirmation_ventes = self._get_confirmation_ventes()
+        res = super().unlink()
+        confirmation_ventes._sync_tonnage_ledger()
+        return res
 
     # -------------------------------------------------------------------------
     # COMPUTE METHODS - STATISTIQUES
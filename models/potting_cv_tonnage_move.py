@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+Registre des mouvements de tonnage des Confirmations de Vente (CV)
+Module: potting_management
+
+Registre en ajout seul : chaque autorisation, allocation à un contrat,
+libération ou report entre CV crée un mouvement portant le solde courant
+de la CV. Le tonnage restant d'une CV se lit sur son dernier mouvement,
+sans re-sommer les contrats liés.
+"""
+
+import logging
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+from odoo.tools import float_is_zero, float_round
+
+_logger = logging.getLogger(__name__)
+
+# Mouvements qui modifient le tonnage utilisé (contrats liés)
+USAGE_MOVE_TYPES = ('allocate', 'release')
+
+
+class PottingCvTonnageMove(models.Model):
+    """Mouvement de tonnage d'une Confirmation de Vente"""
+    _name = 'potting.cv.tonnage.move'
+    _description = 'Mouvement de tonnage CV'
+    _order = 'confirmation_vente_id, sequence desc'
+    _rec_name = 'confirmation_vente_id'
+
+    _sql_constraints = [
+        ('cv_sequence_uniq', 'unique(confirmation_vente_id, sequence)',
+         'Le numéro de mouvement doit être unique par CV !'),
+    ]
+
+    confirmation_vente_id = fields.Many2one(
+        'potting.confirmation.vente',
+        string="CV",
+        required=True,
+        readonly=True,
+        ondelete='cascade',
+        index=True
+    )
+
+    sequence = fields.Integer(
+        string="N° mouvement",
+        required=True,
+        readonly=True,
+        help="Numéro d'ordre du mouvement dans le registre de la CV"
+    )
+
+    date = fields.Datetime(
+        string="Date",
+        required=True,
+        readonly=True,
+        default=fields.Datetime.now
+    )
+
+    move_type = fields.Selection([
+        ('authorize', 'Autorisation'),
+        ('adjust', 'Ajustement'),
+        ('allocate', 'Allocation contrat'),
+        ('release', 'Libération contrat'),
+        ('transfer_out', 'Report sortant'),
+        ('transfer_in', 'Report entrant'),
+    ], string="Type", required=True, readonly=True, index=True)
+
+    quantity = fields.Float(
+        string="Mouvement (T)",
+        required=True,
+        readonly=True,
+        digits='Product Unit of Measure',
+        help="Effet sur le tonnage disponible (positif = tonnage ajouté)"
+    )
+
+    balance = fields.Float(
+        string="Solde disponible (T)",
+        readonly=True,
+        digits='Product Unit of Measure',
+        help="Tonnage disponible sur la CV après ce mouvement"
+    )
+
+    used_balance = fields.Float(
+        string="Solde utilisé (T)",
+        readonly=True,
+        digits='Product Unit of Measure',
+        help="Tonnage consommé par les contrats après ce mouvement"
+    )
+
+    customer_order_id = fields.Many2one(
+        'potting.customer.order',
+        string="Contrat",
+        readonly=True,
+        ondelete='set null',
+        index=True
+    )
+
+    counterpart_cv_id = fields.Many2one(
+        'potting.confirmation.vente',
+        string="CV contrepartie",
+        readonly=True,
+        ondelete='set null',
+        help="CV source ou destination d'un report de tonnage"
+    )
+
+    note = fields.Char(
+        string="Motif",
+        readonly=True
+    )
+
+    user_id = fields.Many2one(
+        'res.users',
+        string="Utilisateur",
+        readonly=True,
+        default=lambda self: self.env.user
+    )
+
+    company_id = fields.Many2one(
+        'res.company',
+        string="Société",
+        related='confirmation_vente_id.company_id',
+        store=True
+    )
+
+    # =========================================================================
+    # REGISTRE EN AJOUT SEUL
+    # =========================================================================
+
+    def write(self, vals):
+        raise UserError(_("Les mouvements de tonnage CV ne peuvent pas être modifiés."))
+
+    def unlink(self):
+        raise UserError(_("Les mouvements de tonnage CV ne peuvent pas être supprimés."))
+
+    # =========================================================================
+    # ÉCRITURE DES MOUVEMENTS
+    # =========================================================================
+
+    @api.model
+    def _lock_cvs(self, cv_ids):
+        """Verrouiller les lignes des CV concernées (ordre des ids : pas d'interblocage)."""
+        if cv_ids:
+            self.env.cr.execute(
+                "SELECT id FROM potting_confirmation_vente WHERE id = ANY(%s) ORDER BY id FOR UPDATE",
+                [sorted(cv_ids)],
+            )
+
+    @api.model
+    def _get_last_balances(self, cv_ids):
+        """Dernier mouvement de chaque CV (une requête, index unique CV/numéro).
+
+        :return: dict {cv_id: (sequence, solde disponible, solde utilisé)}
+        """
+        if not cv_ids:
+            return {}
+        self.flush_model(['confirmation_vente_id', 'sequence', 'balance', 'used_balance'])
+        self.env.cr.execute("""
+            SELECT DISTINCT ON (confirmation_vente_id)
+                   confirmation_vente_id, sequence, balance, used_balance
+              FROM potting_cv_tonnage_move
+             WHERE confirmation_vente_id = ANY(%s)
+          ORDER BY confirmation_vente_id, sequence DESC
+        """, [list(cv_ids)])
+        return {cv_id: (sequence, balance, used) for cv_id, sequence, balance, used in self.env.cr.fetchall()}
+
+    @api.model
+    def _post(self, vals_list):
+        """Enregistrer des mouvements en calculant le solde courant de chaque CV.
+
+        Les CV concernées sont verrouillées, le dernier solde est lu une fois
+        pour toutes, puis les mouvements sont créés en un seul appel.
+
+        :param vals_list: valeurs (confirmation_vente_id, move_type, quantity, ...)
+        :return: mouvements créés
+        """
+        vals_list = [
+            vals for vals in vals_list
+            if not float_is_zero(vals['quantity'], precision_digits=3)
+        ]
+        if not vals_list:
+            return self.browse()
+        cv_ids = {vals['confirmation_vente_id'] for vals in vals_list}
+        self._lock_cvs(cv_ids)
+        last = self._get_last_balances(cv_ids)
+
+        for vals in vals_list:
+            cv_id = vals['confirmation_vente_id']
+            sequence, balance, used = last.get(cv_id, (0, 0.0, 0.0))
+            quantity = float_round(vals['quantity'], precision_digits=3)
+            balance = float_round(balance + quantity, precision_digits=3)
+            if vals['move_type'] in USAGE_MOVE_TYPES:
+                used = float_round(used - quantity, precision_digits=3)
+            vals.update(sequence=sequence + 1, quantity=quantity, balance=balance, used_balance=used)
+            last[cv_id] = (sequence + 1, balance, used)
+
+        moves = self.sudo().create(vals_list)
+        _logger.debug("Registre tonnage CV: %d mouvement(s) sur %d CV", len(moves), len(cv_ids))
+        return moves
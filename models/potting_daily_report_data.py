@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+Fournisseur de données du rapport quotidien OT
+Module: potting_management
+
+Construit en une seule passe les lignes OT/lots et les statistiques du
+rapport quotidien à partir de quelques lectures SQL restreintes aux
+colonnes utiles (OT, lots, conteneurs, certifications, partenaires).
+
+Utilisé par :
+- le template QWeb du rapport quotidien (potting.daily.report.wizard)
+- l'email du rapport quotidien
+- l'endpoint mobile /api/v1/potting/reports/summary
+"""
+
+import re
+
+from odoo import api, models
+
+# Numéro OT : partie numérique avant le '/' (ex: 3734/2025-2026-MA)
+OT_NUMBER_PATTERN = re.compile(r'(\d+)/')
+
+# Libellé et poids (kg) de l'unité de conditionnement par type de produit
+REPORT_UNIT_NAMES = {
+    'cocoa_mass': 'Box of liquor',
+    'cocoa_butter': 'Box of butter',
+    'cocoa_cake': 'Big Bag',
+    'cocoa_powder': 'Sac',
+}
+REPORT_UNIT_WEIGHTS_KG = {
+    'cocoa_mass': 25,
+    'cocoa_butter': 25,
+    'cocoa_cake': 1000,
+    'cocoa_powder': 25,
+}
+
+OT_REPORT_FIELDS = [
+    'name', 'product_type', 'state', 'tonnage', 'current_tonnage',
+    'progress_percentage', 'delivery_status', 'delivered_lot_count',
+    'delivered_tonnage', 'remaining_to_deliver_tonnage',
+    'customer_id', 'consignee_id', 'vessel_name', 'booking_number', 'pod',
+]
+LOT_REPORT_FIELDS = [
+    'name', 'transit_order_id', 'contract_number', 'bl_number', 'bl_date',
+    'container_id', 'certification_id', 'destination', 'date_potted',
+    'date_production_end', 'current_tonnage',
+]
+CONTAINER_REPORT_FIELDS = ['name', 'date_arrival', 'date_departure', 'shipping_line']
+
+
+class PottingDailyReportData(models.AbstractModel):
+    """Fournisseur de données pour le rapport quotidien OT.
+
+    Le nombre de requêtes est constant quel que soit le nombre d'OT et de
+    lots : les enregistrements liés sont lus par lots d'identifiants et
+    assemblés en mémoire.
+    """
+    _name = 'potting.daily.report.data'
+    _description = "Données du rapport quotidien OT"
+
+    @api.model
+    def _read_by_id(self, model, ids, field_names):
+        """Lire les colonnes demandées pour un ensemble d'ids, indexées par id."""
+        ids = [i for i in set(ids) if i]
+        if not ids:
+            return {}
+        records = self.env[model].browse(ids).read(field_names, load=None)
+        return {rec['id']: rec for rec in records}
+
+    @api.model
+    def build(self, transit_orders):
+        """Construire les lignes et statistiques du rapport.
+
+        :param transit_orders: recordset potting.transit.order
+        :return: dict avec les clés 'ots' (lignes du rapport, triées par nom),
+                 'stats', 'ot_range' et 'by_customer'
+        """
+        ots = sorted(
+            transit_orders.read(OT_REPORT_FIELDS, load=None),
+            key=lambda o: o['name'],
+        )
+
+        lots = self.env['potting.lot'].search_read(
+            [('transit_order_id', 'in', transit_orders.ids)],
+            LOT_REPORT_FIELDS, order='name', load=None,
+        )
+        containers = self._read_by_id(
+            'potting.container', [lot['container_id'] for lot in lots], CONTAINER_REPORT_FIELDS
+        )
+        certifications = self._read_by_id(
+            'potting.certification', [lot['certification_id'] for lot in lots], ['suffix']
+        )
+        partners = self._read_by_id(
+            'res.partner',
+            [ot['customer_id'] for ot in ots] + [ot['consignee_id'] for ot in ots],
+            ['name', 'parent_id'],
+        )
+        parents = self._read_by_id(
+            'res.partner', [p['parent_id'] for p in partners.values()], ['name']
+        )
+
+        lots_by_ot = {}
+        for lot in lots:
+            lots_by_ot.setdefault(lot['transit_order_id'], []).append(lot)
+
+        stats = {
+            'total_ot': len(ots),
+            'total_tonnage_kg': 0.0,
+            'total_current_kg': 0.0,
+            'avg_progress': 0.0,
+            'in_tc_count': 0,
+            'prod_100_count': 0,
+            'in_prod_count': 0,
+            'partial_delivery_count': 0,
+            'fully_delivered_count': 0,
+            'not_delivered_count': 0,
+        }
+        delivery_counters = {
+            'partial': 'partial_delivery_count',
+            'fully_delivered': 'fully_delivered_count',
+            'not_delivered': 'not_delivered_count',
+        }
+        ot_numbers = []
+        by_customer = {}
+        rows = []
+        progress_sum = 0.0
+
+        for ot in ots:
+            match = OT_NUMBER_PATTERN.search(ot['name'] or '')
+            if match:
+                ot_numbers.append(int(match.group(1)))
+
+            total_kg = ot['tonnage'] * 1000
+            current_kg = ot['current_tonnage'] * 1000
+            progress = (current_kg / total_kg * 100) if total_kg > 0 else 0
+            weight = REPORT_UNIT_WEIGHTS_KG.get(ot['product_type'], 25)
+
+            # Statistiques (même passe que les lignes)
+            stats['total_tonnage_kg'] += total_kg
+            stats['total_current_kg'] += current_kg
+            progress_sum += ot['progress_percentage']
+            if ot['state'] == 'done':
+                stats['in_tc_count'] += 1
+            elif ot['progress_percentage'] >= 100:
+                stats['prod_100_count'] += 1
+            elif ot['state'] != 'cancelled':
+                stats['in_prod_count'] += 1
+            if ot['delivery_status'] in delivery_counters:
+                stats[delivery_counters[ot['delivery_status']]] += 1
+
+            if ot['state'] == 'done':
+                color_status = 'green'  # 100% In TC
+            elif progress >= 100:
+                color_status = 'yellow'  # 100% Production
+            else:
+                color_status = 'red'  # In Production
+
+            customer = partners.get(ot['customer_id'], {})
+            parent = parents.get(customer.get('parent_id'), {})
+            consignee_name = partners.get(ot['consignee_id'], {}).get('name') or ''
+
+            customer_key = customer.get('name') or 'Non défini'
+            if consignee_name:
+                customer_key = f"{customer_key} / {consignee_name}"
+            customer_stats = by_customer.setdefault(customer_key, {'count': 0, 'tonnage': 0})
+            customer_stats['count'] += 1
+            customer_stats['tonnage'] += total_kg
+
+            ot_lots = lots_by_ot.get(ot['id'], [])
+            cert_suffix = ''
+            if ot_lots and ot_lots[0]['certification_id']:
+                cert_suffix = certifications.get(ot_lots[0]['certification_id'], {}).get('suffix') or ''
+
+            lots_data = []
+            for lot in ot_lots:
+                container = containers.get(lot['container_id'], {})
+                lots_data.append({
+                    'name': lot['name'],
+                    'contract_number': lot['contract_number'] or '',
+                    'bl_number': lot['bl_number'] or '',
+                    'bl_date': lot['bl_date'],
+                    'container_number': container.get('name') or '',
+                    'vessel_name': ot['vessel_name'] or '',
+                    'booking_number': ot['booking_number'] or '',
+                    'eta': container.get('date_arrival') or None,
+                    'etd': container.get('date_departure') or None,
+                    'shipping_line': container.get('shipping_line') or '',
+                    'destination': lot['destination'] or ot['pod'] or '',
+                    'date_potted': lot['date_potted'].date() if lot['date_potted'] else None,
+                    'date_production_end': lot['date_production_end'],
+                    'quantity_kg': lot['current_tonnage'] * 1000,
+                })
+
+            rows.append({
+                'ot_number': match.group(1) if match else ot['name'],
+                'name': ot['name'],
+                'customer_name': parent.get('name') or customer.get('name') or '',
+                'consignee_name': consignee_name,
+                'total_kg': total_kg,
+                'total_units': int(total_kg / weight) if weight > 0 else 0,
+                'unit_name': REPORT_UNIT_NAMES.get(ot['product_type'], 'Unités'),
+                'certification': cert_suffix,
+                'progress': progress,
+                'current_kg': current_kg,
+                'color_status': color_status,
+                'lots': lots_data,
+                # Delivery status info
+                'delivery_status': ot['delivery_status'],
+                'is_partial_delivery': ot['delivery_status'] == 'partial',
+                'delivered_lot_count': ot['delivered_lot_count'],
+                'delivered_tonnage_kg': ot['delivered_tonnage'] * 1000,
+                'remaining_to_deliver_kg': ot['remaining_to_deliver_tonnage'] * 1000,
+            })
+
+        if ots:
+            stats['avg_progress'] = progress_sum / len(ots)
+
+        return {
+            'ots': rows,
+            'stats': stats,
+            'ot_range': {'from': min(ot_numbers), 'to': max(ot_numbers)} if ot_numbers else {},
+            'by_customer': sorted(
+                ({'name': name, **values} for name, values in by_customer.items()),
+                key=lambda c: c['tonnage'],
+                reverse=True,
+            ),
+        }
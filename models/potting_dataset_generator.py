@@ -0,0 +1,480 @@
+# -*- coding: utf-8 -*-
+"""
+Générateur de jeu de données à l'échelle d'une campagne
+
+Crée une campagne complète pour reproduire en local les volumes de
+production : clients et destinataires, confirmations de vente, contrats,
+formules (avec leurs taxes), OT, lots, lignes de production, conteneurs,
+BL et factures.
+
+- Déterministe : tous les tirages passent par ``random.Random(seed)`` et les
+  dates partent de ``date_start`` (pas de la date du jour).
+- Créations par paquets (``chunk_size``), suivi et chatter désactivés.
+- Les lignes de production (le gros volume) sont insérées en SQL avec leurs
+  colonnes liées et calculées, puis les totaux des lots et des OT sont
+  recalculés par l'ORM, paquet de lots par paquet de lots.
+
+Depuis un shell Odoo ::
+
+    result = env['potting.dataset.generator'].generate(
+        seed=7, transit_orders=20000, production_lines=1000000,
+    )
+    env.cr.commit()
+
+Le wizard « Générer un jeu de données » (mode développeur, administrateurs)
+appelle la même méthode.
+"""
+
+import logging
+import math
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from odoo import api, models, _
+from odoo.exceptions import UserError
+
+_logger = logging.getLogger(__name__)
+
+GENERATOR_CONTEXT = {
+    'tracking_disable': True,
+    'mail_create_nolog': True,
+    'mail_create_nosubscribe': True,
+    'mail_notrack': True,
+    'potting_defer_invoice': True,
+}
+
+DEFAULT_OPTIONS = {
+    'seed': 42,
+    'date_start': date(2025, 10, 1),
+    'customers': 50,
+    'consignees': 80,
+    'confirmations': 20,
+    'customer_orders': 400,
+    'transit_orders': 2000,
+    'production_lines': 100000,
+    'vessels': 30,
+    # Tonnage d'un OT (T) et tonnage maximum d'un lot (T)
+    'ot_tonnage': (50.0, 500.0),
+    'lot_tonnage': 25.0,
+    # Poids relatifs des types de produit
+    'product_weights': {'cocoa_mass': 5, 'cocoa_butter': 3, 'cocoa_cake': 1, 'cocoa_powder': 1},
+    # Avancement des OT : lots générés, en production, empotés, expédiés (BL confirmé)
+    'stage_weights': {'planned': 1, 'production': 3, 'potted': 2, 'shipped': 4},
+    # Part des BL expédiés facturés (si la comptabilité est configurée)
+    'invoiced_ratio': 0.5,
+    'chunk_size': 2000,
+    'refresh_alerts': True,
+}
+
+SHIFTS = ('morning', 'afternoon', 'night')
+
+# Période de production (jours après date_start), empotage et expédition ensuite
+PRODUCTION_SPAN_DAYS = 180
+POTTING_DAY = 200
+SHIPPING_DAY = 210
+
+
+class PottingDatasetGenerator(models.AbstractModel):
+    """Génération d'une campagne synthétique reproductible"""
+    _name = 'potting.dataset.generator'
+    _description = 'Générateur de jeu de données de campagne'
+
+    @api.model
+    def generate(self, **options):
+        """Générer une campagne complète.
+
+        :param options: surcharges de DEFAULT_OPTIONS (nombres, distributions,
+                        graine, taille des paquets)
+        :return: dict {'campaign': potting.campaign, 'counts': {modèle: nombre},
+                 'duration': secondes}
+        """
+        if not self.env.is_admin():
+            raise UserError(_("Seul un administrateur peut générer un jeu de données."))
+        unknown = set(options) - set(DEFAULT_OPTIONS)
+        if unknown:
+            raise UserError(_("Options inconnues : %s") % ', '.join(sorted(unknown)))
+        opts = dict(DEFAULT_OPTIONS, **options)
+        rng = random.Random(opts['seed'])
+        gen = self.with_context(**GENERATOR_CONTEXT)
+        prefix = 'G%d' % opts['seed']
+        started = time.time()
+
+        campaign = gen._generate_campaign(opts, prefix)
+        partners = gen._generate_partners(opts, prefix)
+        cvs = gen._generate_confirmations(opts, rng, prefix, campaign)
+        vessels = gen._generate_vessels(opts, prefix)
+        orders, plans = gen._generate_orders(opts, rng, prefix, campaign, partners, cvs, vessels)
+        lots = gen._generate_lots(opts, prefix, plans)
+        line_count = gen._generate_production(opts, rng, plans, lots)
+        containers = gen._generate_containers(opts, prefix, plans, lots)
+        notes, invoices = gen._generate_deliveries(opts, rng, plans, lots)
+        if opts['refresh_alerts']:
+            self.env['potting.alert.snapshot'].refresh_all()
+
+        counts = {
+            'res.partner': len(partners['customers']) + len(partners['consignees']),
+            'potting.confirmation.vente': len(cvs),
+            'potting.customer.order': len(orders),
+            'potting.formule': len(plans),
+            'potting.transit.order': len(plans),
+            'potting.lot': len(lots),
+            'potting.production.line': line_count,
+            'potting.container': len(containers),
+            'potting.delivery.note': len(notes),
+            'account.move': len(invoices),
+        }
+        duration = time.time() - started
+        _logger.info("Jeu de données %s généré en %.0fs : %s", prefix, duration, counts)
+        return {'campaign': campaign, 'counts': counts, 'duration': duration}
+
+    # -------------------------------------------------------------------------
+    # OUTILS
+    # -------------------------------------------------------------------------
+    @api.model
+    def _create_chunks(self, model, vals_list, chunk_size):
+        """Créer par paquets et libérer le cache entre deux paquets."""
+        records = self.env[model]
+        for start in range(0, len(vals_list), chunk_size):
+            records |= self.env[model].create(vals_list[start:start + chunk_size])
+            self.env.flush_all()
+            self.env.invalidate_all()
+        return records
+
+    @api.model
+    def _weighted_choice(self, rng, weights):
+        keys = sorted(weights)
+        return rng.choices(keys, weights=[weights[key] for key in keys])[0]
+
+    @api.model
+    def _split_units(self, rng, total, parts):
+        """Répartir total unités en parts lignes d'au moins une unité, avec variation."""
+        parts = max(1, min(parts, total))
+        base, remainder = divmod(total, parts)
+        units = [base + (1 if index < remainder else 0) for index in range(parts)]
+        for index in range(parts - 1):
+            shift = rng.randint(0, (units[index + 1] - 1) // 5) if units[index + 1] > 1 else 0
+            units[index] += shift
+            units[index + 1] -= shift
+        return units
+
+    # -------------------------------------------------------------------------
+    # RÉFÉRENTIELS
+    # -------------------------------------------------------------------------
+    @api.model
+    def _generate_campaign(self, opts, prefix):
+        start = opts['date_start']
+        return self.env['potting.campaign'].create({
+            'name': _('Campagne %s %d-%d') % (prefix, start.year, start.year + 1),
+            'code': prefix,
+            'date_start': start,
+            'date_end': start + timedelta(days=364),
+            'state': 'active',
+        })
+
+    @api.model
+    def _generate_partners(self, opts, prefix):
+        Partner = self.env['res.partner']
+        customers = Partner.create([{
+            'name': '%s CLIENT %04d' % (prefix, index),
+            'is_company': True,
+        } for index in range(opts['customers'])])
+        consignees = Partner.create([{
+            'name': '%s DESTINATAIRE %04d' % (prefix, index),
+            'is_company': True,
+            'is_potting_consignee': True,
+            'potting_consignee_code': '%sD%04d' % (prefix, index),
+        } for index in range(opts['consignees'])])
+        return {'customers': customers, 'consignees': consignees}
+
+    @api.model
+    def _generate_confirmations(self, opts, rng, prefix, campaign):
+        # Tonnage autorisé suffisant pour toutes les formules de la campagne
+        tonnage = opts['transit_orders'] * opts['ot_tonnage'][1] / max(1, opts['confirmations']) * 1.2
+        return self.env['potting.confirmation.vente'].create([{
+            'reference_ccc': '%s-CV-%04d' % (prefix, index),
+            'campaign_id': campaign.id,
+            'date_emission': campaign.date_start,
+            'date_start': campaign.date_start,
+            'date_end': campaign.date_end,
+            'tonnage_autorise': tonnage,
+            'prix_tonnage': rng.randrange(1300000, 1900000, 10000),
+            'product_type': 'all',
+            'state': 'active',
+        } for index in range(opts['confirmations'])])
+
+    @api.model
+    def _generate_vessels(self, opts, prefix):
+        return self.env['potting.vessel'].create([{
+            'name': '%s NAVIRE %03d' % (prefix, index),
+            'code': '%sV%03d' % (prefix, index),
+        } for index in range(opts['vessels'])])
+
+    # -------------------------------------------------------------------------
+    # CONTRATS, FORMULES ET OT
+    # -------------------------------------------------------------------------
+    @api.model
+    def _generate_orders(self, opts, rng, prefix, campaign, partners, cvs, vessels):
+        """Créer contrats, formules et OT.
+
+        :return: (contrats, plans) où plans est une liste de dicts par OT
+                 (id, tonnage, type de produit, étape d'avancement)
+        """
+        order_types = [self._weighted_choice(rng, opts['product_weights']) for _i in range(opts['customer_orders'])]
+        plans = []
+        for index in range(opts['transit_orders']):
+            order_index = rng.randrange(len(order_types))
+            plans.append({
+                'index': index,
+                'order_index': order_index,
+                'product_type': order_types[order_index],
+                'tonnage': round(rng.uniform(*opts['ot_tonnage']), 3),
+                'stage': self._weighted_choice(rng, opts['stage_weights']),
+                'cv': rng.choice(cvs),
+                'consignee': rng.choice(partners['consignees']),
+                'vessel': rng.choice(vessels),
+            })
+
+        tonnage_by_order = [0.0] * len(order_types)
+        for plan in plans:
+            tonnage_by_order[plan['order_index']] += plan['tonnage']
+        orders = self._create_chunks('potting.customer.order', [{
+            'customer_id': rng.choice(partners['customers']).id,
+            'contract_number': '%s-C%05d' % (prefix, index),
+            'product_type': product_type,
+            'contract_tonnage': tonnage_by_order[index] or 1.0,
+            'unit_price': rng.randrange(2000, 4000, 10),
+            'date_order': campaign.date_start + timedelta(days=rng.randint(0, 60)),
+        } for index, product_type in enumerate(order_types)], opts['chunk_size'])
+
+        formules = self._create_chunks('potting.formule', [{
+            'confirmation_vente_id': plan['cv'].id,
+            'campaign_id': campaign.id,
+            'date_emission': campaign.date_start + timedelta(days=rng.randint(0, 90)),
+            'product_type': plan['product_type'],
+            'prix_tonnage': plan['cv'].prix_tonnage,
+            'prix_kg': plan['cv'].prix_tonnage / 1000,
+            'tonnage': plan['tonnage'],
+            'state': 'validated',
+        } for plan in plans], opts['chunk_size'])
+
+        transit_orders = self._create_chunks('potting.transit.order', [{
+            'formule_id': formule_id,
+            'customer_order_id': orders[plan['order_index']].id,
+            'campaign_id': campaign.id,
+            'consignee_id': plan['consignee'].id,
+            'product_type': plan['product_type'],
+            'tonnage': plan['tonnage'],
+            'vessel_id': plan['vessel'].id,
+            'pod': rng.choice(('Rotterdam', 'Amsterdam', 'Hambourg', 'Anvers', 'Le Havre')),
+        } for formule_id, plan in zip(formules.ids, plans)], opts['chunk_size'])
+        for plan, transit_order_id in zip(plans, transit_orders.ids):
+            plan['id'] = transit_order_id
+        return orders, plans
+
+    @api.model
+    def _generate_lots(self, opts, prefix, plans):
+        """Découper chaque OT en lots de lot_tonnage T au plus (le dernier reçoit le reste)."""
+        vals_list = []
+        for plan in plans:
+            count = math.ceil(plan['tonnage'] / opts['lot_tonnage'])
+            remaining = plan['tonnage']
+            for _i in range(count):
+                target = round(min(opts['lot_tonnage'], remaining), 3)
+                remaining -= target
+                name = '%sL%07d' % (prefix, len(vals_list))
+                vals_list.append({
+                    'name': name,
+                    'base_name': name,
+                    'transit_order_id': plan['id'],
+                    'product_type': plan['product_type'],
+                    'target_tonnage': target,
+                })
+        lots = self._create_chunks('potting.lot', vals_list, opts['chunk_size'])
+
+        states = {'planned': 'lots_generated', 'production': 'in_progress', 'potted': 'in_progress', 'shipped': 'in_progress'}
+        TransitOrder = self.env['potting.transit.order']
+        for stage, state in states.items():
+            TransitOrder.browse([plan['id'] for plan in plans if plan['stage'] == stage]).write({'state': state})
+        return lots
+
+    # -------------------------------------------------------------------------
+    # PRODUCTION
+    # -------------------------------------------------------------------------
+    @api.model
+    def _generate_production(self, opts, rng, plans, lots):
+        """Insérer les lignes de production des lots en production, empotés ou expédiés.
+
+        :return: nombre de lignes insérées
+        """
+        stage_by_order = {plan['id']: plan['stage'] for plan in plans}
+        weights = {key: config['unit_weight'] for key, config in self.env['potting.lot'].PACKAGING_CONFIG.items()}
+        lot_rows = [
+            lot for lot in lots.read(['transit_order_id', 'product_type', 'target_tonnage'], load=None)
+            if stage_by_order[lot['transit_order_id']] != 'planned'
+        ]
+        if not lot_rows:
+            return 0
+        total_tonnage = sum(lot['target_tonnage'] for lot in lot_rows)
+        span = PRODUCTION_SPAN_DAYS
+
+        line_count = 0
+        in_production = []
+        chunk = max(1, opts['chunk_size'] // 2)
+        for start in range(0, len(lot_rows), chunk):
+            rows = []
+            for lot in lot_rows[start:start + chunk]:
+                stage = stage_by_order[lot['transit_order_id']]
+                fill = rng.uniform(0.3, 0.9) if stage == 'production' else rng.uniform(0.98, 1.03)
+                total_units = max(1, round(lot['target_tonnage'] * fill / weights[lot['product_type']]))
+                parts = max(1, round(opts['production_lines'] * lot['target_tonnage'] / total_tonnage))
+                for units in self._split_units(rng, total_units, parts):
+                    rows.append((
+                        lot['id'],
+                        opts['date_start'] + timedelta(days=rng.randint(0, span)),
+                        units,
+                        rng.choice(SHIFTS),
+                        'B%05d' % rng.randint(0, 99999),
+                    ))
+                if stage == 'production':
+                    in_production.append(lot['id'])
+            line_count += self._insert_production_lines(rows)
+            chunk_lots = self.env['potting.lot'].browse([lot['id'] for lot in lot_rows[start:start + chunk]])
+            chunk_lots.invalidate_recordset(['production_line_ids'])
+            chunk_lots.modified(['production_line_ids'])
+            self.env.flush_all()
+            self.env.invalidate_all()
+            _logger.info("Jeu de données : %d lignes de production insérées", line_count)
+
+        Lot = self.env['potting.lot']
+        for start in range(0, len(in_production), opts['chunk_size']):
+            Lot.browse(in_production[start:start + opts['chunk_size']]).write({'state': 'in_production'})
+        return line_count
+
+    @api.model
+    def _insert_production_lines(self, rows):
+        """Insérer des lignes de production avec leurs colonnes liées et calculées.
+
+        :param rows: liste de tuples (lot_id, date, unités, équipe, batch)
+        :return: nombre de lignes insérées
+        """
+        if not rows:
+            return 0
+        lot_ids, dates, units, shifts, batches = (list(column) for column in zip(*rows))
+        self.env.cr.execute("""
+            INSERT INTO potting_production_line (
+                lot_id, transit_order_id, customer_order_id, product_type,
+                packaging_unit_name, packaging_unit_weight, packaging_unit_weight_kg,
+                date, units_produced, tonnage, tonnage_kg, shift, batch_number,
+                operator_id, quality_ok, company_id,
+                create_uid, create_date, write_uid, write_date
+            )
+            SELECT l.id, l.transit_order_id, l.customer_order_id, l.product_type,
+                   l.packaging_unit_name, l.packaging_unit_weight, l.packaging_unit_weight_kg,
+                   v.date, v.units, v.units * l.packaging_unit_weight, v.units * l.packaging_unit_weight * 1000,
+                   v.shift, v.batch_number,
+                   %s, true, l.company_id,
+                   %s, now() at time zone 'UTC', %s, now() at time zone 'UTC'
+              FROM unnest(%s::int[], %s::date[], %s::int[], %s::varchar[], %s::varchar[])
+                       AS v(lot_id, date, units, shift, batch_number)
+              JOIN potting_lot l ON l.id = v.lot_id
+        """, [self.env.uid, self.env.uid, self.env.uid, lot_ids, dates, units, shifts, batches])
+        return self.env.cr.rowcount
+
+    # -------------------------------------------------------------------------
+    # EMPOTAGE ET EXPÉDITION
+    # -------------------------------------------------------------------------
+    @api.model
+    def _generate_containers(self, opts, prefix, plans, lots):
+        """Empoter les lots des OT empotés ou expédiés dans des conteneurs 20'."""
+        stage_by_order = {plan['id']: plan['stage'] for plan in plans}
+        capacity = self.env['potting.container'].CONTAINER_CAPACITIES['20']
+        groups = []
+        current_order, load = None, capacity
+        for lot in lots.read(['transit_order_id', 'target_tonnage'], load=None):
+            stage = stage_by_order[lot['transit_order_id']]
+            if stage not in ('potted', 'shipped'):
+                continue
+            if lot['transit_order_id'] != current_order or load + lot['target_tonnage'] > capacity:
+                groups.append({'stage': stage, 'lot_ids': []})
+                current_order, load = lot['transit_order_id'], 0.0
+            groups[-1]['lot_ids'].append(lot['id'])
+            load += lot['target_tonnage']
+        if not groups:
+            return self.env['potting.container']
+
+        containers = self._create_chunks('potting.container', [{
+            'name': '%sU%07d' % (prefix[:3].ljust(3, 'X'), index),
+            'container_type': '20',
+            'state': 'shipped' if group['stage'] == 'shipped' else 'loaded',
+        } for index, group in enumerate(groups)], opts['chunk_size'])
+
+        container_by_lot = {
+            lot_id: container_id
+            for container_id, group in zip(containers.ids, groups)
+            for lot_id in group['lot_ids']
+        }
+        self._pot_lots(container_by_lot, datetime.combine(opts['date_start'] + timedelta(days=POTTING_DAY), datetime.min.time()))
+        return containers
+
+    @api.model
+    def _pot_lots(self, container_by_lot, potted_at):
+        """Empoter en une écriture SQL : conteneur, état et date d'empotage des lots.
+
+        :param container_by_lot: dict {lot_id: container_id}
+        """
+        lots = self.env['potting.lot'].browse(list(container_by_lot))
+        fnames = ['container_id', 'state', 'date_potted']
+        lots.flush_recordset(fnames)
+        lots.modified(fnames, before=True)
+        self.env.cr.execute("""
+            UPDATE potting_lot l
+               SET container_id = v.container_id,
+                   state = 'potted',
+                   date_potted = %s,
+                   write_uid = %s,
+                   write_date = (now() at time zone 'UTC')
+              FROM unnest(%s::int[], %s::int[]) AS v(lot_id, container_id)
+             WHERE l.id = v.lot_id
+        """, [potted_at, self.env.uid, list(container_by_lot), list(container_by_lot.values())])
+        lots.invalidate_recordset(fnames + ['write_uid', 'write_date'])
+        lots.modified(fnames)
+        self.env.flush_all()
+        self.env.invalidate_all()
+
+    @api.model
+    def _generate_deliveries(self, opts, rng, plans, lots):
+        """Un BL confirmé par OT expédié, facturé pour une part invoiced_ratio.
+
+        :return: (BL, factures)
+        """
+        shipped = {plan['id'] for plan in plans if plan['stage'] == 'shipped'}
+        lot_ids_by_order = {}
+        for lot in lots.read(['transit_order_id'], load=None):
+            if lot['transit_order_id'] in shipped:
+                lot_ids_by_order.setdefault(lot['transit_order_id'], []).append(lot['id'])
+        confirmed_at = datetime.combine(opts['date_start'] + timedelta(days=SHIPPING_DAY), datetime.min.time())
+        notes = self._create_chunks('potting.delivery.note', [{
+            'transit_order_id': order_id,
+            'lot_ids': [(6, 0, lot_ids)],
+            'state': 'confirmed',
+            'date_confirmed': confirmed_at,
+            'confirmed_by_id': self.env.uid,
+        } for order_id, lot_ids in sorted(lot_ids_by_order.items())], opts['chunk_size'])
+
+        if 'account.move' not in self.env or not self.env['account.journal'].search([
+            ('type', '=', 'sale'), ('company_id', '=', self.env.company.id)
+        ], limit=1):
+            return notes, []
+
+        invoices = self.env['account.move']
+        to_invoice = notes.browse([note_id for note_id in notes.ids if rng.random() < opts['invoiced_ratio']])
+        to_invoice.transit_order_id.write({'export_duty_collected': True})
+        TransitOrder = self.env['potting.transit.order']
+        for start in range(0, len(to_invoice), opts['chunk_size']):
+            chunk = to_invoice[start:start + opts['chunk_size']]
+            invoices |= TransitOrder._create_invoices_batch([
+                (note.transit_order_id, note.total_tonnage, note) for note in chunk
+            ])['invoices']
+            self.env.flush_all()
+        return notes, invoices
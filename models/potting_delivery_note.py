@@ -1,15 +1,22 @@
 # -*- coding: utf-8 -*-
 
+import logging
+from collections import defaultdict
+
 from odoo import api, fields, models, _
 from odoo.exceptions import UserError, ValidationError
 
+_logger = logging.getLogger(__name__)
+
 
 class PottingDeliveryNote(models.Model):
     """Bon de Livraison (BL) pour les Ordres de Transit."""
     
     _name = 'potting.delivery.note'
     _description = 'Bon de Livraison'
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['potting.bulk.mixin', 'potting.search.mixin', 'mail.thread', 'mail.activity.mixin']
+    _bulk_parent_field = 'transit_order_id'
+    _trigram_search_fields = ['name', 'bl_number', 'booking_number']
     _order = 'name desc'
     _check_company_auto = True
 
@@ -492,67 +499,75 @@ class PottingDeliveryNote(models.Model):
         records = super().create(vals_list)
         
         # Générer automatiquement la facture de l'OT lors de la création du BL
-        for record in records:
-            record._auto_create_invoice_for_transit_order()
+        # (différée en création groupée, voir create_bulk_delivery_notes)
+        if not self.env.context.get('potting_defer_invoice'):
+            records._auto_create_invoices()
         
         return records
 
-    def _auto_create_invoice_for_transit_order(self):
-        """
-        Génère automatiquement une facture partielle pour le tonnage du BL.
-        Facturation partielle : chaque BL génère sa propre facture pour le tonnage livré.
-        """
-        self.ensure_one()
-        
-        transit_order = self.transit_order_id
-        if not transit_order:
-            return
-        
-        # Vérifier si ce BL a déjà une facture
-        if self.invoice_id:
-            return
-        
-        # Vérifier si l'OT est dans un état permettant la facturation
-        if transit_order.state not in ('ready_validation', 'done', 'in_progress'):
-            return
+    def _auto_create_invoices(self):
+        """Générer en une étape groupée les factures automatiques de BL.
         
-        # Vérifier si les droits d'exportation ont été encaissés
-        if not transit_order.export_duty_collected:
-            self.message_post(body=_(
-                "⚠️ La facture n'a pas été générée car les droits d'exportation "
-                "de l'OT %s n'ont pas encore été encaissés."
-            ) % transit_order.name)
-            return
+        Facturation partielle : chaque BL génère sa propre facture pour le
+        tonnage livré. Si l'étape groupée échoue, les BL sont repris un par
+        un : seuls les BL fautifs restent sans facture. Les BL non facturables
+        sont signalés sur leur chatter.
         
+        :return: BL effectivement facturés
+        """
+        notes = self.filtered(lambda note: note.transit_order_id and not note.invoice_id)
         # Vérifier si le module account est installé
-        if 'account.move' not in self.env:
-            return
+        if not notes or 'account.move' not in self.env:
+            return self.browse()
         
-        # Vérifier qu'il y a du tonnage à facturer
-        if self.total_tonnage <= 0:
-            self.message_post(body=_(
-                "⚠️ Aucune facture générée : le tonnage du BL est de 0."
-            ))
-            return
+        TransitOrder = self.env['potting.transit.order']
+        bodies = {}
+        skipped = []
+        try:
+            with self.env.cr.savepoint():
+                skipped = TransitOrder._create_invoices_batch([
+                    (note.transit_order_id, note.total_tonnage, note) for note in notes
+                ])['skipped']
+        except Exception:
+            _logger.info("Facturation des BL: échec du lot de %d BL, reprise BL par BL", len(notes))
+            for note in notes:
+                try:
+                    with self.env.cr.savepoint():
+                        skipped += TransitOrder._create_invoices_batch([
+                            (note.transit_order_id, note.total_tonnage, note)
+                        ])['skipped']
+                except Exception as e:
+                    bodies[note.id] = _(
+                        "⚠️ Erreur lors de la génération automatique de la facture: %s"
+                    ) % str(e)
         
-        # Vérifier qu'on ne dépasse pas le reste à facturer de l'OT
-        if self.total_tonnage > transit_order.remaining_to_invoice + 0.001:
-            self.message_post(body=_(
-                "⚠️ Le tonnage du BL (%.3f T) dépasse le reste à facturer de l'OT (%.3f T). "
-                "Facture non générée automatiquement."
-            ) % (self.total_tonnage, transit_order.remaining_to_invoice))
-            return
+        bodies.update({
+            note.id: _("⚠️ Facture non générée automatiquement : %s") % reason
+            for _order, note, reason in skipped
+        })
+        invoiced = notes.filtered('invoice_id')
+        bodies.update({
+            note.id: _("✅ Facture %s générée automatiquement pour %.3f T (OT: %s).") % (
+                note.invoice_id.name, note.total_tonnage, note.transit_order_id.name)
+            for note in invoiced
+        })
+        notes._message_log_batch(bodies=bodies)
+        return invoiced
+
+    @api.model
+    def _link_invoices(self, invoice_by_note):
+        """Lier des BL à leur facture, en une écriture par facture.
         
-        try:
-            # Créer la facture partielle pour le tonnage de ce BL
-            transit_order._create_invoice(tonnage=self.total_tonnage, delivery_note=self)
-            self.message_post(body=_(
-                "✅ Facture %s générée automatiquement pour %.3f T (OT: %s)."
-            ) % (self.invoice_id.name, self.total_tonnage, transit_order.name))
-        except Exception as e:
-            self.message_post(body=_(
-                "⚠️ Erreur lors de la génération automatique de la facture: %s"
-            ) % str(e))
+        L'écriture passe par l'ORM pour conserver le suivi (tracking) du
+        champ invoice_id sur le chatter des BL.
+        
+        :param invoice_by_note: dict {delivery_note_id: invoice_id}
+        """
+        note_ids_by_invoice = defaultdict(list)
+        for note_id, invoice_id in invoice_by_note.items():
+            note_ids_by_invoice[invoice_id].append(note_id)
+        for invoice_id, note_ids in note_ids_by_invoice.items():
+            self.browse(note_ids).write({'invoice_id': invoice_id})
 
     def copy(self, default=None):
         self.ensure_one()
@@ -787,3 +802,89 @@ class PottingDeliveryNote(models.Model):
                 'container': lot.container_id.name if lot.container_id else '',
             } for lot in self.lot_ids.sorted('name')],
         }
+
+    # -------------------------------------------------------------------------
+    # CRÉATION GROUPÉE
+    # -------------------------------------------------------------------------
+    @api.model
+    def _get_eligible_lot_ids(self, transit_orders):
+        """Lots empotés des OT qui ne figurent encore sur aucun BL actif.
+        
+        Une seule requête pour tous les OT.
+        
+        :return: dict {transit_order_id: [lot_id, ...]} (lots triés par nom)
+        """
+        self.env['potting.lot'].flush_model(['transit_order_id', 'state', 'name'])
+        self.flush_model(['lot_ids', 'state'])
+        self.env.cr.execute("""
+            SELECT l.transit_order_id, array_agg(l.id ORDER BY l.name)
+              FROM potting_lot l
+             WHERE l.transit_order_id = ANY(%s)
+               AND l.state = 'potted'
+               AND NOT EXISTS (
+                    SELECT 1
+                      FROM potting_delivery_note_lot_rel rel
+                      JOIN potting_delivery_note note ON note.id = rel.delivery_note_id
+                     WHERE rel.lot_id = l.id
+                       AND note.state != 'cancelled'
+               )
+          GROUP BY l.transit_order_id
+        """, [transit_orders.ids])
+        return dict(self.env.cr.fetchall())
+
+    @api.model
+    def create_bulk_delivery_notes(self, transit_orders, values=None, create_invoices=True):
+        """Créer en une fois un BL par OT avec tous ses lots empotés non livrés.
+        
+        Utilisé au départ d'un navire : les lots éligibles sont lus en une
+        requête, tous les BL sont créés en un seul appel à create() et la
+        facturation automatique est faite ensuite en une étape groupée.
+        
+        :param transit_orders: recordset potting.transit.order
+        :param values: valeurs communes des BL (date, BL, transporteur...)
+        :param create_invoices: générer les factures automatiques des BL créés
+        :return: dict avec 'delivery_notes', 'invoiced' et 'skipped' {nom OT: raison}
+        """
+        skipped = {}
+        orders = self.env['potting.transit.order']
+        for order in transit_orders:
+            if order.state in ('in_progress', 'ready_validation', 'done'):
+                orders |= order
+            else:
+                skipped[order.name] = _("OT ni en cours, ni prêt, ni validé")
+        
+        lot_ids_by_order = self._get_eligible_lot_ids(orders) if orders else {}
+        vals_list = []
+        for order in orders:
+            lot_ids = lot_ids_by_order.get(order.id)
+            if not lot_ids:
+                skipped[order.name] = _("Aucun lot empoté à livrer")
+                continue
+            vals = {
+                'transit_order_id': order.id,
+                'lot_ids': [(6, 0, lot_ids)],
+                'contract_number': order.customer_order_id.contract_number or False,
+                'destination': order.pod or False,
+                'port_of_discharge': order.pod or False,
+                'shipping_company_id': order.vessel_id.shipping_company_id.id or False,
+                'company_id': order.company_id.id,
+            }
+            vals.update(values or {})
+            vals_list.append(vals)
+        
+        # Mode groupé : un message récapitulatif par OT (voir potting.bulk.mixin)
+        with self._bulk_mode() as DeliveryNote:
+            notes = DeliveryNote.with_context(potting_defer_invoice=True).create(vals_list)
+            notes._bulk_log({
+                note.id: _("📦 Bon de livraison créé en lot avec %d lot(s) pour un total de %.3f T.") % (
+                    note.lot_count, note.total_tonnage)
+                for note in notes
+            })
+        notes = notes.with_env(self.env)
+        invoiced = notes._auto_create_invoices() if create_invoices and notes else self.browse()
+        
+        return {
+            'delivery_notes': notes,
+            'invoiced': invoiced,
+            'skipped': skipped,
+        }
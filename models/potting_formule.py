@@ -1,8 +1,12 @@
 # -*- coding: utf-8 -*-
 
+from collections import defaultdict
+from datetime import date
+
+from markupsafe import Markup
+
 from odoo import api, fields, models, _
 from odoo.exceptions import UserError, ValidationError
-from datetime import date
 
 
 class PottingFormule(models.Model):
@@ -19,7 +23,7 @@ class PottingFormule(models.Model):
     """
     _name = 'potting.formule'
     _description = 'Formule (FO)'
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['potting.bulk.mixin', 'mail.thread', 'mail.activity.mixin']
     _order = 'date_emission desc, name desc'
     _check_company_auto = True
 
@@ -866,31 +870,16 @@ class PottingFormule(models.Model):
                     'potting.formule'
                 ) or _('Nouveau')
         records = super().create(vals_list)
-        # Charger automatiquement les taxes actives pour chaque nouvelle formule
-        for record in records:
-            record._auto_load_taxes()
+        # Charger automatiquement les taxes actives pour les nouvelles formules
+        records._auto_load_taxes()
         return records
     
     def _auto_load_taxes(self):
         """Charger automatiquement toutes les taxes actives lors de la création"""
-        self.ensure_one()
-        if self.taxe_ids:
-            return  # Ne pas écraser les taxes si déjà présentes (ex: copie)
-        
-        taxe_types = self.env['potting.taxe.type'].search([('active', '=', True)])
-        for taxe_type in taxe_types:
-            self.env['potting.formule.taxe'].create({
-                'formule_id': self.id,
-                'taxe_type_id': taxe_type.id,
-                'name': taxe_type.name,
-                'code': taxe_type.code,
-                'categorie': taxe_type.categorie,
-                'taux_pourcentage': taxe_type.taux_pourcentage,
-                'taux_par_kg': taxe_type.taux_par_kg,
-                'is_preleve': taxe_type.is_preleve_default,
-                'is_apres_vente': taxe_type.is_apres_vente,
-                'sequence': taxe_type.sequence,
-            })
+        # Ne pas écraser les taxes si déjà présentes (ex: copie)
+        formules = self.filtered(lambda f: not f.taxe_ids)
+        if formules:
+            self.env['potting.tax.engine'].create_standard_taxes(formules)
     
     def unlink(self):
         for record in self:
@@ -916,20 +905,11 @@ class PottingFormule(models.Model):
         
         # Mettre à jour l'état en fonction des paiements
         if 'avant_vente_paye' in vals:
-            for record in self:
-                record._update_payment_state()
-        
-        # Synchronisation robuste vers l'OT
-        if sync_producteurs:
-            for record in self:
-                if record.avant_vente_paye:
-                    record._sync_avant_vente_to_ot()
+            self._update_payment_state()
         
-        # Si on vient de lier un OT, vérifier si la formule était déjà payée
-        if 'transit_order_id' in vals and vals['transit_order_id']:
-            for record in self:
-                if record.avant_vente_paye:
-                    record._sync_avant_vente_to_ot()
+        # Synchronisation robuste vers l'OT (ou OT tout juste lié à une formule payée)
+        if sync_producteurs or vals.get('transit_order_id'):
+            self.filtered('avant_vente_paye')._sync_avant_vente_to_ot()
         
         return result
     
@@ -974,14 +954,11 @@ class PottingFormule(models.Model):
         - Le paiement est unique, pas de découpage 60%/40%
         - Le DUS est géré séparément sur l'OT après la vente
         """
-        for record in self:
-            if record.state in ('draft', 'cancelled'):
-                continue
-            if record.avant_vente_paye:
-                # Paiement producteurs effectué = Formule payée
-                record.state = 'paid'
-            else:
-                record.state = 'validated'
+        records = self.filtered(lambda r: r.state not in ('draft', 'cancelled'))
+        # Paiement producteurs effectué = Formule payée
+        paid = records.filtered('avant_vente_paye')
+        paid.filtered(lambda r: r.state != 'paid').write({'state': 'paid'})
+        (records - paid).filtered(lambda r: r.state != 'validated').write({'state': 'validated'})
     
     def action_sync_payment_status(self):
         """Synchroniser le statut de paiement avec les demandes de paiement liées.
@@ -1078,30 +1055,14 @@ class PottingFormule(models.Model):
             raise UserError(_("Les taxes ne peuvent être ajoutées que sur une formule en brouillon."))
         
         # Récupérer tous les types de taxes actifs
-        taxe_types = self.env['potting.taxe.type'].search([('active', '=', True)])
+        engine = self.env['potting.tax.engine']
+        taxe_types = engine._load_tax_types()
         
         if not taxe_types:
             raise UserError(_("Aucun type de taxe prédéfini n'est configuré. "
                             "Veuillez d'abord configurer les types de taxes."))
         
-        existing_codes = self.taxe_ids.mapped('code')
-        taxes_added = 0
-        
-        for taxe_type in taxe_types:
-            if taxe_type.code not in existing_codes:
-                self.env['potting.formule.taxe'].create({
-                    'formule_id': self.id,
-                    'taxe_type_id': taxe_type.id,
-                    'name': taxe_type.name,
-                    'code': taxe_type.code,
-                    'categorie': taxe_type.categorie,
-                    'taux_pourcentage': taxe_type.taux_pourcentage,
-                    'taux_par_kg': taxe_type.taux_par_kg,
-                    'is_preleve': taxe_type.is_preleve_default,
-                    'is_apres_vente': taxe_type.is_apres_vente,
-                    'sequence': taxe_type.sequence,
-                })
-                taxes_added += 1
+        taxes_added = len(engine.create_standard_taxes(self, taxe_types, skip_existing_codes=True))
         
         if taxes_added:
             return {
@@ -1291,49 +1252,69 @@ class PottingFormule(models.Model):
             # Synchronisation robuste avec l'OT lié
             record._sync_avant_vente_to_ot()
     
+    def _link_transit_orders(self, ot_by_formule):
+        """Lier des formules à leurs OT par écritures groupées.
+        
+        Utilisé par la création groupée d'OT : une écriture par OT en mode
+        groupé, le suivi de l'OT lié étant publié en un message par formule.
+        write() rafraîchit les alertes et synchronise les paiements avant-vente
+        déjà effectués.
+        
+        :param ot_by_formule: dict {formule_id: transit_order_id}
+        """
+        formule_ids_by_ot = defaultdict(list)
+        for formule_id, ot_id in ot_by_formule.items():
+            formule_ids_by_ot[ot_id].append(formule_id)
+        with self.browse(list(ot_by_formule))._bulk_mode() as formules:
+            for ot_id, formule_ids in formule_ids_by_ot.items():
+                formules.browse(formule_ids).write({'transit_order_id': ot_id})
+    
     def _sync_avant_vente_to_ot(self):
-        """Synchronise le paiement avant-vente vers l'OT lié de façon robuste.
+        """Synchronise le paiement avant-vente vers les OT liés de façon robuste.
         
         Cette méthode est appelée automatiquement quand avant_vente_paye devient True.
-        Elle peut aussi être appelée manuellement depuis l'OT.
+        Elle peut aussi être appelée manuellement depuis l'OT. Les OT sont mis
+        à jour en écritures groupées, puis chacun reçoit sa notification.
         """
-        self.ensure_one()
-        if not self.transit_order_id:
-            return
-        
-        ot = self.transit_order_id
-        if ot.taxes_paid:
-            # Déjà synchronisé
+        # OT déjà synchronisés ignorés
+        formules = self.filtered(lambda f: f.transit_order_id and not f.transit_order_id.taxes_paid)
+        if not formules:
             return
         
-        # Synchroniser les données
-        update_vals = {
-            'taxes_paid': True,
-            'taxes_payment_date': self.date_paiement_avant_vente or date.today(),
-        }
-        
-        # Lier la demande de paiement si elle existe
-        if self.payment_request_avant_vente_id and not ot.taxes_payment_request_id:
-            update_vals['taxes_payment_request_id'] = self.payment_request_avant_vente_id.id
-        
-        ot.write(update_vals)
+        # Synchroniser les données (une écriture par jeu de valeurs identique)
+        ots_by_vals = defaultdict(lambda: self.env['potting.transit.order'])
+        for formule in formules:
+            ot = formule.transit_order_id
+            update_vals = {
+                'taxes_paid': True,
+                'taxes_payment_date': formule.date_paiement_avant_vente or date.today(),
+            }
+            # Lier la demande de paiement si elle existe
+            if formule.payment_request_avant_vente_id and not ot.taxes_payment_request_id:
+                update_vals['taxes_payment_request_id'] = formule.payment_request_avant_vente_id.id
+            ots_by_vals[tuple(sorted(update_vals.items()))] |= ot
+        for update_vals, ots in ots_by_vals.items():
+            ots.write(dict(update_vals))
         
-        # Mettre à jour l'état de l'OT si nécessaire
-        if ot.state in ('draft', 'formule_linked'):
-            ot.state = 'taxes_paid'
+        # Mettre à jour l'état des OT si nécessaire
+        transit_orders = formules.transit_order_id
+        transit_orders.filtered(lambda ot: ot.state in ('draft', 'formule_linked')).write({
+            'state': 'taxes_paid',
+        })
         
         # Log dans le chatter
-        ot.message_post(
-            body=_("✅ <strong>Taxes payées automatiquement</strong><br/>"
-                   "Synchronisé depuis la Formule <a href=\"#id=%s&model=potting.formule\">%s</a><br/>"
-                   "Montant avant-vente: %s %s") % (
-                self.id, self.name, 
-                '{:,.0f}'.format(self.montant_avant_vente).replace(',', ' '),
-                self.currency_id.symbol or 'FCFA'
-            ),
-            subject=_("Taxes payées"),
-            subtype_xmlid='mail.mt_comment'
-        )
+        for formule in formules:
+            formule.transit_order_id.message_post(
+                body=Markup(_("✅ <strong>Taxes payées automatiquement</strong><br/>"
+                              "Synchronisé depuis la Formule %s<br/>"
+                              "Montant avant-vente: %s %s")) % (
+                    formule._get_html_link(),
+                    '{:,.0f}'.format(formule.montant_avant_vente).replace(',', ' '),
+                    formule.currency_id.symbol or 'FCFA'
+                ),
+                subject=_("Taxes payées"),
+                subtype_xmlid='mail.mt_comment'
+            )
     
     # =========================================================================
     # ACTIONS DE VUE
@@ -1524,27 +1505,13 @@ class PottingFormuleTaxe(models.Model):
     @api.depends('formule_id.montant_brut', 'formule_id.tonnage', 'formule_id.tonnage_kg',
                  'taux_pourcentage', 'taux_par_kg', 'taux', 'montant_unitaire', 'montant_fixe')
     def _compute_montant(self):
-        """Calculer le montant de la taxe selon le type de taux utilisé"""
-        for record in self:
-            montant = 0
-            tonnage_kg = record.formule_id.tonnage_kg or (record.formule_id.tonnage * 1000)
-            
-            if record.montant_fixe:
-                # Montant fixe total (pour soutien/reversement)
-                montant = record.montant_fixe
-            elif record.taux_pourcentage:
-                # Calcul par pourcentage (ex: 5% taxe d'enregistrement)
-                montant = (record.formule_id.montant_brut or 0) * (record.taux_pourcentage / 100)
-            elif record.taux_par_kg:
-                # Calcul par kg (ex: 1.245 FCFA/kg pour CCC)
-                montant = record.taux_par_kg * tonnage_kg
-            elif record.montant_unitaire:
-                # Montant fixe par tonne
-                montant = record.montant_unitaire * (record.formule_id.tonnage or 0)
-            elif record.taux:
-                # Ancien calcul (compatibilité)
-                montant = (record.formule_id.montant_brut or 0) * (record.taux / 100)
-            
+        """Calculer le montant de la taxe selon le type de taux utilisé
+        
+        Toutes les lignes à recalculer le sont en une passe (potting.tax.engine) :
+        montant fixe, puis % du montant brut, FCFA/kg, montant/tonne, ancien taux.
+        """
+        amounts = self.env['potting.tax.engine'].compute_line_amounts(self)
+        for record, montant in zip(self, amounts):
             record.montant = montant
     
     @api.onchange('taxe_type_id')
@@ -6,6 +6,8 @@ Les transitaires sont responsables des opérations d'exportation et peuvent
 recevoir des paiements via le module payment_request_validation.
 """
 
+from collections import defaultdict
+
 from odoo import api, fields, models, _
 from odoo.exceptions import UserError, ValidationError
 
@@ -297,30 +299,46 @@ class PottingForwardingAgent(models.Model):
     
     @api.depends('transit_order_ids', 'transit_order_ids.state')
     def _compute_transit_order_count(self):
+        counts = defaultdict(int)
+        active_counts = defaultdict(int)
+        for agent, state, count in self.env['potting.transit.order']._read_group(
+            [('forwarding_agent_id', 'in', self.ids)], ['forwarding_agent_id', 'state'], ['__count']
+        ):
+            counts[agent.id] += count
+            if state not in ('done', 'cancelled'):
+                active_counts[agent.id] += count
         for agent in self:
-            agent.transit_order_count = len(agent.transit_order_ids)
-            agent.active_transit_order_count = len(
-                agent.transit_order_ids.filtered(lambda o: o.state not in ('done', 'cancelled'))
-            )
+            agent.transit_order_count = counts[agent.id]
+            agent.active_transit_order_count = active_counts[agent.id]
     
-    @api.depends('payment_line_ids', 'payment_line_ids.amount', 'payment_line_ids.state', 'payment_line_ids.payment_type')
+    @api.depends('payment_line_ids', 'payment_line_ids.amount', 'payment_line_ids.state', 'payment_line_ids.payment_type',
+                 'transit_order_ids.state', 'transit_order_ids.forwarding_agent_fee')
     def _compute_payment_stats(self):
-        for agent in self:
-            confirmed_payments = agent.payment_line_ids.filtered(lambda l: l.state == 'confirmed')
-            
-            # Total des avances
-            advances = confirmed_payments.filtered(lambda l: l.payment_type == 'advance')
-            agent.total_advances = sum(advances.mapped('amount'))
-            
-            # Total payé (tous types confondus)
-            agent.total_paid = sum(confirmed_payments.mapped('amount'))
-            
-            # Total facturé (calculé depuis les OT)
-            agent.total_invoiced = sum(
-                agent.transit_order_ids.filtered(
-                    lambda o: o.state in ('in_progress', 'ready_validation', 'done')
-                ).mapped('forwarding_agent_fee')
+        # Paiements confirmés par type (une requête groupée pour tous les transitaires)
+        paid = defaultdict(float)
+        advances = defaultdict(float)
+        for agent, payment_type, amount in self.env['potting.forwarding.agent.payment']._read_group(
+            [('forwarding_agent_id', 'in', self.ids), ('state', '=', 'confirmed')],
+            ['forwarding_agent_id', 'payment_type'], ['amount:sum']
+        ):
+            paid[agent.id] += amount
+            if payment_type == 'advance':
+                advances[agent.id] += amount
+        
+        # Total facturé (frais transitaire enregistrés sur les OT)
+        invoiced = {
+            agent.id: fee
+            for agent, fee in self.env['potting.transit.order']._read_group(
+                [('forwarding_agent_id', 'in', self.ids),
+                 ('state', 'in', ('in_progress', 'ready_validation', 'done'))],
+                ['forwarding_agent_id'], ['forwarding_agent_fee:sum']
             )
+        }
+        
+        for agent in self:
+            agent.total_advances = advances[agent.id]
+            agent.total_paid = paid[agent.id]
+            agent.total_invoiced = invoiced.get(agent.id, 0.0)
             
             # Solde dû
             agent.balance_due = agent.total_invoiced - agent.total_paid
@@ -331,33 +349,49 @@ class PottingForwardingAgent(models.Model):
             else:
                 agent.payment_progress = 0.0
     
+    def _get_invoice_totals(self):
+        """Nombre et montant des factures par transitaire et par état (une requête).
+        
+        :return: dict {(agent_id, state): (nombre, montant)}
+        """
+        return {
+            (agent.id, state): (count, amount)
+            for agent, state, count, amount in self.env['potting.forwarding.agent.invoice']._read_group(
+                [('forwarding_agent_id', 'in', self.ids)],
+                ['forwarding_agent_id', 'state'], ['__count', 'amount_total:sum']
+            )
+        }
+    
     @api.depends('invoice_ids', 'invoice_ids.state', 'invoice_ids.amount_total')
     def _compute_invoice_stats(self):
         """Calcule les statistiques des factures transitaire"""
+        totals = self._get_invoice_totals()
+        counts = defaultdict(int)
+        amounts = defaultdict(float)
+        for (agent_id, state), (count, amount) in totals.items():
+            if state != 'cancelled':
+                counts[agent_id] += count
+                amounts[agent_id] += amount
         for agent in self:
-            invoices = agent.invoice_ids.filtered(lambda i: i.state != 'cancelled')
-            agent.invoice_count = len(invoices)
-            agent.total_invoice_amount = sum(invoices.mapped('amount_total'))
+            agent.invoice_count = counts[agent.id]
+            agent.total_invoice_amount = amounts[agent.id]
             
             # Factures validées mais non payées
-            pending_invoices = invoices.filtered(lambda i: i.state == 'validated')
-            agent.pending_invoice_count = len(pending_invoices)
-            agent.total_pending_invoice_amount = sum(pending_invoices.mapped('amount_total'))
+            pending_count, pending_amount = totals.get((agent.id, 'validated'), (0, 0.0))
+            agent.pending_invoice_count = pending_count
+            agent.total_pending_invoice_amount = pending_amount
     
-    @api.depends('total_paid', 'total_invoiced', 'total_invoice_amount')
+    @api.depends('total_paid', 'invoice_ids.state', 'invoice_ids.amount_total')
     def _compute_refund_amount(self):
         """Calcule le montant à reverser par le transitaire.
         
         Le montant à reverser correspond au trop-perçu:
         - Si le total payé > total des factures validées/payées → reverser la différence
         """
+        totals = self._get_invoice_totals()
         for agent in self:
             # Calculer le montant réellement dû (factures non annulées)
-            total_due = sum(
-                agent.invoice_ids.filtered(
-                    lambda i: i.state in ('validated', 'paid')
-                ).mapped('amount_total')
-            )
+            total_due = sum(totals.get((agent.id, state), (0, 0.0))[1] for state in ('validated', 'paid'))
             
             # Si on a payé plus que ce qui est dû
             if agent.total_paid > total_due:
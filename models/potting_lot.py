@@ -1,13 +1,15 @@
 # -*- coding: utf-8 -*-
 
-from odoo import api, fields, models, _
+from odoo import api, fields, models, tools, _
 from odoo.exceptions import UserError, ValidationError
 
 
 class PottingLot(models.Model):
     _name = 'potting.lot'
     _description = 'Lot'
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['potting.bulk.mixin', 'potting.search.mixin', 'mail.thread', 'mail.activity.mixin']
+    _bulk_parent_field = 'transit_order_id'
+    _trigram_search_fields = ['name']
     _order = 'name'
     _check_company_auto = True
 
@@ -438,6 +440,17 @@ class PottingLot(models.Model):
                     "Un lot empoté doit avoir un conteneur assigné."
                 ))
 
+    # -------------------------------------------------------------------------
+    # INDEX
+    # -------------------------------------------------------------------------
+    def init(self):
+        super().init()
+        # Certifications : lots (empotés) d'une certification
+        tools.create_index(
+            self._cr, 'potting_lot_certification_state_idx',
+            self._table, ['certification_id', 'state'],
+        )
+
     # -------------------------------------------------------------------------
     # COMPUTE METHODS
     # -------------------------------------------------------------------------
@@ -7,8 +7,15 @@ Ce modèle permet à un OT de bénéficier du tonnage de plusieurs contrats
 la somme pondérée des prix des différents contrats utilisés.
 """
 
+import logging
+from collections import defaultdict
+from datetime import date
+
 from odoo import api, fields, models, _
 from odoo.exceptions import UserError, ValidationError
+from odoo.tools import float_compare, float_round
+
+_logger = logging.getLogger(__name__)
 
 
 class PottingOtContractAllocation(models.Model):
@@ -202,17 +209,23 @@ class PottingOtContractAllocation(models.Model):
     # CONTRAINTES
     # =========================================================================
     
+    def _get_allocated_totals(self, group_field, ids):
+        """Tonnage total alloué par contrat ou par OT (une requête groupée)."""
+        return {
+            record.id: tonnage or 0.0
+            for record, tonnage in self._read_group(
+                [(group_field, 'in', list(ids))], [group_field], ['tonnage_alloue:sum']
+            )
+        }
+    
     @api.constrains('tonnage_alloue', 'customer_order_id')
     def _check_tonnage_disponible(self):
         """Vérifie que le tonnage alloué ne dépasse pas le tonnage disponible du contrat"""
+        totals = self._get_allocated_totals('customer_order_id', self.customer_order_id.ids)
         for record in self:
             if record.customer_order_id and record.tonnage_alloue:
                 # Calculer le tonnage déjà alloué de ce contrat (excluant cette allocation)
-                other_allocations = self.search([
-                    ('customer_order_id', '=', record.customer_order_id.id),
-                    ('id', '!=', record.id)
-                ])
-                total_deja_alloue = sum(a.tonnage_alloue for a in other_allocations)
+                total_deja_alloue = totals.get(record.customer_order_id.id, 0.0) - record.tonnage_alloue
                 disponible = record.customer_order_id.contract_tonnage - total_deja_alloue
                 
                 if record.tonnage_alloue > disponible * 1.05:  # Tolérance 5%
@@ -226,13 +239,11 @@ class PottingOtContractAllocation(models.Model):
     @api.constrains('tonnage_alloue', 'transit_order_id')
     def _check_tonnage_ot(self):
         """Vérifie que le total des allocations ne dépasse pas le tonnage de l'OT"""
+        totals = self._get_allocated_totals('transit_order_id', self.transit_order_id.ids)
         for record in self:
             if record.transit_order_id and record.tonnage_alloue:
                 # Calculer le total alloué pour cet OT
-                all_allocations = self.search([
-                    ('transit_order_id', '=', record.transit_order_id.id)
-                ])
-                total_alloue = sum(a.tonnage_alloue for a in all_allocations)
+                total_alloue = totals.get(record.transit_order_id.id, 0.0)
                 
                 if total_alloue > record.transit_order_id.tonnage * 1.05:  # Tolérance 5%
                     raise ValidationError(_(
@@ -270,3 +281,147 @@ class PottingOtContractAllocation(models.Model):
             )
             # Proposer le minimum entre ce qui est disponible et ce qui reste à allouer
             self.tonnage_alloue = min(disponible_contrat, restant_ot)
+
+    # =========================================================================
+    # ALLOCATION AUTOMATIQUE
+    # =========================================================================
+    
+    @api.model
+    def _get_contract_campaigns(self, customer_orders):
+        """Campagne de chaque contrat, déduite de ses OT (une requête groupée).
+        
+        Le contrat n'a pas de campagne propre : il prend celle de ses OT
+        lorsqu'ils appartiennent tous à la même campagne. Un contrat sans OT
+        ou à cheval sur plusieurs campagnes n'en a pas (False).
+        
+        :return: dict {contrat_id: campagne_id ou False}
+        """
+        campaigns = defaultdict(set)
+        for order, campaign in self.env['potting.transit.order']._read_group(
+            [('customer_order_id', 'in', customer_orders.ids), ('state', '!=', 'cancelled')],
+            ['customer_order_id', 'campaign_id'],
+        ):
+            campaigns[order.id].add(campaign.id)
+        return {
+            order_id: next(iter(ids)) if len(ids) == 1 else False
+            for order_id, ids in campaigns.items()
+        }
+    
+    @api.model
+    def _get_solver_inputs(self, transit_orders, customer_orders):
+        """Lire en quelques requêtes les données nécessaires au solveur.
+        
+        :return: (ots, contracts, existing_pairs) où ots et contracts sont des
+                 listes de dicts avec le tonnage restant à allouer
+        """
+        ot_rows = transit_orders.read(['name', 'product_type', 'tonnage', 'campaign_id'], load=None)
+        contract_rows = customer_orders.read(
+            ['name', 'product_type', 'contract_tonnage', 'unit_price', 'date_order'],
+            load=None,
+        )
+        contract_campaigns = self._get_contract_campaigns(customer_orders)
+        for row in contract_rows:
+            row['campaign_id'] = contract_campaigns.get(row['id'], False)
+        
+        ot_allocated = defaultdict(float)
+        existing_pairs = set()
+        for ot, order, tonnage in self._read_group(
+            [('transit_order_id', 'in', transit_orders.ids)],
+            ['transit_order_id', 'customer_order_id'], ['tonnage_alloue:sum'],
+        ):
+            ot_allocated[ot.id] += tonnage or 0.0
+            existing_pairs.add((ot.id, order.id))
+        contract_allocated = self._get_allocated_totals('customer_order_id', customer_orders.ids)
+        
+        for row in ot_rows:
+            row['remaining'] = float_round(row['tonnage'] - ot_allocated[row['id']], precision_digits=3)
+        for row in contract_rows:
+            row['remaining'] = float_round(
+                row['contract_tonnage'] - contract_allocated.get(row['id'], 0.0), precision_digits=3
+            )
+        return ot_rows, contract_rows, existing_pairs
+    
+    @api.model
+    def _solve(self, ots, contracts, existing_pairs=(), price_priority='none', same_campaign=False):
+        """Répartir le tonnage restant des OT sur les contrats (algorithme glouton).
+        
+        Les contrats sont consommés dans l'ordre de priorité (prix, puis date de
+        commande) et les OT sont servis du plus gros au plus petit. Pour chaque
+        groupe (type de produit, campagne éventuelle), un pointeur avance sur
+        la liste des contrats : le coût est linéaire en nombre d'OT + contrats.
+        
+        :param ots: dicts id / product_type / campaign_id / remaining
+        :param contracts: dicts id / product_type / campaign_id / unit_price /
+                          date_order / remaining
+        :param existing_pairs: couples (ot_id, contrat_id) déjà alloués
+        :param price_priority: 'none', 'high' (prix le plus élevé d'abord) ou
+                               'low' (prix le plus bas d'abord)
+        :param same_campaign: n'allouer que des contrats de la campagne de l'OT
+                              (campagne du contrat déduite de ses OT)
+        :return: liste de tuples (ot_id, contrat_id, tonnage)
+        """
+        def group_key(row):
+            return (row['product_type'], row['campaign_id'] if same_campaign else None)
+        
+        def contract_order(row):
+            price = row['unit_price'] or 0.0
+            if price_priority == 'high':
+                price = -price
+            elif price_priority != 'low':
+                price = 0.0
+            return (price, row['date_order'] or date.max, row['id'])
+        
+        contracts_by_key = defaultdict(list)
+        for row in sorted(contracts, key=contract_order):
+            if float_compare(row['remaining'], 0.0, precision_digits=3) > 0:
+                contracts_by_key[group_key(row)].append(row)
+        capacities = {row['id']: row['remaining'] for row in contracts}
+        pointers = defaultdict(int)
+        
+        allocations = []
+        for ot in sorted(ots, key=lambda row: (-row['remaining'], row['id'])):
+            key = group_key(ot)
+            candidates = contracts_by_key.get(key, [])
+            need = ot['remaining']
+            index = pointers[key]
+            while float_compare(need, 0.0, precision_digits=3) > 0 and index < len(candidates):
+                contract_id = candidates[index]['id']
+                capacity = capacities[contract_id]
+                if float_compare(capacity, 0.0, precision_digits=3) <= 0 \
+                        or (ot['id'], contract_id) in existing_pairs:
+                    index += 1
+                    continue
+                tonnage = float_round(min(need, capacity), precision_digits=3)
+                allocations.append((ot['id'], contract_id, tonnage))
+                capacities[contract_id] = float_round(capacity - tonnage, precision_digits=3)
+                need = float_round(need - tonnage, precision_digits=3)
+            # Contrats épuisés : les OT suivants repartent du premier contrat disponible
+            while pointers[key] < len(candidates) and float_compare(
+                capacities[candidates[pointers[key]]['id']], 0.0, precision_digits=3
+            ) <= 0:
+                pointers[key] += 1
+        return allocations
+    
+    @api.model
+    def compute_allocations(self, transit_orders, customer_orders, price_priority='none', same_campaign=False):
+        """Calculer (sans écrire) la répartition des OT sur les contrats.
+        
+        :return: liste de valeurs pour create(), une par allocation proposée
+        """
+        ots, contracts, existing_pairs = self._get_solver_inputs(transit_orders, customer_orders)
+        solution = self._solve(ots, contracts, existing_pairs, price_priority, same_campaign)
+        return [{
+            'transit_order_id': ot_id,
+            'customer_order_id': contract_id,
+            'tonnage_alloue': tonnage,
+        } for ot_id, contract_id, tonnage in solution]
+    
+    @api.model
+    def create_allocations(self, vals_list):
+        """Créer les allocations en un seul appel (contraintes vérifiées en agrégé)."""
+        allocations = self.with_context(mail_create_nolog=True).create(vals_list)
+        _logger.info(
+            "Allocation automatique: %d allocation(s) créée(s) pour %d OT",
+            len(allocations), len(allocations.transit_order_id)
+        )
+        return allocations
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-from odoo import api, fields, models, _
+from odoo import api, fields, models, tools, _
 from odoo.exceptions import UserError, ValidationError
 
 
@@ -14,8 +14,13 @@ class PottingProductionLine(models.Model):
     _sql_constraints = [
         ('units_produced_positive', 'CHECK(units_produced > 0)', 
          'Le nombre d\'unités produites doit être supérieur à 0!'),
+        ('idempotency_key_uniq', 'unique(idempotency_key)',
+         'Cette clé d\'idempotence a déjà été utilisée pour une autre production!'),
     ]
 
+    # Taille maximale d'un lot d'ingestion (terminal, balance)
+    INGEST_MAX_ROWS = 1000
+
     lot_id = fields.Many2one(
         'potting.lot',
         string="Lot",
@@ -128,6 +133,14 @@ class PottingProductionLine(models.Model):
     
     note = fields.Text(string="Notes")
     
+    idempotency_key = fields.Char(
+        string="Clé d'idempotence",
+        readonly=True,
+        copy=False,
+        help="Clé fournie par le terminal ou la balance lors de l'ingestion groupée. "
+             "Garantit qu'une ligne renvoyée après une coupure réseau n'est créée qu'une fois."
+    )
+    
     company_id = fields.Many2one(
         'res.company',
         string="Société",
@@ -143,22 +156,33 @@ class PottingProductionLine(models.Model):
         digits=(5, 2)
     )
 
+    # -------------------------------------------------------------------------
+    # INDEX
+    # -------------------------------------------------------------------------
+    def init(self):
+        super().init()
+        # Historique d'un lot par date (ordre 'date desc')
+        tools.create_index(
+            self._cr, 'potting_production_line_lot_date_idx',
+            self._table, ['lot_id', 'date'],
+        )
+
     # -------------------------------------------------------------------------
     # CONSTRAINTS
     # -------------------------------------------------------------------------
     @api.constrains('units_produced')
     def _check_units_produced(self):
         """Validation du nombre d'unités produites"""
+        # Vérifier la limite max en tonnage (configurable)
+        max_production = float(
+            self.env['ir.config_parameter'].sudo().get_param(
+                'potting_management.max_daily_production', '10.0'
+            )
+        )
         for line in self:
             if line.units_produced <= 0:
                 raise ValidationError(_("Le nombre d'unités produites doit être supérieur à 0."))
             
-            # Vérifier la limite max en tonnage (configurable)
-            max_production = float(
-                self.env['ir.config_parameter'].sudo().get_param(
-                    'potting_management.max_daily_production', '10.0'
-                )
-            )
             if line.tonnage > max_production:
                 max_units = int(max_production / line.packaging_unit_weight) if line.packaging_unit_weight else 0
                 raise ValidationError(
@@ -176,21 +200,25 @@ class PottingProductionLine(models.Model):
 
     @api.constrains('lot_id', 'units_produced')
     def _check_lot_capacity(self):
-        """Vérifier que la production ne dépasse pas la capacité du lot"""
-        for line in self:
-            lot = line.lot_id
-            # Calculer le tonnage total sans cette ligne
-            other_tonnage = sum(lot.production_line_ids.filtered(lambda l: l.id != line.id).mapped('tonnage'))
-            total = other_tonnage + line.tonnage
+        """Vérifier que la production ne dépasse pas la capacité du lot.
+        
+        Le contrôle est fait une seule fois par lot : les lignes créées
+        ensemble (ingestion groupée) sont déjà incluses dans production_line_ids.
+        """
+        for lot in self.mapped('lot_id'):
+            lines = self.filtered(lambda l: l.lot_id == lot)
+            total = sum(lot.production_line_ids.mapped('tonnage'))
             
             # Tolérance de 110% de la capacité
             if total > lot.target_tonnage * 1.1:
-                max_units_remaining = int((lot.target_tonnage * 1.1 - other_tonnage) / line.packaging_unit_weight) if line.packaging_unit_weight else 0
+                other_tonnage = total - sum(lines.mapped('tonnage'))
+                unit_weight = lines[0].packaging_unit_weight
+                max_units_remaining = int((lot.target_tonnage * 1.1 - other_tonnage) / unit_weight) if unit_weight else 0
                 raise ValidationError(_(
                     "Cette production dépasserait la capacité du lot de plus de 10%%.\n"
                     "Capacité: %.2f T, Total après: %.2f T\n"
                     "Maximum %d %s restants pour ce lot."
-                ) % (lot.target_tonnage, total, max_units_remaining, line.packaging_unit_name or 'unités'))
+                ) % (lot.target_tonnage, total, max_units_remaining, lines[0].packaging_unit_name or 'unités'))
 
     # -------------------------------------------------------------------------
     # COMPUTE METHODS
@@ -281,9 +309,11 @@ class PottingProductionLine(models.Model):
     def create(self, vals_list):
         records = super().create(vals_list)
         
-        for record in records:
-            lot = record.lot_id
-            transit_order = record.transit_order_id
+        # Traitement groupé par lot : un seul changement d'état et un seul
+        # message par lot, même pour une ingestion de plusieurs centaines de lignes
+        for lot in records.mapped('lot_id'):
+            lot_lines = records.filtered(lambda l: l.lot_id == lot)
+            transit_order = lot.transit_order_id
             
             # Update lot state to in_production if still in draft
             if lot.state == 'draft':
@@ -294,9 +324,18 @@ class PottingProductionLine(models.Model):
                 transit_order.action_start_production()
             
             # Post message on lot
-            lot.message_post(body=_(
-                "Production ajoutée: %.2f T (Batch: %s, Équipe: %s)"
-            ) % (record.tonnage, record.batch_number or '-', record.shift or '-'))
+            if len(lot_lines) == 1:
+                lot.message_post(body=_(
+                    "Production ajoutée: %.2f T (Batch: %s, Équipe: %s)"
+                ) % (lot_lines.tonnage, lot_lines.batch_number or '-', lot_lines.shift or '-'))
+            else:
+                lot.message_post(body=_(
+                    "%d productions ajoutées: %.2f T (Batchs: %s)"
+                ) % (
+                    len(lot_lines),
+                    sum(lot_lines.mapped('tonnage')),
+                    ', '.join(sorted(set(filter(None, lot_lines.mapped('batch_number'))))) or '-',
+                ))
         
         return records
 
@@ -378,6 +417,197 @@ class PottingProductionLine(models.Model):
         
         return summary
 
+    @api.model
+    def ingest_production_batch(self, rows):
+        """
+        Ingestion groupée de productions envoyées par une balance ou un terminal.
+        
+        Chaque ligne est un dict contenant :
+        - idempotency_key (requis) : clé unique fournie par le client
+        - lot_name (requis) : numéro du lot
+        - units_produced (requis) : nombre d'unités produites
+        - date : date de production (YYYY-MM-DD, défaut: aujourd'hui)
+        - shift : morning / afternoon / night
+        - operator_id ou operator_login : opérateur
+        - batch_number, note : optionnels
+        
+        Les clés déjà ingérées sont ignorées (renvoi sans risque après une
+        coupure réseau). Les lots et opérateurs sont résolus en une requête,
+        un opérateur inconnu ou une ligne au-delà de la production maximale
+        (potting_management.max_daily_production) est une erreur de ligne, la
+        capacité est vérifiée par lot sur l'ensemble des lignes, puis toutes
+        les lignes valides sont créées en un seul appel.
+        
+        :param rows: liste de dicts
+        :return: dict avec les clés 'created', 'duplicates' et 'errors'
+        """
+        if len(rows) > self.INGEST_MAX_ROWS:
+            raise UserError(_(
+                "Trop de lignes dans le lot d'ingestion (%d, maximum %d)."
+            ) % (len(rows), self.INGEST_MAX_ROWS))
+        
+        result = {'created': [], 'duplicates': [], 'errors': []}
+        shifts = dict(self._fields['shift'].selection)
+        today = fields.Date.context_today(self)
+        
+        # 1. Validation unitaire et dédoublonnage dans la requête elle-même
+        candidates = []
+        seen_keys = set()
+        for index, row in enumerate(rows):
+            if not isinstance(row, dict):
+                result['errors'].append({'index': index, 'key': None, 'message': _("Ligne invalide.")})
+                continue
+            key = str(row.get('idempotency_key') or '').strip()
+            if not key:
+                result['errors'].append({'index': index, 'key': None, 'message': _("Clé d'idempotence manquante.")})
+                continue
+            if key in seen_keys:
+                result['duplicates'].append({'index': index, 'key': key, 'id': False})
+                continue
+            seen_keys.add(key)
+            
+            lot_name = str(row.get('lot_name') or '').strip()
+            try:
+                units = int(row.get('units_produced') or 0)
+                prod_date = fields.Date.to_date(row.get('date')) or today
+                operator_id = int(row.get('operator_id') or 0)
+            except (TypeError, ValueError):
+                result['errors'].append({'index': index, 'key': key, 'message': _("Unités, date ou opérateur invalides.")})
+                continue
+            shift = row.get('shift') or 'morning'
+            
+            if not lot_name:
+                message = _("Numéro de lot manquant.")
+            elif units <= 0:
+                message = _("Le nombre d'unités produites doit être supérieur à 0.")
+            elif prod_date > today:
+                message = _("La date de production ne peut pas être dans le futur.")
+            elif shift not in shifts:
+                message = _("Équipe inconnue: %s") % shift
+            else:
+                message = False
+            if message:
+                result['errors'].append({'index': index, 'key': key, 'message': message})
+                continue
+            
+            candidates.append({
+                'index': index,
+                'key': key,
+                'lot_name': lot_name,
+                'units': units,
+                'date': prod_date,
+                'shift': shift,
+                'operator_id': operator_id,
+                'operator_login': row.get('operator_login') or False,
+                'batch_number': row.get('batch_number') or False,
+                'note': row.get('note') or False,
+            })
+        
+        if not candidates:
+            return result
+        
+        # 2. Clés déjà ingérées : une seule requête
+        existing = {
+            rec['idempotency_key']: rec['id']
+            for rec in self.search_read(
+                [('idempotency_key', 'in', [c['key'] for c in candidates])],
+                ['idempotency_key'],
+            )
+        }
+        pending = []
+        for cand in candidates:
+            if cand['key'] in existing:
+                result['duplicates'].append({'index': cand['index'], 'key': cand['key'], 'id': existing[cand['key']]})
+            else:
+                pending.append(cand)
+        
+        # 3. Résolution des lots et des opérateurs : une requête chacun
+        lots = self.env['potting.lot'].search([('name', 'in', list({c['lot_name'] for c in pending}))])
+        lots_by_name = {lot.name: lot for lot in lots}
+        operator_ids = {c['operator_id'] for c in pending if c['operator_id']}
+        logins = {c['operator_login'] for c in pending if c['operator_login'] and not c['operator_id']}
+        users_by_login = {}
+        known_user_ids = set()
+        if operator_ids or logins:
+            for user in self.env['res.users'].sudo().search(
+                ['|', ('id', 'in', list(operator_ids)), ('login', 'in', list(logins))]
+            ):
+                users_by_login[user.login] = user.id
+                known_user_ids.add(user.id)
+        max_production = float(
+            self.env['ir.config_parameter'].sudo().get_param(
+                'potting_management.max_daily_production', '10.0'
+            )
+        )
+        
+        # 4. Contrôles par ligne (lot, opérateur, production maximale)
+        by_lot = {}
+        for cand in pending:
+            lot = lots_by_name.get(cand['lot_name'])
+            if cand['operator_id']:
+                operator_id = cand['operator_id'] if cand['operator_id'] in known_user_ids else False
+            elif cand['operator_login']:
+                operator_id = users_by_login.get(cand['operator_login'], False)
+            else:
+                operator_id = self.env.user.id
+            if not lot:
+                message = _("Lot introuvable: %s") % cand['lot_name']
+            elif lot.state not in ('draft', 'in_production'):
+                message = _("Impossible d'ajouter de la production au lot %s (état: %s).") % (lot.name, lot.state)
+            elif not operator_id:
+                message = _("Opérateur introuvable: %s") % (cand['operator_id'] or cand['operator_login'])
+            elif cand['units'] * lot.packaging_unit_weight > max_production:
+                max_units = int(max_production / lot.packaging_unit_weight) if lot.packaging_unit_weight else 0
+                message = _("Le nombre d'unités produites ne peut pas dépasser %d %s (%.1f tonnes max).") % (
+                    max_units, lot.packaging_unit_name or 'unités', max_production
+                )
+            else:
+                message = False
+            if message:
+                result['errors'].append({'index': cand['index'], 'key': cand['key'], 'message': message})
+                continue
+            cand['operator_id'] = operator_id
+            by_lot.setdefault(lot, []).append(cand)
+        
+        # 5. Contrôle de capacité agrégé par lot
+        
+        vals_list = []
+        accepted = []
+        for lot, lot_cands in by_lot.items():
+            added = sum(c['units'] for c in lot_cands) * lot.packaging_unit_weight
+            if lot.current_tonnage + added > lot.target_tonnage * 1.1:
+                message = _(
+                    "Capacité du lot %s dépassée de plus de 10%% (capacité: %.2f T, actuel: %.2f T, ajout: %.2f T)."
+                ) % (lot.name, lot.target_tonnage, lot.current_tonnage, added)
+                result['errors'].extend(
+                    {'index': c['index'], 'key': c['key'], 'message': message} for c in lot_cands
+                )
+                continue
+            for cand in lot_cands:
+                vals_list.append({
+                    'lot_id': lot.id,
+                    'units_produced': cand['units'],
+                    'date': cand['date'],
+                    'shift': cand['shift'],
+                    'operator_id': cand['operator_id'],
+                    'batch_number': cand['batch_number'],
+                    'note': cand['note'],
+                    'idempotency_key': cand['key'],
+                    'company_id': lot.company_id.id,
+                })
+                accepted.append(cand)
+        
+        # 6. Création groupée (mode groupé : changements d'état des lots agrégés par OT)
+        if vals_list:
+            with lots._bulk_mode() as bulk_lots:
+                lines = self.with_env(bulk_lots.env).create(vals_list)
+            result['created'] = [
+                {'index': cand['index'], 'key': cand['key'], 'id': line.id}
+                for cand, line in zip(accepted, lines)
+            ]
+        
+        return result
+
     def name_get(self):
         result = []
         for line in self:
@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+"""
+Profilage à la demande des actions de wizard et des endpoints API
+
+Quand un utilisateur signale qu'une action est lente (« Générer les OT »,
+rapport quotidien...), le profilage est activé par paramètres système, sans
+redémarrage ni mode développeur :
+
+- ``potting_management.profiling_users`` : logins séparés par des virgules,
+  toutes leurs actions de wizard et requêtes API sont profilées ;
+- ``potting_management.profiling_targets`` : cibles (motifs ``fnmatch``)
+  séparées par des virgules, par exemple
+  ``potting.generate.lots.wizard.action_*,/api/v1/potting/reports/*`` ;
+- ``potting_management.profiling_top_n`` : nombre de fonctions et de
+  requêtes retenues (20 par défaut) ;
+- ``potting_management.profiling_retention_days`` : conservation des
+  profils (30 jours par défaut).
+
+Les méthodes ``action_*`` des wizards ``potting.*`` sont enveloppées au
+chargement du registre ; les routes de ``PottingMobileAPIController`` le sont
+par le décorateur ``profile_endpoint``. Chaque appel profilé enregistre un
+``potting.profile.run`` : profil cProfile (fichier ``.prof`` lisible avec
+``pstats`` ou snakeviz), journal des requêtes SQL les plus lentes, et
+synthèse des fonctions et requêtes les plus coûteuses.
+"""
+
+import base64
+import cProfile
+import fnmatch
+import functools
+import io
+import logging
+import marshal
+import pstats
+import threading
+import time
+from collections import defaultdict
+from datetime import timedelta
+
+from odoo import api, fields, models
+from odoo.tools.profiler import Profiler
+
+_logger = logging.getLogger(__name__)
+
+DEFAULT_TOP_N = 20
+DEFAULT_RETENTION_DAYS = 30
+
+# Un seul profilage à la fois par thread (une action appelant une autre action)
+_profiling = threading.local()
+
+
+def _split_param(value):
+    return [item.strip() for item in (value or '').split(',') if item.strip()]
+
+
+def _profiled_action(target, method):
+    """Envelopper une méthode action_* de wizard dans le profilage à la demande."""
+    @functools.wraps(method)
+    def action(self, *args, **kwargs):
+        return self.env['potting.profile.run']._profile_call(
+            target, 'wizard', self.env.user, method, (self,) + args, kwargs
+        )
+    action._potting_profiled = True
+    return action
+
+
+class PottingProfileRun(models.Model):
+    """Profil d'exécution d'une action de wizard ou d'un endpoint API"""
+    _name = 'potting.profile.run'
+    _description = 'Profil d\'exécution'
+    _order = 'date desc, id desc'
+
+    name = fields.Char(
+        string="Cible",
+        required=True,
+        readonly=True,
+        help="Méthode de wizard (modèle.méthode) ou chemin de l'endpoint API"
+    )
+
+    kind = fields.Selection([
+        ('wizard', 'Action de wizard'),
+        ('api', 'Endpoint API'),
+    ], string="Type", required=True, readonly=True)
+
+    user_id = fields.Many2one(
+        'res.users',
+        string="Utilisateur",
+        readonly=True,
+        ondelete='set null',
+        index=True
+    )
+
+    date = fields.Datetime(
+        string="Date",
+        default=fields.Datetime.now,
+        readonly=True,
+        index=True
+    )
+
+    duration = fields.Float(
+        string="Durée (ms)",
+        readonly=True,
+        digits=(16, 1)
+    )
+
+    query_count = fields.Integer(
+        string="Requêtes SQL",
+        readonly=True
+    )
+
+    query_time = fields.Float(
+        string="Temps SQL (ms)",
+        readonly=True,
+        digits=(16, 1)
+    )
+
+    error = fields.Text(
+        string="Erreur",
+        readonly=True,
+        help="Exception levée par l'appel profilé"
+    )
+
+    profile_file = fields.Binary(
+        string="Profil cProfile",
+        attachment=True,
+        readonly=True
+    )
+
+    profile_filename = fields.Char(string="Nom du profil")
+
+    sql_log_file = fields.Binary(
+        string="Requêtes les plus lentes",
+        attachment=True,
+        readonly=True
+    )
+
+    sql_log_filename = fields.Char(string="Nom du journal SQL")
+
+    line_ids = fields.One2many(
+        'potting.profile.run.line',
+        'run_id',
+        string="Synthèse"
+    )
+
+    function_line_ids = fields.One2many(
+        'potting.profile.run.line',
+        'run_id',
+        string="Fonctions",
+        domain=[('kind', '=', 'function')]
+    )
+
+    query_line_ids = fields.One2many(
+        'potting.profile.run.line',
+        'run_id',
+        string="Requêtes",
+        domain=[('kind', '=', 'query')]
+    )
+
+    # -------------------------------------------------------------------------
+    # ACTIVATION
+    # -------------------------------------------------------------------------
+    def _register_hook(self):
+        """Envelopper les méthodes action_* des wizards potting.* du module."""
+        super()._register_hook()
+        for model_name in list(self.env.registry):
+            ModelClass = self.env.registry[model_name]
+            if not model_name.startswith('potting.') or not ModelClass._transient:
+                continue
+            for attr in dir(ModelClass):
+                method = getattr(ModelClass, attr, None)
+                if (
+                    not attr.startswith('action_')
+                    or not callable(method)
+                    or getattr(method, '_potting_profiled', False)
+                    or not method.__module__.startswith('odoo.addons.potting_management')
+                ):
+                    continue
+                setattr(ModelClass, attr, _profiled_action('%s.%s' % (model_name, attr), method))
+
+    @api.model
+    def _profiling_enabled(self, target, user):
+        """Vrai si la cible ou l'utilisateur est désigné dans les paramètres système."""
+        ICP = self.env['ir.config_parameter'].sudo()
+        if user and user.login in _split_param(ICP.get_param('potting_management.profiling_users')):
+            return True
+        return any(
+            fnmatch.fnmatchcase(target, pattern)
+            for pattern in _split_param(ICP.get_param('potting_management.profiling_targets'))
+        )
+
+    @api.model
+    def _profile_call(self, target, kind, user, func, args, kwargs):
+        """Appeler func(*args, **kwargs), profilé si le profilage est activé pour cet appel.
+
+        Le profil est enregistré dans une transaction séparée : il est conservé
+        même si l'appel échoue et que sa transaction est annulée.
+        """
+        if getattr(_profiling, 'active', False) or not self._profiling_enabled(target, user):
+            return func(*args, **kwargs)
+
+        _profiling.active = True
+        profile = cProfile.Profile()
+        sql_profiler = None
+        error = False
+        started = time.time()
+        try:
+            with Profiler(collectors=['sql'], db=None, description=target) as sql_profiler:
+                profile.enable()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    profile.disable()
+        except Exception as e:
+            error = '%s: %s' % (type(e).__name__, e)
+            raise
+        finally:
+            _profiling.active = False
+            try:
+                self._store_run(target, kind, user, {
+                    'duration': (time.time() - started) * 1000,
+                    'profile': profile,
+                    'queries': sql_profiler.collectors[0].entries if sql_profiler else [],
+                    'error': error,
+                })
+            except Exception:
+                _logger.exception("Profilage : enregistrement du profil de %s impossible", target)
+
+    # -------------------------------------------------------------------------
+    # ENREGISTREMENT
+    # -------------------------------------------------------------------------
+    @api.model
+    def _store_run(self, target, kind, user, result):
+        """Créer le profil dans une transaction séparée."""
+        top_n = int(self.env['ir.config_parameter'].sudo().get_param(
+            'potting_management.profiling_top_n', DEFAULT_TOP_N
+        ) or DEFAULT_TOP_N)
+        queries = result['queries']
+        stamp = fields.Datetime.now().strftime('%Y%m%d_%H%M%S')
+        basename = '%s_%s' % (target.strip('/').replace('/', '_'), stamp)
+        vals = {
+            'name': target,
+            'kind': kind,
+            'user_id': user.id if user else False,
+            'duration': result['duration'],
+            'query_count': len(queries),
+            'query_time': sum(entry['time'] for entry in queries) * 1000,
+            'error': result['error'],
+            'profile_file': base64.b64encode(marshal.dumps(pstats.Stats(result['profile']).stats)),
+            'profile_filename': '%s.prof' % basename,
+            'sql_log_file': base64.b64encode(self._format_sql_log(queries, top_n).encode()),
+            'sql_log_filename': '%s_sql.txt' % basename,
+            'line_ids': [
+                (0, 0, vals) for vals in
+                self._function_lines(result['profile'], top_n) + self._query_lines(queries, top_n)
+            ],
+        }
+        with self.env.registry.cursor() as cr:
+            run = self.env(cr=cr, su=True)['potting.profile.run'].create(vals)
+            _logger.info(
+                "Profilage : %s en %.0f ms, %d requêtes (profil %s)",
+                target, vals['duration'], vals['query_count'], run.id
+            )
+
+    @api.model
+    def _function_lines(self, profile, top_n):
+        """Fonctions les plus coûteuses en temps propre."""
+        stats = pstats.Stats(profile).stats
+        hottest = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)[:top_n]
+        return [{
+            'kind': 'function',
+            'sequence': rank,
+            'name': '%s:%d(%s)' % (filename, lineno, funcname),
+            'calls': calls,
+            'time': own_time * 1000,
+            'cumulative_time': cumulative_time * 1000,
+        } for rank, ((filename, lineno, funcname), (_cc, calls, own_time, cumulative_time, _callers))
+            in enumerate(hottest)]
+
+    @api.model
+    def _query_lines(self, queries, top_n):
+        """Requêtes regroupées par texte (sans paramètres), les plus coûteuses en premier.
+
+        Un nombre d'appels élevé pour une même requête signale un accès N+1.
+        """
+        grouped = defaultdict(lambda: {'calls': 0, 'time': 0.0, 'max': 0.0})
+        for entry in queries:
+            group = grouped[entry['query']]
+            group['calls'] += 1
+            group['time'] += entry['time']
+            group['max'] = max(group['max'], entry['time'])
+        hottest = sorted(grouped.items(), key=lambda item: item[1]['time'], reverse=True)[:top_n]
+        return [{
+            'kind': 'query',
+            'sequence': rank,
+            'name': query,
+            'calls': group['calls'],
+            'time': group['time'] * 1000,
+            'cumulative_time': group['max'] * 1000,
+        } for rank, (query, group) in enumerate(hottest)]
+
+    @api.model
+    def _format_sql_log(self, queries, top_n):
+        """Journal texte des requêtes les plus lentes, avec paramètres et pile d'appel."""
+        out = io.StringIO()
+        slowest = sorted(queries, key=lambda entry: entry['time'], reverse=True)[:top_n]
+        out.write("%d requêtes, %.1f ms au total\n" % (
+            len(queries), sum(entry['time'] for entry in queries) * 1000,
+        ))
+        for rank, entry in enumerate(slowest, 1):
+            out.write("\n#%d - %.1f ms\n%s\n" % (rank, entry['time'] * 1000, entry['full_query']))
+            for filename, lineno, funcname, _line in entry.get('stack', [])[-8:]:
+                out.write("    %s:%d %s\n" % (filename, lineno, funcname))
+        return out.getvalue()
+
+    # -------------------------------------------------------------------------
+    # NETTOYAGE
+    # -------------------------------------------------------------------------
+    @api.autovacuum
+    def _gc_profile_runs(self):
+        """Supprimer les profils plus anciens que la durée de conservation."""
+        days = int(self.env['ir.config_parameter'].sudo().get_param(
+            'potting_management.profiling_retention_days', DEFAULT_RETENTION_DAYS
+        ) or DEFAULT_RETENTION_DAYS)
+        self.sudo().search([('date', '<', fields.Datetime.now() - timedelta(days=days))]).unlink()
+
+
+class PottingProfileRunLine(models.Model):
+    """Fonction ou requête SQL parmi les plus coûteuses d'un profil"""
+    _name = 'potting.profile.run.line'
+    _description = 'Ligne de profil d\'exécution'
+    _order = 'run_id, kind, sequence'
+
+    run_id = fields.Many2one(
+        'potting.profile.run',
+        string="Profil",
+        required=True,
+        ondelete='cascade',
+        index=True
+    )
+
+    kind = fields.Selection([
+        ('function', 'Fonction'),
+        ('query', 'Requête SQL'),
+    ], string="Type", required=True)
+
+    sequence = fields.Integer(string="Rang")
+
+    name = fields.Text(
+        string="Fonction / requête",
+        required=True
+    )
+
+    calls = fields.Integer(string="Appels")
+
+    time = fields.Float(
+        string="Temps (ms)",
+        digits=(16, 2),
+        help="Fonction : temps propre. Requête : temps cumulé de tous les appels."
+    )
+
+    cumulative_time = fields.Float(
+        string="Cumulé / max (ms)",
+        digits=(16, 2),
+        help="Fonction : temps cumulé, appels internes compris. Requête : appel le plus lent."
+    )
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""
+Analyse des exportations (vue matérialisée)
+
+Modèle de reporting en lecture seule (``_auto = False``) adossé à une vue
+matérialisée PostgreSQL. Une ligne par société, campagne, client, type de
+produit et mois, avec les flux du mois :
+
+- OT créés (nombre, tonnage, montant en devise société)
+- production (tonnage des lignes de production)
+- empotage (lots empotés, tonnage, conteneurs)
+- expédition (BL confirmés ou livrés, tonnage)
+- facturation (tonnage et montant HT des lignes produit des factures non
+  annulées, avoirs déduits)
+
+Chaque flux est daté par son propre événement (création de l'OT, date de
+production, date d'empotage, confirmation du BL, date de facture) et
+rattaché aux axes de l'OT. Les vues pivot et graphique agrègent toute la
+campagne en SQL, sans boucle Python.
+
+Rafraîchissement : par cron (toutes les heures) et à l'ouverture du menu
+quand la dernière actualisation date de plus de REFRESH_MAX_AGE minutes.
+``REFRESH MATERIALIZED VIEW CONCURRENTLY`` laisse la vue lisible pendant
+le calcul. La date d'actualisation est gardée dans une table d'une ligne
+(REFRESH_TABLE) et non dans ir.config_parameter, dont l'écriture vide le
+cache du registre de tous les workers.
+"""
+
+import logging
+from datetime import timedelta
+
+from odoo import api, fields, models, tools
+
+_logger = logging.getLogger(__name__)
+
+# Âge maximal (minutes) des données à l'ouverture de l'analyse
+REFRESH_MAX_AGE = 15
+REFRESH_TABLE = 'potting_report_export_analysis_refresh'
+
+
+class PottingReportExportAnalysis(models.Model):
+    """Flux mensuels des OT, lots, production, conteneurs, BL et factures"""
+    _name = 'potting.report.export.analysis'
+    _description = 'Analyse des exportations'
+    _auto = False
+    _rec_name = 'date'
+    _order = 'date desc, campaign_id, customer_id, product_type'
+
+    # -------------------------------------------------------------------------
+    # AXES
+    # -------------------------------------------------------------------------
+    date = fields.Date(string="Mois", readonly=True)
+    campaign_id = fields.Many2one('potting.campaign', string="Campagne", readonly=True)
+    customer_id = fields.Many2one('res.partner', string="Client", readonly=True)
+    product_type = fields.Selection([
+        ('cocoa_mass', 'Masse de cacao'),
+        ('cocoa_butter', 'Beurre de cacao'),
+        ('cocoa_cake', 'Cake (Tourteau) de cacao'),
+        ('cocoa_powder', 'Poudre de cacao'),
+    ], string="Type de produit", readonly=True)
+    company_id = fields.Many2one('res.company', string="Société", readonly=True)
+    currency_id = fields.Many2one('res.currency', string="Devise société", readonly=True)
+
+    # -------------------------------------------------------------------------
+    # MESURES
+    # -------------------------------------------------------------------------
+    ot_count = fields.Integer(string="OT créés", readonly=True)
+    ordered_tonnage = fields.Float(string="Tonnage OT (T)", readonly=True, digits='Product Unit of Measure')
+    ordered_amount = fields.Monetary(string="Montant OT", readonly=True, currency_field='currency_id')
+    produced_tonnage = fields.Float(string="Tonnage produit (T)", readonly=True, digits='Product Unit of Measure')
+    potted_lot_count = fields.Integer(string="Lots empotés", readonly=True)
+    potted_tonnage = fields.Float(string="Tonnage empoté (T)", readonly=True, digits='Product Unit of Measure')
+    container_count = fields.Integer(string="Conteneurs empotés", readonly=True)
+    delivery_note_count = fields.Integer(string="BL confirmés", readonly=True)
+    shipped_tonnage = fields.Float(string="Tonnage expédié (T)", readonly=True, digits='Product Unit of Measure')
+    invoiced_tonnage = fields.Float(string="Tonnage facturé (T)", readonly=True, digits='Product Unit of Measure')
+    invoiced_amount = fields.Monetary(string="Montant facturé HT", readonly=True, currency_field='currency_id')
+
+    # -------------------------------------------------------------------------
+    # VUE
+    # -------------------------------------------------------------------------
+    def _query(self):
+        return """
+            WITH events AS (
+                -- OT créés
+                SELECT o.id AS transit_order_id, o.date_created AS date,
+                       1 AS ot_count, o.tonnage AS ordered_tonnage,
+                       o.total_amount_company_currency AS ordered_amount,
+                       0.0 AS produced_tonnage, 0 AS potted_lot_count, 0.0 AS potted_tonnage,
+                       0 AS container_count, 0 AS delivery_note_count, 0.0 AS shipped_tonnage,
+                       0.0 AS invoiced_tonnage, 0.0 AS invoiced_amount
+                  FROM potting_transit_order o
+                 WHERE o.state != 'cancelled'
+                UNION ALL
+                -- Production
+                SELECT pl.transit_order_id, pl.date,
+                       0, 0.0, 0.0,
+                       pl.tonnage, 0, 0.0,
+                       0, 0, 0.0,
+                       0.0, 0.0
+                  FROM potting_production_line pl
+                UNION ALL
+                -- Lots empotés
+                SELECT l.transit_order_id, l.date_potted::date,
+                       0, 0.0, 0.0,
+                       0.0, 1, l.current_tonnage,
+                       0, 0, 0.0,
+                       0.0, 0.0
+                  FROM potting_lot l
+                 WHERE l.state = 'potted' AND l.date_potted IS NOT NULL
+                UNION ALL
+                -- Conteneurs : un par OT empoté dedans
+                SELECT l.transit_order_id, MIN(l.date_potted)::date,
+                       0, 0.0, 0.0,
+                       0.0, 0, 0.0,
+                       1, 0, 0.0,
+                       0.0, 0.0
+                  FROM potting_lot l
+                 WHERE l.state = 'potted' AND l.container_id IS NOT NULL AND l.date_potted IS NOT NULL
+                 GROUP BY l.transit_order_id, l.container_id
+                UNION ALL
+                -- BL confirmés ou livrés
+                SELECT n.transit_order_id, n.date_confirmed::date,
+                       0, 0.0, 0.0,
+                       0.0, 0, 0.0,
+                       0, 1, n.total_tonnage,
+                       0.0, 0.0
+                  FROM potting_delivery_note n
+                 WHERE n.state IN ('confirmed', 'delivered') AND n.date_confirmed IS NOT NULL
+                UNION ALL
+                -- Factures : ligne produit de chaque OT (factures simples et groupées)
+                SELECT aml.potting_transit_order_id, COALESCE(m.invoice_date, m.date),
+                       0, 0.0, 0.0,
+                       0.0, 0, 0.0,
+                       0, 0, 0.0,
+                       CASE WHEN m.move_type = 'out_refund'
+                            THEN -aml.potting_invoiced_tonnage ELSE aml.potting_invoiced_tonnage END,
+                       -aml.balance
+                  FROM account_move_line aml
+                  JOIN account_move m ON m.id = aml.move_id
+                 WHERE aml.potting_transit_order_id IS NOT NULL
+                   AND m.state != 'cancel'
+                   AND m.move_type IN ('out_invoice', 'out_refund')
+            )
+            SELECT row_number() OVER (
+                       ORDER BY o.company_id, o.campaign_id, o.customer_id, o.product_type,
+                                date_trunc('month', e.date)
+                   ) AS id,
+                   date_trunc('month', e.date)::date AS date,
+                   o.company_id,
+                   c.currency_id,
+                   o.campaign_id,
+                   o.customer_id,
+                   o.product_type,
+                   SUM(e.ot_count) AS ot_count,
+                   SUM(e.ordered_tonnage) AS ordered_tonnage,
+                   SUM(e.ordered_amount) AS ordered_amount,
+                   SUM(e.produced_tonnage) AS produced_tonnage,
+                   SUM(e.potted_lot_count) AS potted_lot_count,
+                   SUM(e.potted_tonnage) AS potted_tonnage,
+                   SUM(e.container_count) AS container_count,
+                   SUM(e.delivery_note_count) AS delivery_note_count,
+                   SUM(e.shipped_tonnage) AS shipped_tonnage,
+                   SUM(e.invoiced_tonnage) AS invoiced_tonnage,
+                   SUM(e.invoiced_amount) AS invoiced_amount
+              FROM events e
+              JOIN potting_transit_order o ON o.id = e.transit_order_id
+              JOIN res_company c ON c.id = o.company_id
+             WHERE e.date IS NOT NULL
+             GROUP BY o.company_id, c.currency_id, o.campaign_id, o.customer_id, o.product_type,
+                      date_trunc('month', e.date)
+        """
+
+    def init(self):
+        tools.drop_view_if_exists(self.env.cr, self._table)
+        self.env.cr.execute("CREATE MATERIALIZED VIEW %s AS (%s)" % (self._table, self._query()))
+        # Index unique requis par REFRESH ... CONCURRENTLY
+        tools.create_unique_index(self.env.cr, '%s_id_uniq' % self._table, self._table, ['id'])
+        tools.create_index(
+            self.env.cr, '%s_campaign_date_idx' % self._table, self._table, ['campaign_id', 'date']
+        )
+        self.env.cr.execute("""
+            CREATE TABLE IF NOT EXISTS %s (
+                id integer PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+                refreshed_at timestamp NOT NULL
+            )
+        """ % REFRESH_TABLE)
+        self._set_refreshed_at()
+
+    # -------------------------------------------------------------------------
+    # RAFRAÎCHISSEMENT
+    # -------------------------------------------------------------------------
+    def _get_refreshed_at(self):
+        self.env.cr.execute("SELECT refreshed_at FROM %s WHERE id = 1" % REFRESH_TABLE)
+        row = self.env.cr.fetchone()
+        return row and row[0]
+
+    def _set_refreshed_at(self, refreshed_at=None):
+        self.env.cr.execute("""
+            INSERT INTO %s (id, refreshed_at) VALUES (1, %%s)
+            ON CONFLICT (id) DO UPDATE SET refreshed_at = EXCLUDED.refreshed_at
+        """ % REFRESH_TABLE, [refreshed_at or fields.Datetime.now()])
+
+    @api.model
+    def _refresh(self, max_age=None):
+        """Recalculer la vue, sauf si elle a moins de max_age minutes.
+
+        :return: True si la vue a été recalculée
+        """
+        if max_age is not None:
+            refreshed_at = self._get_refreshed_at()
+            if refreshed_at and refreshed_at > fields.Datetime.now() - timedelta(minutes=max_age):
+                return False
+        self.env.flush_all()
+        self.env.cr.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY %s" % self._table)
+        self.invalidate_model()
+        self._set_refreshed_at()
+        _logger.info("Analyse des exportations actualisée")
+        return True
+
+    @api.model
+    def _cron_refresh(self):
+        self._refresh()
+
+    @api.model
+    def action_open_analysis(self):
+        """Ouvrir l'analyse, actualisée si les données ont plus de REFRESH_MAX_AGE minutes."""
+        self.sudo()._refresh(max_age=REFRESH_MAX_AGE)
+        return self.env['ir.actions.act_window']._for_xml_id(
+            'potting_management.action_potting_report_export_analysis'
+        )
+
+    @api.model
+    def action_refresh(self):
+        """Actualiser immédiatement puis rouvrir l'analyse."""
+        self.sudo()._refresh()
+        return self.env['ir.actions.act_window']._for_xml_id(
+            'potting_management.action_potting_report_export_analysis'
+        )
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Export XLSX du rapport de production (quotidien ou campagne)
+Module: potting_management
+
+Même jeu de données OT/lots que le rapport quotidien PDF, écrit avec le
+mode write_only d'openpyxl. Les lignes sont lues par paquets depuis un
+curseur PostgreSQL côté serveur (DECLARE / FETCH) : la mémoire reste
+constante quel que soit le nombre de lots exportés.
+"""
+
+import logging
+import re
+
+from odoo import api, models, _
+from odoo.exceptions import UserError
+
+try:
+    import openpyxl
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+_logger = logging.getLogger(__name__)
+
+# Nombre de lignes lues par FETCH sur le curseur serveur
+XLSX_FETCH_SIZE = 2000
+
+# Caractères interdits dans un nom de feuille Excel
+SHEET_TITLE_FORBIDDEN = re.compile(r'[\[\]:*?/\\]')
+
+XLSX_COLUMNS = [
+    # (en-tête, largeur)
+    ("OT", 22),
+    ("Client", 28),
+    ("Destinataire", 28),
+    ("Type de produit", 20),
+    ("Tonnage OT (Kg)", 16),
+    ("État OT", 16),
+    ("Lot", 14),
+    ("Certification", 12),
+    ("N° Contrat", 16),
+    ("N° BL", 16),
+    ("Date BL", 12),
+    ("Conteneur", 16),
+    ("Navire", 20),
+    ("Booking", 16),
+    ("ETA", 12),
+    ("ETD", 12),
+    ("Compagnie maritime", 20),
+    ("Destination", 20),
+    ("Date empotage", 14),
+    ("Fin production", 14),
+    ("Quantité (Kg)", 14),
+    ("État lot", 16),
+]
+
+# Une ligne par lot (les OT sans lot apparaissent une fois, colonnes lot vides)
+XLSX_EXPORT_QUERY = """
+    SELECT ot.name,
+           COALESCE(parent.name, customer.name),
+           consignee.name,
+           ot.product_type,
+           ot.tonnage * 1000,
+           ot.state,
+           lot.name,
+           cert.suffix,
+           lot.contract_number,
+           lot.bl_number,
+           lot.bl_date,
+           container.name,
+           ot.vessel_name,
+           ot.booking_number,
+           container.date_arrival,
+           container.date_departure,
+           container.shipping_line,
+           COALESCE(NULLIF(lot.destination, ''), ot.pod),
+           lot.date_potted::date,
+           lot.date_production_end,
+           lot.current_tonnage * 1000,
+           lot.state
+      FROM potting_transit_order ot
+ LEFT JOIN potting_lot lot ON lot.transit_order_id = ot.id
+ LEFT JOIN potting_container container ON container.id = lot.container_id
+ LEFT JOIN potting_certification cert ON cert.id = lot.certification_id
+ LEFT JOIN res_partner customer ON customer.id = ot.customer_id
+ LEFT JOIN res_partner parent ON parent.id = customer.parent_id
+ LEFT JOIN res_partner consignee ON consignee.id = ot.consignee_id
+     WHERE ot.id = ANY(%s)
+  ORDER BY ot.name, lot.name
+"""
+
+
+class PottingReportXlsxExport(models.AbstractModel):
+    """Export XLSX en flux du jeu de données OT/lots."""
+    _name = 'potting.report.xlsx.export'
+    _description = "Export XLSX du rapport de production"
+
+    @api.model
+    def _iter_rows(self, transit_order_ids, fetch_size=XLSX_FETCH_SIZE):
+        """Itérer sur les lignes du rapport par paquets de fetch_size.
+
+        Utilise un curseur SQL nommé (côté serveur) dans la transaction
+        courante : seules fetch_size lignes sont en mémoire à la fois.
+        """
+        self.env['potting.transit.order'].flush_model()
+        self.env['potting.lot'].flush_model()
+        self.env['potting.container'].flush_model()
+        cr = self.env.cr
+        cr.execute("DECLARE potting_xlsx_export NO SCROLL CURSOR FOR " + XLSX_EXPORT_QUERY,
+                   [list(transit_order_ids)])
+        try:
+            while True:
+                cr.execute("FETCH FORWARD %s FROM potting_xlsx_export", [fetch_size])
+                rows = cr.fetchall()
+                if not rows:
+                    break
+                yield from rows
+        finally:
+            cr.execute("CLOSE potting_xlsx_export")
+
+    @api.model
+    def export_transit_orders(self, transit_orders, fileobj, title=None, fetch_size=XLSX_FETCH_SIZE):
+        """Écrire le rapport XLSX des OT donnés dans fileobj.
+
+        :param transit_orders: recordset potting.transit.order
+        :param fileobj: fichier binaire ouvert en écriture (tempfile, BytesIO)
+        :param title: titre de la feuille (31 caractères max)
+        :return: nombre de lignes écrites (hors en-tête)
+        """
+        if not OPENPYXL_AVAILABLE:
+            raise UserError(_(
+                "La bibliothèque openpyxl n'est pas installée. "
+                "Veuillez l'installer avec: pip install openpyxl"
+            ))
+        transit_orders.check_access_rights('read')
+        transit_orders.check_access_rule('read')
+
+        product_labels = dict(self.env['potting.transit.order']._fields['product_type'].selection)
+        ot_states = dict(self.env['potting.transit.order']._fields['state'].selection)
+        lot_states = dict(self.env['potting.lot']._fields['state'].selection)
+
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet_title = SHEET_TITLE_FORBIDDEN.sub('-', title or _("Production"))[:31]
+        sheet = workbook.create_sheet(title=sheet_title)
+        sheet.freeze_panes = 'A2'
+        for index, (_header, width) in enumerate(XLSX_COLUMNS, start=1):
+            sheet.column_dimensions[openpyxl.utils.get_column_letter(index)].width = width
+
+        header_font = Font(bold=True, color="FFFFFF")
+        header_fill = PatternFill(start_color="1A5F2A", end_color="1A5F2A", fill_type="solid")
+        header = []
+        for label, _width in XLSX_COLUMNS:
+            cell = WriteOnlyCell(sheet, value=label)
+            cell.font = header_font
+            cell.fill = header_fill
+            header.append(cell)
+        sheet.append(header)
+
+        count = 0
+        for row in self._iter_rows(transit_orders.ids, fetch_size=fetch_size):
+            row = list(row)
+            row[3] = product_labels.get(row[3], row[3])
+            row[5] = ot_states.get(row[5], row[5])
+            row[21] = lot_states.get(row[21], row[21])
+            sheet.append(row)
+            count += 1
+
+        workbook.save(fileobj)
+        _logger.info("Export XLSX production: %d lignes pour %d OT", count, len(transit_orders))
+        return count
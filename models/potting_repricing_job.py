@@ -0,0 +1,665 @@
+# -*- coding: utf-8 -*-
+"""
+Révision des prix d'une campagne
+Module: potting_management
+
+Lorsqu'un prix officiel, un taux de taxe ou le taux des droits
+d'exportation change, une révision recalcule les montants de toutes les
+formules (brouillon / validées) et de tous les OT concernés d'une campagne.
+Le travail est découpé en lots traités par un cron : calcul d'un aperçu
+des écarts, puis application en écritures groupées avec un seul message
+d'audit par enregistrement.
+"""
+
+import logging
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+from odoo.tools import float_compare
+
+from .potting_tax_engine import RATE_FIELDS, compute_tax_amounts, formule_bases
+
+_logger = logging.getLogger(__name__)
+
+# Nombre d'enregistrements traités par passage du cron
+CHUNK_SIZE = 200
+
+# États des formules et contrats concernés par une révision
+REPRICED_FORMULE_STATES = ('draft', 'validated')
+REPRICED_ORDER_STATES = ('draft', 'confirmed', 'in_progress')
+
+
+class PottingRepricingJob(models.Model):
+    """Révision des prix d'une campagne (traitement par lots en arrière-plan)"""
+    _name = 'potting.repricing.job'
+    _description = 'Révision des prix de campagne'
+    _order = 'id desc'
+
+    # =========================================================================
+    # CHAMPS
+    # =========================================================================
+
+    name = fields.Char(
+        string="Référence",
+        required=True,
+        readonly=True,
+        copy=False,
+        default=lambda self: _('Nouveau')
+    )
+
+    campaign_id = fields.Many2one(
+        'potting.campaign',
+        string="Campagne",
+        required=True,
+        index=True
+    )
+
+    company_id = fields.Many2one(
+        'res.company',
+        string="Société",
+        required=True,
+        default=lambda self: self.env.company
+    )
+
+    currency_id = fields.Many2one(
+        related='company_id.currency_id',
+        string="Devise"
+    )
+
+    state = fields.Selection([
+        ('draft', 'Brouillon'),
+        ('computing', 'Calcul en cours'),
+        ('preview', 'Aperçu'),
+        ('applying', 'Application en cours'),
+        ('done', 'Appliquée'),
+        ('cancelled', 'Annulée'),
+    ], string="État", default='draft', required=True, copy=False, index=True)
+
+    # Changements demandés
+    apply_official_price = fields.Boolean(
+        string="Nouveau prix officiel",
+        help="Appliquer un nouveau prix officiel du cacao aux formules de la campagne"
+    )
+
+    old_official_price = fields.Float(
+        string="Prix officiel actuel (par tonne)",
+        readonly=True,
+        copy=False
+    )
+
+    new_official_price = fields.Float(
+        string="Nouveau prix officiel (par tonne)"
+    )
+
+    apply_export_duty_rate = fields.Boolean(
+        string="Nouveau taux des droits d'exportation",
+        help="Appliquer un nouveau taux aux contrats ouverts de la campagne et à leurs OT"
+    )
+
+    new_export_duty_rate = fields.Float(
+        string="Nouveau taux droits d'exportation (%)"
+    )
+
+    rate_change_ids = fields.One2many(
+        'potting.repricing.rate.change',
+        'job_id',
+        string="Taux de taxe modifiés"
+    )
+
+    line_ids = fields.One2many(
+        'potting.repricing.line',
+        'job_id',
+        string="Écarts",
+        readonly=True
+    )
+
+    # Avancement
+    total_count = fields.Integer(
+        string="À traiter",
+        readonly=True,
+        copy=False
+    )
+
+    processed_count = fields.Integer(
+        string="Traités",
+        readonly=True,
+        copy=False
+    )
+
+    progress = fields.Float(
+        string="Avancement (%)",
+        compute='_compute_progress'
+    )
+
+    last_formule_id = fields.Integer(
+        string="Dernière formule calculée",
+        readonly=True,
+        copy=False
+    )
+
+    last_transit_order_id = fields.Integer(
+        string="Dernier OT calculé",
+        readonly=True,
+        copy=False
+    )
+
+    formule_line_count = fields.Integer(
+        string="Formules modifiées",
+        compute='_compute_line_counts'
+    )
+
+    ot_line_count = fields.Integer(
+        string="OT modifiés",
+        compute='_compute_line_counts'
+    )
+
+    result_message = fields.Text(
+        string="Résultat",
+        readonly=True,
+        copy=False
+    )
+
+    # =========================================================================
+    # MÉTHODES COMPUTED
+    # =========================================================================
+
+    @api.depends('total_count', 'processed_count')
+    def _compute_progress(self):
+        for job in self:
+            job.progress = 100.0 * job.processed_count / job.total_count if job.total_count else 0.0
+
+    @api.depends('line_ids.formule_id', 'line_ids.transit_order_id')
+    def _compute_line_counts(self):
+        counts = {
+            (job.id, is_formule): count
+            for job, is_formule, count in self.env['potting.repricing.line']._read_group(
+                [('job_id', 'in', self.ids)], ['job_id', 'is_formule'], ['__count']
+            )
+        }
+        for job in self:
+            job.formule_line_count = counts.get((job.id, True), 0)
+            job.ot_line_count = counts.get((job.id, False), 0)
+
+    # =========================================================================
+    # CRUD
+    # =========================================================================
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        for vals in vals_list:
+            if vals.get('name', _('Nouveau')) == _('Nouveau'):
+                campaign = self.env['potting.campaign'].browse(vals.get('campaign_id'))
+                vals['name'] = _("Révision %s du %s") % (
+                    campaign.name or '', fields.Date.to_string(fields.Date.context_today(self))
+                )
+        return super().create(vals_list)
+
+    def unlink(self):
+        if any(job.state in ('computing', 'applying') for job in self):
+            raise UserError(_("Impossible de supprimer une révision en cours de traitement."))
+        return super().unlink()
+
+    # =========================================================================
+    # PÉRIMÈTRE
+    # =========================================================================
+
+    def _has_formule_changes(self):
+        return self.apply_official_price or bool(self.rate_change_ids)
+
+    def _get_formule_domain(self):
+        if not self._has_formule_changes():
+            return [('id', '=', False)]
+        return [
+            ('campaign_id', '=', self.campaign_id.id),
+            ('state', 'in', list(REPRICED_FORMULE_STATES)),
+        ]
+
+    def _get_customer_orders(self):
+        """Contrats ouverts de la campagne dont le taux de droits change.
+
+        Le contrat n'a pas de campagne propre : il est rattaché à la campagne
+        par ses OT.
+        """
+        if not self.apply_export_duty_rate:
+            return self.env['potting.customer.order']
+        orders = self.env['potting.transit.order'].search([
+            ('campaign_id', '=', self.campaign_id.id),
+            ('customer_order_id', '!=', False),
+        ]).customer_order_id
+        return orders.filtered(lambda order: order.state in REPRICED_ORDER_STATES)
+
+    def _get_transit_order_domain(self):
+        if not self.apply_export_duty_rate:
+            return [('id', '=', False)]
+        return [
+            ('customer_order_id', 'in', self._get_customer_orders().ids),
+            ('state', '!=', 'cancelled'),
+        ]
+
+    def _trigger_cron(self):
+        cron = self.env.ref('potting_management.cron_potting_repricing_job', raise_if_not_found=False)
+        if cron:
+            cron._trigger()
+
+    # =========================================================================
+    # ACTIONS
+    # =========================================================================
+
+    def action_compute(self):
+        """Lancer le calcul de l'aperçu en arrière-plan."""
+        for job in self:
+            if job.state != 'draft':
+                raise UserError(_("Seules les révisions en brouillon peuvent être calculées."))
+            if not (job._has_formule_changes() or job.apply_export_duty_rate):
+                raise UserError(_("Indiquez au moins un changement de prix ou de taux."))
+            if job.apply_official_price and job.new_official_price <= 0:
+                raise UserError(_("Le nouveau prix officiel doit être supérieur à zéro."))
+            if job.apply_export_duty_rate and not 0 <= job.new_export_duty_rate <= 100:
+                raise UserError(_("Le taux des droits d'exportation doit être compris entre 0 et 100 %."))
+
+            ICP = self.env['ir.config_parameter'].sudo()
+            job.line_ids.unlink()
+            job.rate_change_ids._store_old_rates()
+            job.write({
+                'state': 'computing',
+                'old_official_price': float(ICP.get_param('potting_management.official_cocoa_price', '0') or 0),
+                'total_count': (
+                    self.env['potting.formule'].search_count(job._get_formule_domain())
+                    + self.env['potting.transit.order'].search_count(job._get_transit_order_domain())
+                ),
+                'processed_count': 0,
+                'last_formule_id': 0,
+                'last_transit_order_id': 0,
+                'result_message': False,
+            })
+        self._trigger_cron()
+        return True
+
+    def action_apply(self):
+        """Appliquer les écarts de l'aperçu en arrière-plan."""
+        for job in self:
+            if job.state != 'preview':
+                raise UserError(_("Calculez l'aperçu avant d'appliquer la révision."))
+            job._apply_global_changes()
+            job.write({
+                'state': 'applying',
+                'total_count': len(job.line_ids),
+                'processed_count': 0,
+            })
+        self._trigger_cron()
+        return True
+
+    def action_cancel(self):
+        if any(job.state in ('applying', 'done') for job in self):
+            raise UserError(_("Une révision appliquée ne peut pas être annulée."))
+        self.write({'state': 'cancelled'})
+        return True
+
+    def action_draft(self):
+        if any(job.state not in ('preview', 'cancelled') for job in self):
+            raise UserError(_("Seules les révisions en aperçu ou annulées peuvent être remises en brouillon."))
+        self.line_ids.unlink()
+        self.write({'state': 'draft', 'total_count': 0, 'processed_count': 0})
+        return True
+
+    # =========================================================================
+    # TRAITEMENT PAR LOTS
+    # =========================================================================
+
+    @api.model
+    def _cron_process_jobs(self):
+        """Traiter un lot de chaque révision en cours, relancer s'il reste du travail."""
+        pending = False
+        for job in self.search([('state', 'in', ('computing', 'applying'))]):
+            pending |= job._process_chunk()
+        if pending:
+            self._trigger_cron()
+
+    def _process_chunk(self):
+        """Traiter un lot de la révision.
+
+        :return: True s'il reste des lots à traiter
+        """
+        self.ensure_one()
+        if self.state == 'computing':
+            if not self._compute_formule_chunk() and not self._compute_transit_order_chunk():
+                self.state = 'preview'
+        elif self.state == 'applying':
+            if not self._apply_chunk():
+                self._finish()
+        return self.state in ('computing', 'applying')
+
+    def _compute_formule_chunk(self):
+        """Calculer les nouveaux montants d'un lot de formules (aucune écriture).
+
+        :return: False quand toutes les formules ont été calculées
+        """
+        formules = self.env['potting.formule'].search(
+            self._get_formule_domain() + [('id', '>', self.last_formule_id)],
+            order='id', limit=CHUNK_SIZE
+        )
+        if not formules:
+            return False
+
+        rows = formules.read([
+            'name', 'tonnage', 'tonnage_kg', 'montant_brut', 'differentiel_qualite',
+            'total_taxes_prelevees', 'montant_net', 'currency_id',
+        ], load=None)
+        new_gross = {
+            row['id']: self.new_official_price * (row['tonnage'] or 0.0) if self.apply_official_price
+            else row['montant_brut'] or 0.0
+            for row in rows
+        }
+        tax_lines = self.env['potting.formule.taxe'].search_read(
+            [('formule_id', 'in', formules.ids)],
+            list(RATE_FIELDS) + ['formule_id', 'taxe_type_id', 'is_preleve'], load=None
+        )
+
+        # Une seule passe vectorisée sur toutes les lignes de taxe du lot
+        overrides = {change.taxe_type_id.id: change for change in self.rate_change_ids}
+        row_by_id = {row['id']: row for row in rows}
+        columns = {name: [] for name in RATE_FIELDS}
+        bases = ([], [], [])
+        for line in tax_lines:
+            change = overrides.get(line['taxe_type_id'])
+            for name in RATE_FIELDS:
+                value = line[name] or 0.0
+                if change and name == 'taux_pourcentage':
+                    value = change.new_taux_pourcentage
+                elif change and name == 'taux_par_kg':
+                    value = change.new_taux_par_kg
+                columns[name].append(value)
+            row = row_by_id[line['formule_id']]
+            for column, value in zip(bases, formule_bases(new_gross[row['id']], row['tonnage'], row['tonnage_kg'])):
+                column.append(value)
+        amounts = compute_tax_amounts(*(columns[name] for name in RATE_FIELDS), *bases)
+
+        new_deductions = dict.fromkeys(formules.ids, 0.0)
+        for line, amount in zip(tax_lines, amounts):
+            if line['is_preleve']:
+                new_deductions[line['formule_id']] += amount
+
+        vals_list = []
+        for row in rows:
+            new_net = new_gross[row['id']] + (row['differentiel_qualite'] or 0.0) - new_deductions[row['id']]
+            vals = self._prepare_line_vals(
+                row, row['montant_brut'], new_gross[row['id']],
+                row['total_taxes_prelevees'], new_deductions[row['id']],
+                row['montant_net'], new_net,
+            )
+            if vals:
+                vals['formule_id'] = row['id']
+                vals_list.append(vals)
+        self.env['potting.repricing.line'].create(vals_list)
+        self.write({
+            'last_formule_id': formules[-1].id,
+            'processed_count': self.processed_count + len(formules),
+        })
+        return True
+
+    def _compute_transit_order_chunk(self):
+        """Calculer les nouveaux droits d'exportation d'un lot d'OT (aucune écriture).
+
+        :return: False quand tous les OT ont été calculés
+        """
+        transit_orders = self.env['potting.transit.order'].search(
+            self._get_transit_order_domain() + [('id', '>', self.last_transit_order_id)],
+            order='id', limit=CHUNK_SIZE
+        )
+        if not transit_orders:
+            return False
+
+        rate = self.new_export_duty_rate
+        vals_list = []
+        for row in transit_orders.read(
+            ['name', 'total_amount', 'export_duty_amount', 'net_amount', 'currency_id'], load=None
+        ):
+            total = row['total_amount'] or 0.0
+            new_duties = total * rate / 100 if total and rate else 0.0
+            vals = self._prepare_line_vals(
+                row, total, total,
+                row['export_duty_amount'], new_duties,
+                row['net_amount'], total - new_duties,
+            )
+            if vals:
+                vals['transit_order_id'] = row['id']
+                vals_list.append(vals)
+        self.env['potting.repricing.line'].create(vals_list)
+        self.write({
+            'last_transit_order_id': transit_orders[-1].id,
+            'processed_count': self.processed_count + len(transit_orders),
+        })
+        return True
+
+    def _prepare_line_vals(self, row, old_gross, new_gross, old_deductions, new_deductions, old_net, new_net):
+        """Valeurs d'une ligne d'écart, ou None si les montants ne changent pas."""
+        old_gross, old_deductions, old_net = old_gross or 0.0, old_deductions or 0.0, old_net or 0.0
+        if all(float_compare(old, new, precision_digits=2) == 0 for old, new in (
+            (old_gross, new_gross), (old_deductions, new_deductions), (old_net, new_net),
+        )):
+            return None
+        return {
+            'job_id': self.id,
+            'name': row['name'],
+            'currency_id': row['currency_id'] or self.currency_id.id,
+            'old_gross': old_gross,
+            'new_gross': new_gross,
+            'old_deductions': old_deductions,
+            'new_deductions': new_deductions,
+            'old_net': old_net,
+            'new_net': new_net,
+        }
+
+    def _apply_global_changes(self):
+        """Enregistrer les nouveaux taux de référence (types de taxe, prix, contrats)."""
+        self.ensure_one()
+        for change in self.rate_change_ids:
+            change.taxe_type_id.write({
+                'taux_pourcentage': change.new_taux_pourcentage,
+                'taux_par_kg': change.new_taux_par_kg,
+            })
+        if self.apply_official_price:
+            ICP = self.env['ir.config_parameter'].sudo()
+            ICP.set_param('potting_management.official_cocoa_price', str(self.new_official_price))
+            ICP.set_param('potting_management.official_cocoa_price_date', fields.Datetime.to_string(fields.Datetime.now()))
+        if self.apply_export_duty_rate:
+            # Les droits et montants nets des OT sont recalculés par l'ORM
+            self._get_customer_orders().write({'export_duty_rate': self.new_export_duty_rate})
+
+    def _apply_chunk(self):
+        """Appliquer un lot d'écarts en écritures groupées.
+
+        :return: False quand tous les écarts ont été appliqués
+        """
+        lines = self.env['potting.repricing.line'].search(
+            [('job_id', '=', self.id), ('applied', '=', False)], order='id', limit=CHUNK_SIZE
+        )
+        if not lines:
+            return False
+
+        formule_lines = lines.filtered('formule_id')
+        formules = formule_lines.formule_id.with_context(tracking_disable=True)
+        if formules and self.apply_official_price:
+            formules.write({
+                'prix_tonnage': self.new_official_price,
+                'prix_kg': self.new_official_price / 1000,
+            })
+        TaxLine = self.env['potting.formule.taxe']
+        for change in self.rate_change_ids:
+            TaxLine.search([
+                ('formule_id', 'in', formules.ids),
+                ('taxe_type_id', '=', change.taxe_type_id.id),
+            ]).write({
+                'taux_pourcentage': change.new_taux_pourcentage,
+                'taux_par_kg': change.new_taux_par_kg,
+            })
+
+        for lines_by_model, records in (
+            (formule_lines, formules),
+            (lines - formule_lines, (lines - formule_lines).transit_order_id),
+        ):
+            if records:
+                records._message_log_batch(bodies={
+                    (line.formule_id or line.transit_order_id).id: line._get_audit_body()
+                    for line in lines_by_model
+                })
+
+        lines.write({'applied': True})
+        self.processed_count += len(lines)
+        return True
+
+    def _finish(self):
+        self.write({
+            'state': 'done',
+            'result_message': _("%d formule(s) et %d OT révisé(s).") % (
+                self.formule_line_count, self.ot_line_count
+            ),
+        })
+        _logger.info("Révision %s: %s", self.name, self.result_message)
+
+
+class PottingRepricingRateChange(models.Model):
+    """Nouveau taux d'un type de taxe dans une révision"""
+    _name = 'potting.repricing.rate.change'
+    _description = 'Révision des prix - taux de taxe modifié'
+
+    _sql_constraints = [
+        ('job_taxe_type_uniq', 'unique(job_id, taxe_type_id)',
+         'Un type de taxe ne peut apparaître qu\'une fois par révision !'),
+    ]
+
+    job_id = fields.Many2one(
+        'potting.repricing.job',
+        string="Révision",
+        required=True,
+        ondelete='cascade'
+    )
+
+    taxe_type_id = fields.Many2one(
+        'potting.taxe.type',
+        string="Type de taxe",
+        required=True
+    )
+
+    old_taux_pourcentage = fields.Float(
+        string="Taux actuel (%)",
+        readonly=True,
+        digits=(16, 4)
+    )
+
+    old_taux_par_kg = fields.Float(
+        string="Taux actuel (par kg)",
+        readonly=True,
+        digits=(16, 4)
+    )
+
+    new_taux_pourcentage = fields.Float(
+        string="Nouveau taux (%)",
+        digits=(16, 4)
+    )
+
+    new_taux_par_kg = fields.Float(
+        string="Nouveau taux (par kg)",
+        digits=(16, 4)
+    )
+
+    @api.onchange('taxe_type_id')
+    def _onchange_taxe_type_id(self):
+        if self.taxe_type_id:
+            self.new_taux_pourcentage = self.taxe_type_id.taux_pourcentage
+            self.new_taux_par_kg = self.taxe_type_id.taux_par_kg
+
+    def _store_old_rates(self):
+        for change in self:
+            change.write({
+                'old_taux_pourcentage': change.taxe_type_id.taux_pourcentage,
+                'old_taux_par_kg': change.taxe_type_id.taux_par_kg,
+            })
+
+
+class PottingRepricingLine(models.Model):
+    """Écart de montants d'une formule ou d'un OT dans une révision"""
+    _name = 'potting.repricing.line'
+    _description = 'Révision des prix - écart'
+    _order = 'job_id, id'
+
+    job_id = fields.Many2one(
+        'potting.repricing.job',
+        string="Révision",
+        required=True,
+        ondelete='cascade',
+        index=True
+    )
+
+    name = fields.Char(
+        string="Document",
+        readonly=True
+    )
+
+    formule_id = fields.Many2one(
+        'potting.formule',
+        string="Formule",
+        readonly=True,
+        ondelete='cascade'
+    )
+
+    transit_order_id = fields.Many2one(
+        'potting.transit.order',
+        string="OT",
+        readonly=True,
+        ondelete='cascade'
+    )
+
+    is_formule = fields.Boolean(
+        string="Formule",
+        compute='_compute_is_formule',
+        store=True
+    )
+
+    currency_id = fields.Many2one(
+        'res.currency',
+        string="Devise",
+        readonly=True
+    )
+
+    old_gross = fields.Monetary(string="Montant brut actuel", currency_field='currency_id', readonly=True)
+    new_gross = fields.Monetary(string="Nouveau montant brut", currency_field='currency_id', readonly=True)
+    old_deductions = fields.Monetary(
+        string="Prélèvements actuels", currency_field='currency_id', readonly=True,
+        help="Taxes prélevées (formule) ou droits d'exportation (OT)"
+    )
+    new_deductions = fields.Monetary(string="Nouveaux prélèvements", currency_field='currency_id', readonly=True)
+    old_net = fields.Monetary(string="Montant net actuel", currency_field='currency_id', readonly=True)
+    new_net = fields.Monetary(string="Nouveau montant net", currency_field='currency_id', readonly=True)
+
+    difference = fields.Monetary(
+        string="Écart net",
+        currency_field='currency_id',
+        compute='_compute_difference',
+        store=True
+    )
+
+    applied = fields.Boolean(
+        string="Appliqué",
+        readonly=True,
+        default=False
+    )
+
+    @api.depends('formule_id')
+    def _compute_is_formule(self):
+        for line in self:
+            line.is_formule = bool(line.formule_id)
+
+    @api.depends('old_net', 'new_net')
+    def _compute_difference(self):
+        for line in self:
+            line.difference = line.new_net - line.old_net
+
+    def _get_audit_body(self):
+        self.ensure_one()
+        return _("Révision des prix « %s » : montant net %s → %s (écart %s)") % (
+            self.job_id.name,
+            f"{self.old_net:,.2f}",
+            f"{self.new_net:,.2f}",
+            f"{self.difference:+,.2f}",
+        )
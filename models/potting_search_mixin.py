@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Recherche rapide par trigrammes (pg_trgm)
+
+Les opérateurs saisissent des références partielles (lot ``M10045``, OT
+``3734/2025-2026-MA``, conteneur, BL, booking) qui deviennent des
+``ilike '%...%'`` : sans index adapté, PostgreSQL parcourt toute la table.
+
+Les modèles héritant de ``potting.search.mixin`` déclarent dans
+``_trigram_search_fields`` les colonnes à indexer :
+
+- ``init`` installe l'extension ``pg_trgm`` si possible et crée un index
+  GIN ``gin_trgm_ops`` par colonne (utilisé par tous les ``ilike``, y compris
+  les filtres de la vue de recherche) ;
+- ``_name_search`` (autocomplétion des many2one) cherche dans ces colonnes
+  et trie par pertinence (similarité décroissante, puis ordre du modèle).
+
+Sans ``pg_trgm`` (droits insuffisants), la recherche standard est conservée.
+"""
+
+import logging
+
+import psycopg2
+
+from odoo import api, models, tools
+from odoo.osv import expression
+from odoo.tools import SQL
+
+_logger = logging.getLogger(__name__)
+
+# En dessous de 3 caractères, pg_trgm ne peut pas utiliser l'index
+TRIGRAM_MIN_LENGTH = 3
+
+
+class PottingSearchMixin(models.AbstractModel):
+    """Index trigrammes et autocomplétion triée par pertinence"""
+    _name = 'potting.search.mixin'
+    _description = 'Recherche rapide par trigrammes'
+
+    # Colonnes (champs Char stockés, non traduits) indexées et recherchées
+    _trigram_search_fields = []
+
+    def init(self):
+        super().init()
+        if self._abstract or not self._trigram_search_fields or not self._trigram_ensure_extension():
+            return
+        for fname in self._trigram_search_fields:
+            tools.create_index(
+                self._cr, '%s_%s_trgm_idx' % (self._table, fname),
+                self._table, ['"%s" gin_trgm_ops' % fname], method='gin',
+            )
+
+    def _trigram_ensure_extension(self):
+        """Installer pg_trgm si nécessaire ; False si l'extension est indisponible."""
+        if self.env.registry.has_trigram:
+            return True
+        try:
+            with self._cr.savepoint(flush=False):
+                self._cr.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        except psycopg2.Error as e:
+            _logger.warning(
+                "Extension pg_trgm indisponible, index trigrammes de %s non créés : %s",
+                self._table, e
+            )
+            return False
+        self.env.registry.has_trigram = True
+        return True
+
+    @api.model
+    def _name_search(self, name, domain=None, operator='ilike', limit=None, order=None):
+        """Recherche dans les colonnes indexées, résultats les plus proches en premier."""
+        if (
+            not self._trigram_search_fields
+            or operator != 'ilike'
+            or len(name or '') < TRIGRAM_MIN_LENGTH
+            or not self.env.registry.has_trigram
+        ):
+            return super()._name_search(name, domain, operator, limit, order)
+
+        search_domain = expression.OR([
+            [(fname, 'ilike', name)] for fname in self._trigram_search_fields
+        ])
+        query = self._search(expression.AND([search_domain, domain or []]), limit=limit)
+        similarities = SQL(', ').join(
+            SQL("similarity(%s, %s)", SQL.identifier(self._table, fname), name)
+            for fname in self._trigram_search_fields
+        )
+        query.order = SQL(
+            "GREATEST(%s) DESC NULLS LAST, %s",
+            similarities, self._order_to_sql(order or self._order, query),
+        )
+        return query
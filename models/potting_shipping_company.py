@@ -9,8 +9,11 @@ class PottingShippingCompany(models.Model):
     
     _name = 'potting.shipping.company'
     _description = 'Compagnie Maritime'
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['potting.search.mixin', 'mail.thread', 'mail.activity.mixin']
     _order = 'name'
+    _trigram_search_fields = ['complete_name']
+    # Recherche sans trigrammes (termes courts, pg_trgm absent) : nom et code
+    _rec_names_search = ['name', 'code']
 
     # SQL Constraints
     _sql_constraints = [
@@ -36,6 +39,13 @@ class PottingShippingCompany(models.Model):
         help="Code abrégé de la compagnie (ex: MSC, MAERSK, CMA-CGM)"
     )
     
+    complete_name = fields.Char(
+        string="Nom complet",
+        compute='_compute_complete_name',
+        store=True,
+        help="Nom affiché « [code] nom », stocké pour l'autocomplétion"
+    )
+    
     logo = fields.Binary(
         string="Logo",
         attachment=True
@@ -132,23 +142,16 @@ class PottingShippingCompany(models.Model):
     # -------------------------------------------------------------------------
     # DISPLAY METHODS
     # -------------------------------------------------------------------------
-    def name_get(self):
-        """Display name with code if available."""
-        result = []
+    @api.depends('name', 'code')
+    def _compute_complete_name(self):
         for company in self:
-            name = company.name
-            if company.code:
-                name = f"[{company.code}] {name}"
-            result.append((company.id, name))
-        return result
+            company.complete_name = f"[{company.code}] {company.name}" if company.code else company.name
 
-    @api.model
-    def _name_search(self, name, domain=None, operator='ilike', limit=None, order=None):
-        """Search by name or code."""
-        domain = domain or []
-        if name:
-            domain = ['|', ('name', operator, name), ('code', operator, name)] + domain
-        return self._search(domain, limit=limit, order=order)
+    @api.depends('complete_name')
+    def _compute_display_name(self):
+        """Display name with code if available."""
+        for company in self:
+            company.display_name = company.complete_name or company.name
 
     # -------------------------------------------------------------------------
     # ACTION METHODS
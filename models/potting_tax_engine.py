@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+"""
+Moteur de calcul des taxes et redevances des formules
+Module: potting_management
+
+Les montants de toutes les lignes de taxe d'un lot de formules sont
+calculés en une passe vectorisée (NumPy si disponible, sinon boucle
+Python équivalente). La table des types de taxe actifs est lue une seule
+fois. Les fonctions de calcul sont pures : elles servent aussi aux
+aperçus (simulation de prix ou de taux) sans rien écrire.
+"""
+
+import logging
+
+from odoo import api, models
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+_logger = logging.getLogger(__name__)
+
+# Champs de taux d'une ligne, dans l'ordre de priorité du calcul
+RATE_FIELDS = ('montant_fixe', 'taux_pourcentage', 'taux_par_kg', 'montant_unitaire', 'taux')
+
+# Champs recopiés d'un type de taxe vers une ligne de formule
+TAX_TYPE_FIELDS = [
+    'name', 'code', 'categorie', 'taux_pourcentage', 'taux_par_kg',
+    'is_preleve_default', 'is_apres_vente', 'sequence', 'company_id',
+]
+
+
+def compute_tax_amounts(montant_fixe, taux_pourcentage, taux_par_kg, montant_unitaire, taux,
+                        montant_brut, tonnage_kg, tonnage):
+    """Calculer le montant de chaque ligne de taxe.
+
+    Toutes les séquences ont la même longueur (une valeur par ligne). Le
+    premier taux non nul l'emporte, dans l'ordre : montant fixe, taux en
+    pourcentage du montant brut, taux par kg, montant par tonne, ancien
+    taux en pourcentage.
+
+    :return: liste des montants (float)
+    """
+    if NUMPY_AVAILABLE:
+        fixe = np.asarray(montant_fixe, dtype=float)
+        pct = np.asarray(taux_pourcentage, dtype=float)
+        per_kg = np.asarray(taux_par_kg, dtype=float)
+        unit = np.asarray(montant_unitaire, dtype=float)
+        legacy = np.asarray(taux, dtype=float)
+        brut = np.asarray(montant_brut, dtype=float)
+        return np.select(
+            [fixe != 0, pct != 0, per_kg != 0, unit != 0, legacy != 0],
+            [fixe, brut * pct / 100, per_kg * np.asarray(tonnage_kg, dtype=float),
+             unit * np.asarray(tonnage, dtype=float), brut * legacy / 100],
+            default=0.0,
+        ).tolist()
+
+    amounts = []
+    for values in zip(montant_fixe, taux_pourcentage, taux_par_kg, montant_unitaire, taux,
+                      montant_brut, tonnage_kg, tonnage):
+        fixe, pct, per_kg, unit, legacy, brut, kg, tons = values
+        if fixe:
+            amounts.append(fixe)
+        elif pct:
+            amounts.append(brut * pct / 100)
+        elif per_kg:
+            amounts.append(per_kg * kg)
+        elif unit:
+            amounts.append(unit * tons)
+        elif legacy:
+            amounts.append(brut * legacy / 100)
+        else:
+            amounts.append(0.0)
+    return amounts
+
+
+def formule_bases(montant_brut, tonnage, tonnage_kg):
+    """Assiettes de calcul d'une formule (montant brut, tonnage kg, tonnage T)."""
+    return montant_brut or 0.0, tonnage_kg or (tonnage or 0.0) * 1000, tonnage or 0.0
+
+
+class PottingTaxEngine(models.AbstractModel):
+    """Calcul groupé des taxes et redevances des formules"""
+    _name = 'potting.tax.engine'
+    _description = "Moteur de calcul des taxes des formules"
+
+    @api.model
+    def _load_tax_types(self):
+        """Types de taxe actifs, lus une fois (liste de dicts ordonnée par séquence)."""
+        return self.env['potting.taxe.type'].search_read(
+            [('active', '=', True)], TAX_TYPE_FIELDS, load=None
+        )
+
+    @api.model
+    def _prepare_tax_line_vals(self, formule_id, tax_type):
+        """Valeurs d'une ligne de taxe de formule depuis un type de taxe (dict)."""
+        return {
+            'formule_id': formule_id,
+            'taxe_type_id': tax_type['id'],
+            'name': tax_type['name'],
+            'code': tax_type['code'],
+            'categorie': tax_type['categorie'],
+            'taux_pourcentage': tax_type['taux_pourcentage'],
+            'taux_par_kg': tax_type['taux_par_kg'],
+            'is_preleve': tax_type['is_preleve_default'],
+            'is_apres_vente': tax_type['is_apres_vente'],
+            'sequence': tax_type['sequence'],
+        }
+
+    @api.model
+    def create_standard_taxes(self, formules, tax_types=None, skip_existing_codes=False):
+        """Créer en un seul appel les lignes de taxe standard de plusieurs formules.
+
+        :param formules: recordset potting.formule
+        :param tax_types: types de taxe déjà chargés (_load_tax_types)
+        :param skip_existing_codes: ne pas recréer les codes déjà présents
+        :return: lignes créées (potting.formule.taxe)
+        """
+        if tax_types is None:
+            tax_types = self._load_tax_types()
+        existing_codes = {}
+        if skip_existing_codes:
+            for line in self.env['potting.formule.taxe'].search_read(
+                [('formule_id', 'in', formules.ids)], ['formule_id', 'code'], load=None
+            ):
+                existing_codes.setdefault(line['formule_id'], set()).add(line['code'])
+        vals_list = [
+            self._prepare_tax_line_vals(formule.id, tax_type)
+            for formule in formules
+            for tax_type in tax_types
+            if tax_type['code'] not in existing_codes.get(formule.id, ())
+        ]
+        return self.env['potting.formule.taxe'].create(vals_list)
+
+    @api.model
+    def compute_line_amounts(self, lines):
+        """Montants d'un ensemble de lignes de taxe, calculés en une passe.
+
+        :param lines: recordset potting.formule.taxe
+        :return: liste des montants, dans l'ordre de lines
+        """
+        columns = {name: [] for name in RATE_FIELDS}
+        bases = ([], [], [])
+        for line in lines:
+            for name in RATE_FIELDS:
+                columns[name].append(line[name] or 0.0)
+            formule = line.formule_id
+            for column, value in zip(bases, formule_bases(formule.montant_brut, formule.tonnage, formule.tonnage_kg)):
+                column.append(value)
+        return compute_tax_amounts(*(columns[name] for name in RATE_FIELDS), *bases)
+
+    @api.model
+    def preview_taxes(self, formule_values, tax_types=None):
+        """Simuler les taxes standard pour des formules (sans écriture).
+
+        :param formule_values: liste de dicts montant_brut / tonnage / tonnage_kg
+        :param tax_types: types de taxe (dicts) ; par défaut les types actifs,
+                          éventuellement avec des taux modifiés pour simulation
+        :return: liste (une entrée par formule) de dicts
+                 {'taxes': {code: montant}, 'total': montant total}
+        """
+        if tax_types is None:
+            tax_types = self._load_tax_types()
+        columns = {name: [] for name in RATE_FIELDS}
+        bases = ([], [], [])
+        for values in formule_values:
+            formule_base = formule_bases(values.get('montant_brut'), values.get('tonnage'), values.get('tonnage_kg'))
+            for tax_type in tax_types:
+                for name in RATE_FIELDS:
+                    columns[name].append(tax_type.get(name) or 0.0)
+                for column, value in zip(bases, formule_base):
+                    column.append(value)
+        amounts = compute_tax_amounts(*(columns[name] for name in RATE_FIELDS), *bases)
+
+        results = []
+        width = len(tax_types)
+        for index in range(len(formule_values)):
+            row = amounts[index * width:(index + 1) * width]
+            results.append({
+                'taxes': {tax_type['code']: amount for tax_type, amount in zip(tax_types, row)},
+                'total': sum(row),
+            })
+        return results
+
+    @api.model
+    def recompute_formules(self, formules):
+        """Recalculer et enregistrer les taxes d'un lot de formules (ex: une campagne).
+
+        :return: nombre de lignes recalculées
+        """
+        lines = formules.taxe_ids
+        if not lines:
+            return 0
+        self.env.add_to_compute(lines._fields['montant'], lines)
+        lines.flush_recordset(['montant'])
+        formules.flush_recordset()
+        _logger.info("Moteur de taxes: %d ligne(s) recalculée(s) pour %d formule(s)", len(lines), len(formules))
+        return len(lines)
+
+    @api.model
+    def recompute_campaign(self, campaign, states=('draft', 'validated')):
+        """Recalculer les taxes de toutes les formules d'une campagne."""
+        formules = self.env['potting.formule'].search([
+            ('campaign_id', '=', campaign.id),
+            ('state', 'in', list(states)),
+        ])
+        return self.recompute_formules(formules)
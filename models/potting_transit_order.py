@@ -13,10 +13,11 @@ Auteur: ICP
 Version: 2.0.0 - Améliorations robustesse
 """
 
-from odoo import api, fields, models, _
+from odoo import api, fields, models, tools, _
 from odoo.exceptions import UserError, ValidationError
 from odoo.tools import float_compare, float_round, float_is_zero
 import math
+from collections import defaultdict
 import logging
 
 _logger = logging.getLogger(__name__)
@@ -30,7 +31,8 @@ MIN_TONNAGE_PER_OT = 0.001  # Tonnage min par OT en tonnes
 class PottingTransitOrder(models.Model):
     _name = 'potting.transit.order'
     _description = 'Ordre de Transit (OT)'
-    _inherit = ['mail.thread', 'mail.activity.mixin']
+    _inherit = ['potting.bulk.mixin', 'potting.search.mixin', 'mail.thread', 'mail.activity.mixin']
+    _trigram_search_fields = ['name', 'booking_number']
     _order = 'name desc'
     _check_company_auto = True
 
@@ -352,6 +354,14 @@ class PottingTransitOrder(models.Model):
         help="Factures générées pour cet OT (facturation partielle possible)"
     )
     
+    invoice_line_ids = fields.One2many(
+        'account.move.line',
+        'potting_transit_order_id',
+        string="Lignes de facture",
+        copy=False,
+        help="Lignes produit facturant cet OT (y compris dans les factures groupées)"
+    )
+    
     invoice_count = fields.Integer(
         string="Nombre de factures",
         compute='_compute_invoice_info',
@@ -760,6 +770,27 @@ class PottingTransitOrder(models.Model):
         help="Taux de conversion appliqué"
     )
 
+    # -------------------------------------------------------------------------
+    # INDEX
+    # -------------------------------------------------------------------------
+    def init(self):
+        super().init()
+        # Alertes et rappels : OT liés à une formule dont les taxes ne sont pas payées
+        tools.create_index(
+            self._cr, 'potting_transit_order_taxes_pending_idx',
+            self._table, ['taxes_paid', 'write_date'], where="state = 'formule_linked'",
+        )
+        # Alertes : OT vendus dont le DUS n'est pas payé, par date de vente
+        tools.create_index(
+            self._cr, 'potting_transit_order_dus_pending_idx',
+            self._table, ['dus_paid', 'date_sold'], where="state = 'sold'",
+        )
+        # API et rapports : période de création par campagne
+        tools.create_index(
+            self._cr, 'potting_transit_order_campaign_date_created_idx',
+            self._table, ['campaign_id', 'date_created'],
+        )
+
     # -------------------------------------------------------------------------
     # CONSTRAINTS
     # -------------------------------------------------------------------------
@@ -957,7 +988,8 @@ class PottingTransitOrder(models.Model):
             else:
                 order.delivery_status = 'partial'
 
-    @api.depends('delivery_note_ids', 'delivery_note_ids.state', 'invoice_ids', 'invoice_ids.state')
+    @api.depends('delivery_note_ids', 'delivery_note_ids.state', 'invoice_ids', 'invoice_ids.state',
+                 'invoice_line_ids.parent_state')
     def _compute_customer_send_status(self):
         """Compute if OT can be sent to customer (BL validated + Invoice created)."""
         for order in self:
@@ -968,8 +1000,8 @@ class PottingTransitOrder(models.Model):
             order.has_validated_bl = len(validated_bls) > 0
             
             # Check if at least one customer invoice exists (not cancelled)
-            customer_invoices = order.invoice_ids.filtered(
-                lambda inv: inv.move_type == 'out_invoice' and inv.state != 'cancel'
+            customer_invoices = order._get_valid_invoices().filtered(
+                lambda inv: inv.move_type == 'out_invoice'
             )
             order.has_customer_invoice = len(customer_invoices) > 0
             
@@ -1005,9 +1037,14 @@ class PottingTransitOrder(models.Model):
     # COMPUTE METHODS - PRIX, DROITS ET TRANSITAIRE
     # -------------------------------------------------------------------------
     
-    @api.depends('forwarding_agent_id', 'tonnage', 'lot_ids.container_id')
+    @api.depends('forwarding_agent_id', 'forwarding_agent_id.commission_rate',
+                 'forwarding_agent_id.fixed_fee_per_container', 'subtotal_amount', 'unit_price',
+                 'tonnage', 'lot_ids.container_id')
     def _compute_forwarding_agent_fee(self):
-        """Calculate forwarding agent fees based on commission and fixed fees"""
+        """Calculate forwarding agent fees based on commission and fixed fees
+        
+        Stored so that agent statistics can sum the fees in SQL.
+        """
         for order in self:
             fee = 0.0
             if order.forwarding_agent_id:
@@ -1118,15 +1155,31 @@ class PottingTransitOrder(models.Model):
         for order in self:
             order.export_allowed = order.export_duty_collected
     
-    @api.depends('invoice_ids', 'invoice_ids.state', 'invoice_ids.potting_invoiced_tonnage', 'current_tonnage')
+    def _get_consolidated_invoice_lines(self):
+        """Lignes de factures groupées (sans OT unique en en-tête) non annulées."""
+        return self.invoice_line_ids.filtered(
+            lambda line: not line.move_id.potting_transit_order_id and line.parent_state != 'cancel'
+        )
+    
+    def _get_valid_invoices(self):
+        """Factures non annulées de l'OT, y compris les factures groupées."""
+        self.ensure_one()
+        return self.invoice_ids.filtered(lambda inv: inv.state != 'cancel') \
+            | self._get_consolidated_invoice_lines().move_id
+    
+    @api.depends('invoice_ids', 'invoice_ids.state', 'invoice_ids.potting_invoiced_tonnage', 'current_tonnage',
+                 'invoice_line_ids.parent_state', 'invoice_line_ids.potting_invoiced_tonnage')
     def _compute_invoice_info(self):
         """Compute invoice-related fields for partial invoicing support"""
         for order in self:
-            # Filtrer les factures non annulées
-            valid_invoices = order.invoice_ids.filtered(lambda inv: inv.state != 'cancel')
+            # Filtrer les factures non annulées (factures groupées : tonnage suivi par ligne)
+            own_invoices = order.invoice_ids.filtered(lambda inv: inv.state != 'cancel')
+            consolidated_lines = order._get_consolidated_invoice_lines()
+            valid_invoices = own_invoices | consolidated_lines.move_id
             
             order.invoice_count = len(valid_invoices)
-            order.invoiced_tonnage = sum(valid_invoices.mapped('potting_invoiced_tonnage'))
+            order.invoiced_tonnage = sum(own_invoices.mapped('potting_invoiced_tonnage')) \
+                + sum(consolidated_lines.mapped('potting_invoiced_tonnage'))
             order.remaining_to_invoice = max(0, order.current_tonnage - order.invoiced_tonnage)
             
             if order.current_tonnage > 0:
@@ -1225,69 +1278,99 @@ class PottingTransitOrder(models.Model):
     # -------------------------------------------------------------------------
     @api.model_create_multi
     def create(self, vals_list):
-        for vals in vals_list:
-            # Vérifier que le tonnage du contrat n'est pas dépassé
-            customer_order_id = vals.get('customer_order_id')
-            if customer_order_id:
-                customer_order = self.env['potting.customer.order'].browse(customer_order_id)
-                if customer_order.exists():
-                    new_tonnage = vals.get('tonnage', 0)
-                    if customer_order.contract_tonnage > 0:
-                        current_ot_tonnage = sum(customer_order.transit_order_ids.mapped('tonnage'))
-                        if current_ot_tonnage + new_tonnage > customer_order.contract_tonnage:
-                            raise ValidationError(_(
-                                "Impossible d'ajouter cet OT: le tonnage total des OT (%.2f T + %.2f T = %.2f T) "
-                                "dépasserait le tonnage du contrat (%.2f T).\n\n"
-                                "Tonnage restant disponible: %.2f T"
-                            ) % (
-                                current_ot_tonnage, 
-                                new_tonnage, 
-                                current_ot_tonnage + new_tonnage,
-                                customer_order.contract_tonnage,
-                                customer_order.contract_tonnage - current_ot_tonnage
-                            ))
-            
-            # Générer automatiquement le numéro OT si non fourni ou si 'Nouveau'
-            if vals.get('name', _('Nouveau')) == _('Nouveau') or not vals.get('name'):
-                # Le nom de l'OT dépend du type de produit et de la campagne de la commande
-                product_type = vals.get('product_type')
-                
-                # Récupérer la campagne depuis vals ou depuis la campagne par défaut
-                campaign_period = None
-                campaign_id = vals.get('campaign_id')
-                if campaign_id:
-                    campaign = self.env['potting.campaign'].browse(campaign_id)
-                    if campaign.exists():
-                        campaign_period = campaign.name
-                
-                # Récupérer la référence client depuis la commande
-                customer_ref = None
-                if customer_order_id:
-                    customer_order = self.env['potting.customer.order'].browse(customer_order_id)
-                    if customer_order.exists():
-                        # Récupérer la référence du client si elle existe
-                        if customer_order.customer_id and customer_order.customer_id.ref:
-                            customer_ref = customer_order.customer_id.ref
-                
-                vals['name'] = self.env['res.config.settings'].generate_ot_name(
-                    product_type, 
-                    campaign_period,
-                    customer_ref
-                )
+        self._check_batch_contract_tonnage(vals_list)
+        
+        # Générer automatiquement les numéros OT si non fournis ou si 'Nouveau'.
+        # Le nom de l'OT dépend du type de produit et de la campagne de la commande :
+        # un bloc de numéros est réservé par couple (type de produit, campagne).
+        to_name = [
+            vals for vals in vals_list
+            if not vals.get('name') or vals.get('name') == _('Nouveau')
+        ]
+        if to_name:
+            campaigns = self.env['potting.campaign'].browse(
+                {vals['campaign_id'] for vals in to_name if vals.get('campaign_id')}
+            ).exists()
+            campaign_names = {campaign.id: campaign.name for campaign in campaigns}
+            customer_orders = self.env['potting.customer.order'].browse(
+                {vals['customer_order_id'] for vals in to_name if vals.get('customer_order_id')}
+            ).exists()
+            # Récupérer la référence client depuis la commande
+            customer_refs = {order.id: order.customer_id.ref or None for order in customer_orders}
             
-            # Marquer si l'OT est créé depuis le contexte d'une commande
+            groups = defaultdict(list)
+            for vals in to_name:
+                groups[(vals.get('product_type'), campaign_names.get(vals.get('campaign_id')))].append(vals)
+            settings = self.env['res.config.settings']
+            for (product_type, campaign_period), group in groups.items():
+                refs = [customer_refs.get(vals.get('customer_order_id')) for vals in group]
+                if product_type:
+                    names = settings.generate_ot_names(product_type, campaign_period, refs)
+                else:
+                    names = [settings.generate_ot_name(None, campaign_period, ref) for ref in refs]
+                for vals, name in zip(group, names):
+                    vals['name'] = name
+        
+        # Marquer si l'OT est créé depuis le contexte d'une commande
+        for vals in vals_list:
             if self.env.context.get('default_customer_order_id') or vals.get('customer_order_id'):
                 vals['is_created_from_order'] = True
         
         records = super().create(vals_list)
         
-        # Lier les formules aux OT créés
+        # Lier les formules aux OT créés (une seule écriture pour tout le lot)
+        ot_by_formule = {}
         for record in records:
             if record.formule_id and not record.formule_id.transit_order_id:
-                record.formule_id.transit_order_id = record.id
+                ot_by_formule.setdefault(record.formule_id.id, record.id)
+        self.env['potting.formule']._link_transit_orders(ot_by_formule)
         
         return records
 
+    @api.model
+    def _check_batch_contract_tonnage(self, vals_list):
+        """Vérifier que les OT à créer ne dépassent pas le tonnage des contrats.
+        
+        Le tonnage déjà engagé est lu une fois pour tous les contrats du lot,
+        puis cumulé OT par OT dans l'ordre de création.
+        """
+        order_ids = {vals['customer_order_id'] for vals in vals_list if vals.get('customer_order_id')}
+        if not order_ids:
+            return
+        orders = self.env['potting.customer.order'].browse(order_ids).exists()
+        contract_tonnages = {
+            order.id: order.contract_tonnage for order in orders if order.contract_tonnage > 0
+        }
+        if not contract_tonnages:
+            return
+        current_tonnages = dict.fromkeys(contract_tonnages, 0.0)
+        for order, tonnage in self._read_group(
+            [('customer_order_id', 'in', list(contract_tonnages))],
+            ['customer_order_id'], ['tonnage:sum'],
+        ):
+            current_tonnages[order.id] = tonnage or 0.0
+        
+        for vals in vals_list:
+            order_id = vals.get('customer_order_id')
+            if order_id not in contract_tonnages:
+                continue
+            current_ot_tonnage = current_tonnages[order_id]
+            new_tonnage = vals.get('tonnage', 0)
+            contract_tonnage = contract_tonnages[order_id]
+            if current_ot_tonnage + new_tonnage > contract_tonnage:
+                raise ValidationError(_(
+                    "Impossible d'ajouter cet OT: le tonnage total des OT (%.2f T + %.2f T = %.2f T) "
+                    "dépasserait le tonnage du contrat (%.2f T).\n\n"
+                    "Tonnage restant disponible: %.2f T"
+                ) % (
+                    current_ot_tonnage, 
+                    new_tonnage, 
+                    current_ot_tonnage + new_tonnage,
+                    contract_tonnage,
+                    contract_tonnage - current_ot_tonnage
+                ))
+            current_tonnages[order_id] = current_ot_tonnage + new_tonnage
+
     def write(self, vals):
         """Vérifie que le tonnage du contrat n'est pas dépassé lors de la modification."""
         # Gérer le changement de formule
@@ -1556,8 +1639,8 @@ class PottingTransitOrder(models.Model):
             lambda bl: bl.state in ('confirmed', 'delivered')
         )
         bl_names = ', '.join(validated_bls.mapped('name'))
-        invoice_names = ', '.join(self.invoice_ids.filtered(
-            lambda inv: inv.move_type == 'out_invoice' and inv.state != 'cancel'
+        invoice_names = ', '.join(self._get_valid_invoices().filtered(
+            lambda inv: inv.move_type == 'out_invoice'
         ).mapped('name'))
         
         self.message_post(
@@ -1647,15 +1730,15 @@ class PottingTransitOrder(models.Model):
         """Cron job pour rappeler le paiement des taxes en attente.
         
         Crée des activités pour les OT liés à une formule mais dont les taxes
-        ne sont pas payées depuis plus de 5 jours.
+        ne sont pas payées depuis plus de 5 jours (nombre de requêtes constant,
+        voir potting.activity.reminder).
         
         Returns:
-            int: Nombre d'OT traités
+            int: Nombre d'activités créées
         """
         from datetime import date, timedelta
         
         threshold_date = date.today() - timedelta(days=5)
-        count = 0
         
         try:
             ots_pending = self.search([
@@ -1663,34 +1746,20 @@ class PottingTransitOrder(models.Model):
                 ('taxes_paid', '=', False),
                 ('write_date', '<', threshold_date)
             ])
-            
-            for ot in ots_pending:
-                try:
-                    # Vérifier si une activité existe déjà
-                    existing = self.env['mail.activity'].search([
-                        ('res_model', '=', self._name),
-                        ('res_id', '=', ot.id),
-                        ('summary', 'ilike', 'Taxes')
-                    ], limit=1)
-                    
-                    if not existing:
-                        ot.activity_schedule(
-                            'mail.mail_activity_data_todo',
-                            date_deadline=date.today() + timedelta(days=2),
-                            summary='💰 Taxes à payer',
-                            note=_("L'OT %s est lié à la formule mais les taxes ne sont pas encore payées.") % ot.name
-                        )
-                        count += 1
-                        _logger.info("Activité créée pour rappel taxes OT %s", ot.name)
-                except Exception as e:
-                    _logger.error("Erreur lors de la création d'activité pour OT %s: %s", ot.name, str(e))
-                    continue
-                    
+            activities = self.env['potting.activity.reminder'].schedule_reminders(
+                ots_pending,
+                'mail.mail_activity_data_todo',
+                summary='💰 Taxes à payer',
+                summary_match='Taxes',
+                note=lambda ot: _("L'OT %s est lié à la formule mais les taxes ne sont pas encore payées.") % ot.name,
+                date_deadline=date.today() + timedelta(days=2),
+                label='taxes OT',
+            )
         except Exception as e:
             _logger.error("Erreur dans _cron_taxes_payment_reminder: %s", str(e))
-            
-        _logger.info("Cron rappel taxes: %d activités créées sur %d OT en attente", count, len(ots_pending) if 'ots_pending' in locals() else 0)
-        return count
+            return 0
+        
+        return len(activities)
 
     # -------------------------------------------------------------------------
     # ACTION METHODS - LOTS
@@ -2007,8 +2076,138 @@ class PottingTransitOrder(models.Model):
                 "Le tonnage à facturer (%.3f T) dépasse le reste à facturer (%.3f T)."
             ) % (tonnage, self.remaining_to_invoice))
         
-        # Préparer les lignes de facture
+        # Créer la facture
+        invoice = self.env['account.move'].create(self._prepare_invoice_vals(tonnage, delivery_note))
+        
+        # Lier la facture au BL si applicable
+        if delivery_note:
+            delivery_note.invoice_id = invoice
+        
+        # Message dans le chatter
+        msg = _("Facture %s créée pour %.3f T.") % (invoice.name, tonnage)
+        if delivery_note:
+            msg += _(" (BL: %s)") % delivery_note.name
+        self.message_post(body=msg)
+        
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _('Facture'),
+            'res_model': 'account.move',
+            'view_mode': 'form',
+            'res_id': invoice.id,
+        }
+    
+    def _get_invoice_block_reason(self):
+        """Raison empêchant la facturation de l'OT, ou False."""
+        self.ensure_one()
+        if self.state not in ('in_progress', 'ready_validation', 'done'):
+            return _("L'OT %s doit être en cours, prêt pour validation ou validé pour être facturé.") % self.name
+        if not self.export_duty_collected:
+            return _("Les droits d'exportation de l'OT %s n'ont pas encore été encaissés.") % self.name
+        return False
+    
+    @api.model
+    def _create_invoices_batch(self, invoice_requests, consolidate=False):
+        """Créer en une fois les factures client de plusieurs OT ou BL.
+        
+        Les valeurs de toutes les factures sont préparées en mémoire puis
+        créées en un seul appel à create() ; les BL sont liés en une écriture
+        par facture et les champs de facturation des OT sont recalculés
+        une seule fois, au flush. Avec ``consolidate``, les demandes d'un même
+        client dans une même devise sont regroupées sur une seule facture
+        (le tonnage de chaque OT est alors suivi sur sa ligne produit).
+        
+        Args:
+            invoice_requests: liste de tuples (OT, tonnage, BL ou False)
+            consolidate: regrouper les factures par client et devise
+        
+        Returns:
+            dict: 'invoices' (factures créées) et 'skipped' [(OT, BL, raison)]
+        """
+        skipped = []
+        accepted = []
+        remaining = {}
+        for order, tonnage, delivery_note in invoice_requests:
+            reason = order._get_invoice_block_reason()
+            if not reason:
+                remaining.setdefault(order.id, order.remaining_to_invoice)
+                if tonnage <= 0:
+                    reason = _("Aucun tonnage à facturer pour l'OT %s.") % order.name
+                elif tonnage > remaining[order.id] + 0.001:  # Tolérance pour arrondis
+                    reason = _(
+                        "Le tonnage à facturer (%.3f T) dépasse le reste à facturer de l'OT %s (%.3f T)."
+                    ) % (tonnage, order.name, remaining[order.id])
+            if reason:
+                skipped.append((order, delivery_note, reason))
+                continue
+            remaining[order.id] -= tonnage
+            accepted.append((order, tonnage, delivery_note))
+        
+        invoices = self.env['account.move']
+        if not accepted:
+            return {'invoices': invoices, 'skipped': skipped}
+        
+        if consolidate:
+            groups = defaultdict(list)
+            for request in accepted:
+                groups[(request[0].customer_id.id, request[0].currency_id.id)].append(request)
+            request_groups = list(groups.values())
+        else:
+            request_groups = [[request] for request in accepted]
+        invoices = invoices.create([self._prepare_batch_invoice_vals(group) for group in request_groups])
+        
+        invoice_by_note = {}
+        messages = defaultdict(list)
+        for invoice, group in zip(invoices, request_groups):
+            for order, tonnage, delivery_note in group:
+                msg = _("Facture %s créée pour %.3f T.") % (invoice.name, tonnage)
+                if delivery_note:
+                    invoice_by_note[delivery_note.id] = invoice.id
+                    msg += _(" (BL: %s)") % delivery_note.name
+                messages[order.id].append(msg)
+        self.env['potting.delivery.note']._link_invoices(invoice_by_note)
+        self.browse(list(messages))._message_log_batch(bodies={
+            order_id: '\n'.join(order_messages) for order_id, order_messages in messages.items()
+        })
+        return {'invoices': invoices, 'skipped': skipped}
+    
+    @api.model
+    def _prepare_batch_invoice_vals(self, requests):
+        """Valeurs d'une facture couvrant une ou plusieurs demandes (OT, tonnage, BL).
+        
+        Une demande seule donne la facture habituelle de l'OT ; plusieurs
+        demandes donnent une facture groupée sans OT en en-tête.
+        """
+        vals_list = [order._prepare_invoice_vals(tonnage, delivery_note) for order, tonnage, delivery_note in requests]
+        if len(vals_list) == 1:
+            return vals_list[0]
+        
+        invoice_vals = dict(vals_list[0])
+        invoice_vals.update({
+            'invoice_origin': ', '.join(vals['invoice_origin'] for vals in vals_list),
+            'ref': ', '.join(vals['ref'] for vals in vals_list),
+            'potting_transit_order_id': False,
+            'potting_delivery_note_id': False,
+            'potting_invoiced_tonnage': sum(vals['potting_invoiced_tonnage'] for vals in vals_list),
+            'invoice_line_ids': [line for vals in vals_list for line in vals['invoice_line_ids']],
+            'narration': '\n\n'.join(vals['narration'] for vals in vals_list),
+        })
+        return invoice_vals
+    
+    def _prepare_invoice_vals(self, tonnage, delivery_note=None):
+        """Valeurs de la facture client d'un OT pour un tonnage donné.
+        
+        Args:
+            tonnage: Tonnage à facturer
+            delivery_note: Bon de livraison associé (si facture partielle par BL)
+        """
+        self.ensure_one()
         invoice_lines = self._prepare_invoice_lines(tonnage=tonnage)
+        # Ligne produit : rattachée à l'OT (suivi du tonnage en facture groupée)
+        invoice_lines[0].update({
+            'potting_transit_order_id': self.id,
+            'potting_invoiced_tonnage': tonnage,
+        })
         
         # Construire la référence
         if delivery_note:
@@ -2047,27 +2246,7 @@ class PottingTransitOrder(models.Model):
                 f"\nBon de livraison: {delivery_note.name}" if delivery_note else ""
             ),
         }
-        
-        # Créer la facture
-        invoice = self.env['account.move'].create(invoice_vals)
-        
-        # Lier la facture au BL si applicable
-        if delivery_note:
-            delivery_note.invoice_id = invoice
-        
-        # Message dans le chatter
-        msg = _("Facture %s créée pour %.3f T.") % (invoice.name, tonnage)
-        if delivery_note:
-            msg += _(" (BL: %s)") % delivery_note.name
-        self.message_post(body=msg)
-        
-        return {
-            'type': 'ir.actions.act_window',
-            'name': _('Facture'),
-            'res_model': 'account.move',
-            'view_mode': 'form',
-            'res_id': invoice.id,
-        }
+        return invoice_vals
     
     def _prepare_invoice_lines(self, tonnage=None):
         """
@@ -2111,16 +2290,17 @@ class PottingTransitOrder(models.Model):
     def action_view_invoice(self):
         """View invoices for this OT"""
         self.ensure_one()
-        if not self.invoice_ids:
+        invoices = self.invoice_ids | self.invoice_line_ids.move_id
+        if not invoices:
             raise UserError(_("Aucune facture n'a été créée pour cet OT."))
         
-        if len(self.invoice_ids) == 1:
+        if len(invoices) == 1:
             return {
                 'type': 'ir.actions.act_window',
                 'name': _('Facture'),
                 'res_model': 'account.move',
                 'view_mode': 'form',
-                'res_id': self.invoice_ids[0].id,
+                'res_id': invoices.id,
             }
         else:
             return {
@@ -2128,7 +2308,7 @@ class PottingTransitOrder(models.Model):
                 'name': _('Factures - %s') % self.name,
                 'res_model': 'account.move',
                 'view_mode': 'tree,form',
-                'domain': [('id', 'in', self.invoice_ids.ids)],
+                'domain': [('id', 'in', invoices.ids)],
             }
     
     def action_collect_export_duties(self):
@@ -2150,7 +2330,11 @@ class PottingTransitOrder(models.Model):
 class PottingVessel(models.Model):
     _name = 'potting.vessel'
     _description = 'Navire'
+    _inherit = ['potting.search.mixin']
     _order = 'name'
+    _trigram_search_fields = ['complete_name']
+    # Recherche sans trigrammes (termes courts, pg_trgm absent) : nom et code
+    _rec_names_search = ['name', 'code']
     
     _sql_constraints = [
         ('name_uniq', 'unique(name)', 'Le nom du navire doit être unique!'),
@@ -2171,12 +2355,19 @@ class PottingVessel(models.Model):
         help="Champ obsolète - Utilisez 'Compagnie maritime' à la place"
     )
     active = fields.Boolean(string="Actif", default=True)
+    complete_name = fields.Char(
+        string="Nom complet",
+        compute='_compute_complete_name',
+        store=True,
+        help="Nom affiché « [code] nom », stocké pour l'autocomplétion"
+    )
     
-    def name_get(self):
-        result = []
+    @api.depends('name', 'code')
+    def _compute_complete_name(self):
         for vessel in self:
-            name = vessel.name
-            if vessel.code:
-                name = f"[{vessel.code}] {name}"
-            result.append((vessel.id, name))
-        return result
+            vessel.complete_name = f"[{vessel.code}] {vessel.name}" if vessel.code else vessel.name
+
+    @api.depends('complete_name')
+    def _compute_display_name(self):
+        for vessel in self:
+            vessel.display_name = vessel.complete_name or vessel.name
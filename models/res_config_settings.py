@@ -739,6 +739,22 @@ class ResConfigSettings(models.TransientModel):
         Returns:
             int: The next OT number to use for this product type and campaign
         """
+        return self.reserve_ot_numbers(product_type, campaign_period, 1)[0]
+
+    @api.model
+    def reserve_ot_numbers(self, product_type, campaign_period=None, count=1):
+        """Reserve a block of consecutive OT numbers for a product type and campaign.
+        
+        Existing OT names are read once for the whole block.
+        
+        Args:
+            product_type: One of 'cocoa_mass', 'cocoa_butter', 'cocoa_cake', 'cocoa_powder'
+            campaign_period: The campaign period (e.g., '2025-2026'). If None, uses default.
+            count: Number of OT numbers to reserve
+        
+        Returns:
+            list: `count` consecutive OT numbers
+        """
         import re
         
         campaign_year = campaign_period or self.get_campaign_year()
@@ -752,16 +768,16 @@ class ResConfigSettings(models.TransientModel):
         # Pattern pour trouver tous les OT de cette campagne et ce produit
         search_pattern = f"/{campaign_year}-{product_code}"
         
-        existing_ots = self.env['potting.transit.order'].sudo().search([
+        existing_ots = self.env['potting.transit.order'].sudo().search_read([
             ('name', 'like', search_pattern)
-        ], order='name desc', limit=100)
+        ], ['name'], order='name desc', limit=100)
         
         max_number = 0
         for ot in existing_ots:
-            if ot.name and search_pattern in ot.name:
+            if ot['name'] and search_pattern in ot['name']:
                 # Extraire le numéro (ex: "3734/2025-2026-MA" -> 3734 ou "CLI001-3734/2025-2026-MA" -> 3734)
                 # Pattern modifié pour gérer le préfixe client optionnel
-                match = re.search(r'(?:^|-)(\d+)/', ot.name)
+                match = re.search(r'(?:^|-)(\d+)/', ot['name'])
                 if match:
                     try:
                         num = int(match.group(1))
@@ -771,9 +787,8 @@ class ResConfigSettings(models.TransientModel):
                         pass
         
         # Si aucun OT n'existe, utiliser le numéro initial, sinon incrémenter le max
-        if max_number == 0:
-            return initial_number
-        return max_number + 1
+        first_number = initial_number if max_number == 0 else max_number + 1
+        return list(range(first_number, first_number + count))
 
     @api.model
     def generate_ot_name(self, product_type=None, campaign_period=None, customer_ref=None):
@@ -795,15 +810,30 @@ class ResConfigSettings(models.TransientModel):
                 return f"{customer_ref}-{base_name}"
             return base_name
         
+        return self.generate_ot_names(product_type, campaign_period, [customer_ref])[0]
+
+    @api.model
+    def generate_ot_names(self, product_type, campaign_period=None, customer_refs=(None,)):
+        """Generate a block of consecutive OT names for one product type and campaign.
+        
+        Args:
+            product_type: One of 'cocoa_mass', 'cocoa_butter', 'cocoa_cake', 'cocoa_powder'
+            campaign_period: The campaign period (e.g., '2025-2026'). If None, uses default.
+            customer_refs: One customer reference (or None) per OT name to generate
+        
+        Returns:
+            list: OT names, in the order of customer_refs
+        """
         campaign_year = campaign_period or self.get_campaign_year()
         product_code = self.get_ot_prefix_for_product(product_type)
-        next_number = self.get_next_ot_number_for_product(product_type, campaign_year)
-        
-        # Format: [REF-]NNNN/AAAA-AAAA-XX (ex: CLI001-3734/2025-2026-MA ou 3734/2025-2026-MA)
-        base_ot_name = f"{next_number}/{campaign_year}-{product_code}"
-        if customer_ref:
-            return f"{customer_ref}-{base_ot_name}"
-        return base_ot_name
+        numbers = self.reserve_ot_numbers(product_type, campaign_year, len(customer_refs))
+        
+        names = []
+        for number, customer_ref in zip(numbers, customer_refs):
+            # Format: [REF-]NNNN/AAAA-AAAA-XX (ex: CLI001-3734/2025-2026-MA ou 3734/2025-2026-MA)
+            base_ot_name = f"{number}/{campaign_year}-{product_code}"
+            names.append(f"{customer_ref}-{base_ot_name}" if customer_ref else base_ot_name)
+        return names
     
     # =========================================================================
     # ACTION METHODS
@@ -504,19 +504,13 @@ export class PottingMainDashboard extends Component {
             this.state.finances.total_invoiced = totalInvoiced;
             this.state.finances.total_paid = totalPaid;
 
-            // OT en attente taxes / DUS
-            const campaignDomain = this.state.campaign
-                ? [["campaign_id", "=", this.state.campaign.id]]
-                : [];
-
-            this.state.finances.ot_waiting_taxes = await this.orm.searchCount(
-                "potting.transit.order",
-                [...campaignDomain, ["state", "=", "formule_linked"]]
-            );
-            this.state.finances.ot_waiting_dus = await this.orm.searchCount(
-                "potting.transit.order",
-                [...campaignDomain, ["state", "=", "sold"], ["dus_paid", "=", false]]
+            // OT en attente taxes / DUS (instantané des alertes, une requête)
+            const alertCounts = await this.orm.call(
+                "potting.alert.service", "get_alert_counts", [],
+                { campaign_id: this.state.campaign ? this.state.campaign.id : false }
             );
+            this.state.finances.ot_waiting_taxes = alertCounts.ot_taxes_pending;
+            this.state.finances.ot_waiting_dus = alertCounts.ot_dus_pending;
 
             // Paiements en attente
             try {
@@ -7,3 +7,20 @@ from . import test_potting_customer_order
 from . import test_potting_transit_order
 from . import test_potting_workflow
 from . import test_api_utils
+from . import test_potting_production_line
+from . import test_potting_daily_report
+from . import test_potting_import_contracts
+from . import test_potting_ot_allocation
+from . import test_potting_repricing
+from . import test_potting_container_planning
+from . import test_potting_delivery_note
+from . import test_potting_bulk_mode
+from . import test_potting_search
+from . import test_potting_indexes
+from . import test_potting_benchmark
+from . import test_potting_dataset_generator
+from . import test_potting_profile_run
+from . import test_potting_export_analysis
+from . import test_potting_alert_snapshot
+from . import test_potting_report_xlsx
+from . import test_potting_send_report_wizard
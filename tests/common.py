@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""Données de test communes aux tests potting
+
+Ce module fournit:
+- Une campagne active, une confirmation de vente et un client partagés
+- Des fabriques de formules et d'OT rattachés à cette CV
+"""
+
+from datetime import date, timedelta
+
+from odoo.tests import TransactionCase
+
+
+class PottingTestCommon(TransactionCase):
+    """Campagne, CV et client partagés par les tests potting
+
+    Les classes de test personnalisent les libellés (``fixture_label``,
+    ``fixture_code``) et surchargent les valeurs via ``campaign_vals``,
+    ``cv_vals`` et ``customer_vals``.
+    """
+
+    fixture_label = 'Potting'
+    fixture_code = 'POTTING'
+    campaign_vals = {}
+    cv_vals = {}
+    customer_vals = {}
+
+    @classmethod
+    def setUpClass(cls):
+        """Configuration des données de test"""
+        super().setUpClass()
+        cls.campaign = cls.env['potting.campaign'].create(dict({
+            'name': 'Campagne %s Test' % cls.fixture_label,
+            'date_start': date.today() - timedelta(days=30),
+            'date_end': date.today() + timedelta(days=335),
+            'state': 'active',
+        }, **cls.campaign_vals))
+        cls.cv = cls.env['potting.confirmation.vente'].create(dict({
+            'reference_ccc': 'CV-%s-TEST' % cls.fixture_code,
+            'campaign_id': cls.campaign.id,
+            'date_emission': date.today(),
+            'date_start': date.today(),
+            'date_end': date.today() + timedelta(days=90),
+            'tonnage_autorise': 1000.0,
+            'prix_tonnage': 1500000,
+            'product_type': 'all',
+            'state': 'active',
+        }, **cls.cv_vals))
+        cls.customer = cls.env['res.partner'].create(dict({
+            'name': 'Client %s Test' % cls.fixture_label,
+            'is_company': True,
+        }, **cls.customer_vals))
+
+    @classmethod
+    def _create_formules(cls, count=1, **vals):
+        """Créer count formules validées sur la CV partagée."""
+        return cls.env['potting.formule'].create([dict({
+            'confirmation_vente_id': cls.cv.id,
+            'campaign_id': cls.campaign.id,
+            'date_emission': date.today(),
+            'product_type': 'cocoa_mass',
+            'prix_kg': 1500,
+            'state': 'validated',
+        }, **vals) for _i in range(count)])
+
+    @classmethod
+    def _create_transit_orders(cls, tonnages, formule_vals=None, **vals):
+        """Créer un OT par tonnage, chacun sur sa propre formule (formule_vals)."""
+        product_type = vals.get('product_type', 'cocoa_mass')
+        formules = cls._create_formules(len(tonnages), **dict(formule_vals or {}, product_type=product_type))
+        return cls.env['potting.transit.order'].create([dict({
+            'formule_id': formule.id,
+            'campaign_id': cls.campaign.id,
+            'consignee_id': cls.customer.id,
+            'product_type': product_type,
+            'tonnage': tonnage,
+        }, **vals) for formule, tonnage in zip(formules, tonnages)])
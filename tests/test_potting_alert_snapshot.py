@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""Tests unitaires pour l'instantané des alertes (potting.alert.snapshot)
+
+Ce module teste:
+- Le contenu de l'instantané (catégorie, niveau, société)
+- Le rafraîchissement des parents : CV (registre de tonnage) et contrats (OT)
+- Les compteurs et alertes limités aux sociétés actives
+"""
+
+from datetime import date, timedelta
+
+from odoo.tests import tagged
+
+from odoo.addons.potting_management.tests.common import PottingTestCommon
+
+
+@tagged('potting', 'potting_alert_snapshot', '-at_install', 'post_install')
+class TestPottingAlertSnapshot(PottingTestCommon):
+    """Tests pour potting.alert.snapshot"""
+
+    fixture_label = 'Alertes'
+    fixture_code = 'ALERT'
+    # CV expirant dans 3 jours : alerte critique
+    cv_vals = {
+        'date_emission': date.today() - timedelta(days=10),
+        'date_start': date.today() - timedelta(days=10),
+        'date_end': date.today() + timedelta(days=3),
+        'tonnage_autorise': 100.0,
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        """Configuration des données de test"""
+        super().setUpClass()
+        cls.Snapshot = cls.env['potting.alert.snapshot']
+        cls.contract = cls.env['potting.customer.order'].create({
+            'customer_id': cls.customer.id,
+            'product_type': 'cocoa_mass',
+            'contract_tonnage': 100.0,
+            'unit_price': 1500000,
+            'date_order': date.today(),
+            'state': 'confirmed',
+        })
+
+    def _categories(self, record):
+        return set(self.Snapshot.search([
+            ('model', '=', record._name), ('res_id', '=', record.id),
+        ]).mapped('category'))
+
+    def test_01_snapshot_content(self):
+        """Test instantané: catégorie, niveau, campagne et société des alertes"""
+        alert = self.Snapshot.search([
+            ('model', '=', 'potting.confirmation.vente'), ('res_id', '=', self.cv.id),
+        ])
+        self.assertEqual(alert.category, 'cv_expiring')
+        self.assertEqual(alert.level, 'critical')
+        self.assertEqual(alert.campaign_id, self.campaign)
+        self.assertEqual(alert.company_id, self.cv.company_id)
+        self.assertEqual(alert.date, self.cv.date_end)
+        self.assertIn(self.cv.name, alert.title)
+        self.assertEqual(self._categories(self.contract), {'contract_uncovered'})
+
+    def test_02_cv_refreshed_by_tonnage_moves(self):
+        """Test instantané: la CV entièrement allouée n'est plus en alerte"""
+        counts = self.Snapshot.get_counts(campaign_id=self.campaign.id)
+        self.assertEqual(counts['cv_expiring_7_days'], 1)
+
+        # Le tonnage restant est recalculé par le registre, sans write() du champ
+        self.cv.customer_order_ids = [(4, self.contract.id)]
+        self.assertAlmostEqual(self.cv.tonnage_restant, 0.0)
+        self.assertFalse(self._categories(self.cv))
+        counts = self.Snapshot.get_counts(campaign_id=self.campaign.id)
+        self.assertEqual(counts['cv_expiring_7_days'], 0)
+
+    def test_03_contract_refreshed_by_transit_orders(self):
+        """Test instantané: le contrat couvert par ses OT n'est plus en alerte"""
+        before = self.Snapshot.get_counts()['contracts_uncovered']
+        ot = self._create_transit_orders([60.0], customer_order_id=self.contract.id)
+        self.assertEqual(self._categories(self.contract), {'contract_uncovered'})
+
+        ot.tonnage = 100.0
+        self.assertAlmostEqual(self.contract.remaining_contract_tonnage, 0.0)
+        self.assertFalse(self._categories(self.contract))
+        self.assertEqual(self.Snapshot.get_counts()['contracts_uncovered'], before - 1)
+
+        ot.customer_order_id = False
+        self.assertEqual(self._categories(self.contract), {'contract_uncovered'})
+
+    def test_04_counts_limited_to_active_companies(self):
+        """Test lecture: compteurs et alertes des seules sociétés actives"""
+        other_company = self.env['res.company'].create({'name': 'Société Alertes Test'})
+        Snapshot = self.Snapshot.with_context(allowed_company_ids=[other_company.id])
+        counts = Snapshot.get_counts(campaign_id=self.campaign.id)
+        self.assertEqual(counts['cv_expiring_7_days'], 0)
+        self.assertEqual(counts['total_critical'], 0)
+        critical = Snapshot.get_alerts(levels=('critical',))['critical']
+        self.assertNotIn(self.cv.id, [alert['res_id'] for alert in critical
+                                      if alert['model'] == 'potting.confirmation.vente'])
+
+        critical = self.Snapshot.get_alerts(levels=('critical',))['critical']
+        self.assertIn(self.cv.id, [alert['res_id'] for alert in critical
+                                   if alert['model'] == 'potting.confirmation.vente'])
@@ -0,0 +1,382 @@
+# -*- coding: utf-8 -*-
+"""Benchmark des flux métier principaux (nombre de requêtes SQL et durée)
+
+Ce module mesure, pour plusieurs volumes de données :
+- L'import de contrats et la génération d'OT depuis une commande
+- La génération de lots, la saisie de production et l'empotage
+- La création, confirmation, facturation et livraison des BL
+- La validation des formules et la synchronisation des paiements
+- Les alertes du dashboard, le rapport journalier et l'export XLSX
+
+Il est exclu des exécutions standard et se lance explicitement ::
+
+    odoo-bin -d <db> --test-tags /potting_management:potting_benchmark
+
+Les mesures sont écrites dans un fichier JSON (``POTTING_BENCHMARK_OUTPUT``,
+par défaut ``<tmp>/potting_benchmark.json``) et comparées à la référence
+``benchmark_baseline.json`` : un flux échoue si son nombre de requêtes ou
+sa durée dépasse la référence au-delà de la tolérance. Un flux absent de la
+référence est mesuré mais son test est ignoré (skip) avec un avertissement.
+Avec ``POTTING_BENCHMARK_UPDATE=1``, la référence est réécrite avec les
+mesures : elle se génère sur la machine de référence, puis se committe après
+revue.
+"""
+
+import base64
+import io
+import json
+import logging
+import math
+import os
+import tempfile
+import time
+from datetime import date
+from unittest import skipUnless
+
+from odoo.tests import tagged
+
+from odoo.addons.potting_management.tests.common import PottingTestCommon
+from odoo.addons.potting_management.wizards.potting_import_contracts_wizard import OPENPYXL_AVAILABLE
+
+if OPENPYXL_AVAILABLE:
+    import openpyxl
+
+_logger = logging.getLogger(__name__)
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'benchmark_baseline.json')
+OUTPUT_PATH = os.environ.get(
+    'POTTING_BENCHMARK_OUTPUT', os.path.join(tempfile.gettempdir(), 'potting_benchmark.json')
+)
+UPDATE_BASELINE = os.environ.get('POTTING_BENCHMARK_UPDATE') == '1'
+
+# Volumes mesurés (nombre de contrats, OT, lots... selon le flux)
+SIZES = (5, 25)
+
+# Écarts absolus ignorés (requêtes de cache, bruit de mesure)
+QUERY_SLACK = 3
+TIME_SLACK = 0.05
+
+# Formules des jeux mesurés : 50 T au prix de la CV
+FORMULE_VALS = {'prix_tonnage': 1500000, 'tonnage': 50.0}
+
+
+def _load_baseline():
+    try:
+        with open(BASELINE_PATH) as baseline_file:
+            return json.load(baseline_file)
+    except (OSError, ValueError):
+        return {}
+
+
+@tagged('potting_benchmark', '-standard', '-at_install', 'post_install')
+class TestPottingBenchmark(PottingTestCommon):
+    """Requêtes et durée des flux métier à plusieurs volumes"""
+
+    fixture_label = 'Benchmark'
+    fixture_code = 'BENCHMARK'
+    cv_vals = {'tonnage_autorise': 100000.0}
+    # Nom repris (en minuscules) par le fichier de contrats importé
+    customer_vals = {'name': 'BENCHMARK CHOCOLAT'}
+
+    @classmethod
+    def setUpClass(cls):
+        """Configuration des données de test"""
+        super().setUpClass()
+        cls.baseline = _load_baseline()
+        cls.results = {}
+
+        cls.vessel = cls.env['potting.vessel'].create({'name': 'NAVIRE BENCHMARK'})
+        cls.env['potting.taxe.type'].create({
+            'name': 'Redevance Benchmark',
+            'code': 'BENCH',
+            'categorie': 'redevance',
+            'taux_pourcentage': 1.0,
+            'is_preleve_default': True,
+        })
+
+    @classmethod
+    def tearDownClass(cls):
+        report = {
+            'date': date.today().isoformat(),
+            'sizes': list(SIZES),
+            'flows': cls.results,
+        }
+        with open(OUTPUT_PATH, 'w') as output:
+            json.dump(report, output, indent=2, sort_keys=True)
+        _logger.info("Benchmark potting écrit dans %s", OUTPUT_PATH)
+        if UPDATE_BASELINE:
+            baseline = dict(cls.baseline, flows=dict(cls.baseline.get('flows', {}), **cls.results))
+            with open(BASELINE_PATH, 'w') as baseline_file:
+                json.dump(baseline, baseline_file, indent=2, sort_keys=True)
+                baseline_file.write('\n')
+            _logger.info("Référence du benchmark mise à jour : %s", BASELINE_PATH)
+        super().tearDownClass()
+
+    def setUp(self):
+        super().setUp()
+        self.missing_references = []
+        self.addCleanup(self._skip_missing_references)
+
+    # -------------------------------------------------------------------------
+    # MESURE
+    # -------------------------------------------------------------------------
+
+    def _measure(self, flow, size, func):
+        """Mesurer func (requêtes et durée, écritures comprises) et comparer à la référence."""
+        self.env.flush_all()
+        self.env.invalidate_all()
+        start_queries = self.env.cr.sql_log_count
+        started = time.perf_counter()
+        result = func()
+        self.env.flush_all()
+        measure = {
+            'queries': self.env.cr.sql_log_count - start_queries,
+            'time': round(time.perf_counter() - started, 4),
+        }
+        self.results.setdefault(flow, {})[str(size)] = measure
+        _logger.info("Benchmark %s (%d) : %d requêtes, %.3fs", flow, size, measure['queries'], measure['time'])
+        self._check_regression(flow, size, measure)
+        return result
+
+    def _check_regression(self, flow, size, measure):
+        if UPDATE_BASELINE:
+            return
+        reference = self.baseline.get('flows', {}).get(flow, {}).get(str(size))
+        if not reference:
+            self.missing_references.append('%s (%d)' % (flow, size))
+            return
+        tolerance = self.baseline.get('tolerance', {})
+        max_queries = math.ceil(reference['queries'] * (1 + tolerance.get('queries', 0.1))) + QUERY_SLACK
+        self.assertLessEqual(measure['queries'], max_queries, "%s (%d) : %d requêtes, référence %d" % (
+            flow, size, measure['queries'], reference['queries']))
+        max_time = reference['time'] * (1 + tolerance.get('time', 0.5)) + TIME_SLACK
+        self.assertLessEqual(measure['time'], max_time, "%s (%d) : %.3fs, référence %.3fs" % (
+            flow, size, measure['time'], reference['time']))
+
+    def _skip_missing_references(self):
+        """Ignorer le test si des flux ont été mesurés sans référence à comparer."""
+        if not self.missing_references:
+            return
+        _logger.warning(
+            "Benchmark sans référence pour %s : lancer la suite avec POTTING_BENCHMARK_UPDATE=1 "
+            "sur la machine de référence puis committer %s",
+            ', '.join(self.missing_references), os.path.basename(BASELINE_PATH),
+        )
+        self.skipTest("Aucune référence dans %s pour %s" % (
+            os.path.basename(BASELINE_PATH), ', '.join(self.missing_references)))
+
+    # -------------------------------------------------------------------------
+    # DONNÉES
+    # -------------------------------------------------------------------------
+
+    def _make_formules(self, size, state='validated'):
+        return self._create_formules(size, state=state, **FORMULE_VALS)
+
+    def _make_orders(self, size, **vals):
+        return self._create_transit_orders([50.0] * size, formule_vals=FORMULE_VALS, **vals)
+
+    def _make_lots(self, orders, prefix, units=None, state=None):
+        """Deux lots de 25 T par OT, avec production (units par lot) et état optionnels."""
+        lots = self.env['potting.lot'].create([{
+            'name': '%s%03d%02d' % (prefix, index, lot_index),
+            'transit_order_id': order.id,
+            'product_type': 'cocoa_mass',
+            'target_tonnage': 25.0,
+        } for index, order in enumerate(orders) for lot_index in range(2)])
+        if units:
+            self.env['potting.production.line'].create([{
+                'lot_id': lot.id,
+                'units_produced': units,
+            } for lot in lots])
+        if state == 'potted':
+            container = self.env['potting.container'].create({'name': '%sC' % prefix})
+            lots.write({'state': state, 'container_id': container.id})
+        elif state:
+            lots.write({'state': state})
+        return lots
+
+    def _require_sale_journal(self):
+        if not self.env['account.journal'].search([
+            ('type', '=', 'sale'), ('company_id', '=', self.env.company.id)
+        ], limit=1):
+            self.skipTest("Aucun journal de vente (plan comptable non installé)")
+
+    # -------------------------------------------------------------------------
+    # CONTRATS ET OT
+    # -------------------------------------------------------------------------
+
+    @skipUnless(OPENPYXL_AVAILABLE, "openpyxl n'est pas installé")
+    def test_01_contract_import(self):
+        """Benchmark: lecture et import d'un fichier de contrats"""
+        for size in SIZES:
+            workbook = openpyxl.Workbook()
+            sheet = workbook.active
+            sheet.append(['header'] * 12)
+            for index in range(size):
+                sheet.append(['BENCH-%d-%04d' % (size, index), 'benchmark chocolat', 'cocoa_mass', 50.0,
+                              2500, 'EUR', '2025-01-15', '', '2024-2025', '', 14.6, ''])
+            output = io.BytesIO()
+            workbook.save(output)
+            wizard = self.env['potting.import.contracts.wizard'].create({
+                'file_data': base64.b64encode(output.getvalue()),
+                'file_name': 'contrats.xlsx',
+            })
+
+            def run():
+                wizard.action_parse_file()
+                wizard.action_import()
+            self._measure('contract_import', size, run)
+            self.assertEqual(wizard.state, 'done')
+
+    def test_02_ot_generation_from_order(self):
+        """Benchmark: génération des OT depuis les formules d'une commande"""
+        for size in SIZES:
+            order = self.env['potting.customer.order'].create({
+                'customer_id': self.customer.id,
+                'contract_number': 'BENCH-OT-%d' % size,
+                'product_type': 'cocoa_mass',
+                'contract_tonnage': 50.0 * size,
+            })
+            wizard = self.env['potting.generate.ot.from.order.wizard'].create({
+                'customer_order_id': order.id,
+                'campaign_id': self.campaign.id,
+                'consignee_id': self.customer.id,
+                'formule_ids': [(6, 0, self._make_formules(size).ids)],
+            })
+            self._measure('ot_generation', size, wizard.action_generate_ots)
+            self.assertEqual(len(order.transit_order_ids), size)
+
+    def test_03_formule_validation_and_payment_sync(self):
+        """Benchmark: validation des formules puis synchronisation du paiement vers les OT"""
+        for size in SIZES:
+            formules = self._make_formules(size, state='draft')
+            self._measure('formule_validation', size, formules.action_validate)
+            self.env['potting.transit.order'].create([{
+                'formule_id': formule.id,
+                'campaign_id': self.campaign.id,
+                'consignee_id': self.customer.id,
+                'product_type': 'cocoa_mass',
+                'tonnage': 50.0,
+            } for formule in formules])
+            self._measure('formule_payment_sync', size, formules.action_mark_avant_vente_paid)
+            self.assertTrue(all(formules.transit_order_id.mapped('taxes_paid')))
+
+    # -------------------------------------------------------------------------
+    # LOTS, PRODUCTION ET EMPOTAGE
+    # -------------------------------------------------------------------------
+
+    def test_10_lot_generation(self):
+        """Benchmark: génération des lots de plusieurs OT"""
+        for size in SIZES:
+            orders = self._make_orders(size)
+            wizards = self.env['potting.generate.lots.wizard'].create([{
+                'transit_order_id': order.id,
+                'max_tonnage_per_lot': 10.0,
+            } for order in orders])
+
+            def run():
+                for wizard in wizards:
+                    wizard.action_generate_lots()
+            self._measure('lot_generation', size, run)
+            self.assertEqual(len(orders.lot_ids), 5 * size)
+
+    def test_11_production_entry(self):
+        """Benchmark: ingestion groupée des productions"""
+        for size in SIZES:
+            lots = self._make_lots(self._make_orders(size), 'MBPR%d' % size)
+            rows = [{
+                'idempotency_key': 'BENCH-%d-%s-%d' % (size, lot.name, shift_index),
+                'lot_name': lot.name,
+                'units_produced': 100,
+                'shift': shift,
+            } for lot in lots for shift_index, shift in enumerate(('morning', 'afternoon', 'night'))]
+            result = self._measure(
+                'production_entry', size, lambda: self.env['potting.production.line'].ingest_production_batch(rows)
+            )
+            self.assertEqual(len(result['created']), len(rows))
+
+    def test_12_container_potting(self):
+        """Benchmark: planification et empotage des lots prêts"""
+        for size in SIZES:
+            orders = self._make_orders(size)
+            self._make_lots(orders, 'MBPT%d' % size, units=400, state='ready')
+            containers = self.env['potting.container'].create([
+                {'name': 'BNCH%d%06d' % (size, index)} for index in range(size)
+            ])
+            wizard = self.env['potting.container.planning.wizard'].create({
+                'transit_order_ids': [(6, 0, orders.ids)],
+                'container_ids': [(6, 0, containers.ids)],
+            })
+
+            def run():
+                wizard.action_compute()
+                wizard.action_apply()
+            self._measure('container_potting', size, run)
+            self.assertEqual(wizard.state, 'done')
+
+    # -------------------------------------------------------------------------
+    # BL ET FACTURATION
+    # -------------------------------------------------------------------------
+
+    def _make_shipped_orders(self, size, prefix):
+        orders = self._make_orders(size, vessel_id=self.vessel.id, pod='Rotterdam')
+        orders.write({'state': 'in_progress'})
+        self._make_lots(orders, prefix, units=400, state='potted')
+        return orders
+
+    def test_20_delivery_note_confirm(self):
+        """Benchmark: création des BL au départ navire puis confirmation"""
+        for size in SIZES:
+            orders = self._make_shipped_orders(size, 'MBBL%d' % size)
+
+            def run():
+                notes = self.env['potting.delivery.note'].create_bulk_delivery_notes(
+                    orders, create_invoices=False
+                )['delivery_notes']
+                notes.action_confirm()
+                return notes
+            notes = self._measure('delivery_note_confirm', size, run)
+            self.assertEqual(len(notes), size)
+
+    def test_21_invoicing_and_delivery(self):
+        """Benchmark: facturation groupée des BL confirmés puis livraison"""
+        self._require_sale_journal()
+        for size in SIZES:
+            orders = self._make_shipped_orders(size, 'MBIV%d' % size)
+            orders.write({'export_duty_collected': True})
+            notes = self.env['potting.delivery.note'].create_bulk_delivery_notes(
+                orders, create_invoices=False
+            )['delivery_notes']
+            notes.action_confirm()
+
+            result = self._measure('invoicing', size, lambda: self.env['potting.transit.order']._create_invoices_batch([
+                (note.transit_order_id, note.total_tonnage, note) for note in notes
+            ]))
+            self.assertEqual(len(result['invoices']), size)
+            self._measure('delivery_note_deliver', size, notes.action_deliver)
+            self.assertEqual(set(notes.mapped('state')), {'delivered'})
+
+    # -------------------------------------------------------------------------
+    # DASHBOARD ET RAPPORTS
+    # -------------------------------------------------------------------------
+
+    def test_30_dashboard_and_reports(self):
+        """Benchmark: alertes du dashboard, rapport journalier et export XLSX"""
+        for size in SIZES:
+            orders = self._make_orders(size)
+            self._make_lots(orders, 'MBRP%d' % size, units=200)
+            self.env['potting.alert.service'].refresh_alerts()
+
+            self._measure('dashboard_alerts', size, self.env['potting.alert.service'].get_all_alerts)
+            self._measure('dashboard_alert_counts', size, lambda: self.env['potting.alert.service'].get_alert_counts(
+                campaign_id=self.campaign.id
+            ))
+            report = self._measure('daily_report', size, lambda: self.env['potting.daily.report.data'].build(orders))
+            self.assertEqual(len(report['ots']), size)
+            if OPENPYXL_AVAILABLE:
+                rows = self._measure('xlsx_export', size, lambda: self.env['potting.report.xlsx.export'].export_transit_orders(
+                    orders, io.BytesIO()
+                ))
+                # Une ligne par lot
+                self.assertEqual(rows, len(orders.lot_ids))
+                self.assertEqual(rows, 2 * size)
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""Tests unitaires pour le mode opérations groupées (potting.bulk.mixin)
+
+Ce module teste:
+- Le message agrégé par OT des lots modifiés en mode groupé
+- Le suivi des champs converti en texte « ancien → nouveau »
+- Le benchmark messages / temps entre mode normal et mode groupé
+"""
+
+import logging
+import time
+from odoo.tests import tagged
+
+from odoo.addons.potting_management.tests.common import PottingTestCommon
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged('potting', 'potting_bulk_mode', '-at_install', 'post_install')
+class TestPottingBulkMode(PottingTestCommon):
+    """Tests pour le chatter différé des opérations groupées"""
+
+    fixture_label = 'Mode Groupé'
+    fixture_code = 'BULK'
+    cv_vals = {'tonnage_autorise': 10000.0}
+
+    LOT_COUNT = 200
+
+    @classmethod
+    def setUpClass(cls):
+        """Configuration des données de test"""
+        super().setUpClass()
+        cls.env = cls.env(context=dict(cls.env.context, tracking_disable=False))
+        cls.orders = cls._create_transit_orders([5000.0] * 2)
+
+    def _create_lots(self, order, prefix):
+        return self.env['potting.lot'].create([{
+            'name': '%s%04d' % (prefix, i),
+            'transit_order_id': order.id,
+            'product_type': 'cocoa_mass',
+            'target_tonnage': 25.0,
+        } for i in range(self.LOT_COUNT)])
+
+    def _process(self, lots):
+        """Traitement type d'un lot : changement d'état puis note."""
+        for lot in lots:
+            lot.write({'state': 'ready'})
+            lot.message_post(body="Lot contrôlé.")
+
+    def _count_chatter(self, lots, order):
+        self.env.cr.flush()
+        domain = [
+            '|', '&', ('model', '=', 'potting.lot'), ('res_id', 'in', lots.ids),
+            '&', ('model', '=', 'potting.transit.order'), ('res_id', '=', order.id),
+        ]
+        messages = self.env['mail.message'].search(domain)
+        return len(messages), len(messages.tracking_value_ids)
+
+    def test_01_messages_aggregated_on_transit_order(self):
+        """Test mode groupé: un message par OT avec les changements suivis"""
+        lots = self._create_lots(self.orders[0], 'MBULKA')
+        before = self._count_chatter(lots, self.orders[0])
+
+        with lots._bulk_mode() as bulk_lots:
+            self._process(bulk_lots)
+            self.assertEqual(self._count_chatter(lots, self.orders[0]), before)
+
+        messages, tracking_values = self._count_chatter(lots, self.orders[0])
+        self.assertEqual(messages, before[0] + 1)
+        self.assertEqual(tracking_values, before[1])
+        summary = self.orders[0].message_ids[:1]
+        self.assertIn(lots[0].name, summary.body)
+        self.assertIn('Lot contrôlé.', summary.body)
+        self.assertIn('→', summary.body)
+        self.assertTrue(all(lot.state == 'ready' for lot in lots))
+
+    def test_02_nested_modes_flush_once(self):
+        """Test mode groupé: les modes imbriqués publient avec le plus externe"""
+        lots = self._create_lots(self.orders[0], 'MBULKN')
+        before = self._count_chatter(lots, self.orders[0])[0]
+
+        with lots._bulk_mode() as bulk_lots:
+            with bulk_lots._bulk_mode() as nested:
+                nested[:1].message_post(body="Premier passage.")
+            self.assertEqual(self._count_chatter(lots, self.orders[0])[0], before)
+            bulk_lots[1:2].message_post(body="Second passage.")
+
+        self.assertEqual(self._count_chatter(lots, self.orders[0])[0], before + 1)
+
+    def test_03_benchmark_bulk_vs_normal(self):
+        """Benchmark: même traitement en mode normal puis en mode groupé"""
+        normal_lots = self._create_lots(self.orders[0], 'MBULKX')
+        bulk_lots = self._create_lots(self.orders[1], 'MBULKY')
+        normal_before = self._count_chatter(normal_lots, self.orders[0])
+        bulk_before = self._count_chatter(bulk_lots, self.orders[1])
+
+        started = time.time()
+        self._process(normal_lots)
+        normal_counts = self._count_chatter(normal_lots, self.orders[0])
+        normal_time = time.time() - started
+
+        started = time.time()
+        with bulk_lots._bulk_mode() as lots:
+            self._process(lots)
+        bulk_counts = self._count_chatter(bulk_lots, self.orders[1])
+        bulk_time = time.time() - started
+
+        normal_delta = [after - before for after, before in zip(normal_counts, normal_before)]
+        bulk_delta = [after - before for after, before in zip(bulk_counts, bulk_before)]
+        _logger.info(
+            "Benchmark mode groupé: %d lots, normal %.2fs (%d messages, %d suivis), "
+            "groupé %.2fs (%d messages, %d suivis)",
+            self.LOT_COUNT, normal_time, normal_delta[0], normal_delta[1],
+            bulk_time, bulk_delta[0], bulk_delta[1],
+        )
+        self.assertGreaterEqual(normal_delta[0], self.LOT_COUNT)
+        self.assertEqual(bulk_delta, [1, 0])
@@ -9,10 +9,14 @@ Ce module teste:
 - Workflow d'états et expiration
 """
 
+import logging
+import time
 from datetime import date, timedelta
 from odoo.tests import TransactionCase, tagged
 from odoo.exceptions import ValidationError, UserError
 
+_logger = logging.getLogger(__name__)
+
 
 @tagged('potting', 'potting_cv', '-at_install', 'post_install')
 class TestPottingConfirmationVente(TransactionCase):
@@ -392,3 +396,257 @@ class TestPottingConfirmationVente(TransactionCase):
         
         with self.assertRaises(UserError):
             cv.unlink()
+    
+    # =========================================================================
+    # TESTS CRONS
+    # =========================================================================
+    
+    def _create_expiring_cvs(self, count, prefix):
+        return self.env['potting.confirmation.vente'].create([{
+            'reference_ccc': '%s-%03d' % (prefix, i),
+            'campaign_id': self.campaign.id,
+            'date_emission': date.today() - timedelta(days=60),
+            'date_start': date.today() - timedelta(days=60),
+            'date_end': date.today() + timedelta(days=3),
+            'tonnage_autorise': 100.0,
+            'prix_tonnage': 1500000,
+            'product_type': 'all',
+            'state': 'active',
+        } for i in range(count)])
+    
+    def test_60_cron_expiration_reminders_once(self):
+        """Test rappel d'expiration créé une seule fois par CV"""
+        cvs = self._create_expiring_cvs(5, 'CV-REMIND')
+        CV = self.env['potting.confirmation.vente']
+        
+        CV._cron_check_cv_expiration()
+        CV._cron_check_cv_expiration()
+        
+        activities = self.env['mail.activity'].search([
+            ('res_model', '=', CV._name), ('res_id', 'in', cvs.ids),
+        ])
+        self.assertEqual(len(activities), 5)
+        self.assertEqual(set(activities.mapped('res_id')), set(cvs.ids))
+    
+    def _create_pending_tax_ots(self, count, prefix):
+        """OT liés à une formule dont les taxes sont impayées depuis 10 jours"""
+        cv = self._create_expiring_cvs(1, prefix)
+        consignee = self.env['res.partner'].create({'name': 'Destinataire %s' % prefix})
+        formules = self.env['potting.formule'].create([{
+            'confirmation_vente_id': cv.id,
+            'campaign_id': self.campaign.id,
+            'date_emission': date.today(),
+            'product_type': 'cocoa_mass',
+            'prix_kg': 1500,
+            'state': 'validated',
+        } for _i in range(count)])
+        orders = self.env['potting.transit.order'].create([{
+            'formule_id': formule.id,
+            'campaign_id': self.campaign.id,
+            'consignee_id': consignee.id,
+            'product_type': 'cocoa_mass',
+            'tonnage': 1.0,
+        } for formule in formules])
+        self.env.flush_all()
+        self.env.cr.execute(
+            "UPDATE potting_transit_order SET state = 'formule_linked', taxes_paid = false, write_date = %s "
+            "WHERE id = ANY(%s)",
+            [date.today() - timedelta(days=10), orders.ids]
+        )
+        self.env.invalidate_all()
+        return orders
+    
+    def _count_cron_queries(self, create_records, cron):
+        """Requêtes d'un passage du cron sur un jeu de données annulé ensuite"""
+        savepoint = self.env.cr.savepoint()
+        try:
+            create_records()
+            self.env.flush_all()
+            self.env.invalidate_all()
+            start = self.env.cr.sql_log_count
+            cron()
+            self.env.flush_all()
+            return self.env.cr.sql_log_count - start
+        finally:
+            savepoint.close(rollback=True)
+    
+    def test_61_reminder_crons_query_count_constant(self):
+        """Test crons de rappel (expiration CV, taxes OT): requêtes indépendantes du volume"""
+        CV = self.env['potting.confirmation.vente']
+        TransitOrder = self.env['potting.transit.order']
+        
+        # Premier passage de chaque cron pour chauffer les caches (ormcache, références)
+        self._count_cron_queries(lambda: self._create_expiring_cvs(2, 'CV-QC-W'), CV._cron_check_cv_expiration)
+        self.assertEqual(
+            self._count_cron_queries(lambda: self._create_expiring_cvs(3, 'CV-QC-A'), CV._cron_check_cv_expiration),
+            self._count_cron_queries(lambda: self._create_expiring_cvs(40, 'CV-QC-B'), CV._cron_check_cv_expiration),
+        )
+        
+        self._count_cron_queries(
+            lambda: self._create_pending_tax_ots(2, 'CV-QT-W'), TransitOrder._cron_taxes_payment_reminder
+        )
+        self.assertEqual(
+            self._count_cron_queries(
+                lambda: self._create_pending_tax_ots(3, 'CV-QT-A'), TransitOrder._cron_taxes_payment_reminder
+            ),
+            self._count_cron_queries(
+                lambda: self._create_pending_tax_ots(40, 'CV-QT-B'), TransitOrder._cron_taxes_payment_reminder
+            ),
+        )
+    
+    def test_62_cron_expiration_set_based(self):
+        """Test clôture ensembliste: CV expirées et CV consommées"""
+        CV = self.env['potting.confirmation.vente']
+        vals = {
+            'campaign_id': self.campaign.id,
+            'date_emission': date.today() - timedelta(days=60),
+            'date_start': date.today() - timedelta(days=60),
+            'prix_tonnage': 1500000,
+            'product_type': 'all',
+            'state': 'active',
+        }
+        cv_expired = CV.create(dict(vals, reference_ccc='CV-EXP-SET', date_end=date.today() - timedelta(days=1), tonnage_autorise=100.0))
+        cv_consumed = CV.create(dict(vals, reference_ccc='CV-CONS-SET', date_end=date.today() + timedelta(days=30), tonnage_autorise=50.0))
+        cv_open = CV.create(dict(vals, reference_ccc='CV-OPEN-SET', date_end=date.today() + timedelta(days=30), tonnage_autorise=100.0))
+        customer = self.env['res.partner'].create({'name': 'Client Cron CV', 'is_company': True})
+        order = self.env['potting.customer.order'].create({
+            'customer_id': customer.id,
+            'product_type': 'cocoa_mass',
+            'contract_tonnage': 50.0,
+            'unit_price': 1800000,
+            'state': 'confirmed',
+        })
+        cv_consumed.customer_order_ids = [(4, order.id)]
+        
+        CV._cron_check_expiration()
+        
+        self.assertEqual(cv_expired.state, 'expired')
+        self.assertEqual(cv_consumed.state, 'consumed')
+        self.assertEqual(cv_open.state, 'active')
+        summary = self.campaign.message_ids.filtered(lambda m: 'Clôture automatique' in (m.body or ''))
+        self.assertEqual(len(summary), 1)
+        self.assertIn(cv_expired.name, summary.body)
+        self.assertIn(cv_consumed.name, summary.body)
+        self.assertNotIn(cv_open.name, summary.body)
+        self.assertAlmostEqual(cv_consumed.tonnage_restant, 0.0)
+
+    
+    # =========================================================================
+    # TESTS DU REGISTRE DE TONNAGE
+    # =========================================================================
+    
+    def _ledger_cv(self, reference, tonnage=100.0):
+        return self.env['potting.confirmation.vente'].create({
+            'reference_ccc': reference,
+            'campaign_id': self.campaign.id,
+            'date_emission': date.today(),
+            'date_start': date.today(),
+            'date_end': date.today() + timedelta(days=90),
+            'tonnage_autorise': tonnage,
+            'prix_tonnage': 1500000,
+            'product_type': 'all',
+            'state': 'active',
+        })
+    
+    def test_70_ledger_contract_movements(self):
+        """Test registre: autorisation, allocation, ajustement et libération"""
+        cv = self._ledger_cv('CV-LEDGER-001')
+        customer = self.env['res.partner'].create({'name': 'Client Registre CV', 'is_company': True})
+        order = self.env['potting.customer.order'].create({
+            'customer_id': customer.id,
+            'product_type': 'cocoa_mass',
+            'contract_tonnage': 30.0,
+            'unit_price': 1800000,
+            'state': 'confirmed',
+        })
+        
+        cv.customer_order_ids = [(4, order.id)]
+        self.assertEqual(cv.tonnage_utilise, 30.0)
+        self.assertEqual(cv.tonnage_restant, 70.0)
+        
+        order.contract_tonnage = 40.0
+        self.assertEqual(cv.tonnage_restant, 60.0)
+        
+        order.action_cancel()
+        self.assertEqual(cv.tonnage_utilise, 0.0)
+        self.assertEqual(cv.tonnage_restant, 100.0)
+        
+        moves = cv.tonnage_move_ids.sorted('sequence')
+        self.assertEqual(moves.mapped('move_type'), ['authorize', 'allocate', 'allocate', 'release'])
+        self.assertEqual(moves.mapped('sequence'), [1, 2, 3, 4])
+        self.assertEqual(moves[-1].balance, 100.0)
+        with self.assertRaises(UserError):
+            moves[0].write({'quantity': 1.0})
+    
+    def test_71_ledger_transfer_between_cvs(self):
+        """Test report de tonnage: sortie sur la CV source, entrée sur la cible"""
+        source = self._ledger_cv('CV-LEDGER-SRC', tonnage=100.0)
+        target = self._ledger_cv('CV-LEDGER-DST', tonnage=50.0)
+        wizard = self.env['potting.cv.tonnage.transfer.wizard'].create({
+            'source_cv_id': source.id,
+            'create_new_cv': False,
+            'target_cv_id': target.id,
+            'tonnage_to_transfer': 40.0,
+            'transfer_all': False,
+        })
+        wizard.action_transfer_tonnage()
+        
+        self.assertEqual(source.tonnage_restant, 60.0)
+        self.assertEqual(source.tonnage_autorise, 100.0)
+        self.assertEqual(target.tonnage_restant, 90.0)
+        transfer_in = target.tonnage_move_ids.filtered(lambda m: m.move_type == 'transfer_in')
+        self.assertEqual(transfer_in.counterpart_cv_id, source)
+        transfer_out = source.tonnage_move_ids.filtered(lambda m: m.move_type == 'transfer_out')
+        self.assertEqual(transfer_out.counterpart_cv_id, target)
+        self.assertEqual(transfer_out.quantity, -40.0)
+
+
+@tagged('potting_benchmark', '-standard', '-at_install', 'post_install')
+class TestPottingCVExpirationBenchmark(TransactionCase):
+    """Benchmark du cron d'expiration avec plusieurs milliers de CV par campagne"""
+    
+    CV_COUNT = 3000
+    
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env = cls.env(context=dict(cls.env.context, tracking_disable=True))
+        cls.campaign = cls.env['potting.campaign'].create({
+            'name': 'Campagne Benchmark CV',
+            'date_start': date.today() - timedelta(days=200),
+            'date_end': date.today() + timedelta(days=165),
+            'state': 'active',
+        })
+        cls.cvs = cls.env['potting.confirmation.vente'].create([{
+            'reference_ccc': 'CV-BENCH-%05d' % i,
+            'campaign_id': cls.campaign.id,
+            'date_emission': date.today() - timedelta(days=120),
+            'date_start': date.today() - timedelta(days=120),
+            # Un tiers des CV expirées
+            'date_end': date.today() + timedelta(days=-1 if i % 3 == 0 else 60),
+            'tonnage_autorise': 100.0,
+            'prix_tonnage': 1500000,
+            'product_type': 'all',
+            'state': 'active',
+        } for i in range(cls.CV_COUNT)])
+    
+    def test_cron_expiration_benchmark(self):
+        """Sélection en requêtes constantes, clôture de milliers de CV"""
+        CV = self.env['potting.confirmation.vente'].with_context(tracking_disable=False)
+        self.env.invalidate_all()
+        
+        start = self.env.cr.sql_log_count
+        candidates = CV._get_expiration_candidates(date.today())
+        self.assertLessEqual(self.env.cr.sql_log_count - start, 3)
+        self.assertEqual(len(candidates['expired']), len(range(0, self.CV_COUNT, 3)))
+        
+        started = time.time()
+        CV._cron_check_expiration()
+        _logger.info(
+            "Benchmark expiration CV: %d CV clôturées en %.2fs",
+            len(candidates['expired']), time.time() - started
+        )
+        self.assertEqual(
+            CV.search_count([('id', 'in', self.cvs.ids), ('state', '=', 'expired')]),
+            len(candidates['expired']),
+        )
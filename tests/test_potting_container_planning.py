@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""Tests unitaires pour la planification du chargement des conteneurs
+
+Ce module teste:
+- Le solveur best-fit decreasing (nombre de conteneurs, types de produits)
+- Les lots trop lourds et l'estimation des conteneurs supplémentaires
+- L'empotage groupé via le wizard
+"""
+
+import time
+
+from odoo.tests import tagged
+from odoo.exceptions import UserError
+
+from odoo.addons.potting_management.tests.common import PottingTestCommon
+
+
+@tagged('potting', 'potting_container_planning', '-at_install', 'post_install')
+class TestPottingContainerPlanning(PottingTestCommon):
+    """Tests pour la planification du chargement"""
+
+    fixture_label = 'Planification'
+    fixture_code = 'PLANNING'
+    cv_vals = {'tonnage_autorise': 500.0}
+
+    @classmethod
+    def setUpClass(cls):
+        """Configuration des données de test"""
+        super().setUpClass()
+        cls.Container = cls.env['potting.container']
+        cls.ot = cls._create_transit_orders([40.0])
+
+    def _lot(self, lot_id, tonnage, product_type='cocoa_mass'):
+        return {'id': lot_id, 'product_type': product_type, 'tonnage': tonnage}
+
+    def _empty(self, container_id, remaining=25.0):
+        return {'id': container_id, 'product_type': False, 'remaining': remaining}
+
+    # -------------------------------------------------------------------------
+    # SOLVEUR
+    # -------------------------------------------------------------------------
+
+    def test_01_best_fit_minimises_containers(self):
+        """Test solveur: 15+10 et 12+12 tiennent dans deux conteneurs de 25 T"""
+        lots = [self._lot(1, 12.0), self._lot(2, 15.0), self._lot(3, 10.0), self._lot(4, 12.0)]
+        containers = [self._empty(100 + i) for i in range(4)]
+        assignments, unplaced = self.Container._plan_loading(lots, containers)
+
+        self.assertFalse(unplaced)
+        self.assertEqual(len(assignments), 4)
+        self.assertEqual(len({container_id for _lot_id, container_id in assignments}), 2)
+
+    def test_02_product_types_are_not_mixed(self):
+        """Test solveur: un conteneur ne reçoit qu'un seul type de produit"""
+        lots = [self._lot(1, 5.0), self._lot(2, 5.0, 'cocoa_butter'), self._lot(3, 5.0)]
+        containers = [
+            {'id': 100, 'product_type': 'cocoa_butter', 'remaining': 10.0},
+            self._empty(101),
+        ]
+        assignments = dict(self.Container._plan_loading(lots, containers)[0])
+
+        self.assertEqual(assignments[2], 100)
+        self.assertEqual(assignments[1], 101)
+        self.assertEqual(assignments[3], 101)
+
+    def test_03_oversize_lots_unplaced_and_estimate(self):
+        """Test solveur: lots sans place et estimation des conteneurs neufs"""
+        lots = [self._lot(1, 20.0), self._lot(2, 20.0), self._lot(3, 30.0)]
+        assignments, unplaced = self.Container._plan_loading(lots, [self._empty(100)])
+
+        self.assertEqual(len(assignments), 1)
+        self.assertEqual(sorted(unplaced), [2, 3])
+        self.assertEqual(self.Container._estimate_containers_needed(lots[:2], '20'), 2)
+        self.assertEqual(self.Container._estimate_containers_needed(
+            [self._lot(1, 14.0), self._lot(2, 14.0)], '40hc'
+        ), 1)
+
+    def test_04_large_plan_is_fast(self):
+        """Test solveur: 2000 lots et 1000 conteneurs en moins d'une seconde"""
+        lots = [self._lot(i, 2.0 + (i * 7) % 13, ('cocoa_mass', 'cocoa_butter')[i % 2]) for i in range(2000)]
+        containers = [self._empty(10000 + i) for i in range(1000)]
+
+        start = time.time()
+        assignments, unplaced = self.Container._plan_loading(lots, containers)
+        self.assertLess(time.time() - start, 1.0)
+        self.assertEqual(len(assignments) + len(unplaced), 2000)
+
+    # -------------------------------------------------------------------------
+    # WIZARD
+    # -------------------------------------------------------------------------
+
+    def test_10_wizard_plans_and_pots_lots(self):
+        """Test wizard: aperçu puis empotage groupé des lots prêts"""
+        lots = self.env['potting.lot'].create([{
+            'name': 'MPLAN%03d' % i,
+            'transit_order_id': self.ot.id,
+            'product_type': 'cocoa_mass',
+            'target_tonnage': 25.0,
+        } for i in range(3)])
+        self.env['potting.production.line'].create([{
+            'lot_id': lot.id,
+            'units_produced': units,
+        } for lot, units in zip(lots, (600, 400, 400))])
+        lots.write({'state': 'ready'})
+        containers = self.Container.create([{'name': 'TCPL%07d' % i} for i in range(3)])
+
+        wizard = self.env['potting.container.planning.wizard'].create({
+            'transit_order_ids': [(6, 0, self.ot.ids)],
+            'container_ids': [(6, 0, containers.ids)],
+        })
+        wizard.action_compute()
+        self.assertEqual(wizard.state, 'preview')
+        self.assertEqual(wizard.lot_count, 3)
+        self.assertEqual(wizard.container_count, 2)
+        self.assertFalse(wizard.unplaced_lot_ids)
+        self.assertTrue(all(lot.state == 'ready' for lot in lots))
+
+        wizard.action_apply()
+        self.assertEqual(wizard.state, 'done')
+        self.assertTrue(all(lot.state == 'potted' for lot in lots))
+        self.assertEqual(len(lots.container_id), 2)
+        self.assertTrue(all(c.state == 'loading' for c in lots.container_id))
+        audit = self.ot.message_ids.filtered(lambda m: 'empoté' in (m.body or ''))
+        self.assertEqual(len(audit), 1)
+        self.assertTrue(all(lot.name in audit.body for lot in lots))
+
+    def test_11_wizard_requires_ready_lots(self):
+        """Test wizard: aucun lot prêt"""
+        wizard = self.env['potting.container.planning.wizard'].create({
+            'transit_order_ids': [(6, 0, self.ot.ids)],
+        })
+        with self.assertRaises(UserError):
+            wizard.action_compute()
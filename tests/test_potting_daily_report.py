@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""Tests unitaires pour le fournisseur de données du rapport quotidien OT
+
+Ce module teste:
+- Contenu des lignes et statistiques du rapport
+- Nombre de requêtes constant quel que soit le volume d'OT et de lots
+"""
+
+from datetime import date
+from odoo.tests import tagged
+
+from odoo.addons.potting_management.tests.common import PottingTestCommon
+
+
+@tagged('potting', 'potting_report', '-at_install', 'post_install')
+class TestPottingDailyReportData(PottingTestCommon):
+    """Tests pour potting.daily.report.data"""
+
+    fixture_label = 'Rapport'
+    fixture_code = 'REPORT'
+    cv_vals = {'tonnage_autorise': 5000.0}
+    customer_vals = {'is_company': False}
+
+    @classmethod
+    def setUpClass(cls):
+        """Configuration des données de test"""
+        super().setUpClass()
+
+        cls.parent_customer = cls.env['res.partner'].create({
+            'name': 'Groupe Rapport Test',
+            'is_company': True,
+        })
+        cls.customer.parent_id = cls.parent_customer
+        cls.consignee = cls.env['res.partner'].create({
+            'name': 'Consignee Rapport Test',
+            'is_company': True,
+        })
+
+        cls.customer_order = cls.env['potting.customer.order'].create({
+            'customer_id': cls.customer.id,
+            'product_type': 'cocoa_mass',
+            'contract_tonnage': 2000.0,
+            'unit_price': 1800000,
+            'date_order': date.today(),
+            'state': 'confirmed',
+        })
+
+        cls.certification = cls.env['potting.certification'].search([('suffix', '!=', False)], limit=1)
+
+    def _create_ots(self, count, lots_per_ot=3):
+        """Créer des OT avec leurs lots et un conteneur par lot"""
+        ots = self._create_transit_orders(
+            [10.0 * lots_per_ot] * count,
+            customer_order_id=self.customer_order.id,
+            consignee_id=self.consignee.id,
+        )
+        for ot in ots:
+            for lot_index in range(lots_per_ot):
+                container = self.env['potting.container'].create({
+                    'name': 'TCRP%06d%02d' % (ot.id, lot_index),
+                })
+                self.env['potting.lot'].create({
+                    'name': 'MRPT%04d%02d' % (ot.id, lot_index),
+                    'transit_order_id': ot.id,
+                    'product_type': 'cocoa_mass',
+                    'target_tonnage': 10.0,
+                    'container_id': container.id,
+                    'certification_id': self.certification.id,
+                })
+        return ots
+
+    def _count_queries(self, transit_orders):
+        """Nombre de requêtes SQL pour construire le rapport à froid"""
+        self.env.invalidate_all()
+        before = self.env.cr.sql_log_count
+        data = self.env['potting.daily.report.data'].build(transit_orders)
+        return self.env.cr.sql_log_count - before, data
+
+    def test_01_rows_and_statistics(self):
+        """Test contenu des lignes et statistiques"""
+        ots = self._create_ots(2, lots_per_ot=2)
+        data = self.env['potting.daily.report.data'].build(ots)
+
+        self.assertEqual(len(data['ots']), 2)
+        self.assertEqual(data['stats']['total_ot'], 2)
+        self.assertAlmostEqual(data['stats']['total_tonnage_kg'], 40000.0)
+        self.assertEqual(data['stats']['in_prod_count'], 2)
+
+        row = data['ots'][0]
+        self.assertEqual(row['customer_name'], 'Groupe Rapport Test')
+        self.assertEqual(row['consignee_name'], 'Consignee Rapport Test')
+        self.assertEqual(row['unit_name'], 'Box of liquor')
+        self.assertEqual(row['total_units'], 800)
+        self.assertEqual(len(row['lots']), 2)
+        self.assertTrue(row['lots'][0]['container_number'].startswith('TCRP'))
+        self.assertEqual(row['certification'], self.certification.suffix or '')
+
+        self.assertEqual(len(data['by_customer']), 1)
+        self.assertEqual(data['by_customer'][0]['count'], 2)
+
+    def test_02_constant_query_count(self):
+        """Test nombre de requêtes indépendant du volume"""
+        small = self._create_ots(2)
+        large = small | self._create_ots(12)
+
+        small_count, _small_data = self._count_queries(small)
+        large_count, large_data = self._count_queries(large)
+
+        self.assertEqual(len(large_data['ots']), 14)
+        self.assertEqual(small_count, large_count)
+        # OT, lots, conteneurs, certifications, partenaires, sociétés mères
+        self.assertLessEqual(large_count, 10)
+
+    def test_03_wizard_uses_provider(self):
+        """Test les méthodes du wizard reposent sur le fournisseur"""
+        ots = self._create_ots(1)
+        wizard = self.env['potting.daily.report.wizard'].create({
+            'recipient_id': self.customer.id,
+            'transit_order_ids': [(6, 0, ots.ids)],
+        })
+
+        stats = wizard.get_report_statistics()
+        self.assertEqual(stats['total_ot'], 1)
+        self.assertEqual(len(wizard.get_ot_data_for_report()), 1)
+        self.assertIn('from', wizard.get_ot_number_range())
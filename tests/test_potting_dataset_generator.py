@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""Tests unitaires pour le générateur de jeu de données de campagne
+
+Ce module teste:
+- La cohérence du jeu généré (états, conteneurs, BL, totaux des lots)
+- Les colonnes liées et calculées des lignes de production insérées en SQL
+- Le déterminisme : même graine, mêmes données
+"""
+
+from odoo.tests import TransactionCase, tagged
+
+SMALL_DATASET = {
+    'customers': 3,
+    'consignees': 3,
+    'confirmations': 2,
+    'customer_orders': 5,
+    'transit_orders': 12,
+    'production_lines': 300,
+    'vessels': 2,
+    'chunk_size': 5,
+    'refresh_alerts': False,
+}
+
+
+@tagged('potting', 'potting_dataset_generator', '-at_install', 'post_install')
+class TestPottingDatasetGenerator(TransactionCase):
+    """Tests pour potting.dataset.generator"""
+
+    def _generate(self, seed):
+        return self.env['potting.dataset.generator'].generate(seed=seed, **SMALL_DATASET)
+
+    def _lots(self, campaign):
+        return self.env['potting.lot'].search([('transit_order_id.campaign_id', '=', campaign.id)], order='name')
+
+    def test_01_dataset_consistency(self):
+        """Test génération: volumes, états et totaux recalculés"""
+        result = self._generate(7)
+        counts = result['counts']
+        self.assertEqual(counts['potting.transit.order'], 12)
+
+        lots = self._lots(result['campaign'])
+        self.assertEqual(len(lots), counts['potting.lot'])
+        self.assertEqual(len(lots.production_line_ids), counts['potting.production.line'])
+        for lot in lots:
+            self.assertAlmostEqual(lot.current_tonnage, sum(lot.production_line_ids.mapped('tonnage')), places=3)
+            if lot.state == 'potted':
+                self.assertTrue(lot.container_id)
+                self.assertLessEqual(sum(lot.container_id.lot_ids.mapped('target_tonnage')), 25.0 + 0.001)
+            elif lot.state == 'draft':
+                self.assertFalse(lot.production_line_ids)
+
+        notes = self.env['potting.delivery.note'].search([('transit_order_id.campaign_id', '=', result['campaign'].id)])
+        self.assertEqual(len(notes), counts['potting.delivery.note'])
+        self.assertTrue(all(note.state == 'confirmed' and note.lot_ids for note in notes))
+        self.assertEqual(set(notes.lot_ids.mapped('state')), {'potted'} if notes else set())
+
+    def test_02_production_lines_columns(self):
+        """Test génération: colonnes liées et tonnage des lignes insérées en SQL"""
+        lines = self._lots(self._generate(8)['campaign']).production_line_ids
+        self.assertTrue(lines)
+        for line in lines[:50]:
+            self.assertEqual(line.transit_order_id, line.lot_id.transit_order_id)
+            self.assertEqual(line.product_type, line.lot_id.product_type)
+            self.assertEqual(line.company_id, line.lot_id.company_id)
+            self.assertAlmostEqual(line.tonnage, line.units_produced * line.lot_id.packaging_unit_weight, places=3)
+            self.assertAlmostEqual(line.tonnage_kg, line.tonnage * 1000, places=2)
+
+    def test_03_same_seed_same_dataset(self):
+        """Test génération: une même graine reproduit les mêmes lots et la même production"""
+        signatures = []
+        for _run in range(2):
+            savepoint = self.env.cr.savepoint()
+            try:
+                lots = self._lots(self._generate(9)['campaign'])
+                signatures.append([
+                    (lot.name, lot.product_type, lot.target_tonnage, lot.state,
+                     sorted(lot.production_line_ids.mapped('units_produced')))
+                    for lot in lots
+                ])
+            finally:
+                savepoint.close(rollback=True)
+                self.env.invalidate_all()
+        self.assertEqual(signatures[0], signatures[1])
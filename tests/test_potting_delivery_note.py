@@ -0,0 +1,163 @@
+# -*- coding: utf-8 -*-
+"""Tests unitaires pour le modèle potting.delivery.note
+
+Ce module teste:
+- La création groupée des BL au départ d'un navire
+- La sélection des lots empotés non encore livrés
+- Le récapitulatif du wizard
+- La facturation groupée (factures par BL ou consolidées par client)
+"""
+
+from odoo.tests import tagged
+from odoo.exceptions import UserError
+
+from odoo.addons.potting_management.tests.common import PottingTestCommon
+
+
+@tagged('potting', 'potting_delivery_note', '-at_install', 'post_install')
+class TestPottingBulkDeliveryNote(PottingTestCommon):
+    """Tests pour la création groupée des bons de livraison"""
+
+    fixture_label = 'BL'
+    fixture_code = 'BL'
+    cv_vals = {'tonnage_autorise': 500.0}
+
+    @classmethod
+    def setUpClass(cls):
+        """Configuration des données de test"""
+        super().setUpClass()
+        cls.vessel = cls.env['potting.vessel'].create({'name': 'NAVIRE BL TEST'})
+        cls.orders = cls._create_transit_orders([20.0] * 4, vessel_id=cls.vessel.id, pod='Rotterdam')
+        cls.lots = cls.env['potting.lot'].create([{
+            'name': 'MBL%d%02d' % (index, lot_index),
+            'transit_order_id': order.id,
+            'product_type': 'cocoa_mass',
+            'target_tonnage': 10.0,
+        } for index, order in enumerate(cls.orders) for lot_index in range(3)])
+        # OT 0 et 1 : deux lots empotés et un lot prêt ; OT 2 : aucun lot empoté ; OT 3 : brouillon
+        cls.orders[:3].write({'state': 'in_progress'})
+        cls.potted = cls.lots.filtered(lambda lot: lot.transit_order_id in cls.orders[:2] and lot.name[-2:] != '02')
+        cls.env['potting.production.line'].create([{
+            'lot_id': lot.id,
+            'units_produced': 400,
+        } for lot in cls.potted])
+        container = cls.env['potting.container'].create({'name': 'TCBL0000001'})
+        cls.potted.write({'state': 'potted', 'container_id': container.id})
+        (cls.lots - cls.potted).write({'state': 'ready'})
+
+    def test_01_bulk_creation_by_vessel(self):
+        """Test création groupée: un BL par OT avec ses lots empotés"""
+        wizard = self.env['potting.bulk.delivery.note.wizard'].create({
+            'vessel_id': self.vessel.id,
+            'carrier_name': 'Transporteur Test',
+        })
+        wizard.action_create_delivery_notes()
+
+        notes = wizard.delivery_note_ids
+        self.assertEqual(wizard.state, 'done')
+        self.assertEqual(len(notes), 2)
+        self.assertEqual(notes.transit_order_id, self.orders[:2])
+        self.assertEqual(notes.lot_ids, self.potted)
+        self.assertEqual(set(notes.mapped('carrier_name')), {'Transporteur Test'})
+        self.assertEqual(set(notes.mapped('destination')), {'Rotterdam'})
+        self.assertIn(self.orders[2].name, wizard.result_message)
+        self.assertFalse(notes.invoice_id)
+
+    def test_02_lots_already_delivered_are_skipped(self):
+        """Test création groupée: un lot ne figure que sur un seul BL actif"""
+        DeliveryNote = self.env['potting.delivery.note']
+        first = DeliveryNote.create_bulk_delivery_notes(self.orders)
+        self.assertEqual(len(first['delivery_notes']), 2)
+        self.assertEqual(len(first['skipped']), 2)
+
+        second = DeliveryNote.create_bulk_delivery_notes(self.orders)
+        self.assertFalse(second['delivery_notes'])
+        self.assertEqual(len(second['skipped']), 4)
+
+        first['delivery_notes'][0].action_cancel()
+        third = DeliveryNote.create_bulk_delivery_notes(self.orders)
+        self.assertEqual(third['delivery_notes'].lot_ids, first['delivery_notes'][0].lot_ids)
+
+    def test_03_requires_a_selection(self):
+        """Test wizard: navire, booking ou OT requis"""
+        wizard = self.env['potting.bulk.delivery.note.wizard'].create({})
+        with self.assertRaises(UserError):
+            wizard.action_create_delivery_notes()
+
+    # -------------------------------------------------------------------------
+    # FACTURATION GROUPÉE
+    # -------------------------------------------------------------------------
+
+    def _require_sale_journal(self):
+        if not self.env['account.journal'].search([
+            ('type', '=', 'sale'), ('company_id', '=', self.env.company.id)
+        ], limit=1):
+            self.skipTest("Aucun journal de vente (plan comptable non installé)")
+
+    def test_10_auto_invoice_waits_for_export_duties(self):
+        """Test facturation: droits d'exportation non encaissés, BL signalé"""
+        result = self.env['potting.delivery.note'].create_bulk_delivery_notes(self.orders[:2])
+
+        notes = result['delivery_notes']
+        self.assertFalse(result['invoiced'])
+        self.assertFalse(notes.invoice_id)
+        for note in notes:
+            self.assertTrue(note.message_ids.filtered(lambda m: 'droits' in (m.body or '')))
+
+    def test_11_consolidated_invoice_vals(self):
+        """Test facturation: une facture consolidée suit le tonnage par ligne"""
+        vals = self.env['potting.transit.order']._prepare_batch_invoice_vals([
+            (self.orders[0], 5.0, False),
+            (self.orders[1], 3.0, False),
+        ])
+
+        self.assertFalse(vals['potting_transit_order_id'])
+        self.assertAlmostEqual(vals['potting_invoiced_tonnage'], 8.0)
+        tagged_lines = [line for _cmd, _id, line in vals['invoice_line_ids'] if line.get('potting_transit_order_id')]
+        self.assertEqual(
+            {(line['potting_transit_order_id'], line['potting_invoiced_tonnage']) for line in tagged_lines},
+            {(self.orders[0].id, 5.0), (self.orders[1].id, 3.0)}
+        )
+
+    def test_12_batch_invoice_delivery_notes(self):
+        """Test facturation: BL confirmés facturés en une facture consolidée"""
+        self._require_sale_journal()
+        self.orders[:2].write({'export_duty_collected': True})
+        notes = self.env['potting.delivery.note'].create_bulk_delivery_notes(
+            self.orders[:2], create_invoices=False
+        )['delivery_notes']
+        notes.action_confirm()
+
+        wizard = self.env['potting.batch.invoice.wizard'].create({
+            'delivery_note_ids': [(6, 0, notes.ids)],
+            'consolidate': True,
+        })
+        wizard.action_create_invoices()
+
+        invoice = wizard.invoice_ids
+        self.assertEqual(len(invoice), 1)
+        self.assertEqual(notes.invoice_id, invoice)
+        # Liaison par l'ORM : le changement de facture est suivi sur chaque BL
+        self.env.flush_all()
+        self.env.cr.precommit.run()
+        tracked = notes.message_ids.tracking_value_ids.filtered(lambda t: t.field_id.name == 'invoice_id')
+        self.assertEqual(len(tracked), len(notes))
+        self.assertTrue(invoice.is_potting_invoice)
+        for order, note in zip(self.orders[:2], notes.sorted(lambda n: n.transit_order_id.id)):
+            self.assertEqual(order.invoice_count, 1)
+            self.assertAlmostEqual(order.invoiced_tonnage, note.total_tonnage, places=3)
+            self.assertTrue(order.has_customer_invoice)
+
+    def test_13_batch_invoice_transit_orders(self):
+        """Test facturation: une facture par OT, reste à facturer soldé"""
+        self._require_sale_journal()
+        self.orders[:2].write({'export_duty_collected': True})
+
+        result = self.env['potting.transit.order']._create_invoices_batch([
+            (order, order.remaining_to_invoice, False) for order in self.orders[:3]
+        ])
+
+        self.assertEqual(len(result['invoices']), 2)
+        self.assertEqual(result['invoices'].potting_transit_order_id, self.orders[:2])
+        self.assertEqual([order for order, _note, _reason in result['skipped']], [self.orders[2]])
+        self.assertTrue(all(order.is_fully_invoiced for order in self.orders[:2]))
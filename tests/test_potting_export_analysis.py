@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+"""Tests unitaires pour l'analyse des exportations (vue matérialisée)
+
+Ce module teste:
+- Les flux agrégés par campagne : OT, production, empotage, expédition
+- Le découpage par mois de l'événement
+- L'actualisation à la demande et la fraîcheur à l'ouverture
+"""
+
+from datetime import date, datetime, timedelta
+
+from odoo import fields
+from odoo.tests import tagged
+
+from odoo.addons.potting_management.tests.common import PottingTestCommon
+
+
+@tagged('potting', 'potting_export_analysis', '-at_install', 'post_install')
+class TestPottingExportAnalysis(PottingTestCommon):
+    """Tests pour potting.report.export.analysis"""
+
+    fixture_label = 'Analyse'
+    fixture_code = 'ANALYSIS'
+    # La production du mois précédent doit tomber dans la campagne
+    campaign_vals = {
+        'date_start': date.today() - timedelta(days=120),
+        'date_end': date.today() + timedelta(days=245),
+    }
+
+    @classmethod
+    def setUpClass(cls):
+        """Configuration des données de test"""
+        super().setUpClass()
+        cls.orders = (cls._create_transit_orders([50.0], product_type='cocoa_mass')
+                      | cls._create_transit_orders([50.0], product_type='cocoa_butter'))
+        cls.lots = cls.env['potting.lot'].create([{
+            'name': 'MANA%04d' % index,
+            'transit_order_id': order.id,
+            'product_type': order.product_type,
+            'target_tonnage': 25.0,
+        } for index, order in enumerate(cls.orders)])
+
+        # Production sur deux mois : 40 unités ce mois-ci, 20 le mois précédent
+        cls.previous_month = date.today().replace(day=1) - timedelta(days=1)
+        cls.env['potting.production.line'].create([{
+            'lot_id': lot.id,
+            'units_produced': units,
+            'date': production_date,
+        } for lot in cls.lots for units, production_date in ((40, date.today()), (20, cls.previous_month))])
+
+        cls.container = cls.env['potting.container'].create({'name': 'ANAU0000001'})
+        cls.lots[0].write({
+            'container_id': cls.container.id,
+            'state': 'potted',
+            'date_potted': fields.Datetime.now(),
+        })
+        cls.env['potting.delivery.note'].create({
+            'transit_order_id': cls.orders[0].id,
+            'lot_ids': [(6, 0, cls.lots[0].ids)],
+            'state': 'confirmed',
+            'date_confirmed': fields.Datetime.now(),
+        })
+        cls.Analysis = cls.env['potting.report.export.analysis']
+        cls.Analysis._refresh()
+
+    def _totals(self, domain=None, groupby=None):
+        measures = [
+            'ot_count', 'ordered_tonnage', 'produced_tonnage', 'potted_lot_count',
+            'potted_tonnage', 'container_count', 'delivery_note_count', 'shipped_tonnage',
+        ]
+        return self.Analysis.read_group(
+            [('campaign_id', '=', self.campaign.id)] + (domain or []),
+            measures, groupby or ['campaign_id'], lazy=False,
+        )
+
+    def test_01_campaign_totals_match_records(self):
+        """Test analyse: les totaux de campagne correspondent aux enregistrements"""
+        totals = self._totals()[0]
+        self.assertEqual(totals['ot_count'], 2)
+        self.assertAlmostEqual(totals['ordered_tonnage'], 100.0)
+        self.assertAlmostEqual(totals['produced_tonnage'], sum(self.lots.mapped('current_tonnage')), places=3)
+        self.assertEqual(totals['potted_lot_count'], 1)
+        self.assertAlmostEqual(totals['potted_tonnage'], self.lots[0].current_tonnage, places=3)
+        self.assertEqual(totals['container_count'], 1)
+        self.assertEqual(totals['delivery_note_count'], 1)
+        self.assertAlmostEqual(totals['shipped_tonnage'], self.lots[0].current_tonnage, places=3)
+
+    def test_02_monthly_and_product_split(self):
+        """Test analyse: production ventilée par mois et par type de produit"""
+        previous = self._totals([('date', '=', self.previous_month.replace(day=1))])[0]
+        expected = sum(20 * lot.packaging_unit_weight for lot in self.lots)
+        self.assertAlmostEqual(previous['produced_tonnage'], expected, places=3)
+        self.assertEqual(previous['ot_count'], 0)
+
+        by_product = {row['product_type']: row for row in self._totals(groupby=['product_type'])}
+        self.assertEqual(set(by_product), {'cocoa_mass', 'cocoa_butter'})
+        self.assertEqual(by_product['cocoa_butter']['potted_lot_count'], 0)
+
+    def test_03_refresh_strategy(self):
+        """Test analyse: actualisation à la demande, données récentes conservées à l'ouverture"""
+        self.env['potting.production.line'].create({'lot_id': self.lots[1].id, 'units_produced': 10})
+        before = self._totals()[0]['produced_tonnage']
+
+        # Données de moins de REFRESH_MAX_AGE minutes : pas de recalcul à l'ouverture
+        self.assertFalse(self.Analysis._refresh(max_age=15))
+        self.assertAlmostEqual(self._totals()[0]['produced_tonnage'], before, places=3)
+
+        action = self.Analysis.action_refresh()
+        self.assertEqual(action['res_model'], 'potting.report.export.analysis')
+        self.assertAlmostEqual(
+            self._totals()[0]['produced_tonnage'],
+            before + 10 * self.lots[1].packaging_unit_weight, places=3,
+        )
+
+        # Date d'actualisation hors ir.config_parameter (pas d'invalidation du registre)
+        self.assertFalse(self.env['ir.config_parameter'].sudo().get_param(
+            'potting_management.export_analysis_refreshed_at'
+        ))
+        self.Analysis._set_refreshed_at(datetime.now() - timedelta(hours=2))
+        self.assertTrue(self.Analysis._refresh(max_age=15))
+        self.assertGreater(self.Analysis._get_refreshed_at(), datetime.now() - timedelta(minutes=1))
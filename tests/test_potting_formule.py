@@ -13,6 +13,9 @@ from datetime import date, timedelta
 from odoo.tests import TransactionCase, tagged
 from odoo.exceptions import ValidationError, UserError
 
+# Requêtes maximum d'une notification (message_post) sur le chatter
+MESSAGE_POST_MAX_QUERIES = 30
+
 
 @tagged('potting', 'potting_formule', '-at_install', 'post_install')
 class TestPottingFormule(TransactionCase):
@@ -347,3 +350,123 @@ class TestPottingFormule(TransactionCase):
         
         # Vérifier que l'emballage par défaut est défini
         self.assertTrue(formule.emballage or True)  # Peut être vide selon config
+    
+    # =========================================================================
+    # TESTS DU MOTEUR DE TAXES
+    # =========================================================================
+    
+    def test_70_tax_engine_pure_function(self):
+        """Test calcul vectorisé: priorité des taux, identique sans NumPy"""
+        from unittest.mock import patch
+        from odoo.addons.potting_management.models import potting_tax_engine
+        
+        args = (
+            [1000.0, 0.0, 0.0, 0.0, 0.0, 0.0],      # montant_fixe
+            [5.0, 5.0, 0.0, 0.0, 0.0, 0.0],         # taux_pourcentage
+            [0.0, 1.245, 1.245, 0.0, 0.0, 0.0],     # taux_par_kg
+            [0.0, 0.0, 0.0, 200.0, 0.0, 0.0],       # montant_unitaire
+            [0.0, 0.0, 0.0, 0.0, 14.6, 0.0],        # taux (ancien)
+            [1e6] * 6,                               # montant_brut
+            [50000.0] * 6,                           # tonnage_kg
+            [50.0] * 6,                              # tonnage
+        )
+        expected = [1000.0, 50000.0, 62250.0, 10000.0, 146000.0, 0.0]
+        amounts = potting_tax_engine.compute_tax_amounts(*args)
+        for amount, value in zip(amounts, expected):
+            self.assertAlmostEqual(amount, value, places=2)
+        with patch.object(potting_tax_engine, 'NUMPY_AVAILABLE', False):
+            fallback = potting_tax_engine.compute_tax_amounts(*args)
+        for amount, value in zip(fallback, expected):
+            self.assertAlmostEqual(amount, value, places=2)
+    
+    def test_71_tax_engine_batch_create_and_preview(self):
+        """Test chargement groupé des taxes et cohérence avec l'aperçu"""
+        tax_types = self.env['potting.tax.engine']._load_tax_types()
+        formules = self.env['potting.formule'].create([{
+            'confirmation_vente_id': self.confirmation_vente.id,
+            'campaign_id': self.campaign.id,
+            'date_emission': date.today(),
+            'product_type': 'cocoa_mass',
+            'prix_kg': 1500,
+            'tonnage_brut': 10.0 * (i + 1),
+        } for i in range(5)])
+        
+        for formule in formules:
+            self.assertEqual(len(formule.taxe_ids), len(tax_types))
+        
+        previews = self.env['potting.tax.engine'].preview_taxes([{
+            'montant_brut': formule.montant_brut,
+            'tonnage': formule.tonnage,
+            'tonnage_kg': formule.tonnage_kg,
+        } for formule in formules], tax_types)
+        for formule, preview in zip(formules, previews):
+            self.assertAlmostEqual(sum(formule.taxe_ids.mapped('montant')), preview['total'], places=2)
+        
+        self.assertEqual(
+            self.env['potting.tax.engine'].recompute_formules(formules),
+            len(formules.taxe_ids)
+        )
+    
+    def test_80_payment_requests_batch_queries_per_record(self):
+        """Test validation groupée des demandes de paiement: écritures groupées,
+        au plus 3 × MESSAGE_POST_MAX_QUERIES requêtes par demande supplémentaire
+        (notifications de la formule et de son OT)"""
+        consignee = self.env['res.partner'].create({'name': 'Destinataire Paiement Test'})
+        
+        def create_batch(size):
+            requests = self.env['payment.request'].create([{
+                'subject': 'Paiement FO test %d-%d' % (size, i),
+                'auto_subject': False,
+                'urgency_level': 'normal',
+                'justification': 'Test',
+            } for i in range(size)])
+            formules = self.env['potting.formule'].create([{
+                'confirmation_vente_id': self.confirmation_vente.id,
+                'campaign_id': self.campaign.id,
+                'date_emission': date.today(),
+                'product_type': 'cocoa_mass',
+                'prix_kg': 1500,
+                'state': 'validated',
+                'payment_request_avant_vente_id': request.id,
+            } for request in requests])
+            self.env['potting.transit.order'].create([{
+                'formule_id': formule.id,
+                'campaign_id': self.campaign.id,
+                'consignee_id': consignee.id,
+                'product_type': 'cocoa_mass',
+                'tonnage': 10.0,
+            } for formule in formules])
+            return requests, formules
+        
+        def count_queries(requests):
+            self.env.flush_all()
+            self.env.invalidate_all()
+            start = self.env.cr.sql_log_count
+            requests._on_signature_complete_hook()
+            self.env.flush_all()
+            return self.env.cr.sql_log_count - start
+        
+        small_requests, _small_formules = create_batch(2)
+        large_requests, formules = create_batch(10)
+        self.assertEqual(large_requests.mapped('potting_formule_count'), [1] * 10)
+        # Seules les notifications (formule, OT : taxes payées et droits encaissés)
+        # dépendent de la taille du lot ; les écritures restent groupées
+        small_queries = count_queries(small_requests)
+        large_queries = count_queries(large_requests)
+        extra_records = len(large_requests) - len(small_requests)
+        self.assertLessEqual(large_queries - small_queries, extra_records * 3 * MESSAGE_POST_MAX_QUERIES)
+        
+        self.assertTrue(all(formules.mapped('avant_vente_paye')))
+        self.assertEqual(set(formules.mapped('state')), {'paid'})
+        transit_orders = formules.transit_order_id
+        self.assertEqual(len(transit_orders), 10)
+        self.assertTrue(all(transit_orders.mapped('taxes_paid')))
+        self.assertTrue(all(transit_orders.mapped('export_duty_collected')))
+        comment = self.env.ref('mail.mt_comment')
+        for formule in formules:
+            self.assertEqual(len(formule.message_ids.filtered(
+                lambda m: m.subtype_id == comment and m.subject == "Paiement producteurs validé")), 1)
+            ot_subjects = formule.transit_order_id.message_ids.filtered(
+                lambda m: m.subtype_id == comment).mapped('subject')
+            self.assertIn("Taxes payées", ot_subjects)
+            self.assertIn("Droits d'exportation encaissés", ot_subjects)
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+"""Tests unitaires pour l'assistant potting.import.contracts.wizard
+
+Ce module teste:
+- Lecture en flux du fichier et résolution des références
+- Erreurs ligne par ligne (doublons, client inconnu)
+- Nombre de requêtes indépendant du nombre de lignes
+- Création des contrats par paquets
+"""
+
+import base64
+import io
+from unittest import skipUnless
+
+from odoo.tests import TransactionCase, tagged
+
+from odoo.addons.potting_management.wizards.potting_import_contracts_wizard import OPENPYXL_AVAILABLE
+
+if OPENPYXL_AVAILABLE:
+    import openpyxl
+
+
+@skipUnless(OPENPYXL_AVAILABLE, "openpyxl n'est pas installé")
+@tagged('potting', 'potting_import', '-at_install', 'post_install')
+class TestPottingImportContracts(TransactionCase):
+    """Tests pour l'import de contrats depuis Excel"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Configuration des données de test"""
+        super().setUpClass()
+
+        cls.customer = cls.env['res.partner'].create({
+            'name': 'IMPORT TEST CHOCOLAT',
+            'is_company': True,
+        })
+        cls.certification = cls.env['potting.certification'].create({
+            'name': 'Import Test Certif',
+            'suffix': 'ITC',
+        })
+        cls.env['potting.customer.order'].create({
+            'customer_id': cls.customer.id,
+            'contract_number': 'IMP-EXISTING',
+            'product_type': 'cocoa_mass',
+            'contract_tonnage': 10.0,
+        })
+
+    def _wizard(self, rows):
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.append(['header'] * 12)
+        for row in rows:
+            sheet.append(row)
+        output = io.BytesIO()
+        workbook.save(output)
+        return self.env['potting.import.contracts.wizard'].create({
+            'file_data': base64.b64encode(output.getvalue()),
+            'file_name': 'contrats.xlsx',
+        })
+
+    def _row(self, number, customer='import test chocolat', certifications='Import Test Certif'):
+        return [number, customer, 'cocoa_mass', 50.0, 2500, 'EUR',
+                '2025-01-15', '', '2024-2025', certifications, 14.6, '']
+
+    def test_01_parse_resolves_references(self):
+        """Test résolution client / certification / devise sans recherche par ligne"""
+        wizard = self._wizard([self._row('IMP-001'), self._row('IMP-002', customer='CHOCOLAT')])
+        wizard.action_parse_file()
+
+        self.assertEqual(wizard.valid_lines, 2)
+        line = wizard.preview_line_ids.sorted('row_number')[0]
+        self.assertEqual(line.customer_id, self.customer)
+        self.assertEqual(line.certification_ids, self.certification)
+        self.assertEqual(line.currency_id.name, 'EUR')
+
+    def test_02_row_level_errors(self):
+        """Test erreurs ligne par ligne: existant, doublon, client inconnu"""
+        wizard = self._wizard([
+            self._row('IMP-EXISTING'),
+            self._row('IMP-DUP'),
+            self._row('IMP-DUP'),
+            self._row('IMP-UNKNOWN', customer='CLIENT INEXISTANT XYZ'),
+        ])
+        wizard.action_parse_file()
+
+        self.assertEqual(wizard.total_lines, 4)
+        self.assertEqual(wizard.valid_lines, 1)
+        errors = wizard.preview_line_ids.filtered(lambda l: not l.is_valid).mapped('error_message')
+        self.assertTrue(any('existe déjà' in e for e in errors))
+        self.assertTrue(any('en double' in e for e in errors))
+        self.assertTrue(any('non trouvé' in e for e in errors))
+
+    def test_03_parse_query_count_constant(self):
+        """Test nombre de requêtes de lecture indépendant du nombre de lignes"""
+        wizard = self.env['potting.import.contracts.wizard'].create({})
+
+        def count_queries(size):
+            rows = [(i + 2, tuple(self._row('IMP-Q%d-%04d' % (size, i)))) for i in range(size)]
+            start = self.env.cr.sql_log_count
+            lookups = wizard._build_lookups(rows)
+            for row_idx, row in rows:
+                wizard._parse_row(row, row_idx, lookups)
+            return self.env.cr.sql_log_count - start
+
+        self.assertEqual(count_queries(5), count_queries(500))
+
+    def test_04_import_creates_orders(self):
+        """Test création des contrats et rapport des lignes en échec"""
+        wizard = self._wizard([self._row('IMP-NEW-%03d' % i) for i in range(30)])
+        wizard.action_parse_file()
+        wizard.action_import()
+
+        orders = self.env['potting.customer.order'].search([('contract_number', 'like', 'IMP-NEW-%')])
+        self.assertEqual(len(orders), 30)
+        self.assertEqual(orders.certification_ids, self.certification)
+        self.assertEqual(wizard.state, 'done')
+        self.assertIn('30 contrat(s)', wizard.import_result)
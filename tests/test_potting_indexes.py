@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""Tests de non-régression des index des requêtes fréquentes
+
+Ce module teste:
+- La présence des index composites et partiels déclarés par les modèles
+- Les plans d'exécution (EXPLAIN) des domaines les plus utilisés : alertes
+  taxes et DUS, périodes de création des OT, lots d'une certification,
+  historique de production d'un lot
+
+Les parcours séquentiels sont désactivés (``enable_seqscan = off``) et
+chaque plan doit utiliser l'index attendu, désigné par son nom : un index
+supprimé ou devenu inutilisable fait échouer le test, quelle que soit la
+taille du jeu de données.
+"""
+
+from datetime import date, timedelta
+
+from odoo.tests import tagged
+from odoo.tools import SQL
+
+from odoo.addons.potting_management.tests.common import PottingTestCommon
+
+
+@tagged('potting', 'potting_indexes', '-at_install', 'post_install')
+class TestPottingIndexes(PottingTestCommon):
+    """Plans d'exécution des domaines fréquents"""
+
+    fixture_label = 'Index'
+    fixture_code = 'INDEX'
+    cv_vals = {'tonnage_autorise': 10000.0}
+
+    OT_COUNT = 40
+
+    @classmethod
+    def setUpClass(cls):
+        """Génération d'un jeu de données couvrant les états ciblés"""
+        super().setUpClass()
+        cls.certification = cls.env['potting.certification'].create({
+            'name': 'Certification Index Test',
+            'suffix': 'IXT',
+        })
+        cls.orders = cls._create_transit_orders([50.0] * cls.OT_COUNT)
+        cls.lots = cls.env['potting.lot'].create([{
+            'name': 'MIDX%04d' % index,
+            'transit_order_id': order.id,
+            'product_type': 'cocoa_mass',
+            'target_tonnage': 25.0,
+            'certification_id': cls.certification.id if index % 2 else False,
+        } for index, order in enumerate(cls.orders)])
+        cls.env['potting.production.line'].create([{
+            'lot_id': lot.id,
+            'units_produced': 100,
+        } for lot in cls.lots])
+
+        # Répartition des états ciblés par les alertes, sans passer par les workflows
+        states = ['formule_linked', 'sold', 'in_progress', 'done']
+        cls.env.flush_all()
+        for index, order in enumerate(cls.orders):
+            state = states[index % len(states)]
+            cls.env.cr.execute(
+                "UPDATE potting_transit_order SET state = %s, taxes_paid = %s, dus_paid = %s, date_sold = %s WHERE id = %s",
+                (state, state != 'formule_linked', state == 'done',
+                 date.today() - timedelta(days=index % 10) if state in ('sold', 'done') else None, order.id)
+            )
+        cls.env.invalidate_all()
+        cls.env.cr.execute(
+            "ANALYZE potting_transit_order, potting_lot, potting_production_line"
+        )
+
+    def setUp(self):
+        super().setUp()
+        self.env.cr.execute("SET LOCAL enable_seqscan = off")
+
+    def _explain(self, model, domain, order=None):
+        query = self.env[model]._search(domain, order=order)
+        self.env.cr.execute(SQL("EXPLAIN %s", query.select()))
+        return '\n'.join(row[0] for row in self.env.cr.fetchall())
+
+    def _assert_uses_index(self, model, domain, indexes, order=None):
+        """Vérifier que le plan passe par l'un des index nommés."""
+        if isinstance(indexes, str):
+            indexes = (indexes,)
+        plan = self._explain(model, domain, order)
+        self.assertNotIn('Seq Scan on %s' % self.env[model]._table, plan, plan)
+        self.assertTrue(any(index in plan for index in indexes), plan)
+        return plan
+
+    def test_01_declared_indexes_exist(self):
+        """Test index: les index composites et partiels sont créés"""
+        names = (
+            'potting_transit_order_taxes_pending_idx',
+            'potting_transit_order_dus_pending_idx',
+            'potting_transit_order_campaign_date_created_idx',
+            'potting_lot_certification_state_idx',
+            'potting_production_line_lot_date_idx',
+        )
+        self.env.cr.execute("SELECT indexname FROM pg_indexes WHERE indexname IN %s", [names])
+        self.assertEqual({row[0] for row in self.env.cr.fetchall()}, set(names))
+
+    def test_02_alert_taxes_pending(self):
+        """Test EXPLAIN: OT liés à une formule, taxes non payées"""
+        self._assert_uses_index('potting.transit.order', [
+            ('state', '=', 'formule_linked'), ('taxes_paid', '=', False),
+            ('write_date', '<', date.today() - timedelta(days=5)),
+        ], 'potting_transit_order_taxes_pending_idx')
+
+    def test_03_alert_dus_pending(self):
+        """Test EXPLAIN: OT vendus, DUS non payé depuis plus de 3 jours"""
+        self._assert_uses_index('potting.transit.order', [
+            ('state', '=', 'sold'), ('dus_paid', '=', False),
+            ('date_sold', '<', date.today() - timedelta(days=3)),
+        ], 'potting_transit_order_dus_pending_idx')
+
+    def test_04_date_created_ranges(self):
+        """Test EXPLAIN: période de création (API, rapports) avec et sans campagne"""
+        period = [
+            ('date_created', '>=', date.today() - timedelta(days=30)),
+            ('date_created', '<=', date.today()),
+        ]
+        self._assert_uses_index('potting.transit.order', period, 'potting_transit_order__date_created_index')
+        self._assert_uses_index(
+            'potting.transit.order', [('campaign_id', '=', self.campaign.id)] + period,
+            'potting_transit_order_campaign_date_created_idx',
+        )
+
+    def test_05_certification_potted_lots(self):
+        """Test EXPLAIN: lots empotés d'une certification"""
+        self._assert_uses_index('potting.lot', [
+            ('certification_id', '=', self.certification.id), ('state', '=', 'potted'),
+        ], 'potting_lot_certification_state_idx')
+
+    def test_06_production_history_of_lot(self):
+        """Test EXPLAIN: historique de production d'un lot et production du jour"""
+        # Un lot seul : l'index composite ou celui du champ lot_id conviennent
+        self._assert_uses_index('potting.production.line', [('lot_id', '=', self.lots[0].id)], (
+            'potting_production_line_lot_date_idx', 'potting_production_line__lot_id_index',
+        ))
+        self._assert_uses_index('potting.production.line', [
+            ('lot_id', 'in', self.lots[:5].ids), ('date', '>=', date.today() - timedelta(days=7)),
+        ], 'potting_production_line_lot_date_idx')
+        self._assert_uses_index(
+            'potting.production.line', [('date', '=', date.today())], 'potting_production_line__date_index'
+        )
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""Tests unitaires pour l'allocation automatique OT → Contrats
+
+Ce module teste:
+- Le solveur glouton (capacités, priorité de prix, campagne)
+- Le wizard d'allocation (aperçu puis création groupée)
+- Les contraintes de tonnage vérifiées en agrégé
+"""
+
+from datetime import date
+
+from odoo.tests import tagged
+from odoo.exceptions import ValidationError
+
+from odoo.addons.potting_management.tests.common import PottingTestCommon
+
+
+@tagged('potting', 'potting_allocation', '-at_install', 'post_install')
+class TestPottingOtAllocation(PottingTestCommon):
+    """Tests pour potting.ot.contract.allocation et son solveur"""
+
+    fixture_label = 'Allocation'
+    fixture_code = 'ALLOC'
+
+    @classmethod
+    def setUpClass(cls):
+        """Configuration des données de test"""
+        super().setUpClass()
+        cls.Allocation = cls.env['potting.ot.contract.allocation']
+        cls.contract_cheap = cls._create_contract(100.0, 1500000)
+        cls.contract_expensive = cls._create_contract(100.0, 2000000)
+
+    @classmethod
+    def _create_contract(cls, tonnage, price):
+        return cls.env['potting.customer.order'].create({
+            'customer_id': cls.customer.id,
+            'product_type': 'cocoa_mass',
+            'contract_tonnage': tonnage,
+            'unit_price': price,
+            'date_order': date.today(),
+            'state': 'confirmed',
+        })
+
+    def _row(self, row_id, remaining, price=0.0, product_type='cocoa_mass', campaign_id=1):
+        return {
+            'id': row_id,
+            'product_type': product_type,
+            'campaign_id': campaign_id,
+            'unit_price': price,
+            'date_order': date.today(),
+            'remaining': remaining,
+        }
+
+    def test_01_solver_respects_capacities(self):
+        """Test solveur: aucun contrat ni OT dépassé, OT couverts au maximum"""
+        ots = [self._row(1, 60.0), self._row(2, 50.0), self._row(3, 30.0)]
+        contracts = [self._row(10, 80.0), self._row(11, 40.0)]
+        solution = self.Allocation._solve(ots, contracts)
+
+        by_contract, by_ot = {}, {}
+        for ot_id, contract_id, tonnage in solution:
+            by_contract[contract_id] = by_contract.get(contract_id, 0.0) + tonnage
+            by_ot[ot_id] = by_ot.get(ot_id, 0.0) + tonnage
+        self.assertAlmostEqual(by_contract[10], 80.0)
+        self.assertAlmostEqual(by_contract[11], 40.0)
+        self.assertAlmostEqual(sum(by_ot.values()), 120.0)
+        for ot in ots:
+            self.assertLessEqual(by_ot.get(ot['id'], 0.0), ot['remaining'])
+
+    def test_02_solver_price_priority_and_campaign(self):
+        """Test solveur: priorité de prix, type de produit et campagne"""
+        ots = [self._row(1, 50.0)]
+        contracts = [
+            self._row(10, 100.0, price=1000),
+            self._row(11, 100.0, price=3000),
+            self._row(12, 100.0, price=5000, product_type='cocoa_butter'),
+        ]
+        self.assertEqual(self.Allocation._solve(ots, contracts, price_priority='high'), [(1, 11, 50.0)])
+        self.assertEqual(self.Allocation._solve(ots, contracts, price_priority='low'), [(1, 10, 50.0)])
+
+        contracts[0]['campaign_id'] = 2
+        self.assertEqual(
+            self.Allocation._solve(ots, contracts, price_priority='low', same_campaign=True),
+            [(1, 11, 50.0)]
+        )
+
+    def test_03_wizard_preview_and_apply(self):
+        """Test wizard: aperçu puis création de toutes les allocations"""
+        ots = self._create_transit_orders([60.0, 60.0, 50.0])
+        wizard = self.env['potting.ot.allocation.wizard'].create({
+            'transit_order_ids': [(6, 0, ots.ids)],
+            'customer_order_ids': [(6, 0, (self.contract_cheap | self.contract_expensive).ids)],
+            'price_priority': 'high',
+        })
+        wizard.action_compute()
+        self.assertEqual(wizard.state, 'preview')
+        self.assertAlmostEqual(wizard.total_tonnage, 170.0)
+        self.assertFalse(self.Allocation.search([('transit_order_id', 'in', ots.ids)]))
+
+        wizard.action_apply()
+        self.assertEqual(wizard.state, 'done')
+        allocations = self.Allocation.search([('transit_order_id', 'in', ots.ids)])
+        self.assertEqual(len(allocations), len(wizard.line_ids))
+        expensive = allocations.filtered(lambda a: a.customer_order_id == self.contract_expensive)
+        self.assertAlmostEqual(sum(expensive.mapped('tonnage_alloue')), 100.0)
+        self.assertTrue(all(ot.allocation_complete for ot in ots))
+
+    def test_04_batch_create_checks_aggregate(self):
+        """Test contraintes: dépassement détecté sur l'ensemble du lot"""
+        ots = self._create_transit_orders([60.0, 60.0])
+        with self.assertRaises(ValidationError):
+            self.Allocation.create_allocations([{
+                'transit_order_id': ot.id,
+                'customer_order_id': self.contract_cheap.id,
+                'tonnage_alloue': 60.0,
+            } for ot in ots])
+
+    def test_05_contract_campaign_from_transit_orders(self):
+        """Test solveur: la campagne du contrat est déduite de ses OT"""
+        ots = self._create_transit_orders([40.0, 40.0])
+        ots[0].customer_order_id = self.contract_cheap
+        campaigns = self.Allocation._get_contract_campaigns(self.contract_cheap | self.contract_expensive)
+        self.assertEqual(campaigns.get(self.contract_cheap.id), self.campaign.id)
+        self.assertFalse(campaigns.get(self.contract_expensive.id))
+
+        vals_list = self.Allocation.compute_allocations(
+            ots[1], self.contract_cheap | self.contract_expensive, same_campaign=True
+        )
+        self.assertEqual({vals['customer_order_id'] for vals in vals_list}, {self.contract_cheap.id})
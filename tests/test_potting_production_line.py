@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+"""Tests unitaires pour le modèle potting.production.line
+
+Ce module teste:
+- Ingestion groupée de productions (balance / terminal)
+- Idempotence des renvois après coupure réseau
+- Contrôle de capacité agrégé par lot
+"""
+
+from datetime import date
+from odoo.tests import tagged
+from odoo.exceptions import UserError
+
+from odoo.addons.potting_management.tests.common import PottingTestCommon
+
+
+@tagged('potting', 'potting_production', '-at_install', 'post_install')
+class TestPottingProductionIngest(PottingTestCommon):
+    """Tests pour l'ingestion groupée des lignes de production"""
+
+    fixture_label = 'Production'
+    fixture_code = 'PROD'
+    cv_vals = {'tonnage_autorise': 500.0}
+
+    @classmethod
+    def setUpClass(cls):
+        """Configuration des données de test"""
+        super().setUpClass()
+
+        cls.customer_order = cls.env['potting.customer.order'].create({
+            'customer_id': cls.customer.id,
+            'product_type': 'cocoa_mass',
+            'contract_tonnage': 200.0,
+            'unit_price': 1800000,
+            'date_order': date.today(),
+            'state': 'confirmed',
+        })
+
+        cls.ot = cls._create_transit_orders([20.0], customer_order_id=cls.customer_order.id)
+
+        Lot = cls.env['potting.lot']
+        cls.lot_a = Lot.create({
+            'name': 'MTEST001',
+            'transit_order_id': cls.ot.id,
+            'product_type': 'cocoa_mass',
+            'target_tonnage': 10.0,
+        })
+        cls.lot_b = Lot.create({
+            'name': 'MTEST002',
+            'transit_order_id': cls.ot.id,
+            'product_type': 'cocoa_mass',
+            'target_tonnage': 10.0,
+        })
+        cls.ot.state = 'lots_generated'
+
+    def _row(self, key, lot_name='MTEST001', units=40, **extra):
+        row = {
+            'idempotency_key': key,
+            'lot_name': lot_name,
+            'units_produced': units,
+            'date': date.today().isoformat(),
+            'shift': 'morning',
+        }
+        row.update(extra)
+        return row
+
+    def test_01_batch_creates_lines(self):
+        """Test création groupée sur plusieurs lots"""
+        result = self.env['potting.production.line'].ingest_production_batch([
+            self._row('K-001'),
+            self._row('K-002', units=20, batch_number='B-01'),
+            self._row('K-003', lot_name='MTEST002'),
+        ])
+
+        self.assertEqual(len(result['created']), 3)
+        self.assertFalse(result['errors'])
+        self.assertAlmostEqual(self.lot_a.current_tonnage, 60 * 0.025, places=3)
+        self.assertEqual(self.lot_a.state, 'in_production')
+        self.assertEqual(self.ot.state, 'in_progress')
+
+    def test_02_retry_is_idempotent(self):
+        """Test renvoi du même lot après coupure réseau"""
+        Line = self.env['potting.production.line']
+        rows = [self._row('K-RETRY-1'), self._row('K-RETRY-2')]
+        first = Line.ingest_production_batch(rows)
+        second = Line.ingest_production_batch(rows)
+
+        self.assertEqual(len(first['created']), 2)
+        self.assertFalse(second['created'])
+        self.assertEqual(
+            sorted(d['id'] for d in second['duplicates']),
+            sorted(c['id'] for c in first['created']),
+        )
+        self.assertEqual(Line.search_count([('idempotency_key', 'like', 'K-RETRY-%')]), 2)
+
+    def test_03_duplicate_key_in_same_batch(self):
+        """Test clé répétée dans la même requête"""
+        result = self.env['potting.production.line'].ingest_production_batch([
+            self._row('K-DUP'),
+            self._row('K-DUP'),
+        ])
+        self.assertEqual(len(result['created']), 1)
+        self.assertEqual(len(result['duplicates']), 1)
+
+    def test_04_capacity_checked_in_aggregate(self):
+        """Test dépassement de capacité sur la somme des lignes d'un lot"""
+        # 10 T cible, tolérance 11 T : 2 x 240 cartons = 12 T
+        result = self.env['potting.production.line'].ingest_production_batch([
+            self._row('K-CAP-1', units=240),
+            self._row('K-CAP-2', units=240),
+            self._row('K-CAP-3', lot_name='MTEST002', units=40),
+        ])
+
+        self.assertEqual(len(result['created']), 1)
+        self.assertEqual(
+            sorted(e['key'] for e in result['errors']),
+            ['K-CAP-1', 'K-CAP-2'],
+        )
+        self.assertEqual(self.lot_a.current_tonnage, 0)
+
+    def test_05_invalid_rows_reported(self):
+        """Test lignes invalides remontées sans bloquer le lot"""
+        result = self.env['potting.production.line'].ingest_production_batch([
+            self._row('K-ERR-1', lot_name='INCONNU'),
+            self._row('K-ERR-2', units=0),
+            {'lot_name': 'MTEST001', 'units_produced': 10},
+            self._row('K-OK'),
+        ])
+
+        self.assertEqual(len(result['created']), 1)
+        self.assertEqual(len(result['errors']), 3)
+
+    def test_06_too_many_rows(self):
+        """Test limite de taille du lot d'ingestion"""
+        Line = self.env['potting.production.line']
+        rows = [self._row('K-MAX-%d' % i) for i in range(Line.INGEST_MAX_ROWS + 1)]
+        with self.assertRaises(UserError):
+            Line.ingest_production_batch(rows)
+
+    def test_07_operator_and_max_production_per_row(self):
+        """Test opérateur inconnu et production maximale signalés par ligne"""
+        self.env['ir.config_parameter'].sudo().set_param('potting_management.max_daily_production', '5.0')
+        result = self.env['potting.production.line'].ingest_production_batch([
+            self._row('K-OP-1', operator_id=999999999),
+            self._row('K-OP-2', operator_login='login.inconnu'),
+            self._row('K-OP-3', operator_id='abc'),
+            self._row('K-MAX-1', units=240),
+            self._row('K-OK', operator_id=self.env.user.id),
+        ])
+
+        self.assertEqual([c['key'] for c in result['created']], ['K-OK'])
+        self.assertEqual(
+            sorted(e['key'] for e in result['errors']),
+            ['K-MAX-1', 'K-OP-1', 'K-OP-2', 'K-OP-3'],
+        )
+        line = self.env['potting.production.line'].browse(result['created'][0]['id'])
+        self.assertEqual(line.operator_id, self.env.user)
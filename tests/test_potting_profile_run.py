@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""Tests unitaires pour le profilage à la demande (potting.profile.run)
+
+Ce module teste:
+- L'activation par paramètres système (utilisateur, cible)
+- L'enveloppe des méthodes action_* des wizards
+- Le contenu d'un profil : fonctions, requêtes, fichiers joints
+- La conservation du profil quand l'appel échoue
+"""
+
+import base64
+import marshal
+
+from odoo.exceptions import UserError
+from odoo.tests import TransactionCase, tagged
+
+
+@tagged('potting', 'potting_profile_run', '-at_install', 'post_install')
+class TestPottingProfileRun(TransactionCase):
+    """Tests pour potting.profile.run"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # Les profils sont enregistrés dans une transaction séparée
+        cls.registry.enter_test_mode(cls.cr)
+        cls.addClassCleanup(cls.registry.leave_test_mode)
+        cls.ICP = cls.env['ir.config_parameter'].sudo()
+        cls.Run = cls.env['potting.profile.run']
+
+    def _runs(self, target):
+        return self.Run.search([('name', '=', target)])
+
+    def test_01_wizard_actions_wrapped(self):
+        """Test activation: les actions des wizards potting sont enveloppées"""
+        ModelClass = self.registry['potting.batch.invoice.wizard']
+        self.assertTrue(getattr(ModelClass.action_create_invoices, '_potting_profiled', False))
+        self.assertFalse(getattr(ModelClass.default_get, '_potting_profiled', False))
+
+    def test_02_disabled_by_default(self):
+        """Test activation: sans paramètre, aucun profil n'est enregistré"""
+        target = 'potting.test.disabled'
+        result = self.Run._profile_call(target, 'wizard', self.env.user, lambda: 42, (), {})
+        self.assertEqual(result, 42)
+        self.assertFalse(self._runs(target))
+
+    def test_03_profile_content(self):
+        """Test profil: fonctions, requêtes groupées et fichiers joints"""
+        target = '/api/v1/potting/test'
+        self.ICP.set_param('potting_management.profiling_targets', '/api/v1/potting/*')
+
+        def slow_endpoint():
+            for _i in range(5):
+                self.env['res.partner'].search([('name', 'ilike', 'profil')]).mapped('name')
+            return 'ok'
+
+        self.assertEqual(self.Run._profile_call(target, 'api', self.env.user, slow_endpoint, (), {}), 'ok')
+        run = self._runs(target)
+        self.assertEqual(len(run), 1)
+        self.assertGreaterEqual(run.query_count, 5)
+        self.assertTrue(run.function_line_ids)
+        self.assertTrue(run.query_line_ids)
+        self.assertEqual(run.query_line_ids[0].sequence, 0)
+        self.assertGreaterEqual(max(run.query_line_ids.mapped('calls')), 5)
+        self.assertIsInstance(marshal.loads(base64.b64decode(run.profile_file)), dict)
+        self.assertIn('requêtes', base64.b64decode(run.sql_log_file).decode())
+
+    def test_04_user_profiling_keeps_failed_calls(self):
+        """Test profil: utilisateur désigné, l'erreur est enregistrée avec le profil"""
+        self.ICP.set_param('potting_management.profiling_users', 'nobody,%s' % self.env.user.login)
+        wizard = self.env['potting.batch.invoice.wizard'].create({})
+        # Pas de assertRaises : son savepoint annulerait aussi le profil enregistré
+        try:
+            wizard.action_create_invoices()
+        except UserError:
+            pass
+        else:
+            self.fail("L'action aurait dû échouer sans OT ni BL")
+
+        run = self._runs('potting.batch.invoice.wizard.action_create_invoices')
+        self.assertEqual(len(run), 1)
+        self.assertEqual(run.user_id, self.env.user)
+        self.assertEqual(run.kind, 'wizard')
+        self.assertTrue(run.error.startswith('UserError'))
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""Tests unitaires pour l'export XLSX du rapport de production
+
+Ce module teste:
+- Le classeur produit : en-tête, une ligne par lot, OT sans lot
+- La lecture par paquets du curseur serveur (FETCH)
+- L'export depuis le wizard du rapport quotidien
+"""
+
+import io
+from datetime import date
+from unittest import skipUnless
+from unittest.mock import patch
+
+from odoo.tests import tagged
+
+from odoo.addons.potting_management.models.potting_report_xlsx import OPENPYXL_AVAILABLE, XLSX_COLUMNS
+from odoo.addons.potting_management.tests.common import PottingTestCommon
+
+if OPENPYXL_AVAILABLE:
+    import openpyxl
+
+
+@tagged('potting', 'potting_report_xlsx', '-at_install', 'post_install')
+@skipUnless(OPENPYXL_AVAILABLE, "openpyxl n'est pas installé")
+class TestPottingReportXlsx(PottingTestCommon):
+    """Tests pour potting.report.xlsx.export"""
+
+    fixture_label = 'Export XLSX'
+    fixture_code = 'XLSX'
+
+    @classmethod
+    def setUpClass(cls):
+        """Configuration des données de test"""
+        super().setUpClass()
+        cls.Export = cls.env['potting.report.xlsx.export']
+        cls.contract = cls.env['potting.customer.order'].create({
+            'customer_id': cls.customer.id,
+            'product_type': 'cocoa_mass',
+            'contract_tonnage': 100.0,
+            'unit_price': 1500000,
+            'date_order': date.today(),
+            'state': 'confirmed',
+        })
+        cls.orders = cls._create_transit_orders([20.0] * 3, customer_order_id=cls.contract.id)
+        cls.lots = cls.env['potting.lot'].create([{
+            'name': 'MXLS%d%02d' % (index, lot_index),
+            'transit_order_id': order.id,
+            'product_type': 'cocoa_mass',
+            'target_tonnage': 10.0,
+        } for index, order in enumerate(cls.orders) for lot_index in range(2)])
+        # OT sans lot : une seule ligne, colonnes lot vides
+        cls.order_without_lot = cls._create_transit_orders([10.0], customer_order_id=cls.contract.id)
+        cls.all_orders = cls.orders | cls.order_without_lot
+
+    def _export(self, transit_orders, **kwargs):
+        """Exporter dans un BytesIO puis relire le classeur."""
+        output = io.BytesIO()
+        count = self.Export.export_transit_orders(transit_orders, output, **kwargs)
+        output.seek(0)
+        workbook = openpyxl.load_workbook(output)
+        return count, workbook.active, list(workbook.active.iter_rows(values_only=True))
+
+    def test_01_header_and_one_row_per_lot(self):
+        """Test classeur: en-tête puis une ligne par lot, OT sans lot une fois"""
+        count, _sheet, rows = self._export(self.all_orders)
+
+        self.assertEqual(list(rows[0]), [label for label, _width in XLSX_COLUMNS])
+        self.assertEqual(count, len(self.lots) + 1)
+        self.assertEqual(len(rows) - 1, count)
+
+        lots_by_name = {lot.name: lot for lot in self.lots}
+        lot_rows = [row for row in rows[1:] if row[6]]
+        self.assertEqual(sorted(row[6] for row in lot_rows), sorted(lots_by_name))
+        for row in lot_rows:
+            lot = lots_by_name[row[6]]
+            self.assertEqual(row[0], lot.transit_order_id.name)
+            self.assertEqual(row[1], self.customer.name)
+            self.assertEqual(row[2], self.customer.name)
+            self.assertAlmostEqual(row[4], lot.transit_order_id.tonnage * 1000)
+
+        empty_rows = [row for row in rows[1:] if row[0] == self.order_without_lot.name]
+        self.assertEqual(len(empty_rows), 1)
+        self.assertIsNone(empty_rows[0][6])
+
+    def test_02_rows_fetched_in_chunks(self):
+        """Test lecture par paquets: mêmes lignes quelle que soit la taille du FETCH"""
+        cr = self.env.cr
+        with patch.object(cr, 'execute', wraps=cr.execute) as execute:
+            chunked = list(self.Export._iter_rows(self.all_orders.ids, fetch_size=2))
+        fetches = [call for call in execute.call_args_list if str(call.args[0]).startswith('FETCH')]
+        # 7 lignes par paquets de 2 : 4 paquets puis un FETCH vide
+        self.assertEqual(len(chunked), 7)
+        self.assertEqual(len(fetches), 5)
+        self.assertEqual(chunked, list(self.Export._iter_rows(self.all_orders.ids)))
+
+        count, _sheet, rows = self._export(self.all_orders, fetch_size=2)
+        self.assertEqual(count, 7)
+        self.assertEqual(rows, self._export(self.all_orders)[2])
+
+    def test_03_sheet_title_sanitised(self):
+        """Test titre de feuille: caractères interdits remplacés, 31 caractères au plus"""
+        _count, sheet, _rows = self._export(self.orders, title='Campagne 2024/2025 [export] : production')
+        self.assertEqual(sheet.title, 'Campagne 2024-2025 -export- - p')
+        self.assertEqual(len(sheet.title), 31)
+
+    def test_04_export_from_daily_report_wizard(self):
+        """Test wizard: export des OT sélectionnés et nom du fichier"""
+        recipient = self.env['res.partner'].create({
+            'name': 'Directeur Export XLSX Test',
+            'email': 'dg.xlsx@example.com',
+        })
+        wizard = self.env['potting.daily.report.wizard'].create({
+            'recipient_id': recipient.id,
+            'campaign_id': self.campaign.id,
+        })
+        wizard.transit_order_ids = self.orders
+
+        output = io.BytesIO()
+        self.assertEqual(wizard.export_xlsx(output), len(self.lots))
+        output.seek(0)
+        self.assertEqual(openpyxl.load_workbook(output).active.title, self.campaign.name)
+        self.assertEqual(wizard.get_xlsx_filename(), 'Rapport_Campagne_Campagne_Export_XLSX_Test.xlsx')
@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""Tests unitaires pour la révision des prix de campagne
+
+Ce module teste:
+- Le calcul de l'aperçu des écarts par lots (aucune écriture)
+- L'application groupée aux formules, lignes de taxe et OT
+- Les messages d'audit et l'avancement
+"""
+
+from datetime import date
+from unittest.mock import patch
+
+from odoo.tests import tagged
+from odoo.exceptions import UserError
+
+from odoo.addons.potting_management.models import potting_repricing_job
+from odoo.addons.potting_management.tests.common import PottingTestCommon
+
+
+@tagged('potting', 'potting_repricing', '-at_install', 'post_install')
+class TestPottingRepricing(PottingTestCommon):
+    """Tests pour potting.repricing.job"""
+
+    fixture_label = 'Révision'
+    fixture_code = 'REPRICING'
+
+    @classmethod
+    def setUpClass(cls):
+        """Configuration des données de test"""
+        super().setUpClass()
+        cls.tax_type = cls.env['potting.taxe.type'].create({
+            'name': 'Redevance Révision Test',
+            'code': 'REV_TEST',
+            'categorie': 'redevance',
+            'taux_pourcentage': 1.0,
+            'is_preleve_default': True,
+        })
+        cls.formules = cls.env['potting.formule']
+        for index in range(5):
+            cls.formules |= cls._create_formules(
+                state='draft', prix_tonnage=1500000, tonnage=10.0 * (index + 1),
+            )
+
+    def _create_job(self, **vals):
+        return self.env['potting.repricing.job'].create(dict({'campaign_id': self.campaign.id}, **vals))
+
+    def _run(self, job):
+        """Exécuter tous les lots de la révision (comme le cron, sans attendre)."""
+        while job._process_chunk():
+            pass
+
+    def test_01_preview_then_apply_official_price_and_rate(self):
+        """Test révision: aperçu sans écriture, puis application groupée"""
+        job = self._create_job(
+            apply_official_price=True,
+            new_official_price=1800000,
+            rate_change_ids=[(0, 0, {
+                'taxe_type_id': self.tax_type.id,
+                'new_taux_pourcentage': 2.0,
+            })],
+        )
+        old_nets = self.formules.mapped('montant_net')
+
+        with patch.object(potting_repricing_job, 'CHUNK_SIZE', 2):
+            job.action_compute()
+            self.assertEqual(job.state, 'computing')
+            self._run(job)
+        self.assertEqual(job.state, 'preview')
+        self.assertEqual(job.total_count, 5)
+        self.assertEqual(job.processed_count, 5)
+        self.assertEqual(job.formule_line_count, 5)
+        self.assertAlmostEqual(self.tax_type.taux_pourcentage, 1.0)
+        self.assertEqual(self.formules.mapped('montant_net'), old_nets)
+
+        with patch.object(potting_repricing_job, 'CHUNK_SIZE', 2):
+            job.action_apply()
+            self._run(job)
+        self.assertEqual(job.state, 'done')
+        self.assertAlmostEqual(job.progress, 100.0)
+        self.assertAlmostEqual(self.tax_type.taux_pourcentage, 2.0)
+        self.assertEqual(
+            self.env['ir.config_parameter'].sudo().get_param('potting_management.official_cocoa_price'),
+            '1800000.0'
+        )
+        for line in job.line_ids:
+            formule = line.formule_id
+            self.assertAlmostEqual(formule.prix_tonnage, 1800000)
+            self.assertAlmostEqual(formule.montant_brut, line.new_gross, places=2)
+            self.assertAlmostEqual(formule.total_taxes_prelevees, line.new_deductions, places=2)
+            self.assertAlmostEqual(formule.montant_net, line.new_net, places=2)
+            tax_line = formule.taxe_ids.filtered(lambda t: t.taxe_type_id == self.tax_type)
+            self.assertAlmostEqual(tax_line.montant, formule.montant_brut * 0.02, places=2)
+            audit = formule.message_ids.filtered(lambda m: job.name in (m.body or ''))
+            self.assertEqual(len(audit), 1)
+
+    def test_02_export_duty_rate_reprices_transit_orders(self):
+        """Test révision: nouveau taux de droits appliqué aux contrats et OT"""
+        contract = self.env['potting.customer.order'].create({
+            'customer_id': self.customer.id,
+            'product_type': 'cocoa_mass',
+            'contract_tonnage': 100.0,
+            'unit_price': 2000,
+            'date_order': date.today(),
+            'state': 'confirmed',
+        })
+        ot = self.env['potting.transit.order'].create({
+            'formule_id': self.formules[0].id,
+            'customer_order_id': contract.id,
+            'campaign_id': self.campaign.id,
+            'consignee_id': self.customer.id,
+            'product_type': 'cocoa_mass',
+            'tonnage': 10.0,
+        })
+        job = self._create_job(apply_export_duty_rate=True, new_export_duty_rate=20.0)
+        job.action_compute()
+        self._run(job)
+        self.assertEqual(job.ot_line_count, 1)
+        self.assertEqual(job.formule_line_count, 0)
+        line = job.line_ids
+        self.assertAlmostEqual(line.new_deductions, ot.total_amount * 0.2, places=2)
+
+        job.action_apply()
+        self._run(job)
+        self.assertAlmostEqual(contract.export_duty_rate, 20.0)
+        self.assertAlmostEqual(ot.export_duty_amount, line.new_deductions, places=2)
+        self.assertAlmostEqual(ot.net_amount, line.new_net, places=2)
+
+    def test_03_requires_a_change(self):
+        """Test révision: au moins un changement est requis"""
+        job = self._create_job()
+        with self.assertRaises(UserError):
+            job.action_compute()
+        with self.assertRaises(UserError):
+            job.action_apply()
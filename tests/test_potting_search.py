@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""Tests unitaires pour la recherche rapide par trigrammes
+
+Ce module teste:
+- La création des index GIN pg_trgm
+- L'autocomplétion triée par pertinence (lots, OT, BL)
+- Les noms affichés stockés des navires et compagnies maritimes
+"""
+
+import logging
+import time
+from odoo.tests import tagged
+
+from odoo.addons.potting_management.tests.common import PottingTestCommon
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged('potting', 'potting_search', '-at_install', 'post_install')
+class TestPottingSearch(PottingTestCommon):
+    """Tests pour potting.search.mixin"""
+
+    fixture_label = 'Recherche'
+    fixture_code = 'SEARCH'
+
+    @classmethod
+    def setUpClass(cls):
+        """Configuration des données de test"""
+        super().setUpClass()
+        cls.ot = cls._create_transit_orders([500.0], booking_number='BKSEARCH77')
+        # Les lots M9X0045xxx contiennent tous « M9X0045 », un seul lui est identique
+        cls.lots = cls.env['potting.lot'].create([{
+            'name': name,
+            'transit_order_id': cls.ot.id,
+            'product_type': 'cocoa_mass',
+            'target_tonnage': 25.0,
+        } for name in ['M9X0045%03d' % i for i in range(50)] + ['M9X0045']])
+
+    def _require_trigram(self):
+        if not self.env.registry.has_trigram:
+            self.skipTest("Extension pg_trgm indisponible")
+
+    def test_01_trigram_indexes_created(self):
+        """Test index: un index GIN par colonne déclarée"""
+        self._require_trigram()
+        self.env.cr.execute(
+            "SELECT indexname FROM pg_indexes WHERE indexname IN %s",
+            [('potting_lot_name_trgm_idx', 'potting_transit_order_booking_number_trgm_idx',
+              'potting_delivery_note_bl_number_trgm_idx', 'potting_container_name_trgm_idx')]
+        )
+        self.assertEqual(len(self.env.cr.fetchall()), 4)
+
+    def test_02_lot_autocomplete_by_relevance(self):
+        """Test autocomplétion: la référence exacte sort en premier"""
+        self._require_trigram()
+        started = time.time()
+        results = self.env['potting.lot'].name_search('M9X0045', limit=8)
+        _logger.info("Autocomplétion lots: %d résultats en %.1f ms", len(results), (time.time() - started) * 1000)
+
+        self.assertEqual(len(results), 8)
+        self.assertEqual(results[0][1], 'M9X0045')
+        self.assertTrue(all('M9X0045' in name for _id, name in results))
+
+    def test_03_transit_order_by_booking_number(self):
+        """Test autocomplétion: un OT se retrouve par son numéro de booking partiel"""
+        results = self.env['potting.transit.order'].name_search('SEARCH7')
+        self.assertIn(self.ot.id, [record_id for record_id, _name in results])
+
+    def test_04_short_terms_use_standard_search(self):
+        """Test autocomplétion: moins de 3 caractères, recherche standard"""
+        results = self.env['potting.lot'].name_search('M9', limit=5)
+        self.assertEqual(len(results), 5)
+
+    def test_05_stored_display_names(self):
+        """Test noms affichés: « [code] nom » stocké pour navires et compagnies"""
+        company = self.env['potting.shipping.company'].create({'name': 'Compagnie Recherche', 'code': 'CRT'})
+        vessel = self.env['potting.vessel'].create({
+            'name': 'NAVIRE RECHERCHE',
+            'code': 'NVR',
+            'shipping_company_id': company.id,
+        })
+        self.assertEqual(company.display_name, '[CRT] Compagnie Recherche')
+        self.assertEqual(vessel.complete_name, '[NVR] NAVIRE RECHERCHE')
+        self.assertEqual(self.env['potting.vessel'].name_search('NVR')[0][0], vessel.id)
+
+        vessel.code = 'NVX'
+        self.assertEqual(vessel.display_name, '[NVX] NAVIRE RECHERCHE')
+
+    def test_06_short_codes_use_standard_search(self):
+        """Test autocomplétion: un code court retrouve la compagnie et le navire"""
+        company = self.env['potting.shipping.company'].create({'name': 'Compagnie Code Court', 'code': 'Q7'})
+        vessel = self.env['potting.vessel'].create({
+            'name': 'NAVIRE CODE COURT',
+            'code': 'Z9',
+            'shipping_company_id': company.id,
+        })
+        self.assertIn(company.id, [record_id for record_id, _name in
+                                   self.env['potting.shipping.company'].name_search('Q7')])
+        self.assertIn(vessel.id, [record_id for record_id, _name in
+                                  self.env['potting.vessel'].name_search('Z9')])
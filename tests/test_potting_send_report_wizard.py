@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""Tests unitaires pour l'envoi des rapports par email
+
+Ce module teste:
+- Le mode récapitulatif : un seul email pour tous les OT
+- Le mode un email par OT : rendu par lots, emails en file d'attente,
+  déclenchement du cron d'envoi et avancement visible
+"""
+
+from unittest.mock import patch
+
+from odoo.tests import tagged
+
+from odoo.addons.potting_management.tests.common import PottingTestCommon
+from odoo.addons.potting_management.wizards.potting_send_report_wizard import REPORT_RENDER_BATCH_SIZE
+
+
+@tagged('potting', 'potting_send_report', '-at_install', 'post_install')
+class TestPottingSendReportWizard(PottingTestCommon):
+    """Tests pour potting.send.report.wizard"""
+
+    fixture_label = 'Envoi Rapport'
+    fixture_code = 'SEND'
+
+    OT_COUNT = REPORT_RENDER_BATCH_SIZE + 10
+
+    @classmethod
+    def setUpClass(cls):
+        """Configuration des données de test"""
+        super().setUpClass()
+        cls.orders = cls._create_transit_orders([10.0] * cls.OT_COUNT)
+        cls.recipient = cls.env['res.partner'].create({
+            'name': 'Directeur Rapport Test',
+            'email': 'dg.rapport@example.com',
+        })
+
+    def _create_wizard(self, send_mode):
+        return self.env['potting.send.report.wizard'].create({
+            'report_type': 'ot',
+            'send_mode': send_mode,
+            'transit_order_ids': [(6, 0, self.orders.ids)],
+            'recipient_id': self.recipient.id,
+            'include_pdf': False,
+        })
+
+    def _ot_mails(self):
+        return self.env['mail.mail'].search([
+            ('model', '=', 'potting.transit.order'), ('res_id', 'in', self.orders.ids),
+        ])
+
+    def test_01_digest_sends_one_email(self):
+        """Test récapitulatif: un seul email pour tous les OT"""
+        wizard = self._create_wizard('digest')
+        before = self.env['mail.mail'].search([('email_to', '=', self.recipient.email)])
+
+        result = wizard.action_send_report()
+
+        mails = self.env['mail.mail'].search([('email_to', '=', self.recipient.email)]) - before
+        self.assertEqual(len(mails), 1)
+        self.assertFalse(self._ot_mails())
+        self.assertEqual(result['params']['type'], 'success')
+
+    def test_02_per_record_queued_in_batches(self):
+        """Test un email par OT: rendu par lots, emails en file et cron déclenché"""
+        wizard = self._create_wizard('per_record')
+        cron = self.env.ref('mail.ir_cron_mail_scheduler_action')
+        Trigger = self.env['ir.cron.trigger'].sudo()
+        triggers_before = Trigger.search_count([('cron_id', '=', cron.id)])
+        MailTemplate = type(self.env['mail.template'])
+        generate_template = MailTemplate._generate_template
+
+        with patch.object(MailTemplate, '_generate_template', autospec=True,
+                          side_effect=generate_template) as render:
+            result = wizard.action_send_report()
+
+        self.assertEqual([len(call.args[1]) for call in render.call_args_list],
+                         [REPORT_RENDER_BATCH_SIZE, self.OT_COUNT - REPORT_RENDER_BATCH_SIZE])
+        mails = self._ot_mails()
+        self.assertEqual(len(mails), self.OT_COUNT)
+        self.assertEqual(set(mails.mapped('state')), {'outgoing'})
+        self.assertEqual(set(mails.mapped('res_id')), set(self.orders.ids))
+        self.assertEqual(Trigger.search_count([('cron_id', '=', cron.id)]), triggers_before + 1)
+
+        # Avancement : compteurs du wizard et note dans le chatter des OT
+        self.assertEqual(wizard.queued_count, self.OT_COUNT)
+        self.assertEqual(wizard.failed_count, 0)
+        self.assertEqual(result['params']['type'], 'success')
+        for order in self.orders[:3]:
+            self.assertIn(self.recipient.email, order.message_ids[:1].body)
+
+    def test_03_per_record_failed_batch_counted(self):
+        """Test un email par OT: un lot en échec est annulé et compté"""
+        wizard = self._create_wizard('per_record')
+        MailTemplate = type(self.env['mail.template'])
+        generate_template = MailTemplate._generate_template
+        calls = []
+
+        def fail_first_batch(template, res_ids, render_fields, **kwargs):
+            calls.append(res_ids)
+            if len(calls) == 1:
+                raise ValueError("Rendu impossible")
+            return generate_template(template, res_ids, render_fields, **kwargs)
+
+        with patch.object(MailTemplate, '_generate_template', autospec=True, side_effect=fail_first_batch):
+            result = wizard.action_send_report()
+
+        self.assertEqual(len(self._ot_mails()), self.OT_COUNT - REPORT_RENDER_BATCH_SIZE)
+        self.assertEqual(wizard.queued_count, self.OT_COUNT - REPORT_RENDER_BATCH_SIZE)
+        self.assertEqual(wizard.failed_count, REPORT_RENDER_BATCH_SIZE)
+        self.assertEqual(result['params']['type'], 'warning')
@@ -12,6 +12,9 @@ from datetime import date, timedelta
 from odoo.tests import TransactionCase, tagged
 from odoo.exceptions import ValidationError, UserError
 
+# Requêtes pour lier une formule à son OT (écriture, suivi, alertes)
+LINK_MAX_QUERIES_PER_OT = 10
+
 
 @tagged('potting', 'potting_transit_order', '-at_install', 'post_install')
 class TestPottingTransitOrder(TransactionCase):
@@ -68,7 +71,6 @@ class TestPottingTransitOrder(TransactionCase):
         
         # Commande client de test
         cls.customer_order = cls.env['potting.customer.order'].create({
-            'confirmation_vente_id': cls.cv.id,
             'customer_id': cls.customer.id,
             'product_type': 'cocoa_mass',
             'contract_tonnage': 200.0,
@@ -76,12 +78,13 @@ class TestPottingTransitOrder(TransactionCase):
             'date_order': date.today(),
             'state': 'confirmed',
         })
+        cls.cv.customer_order_ids = [(4, cls.customer_order.id)]
         
         # Formule de test
         cls.formule = cls.env['potting.formule'].create({
             'confirmation_vente_id': cls.cv.id,
             'campaign_id': cls.campaign.id,
-            'date_creation': date.today(),
+            'date_emission': date.today(),
             'product_type': 'cocoa_mass',
             'prix_kg': 1500,
             'state': 'validated',
@@ -490,3 +493,104 @@ class TestPottingTransitOrder(TransactionCase):
         })
         
         self.assertTrue(ot.export_allowed)
+    
+    # =========================================================================
+    # TESTS CRÉATION GROUPÉE
+    # =========================================================================
+    
+    def _create_formules(self, count):
+        return self.env['potting.formule'].create([{
+            'confirmation_vente_id': self.cv.id,
+            'campaign_id': self.campaign.id,
+            'date_emission': date.today(),
+            'product_type': 'cocoa_mass',
+            'prix_kg': 1500,
+            'state': 'validated',
+        } for _i in range(count)])
+    
+    def _ot_vals(self, formules, tonnage=1.0):
+        return [{
+            'customer_order_id': self.customer_order.id,
+            'formule_id': formule.id,
+            'campaign_id': self.campaign.id,
+            'consignee_id': self.consignee.id,
+            'product_type': 'cocoa_mass',
+            'tonnage': tonnage,
+        } for formule in formules]
+    
+    def test_60_batch_create_names_and_links(self):
+        """Test création groupée: numéros consécutifs uniques et formules liées"""
+        formules = self._create_formules(10)
+        ots = self.env['potting.transit.order'].create(self._ot_vals(formules))
+        
+        self.assertEqual(len(set(ots.mapped('name'))), 10)
+        # Client sans référence: format NNNN/AAAA-AAAA-XX
+        numbers = sorted(int(name.split('/')[0]) for name in ots.mapped('name'))
+        self.assertEqual(numbers, list(range(numbers[0], numbers[0] + 10)))
+        for ot in ots:
+            self.assertEqual(ot.formule_id.transit_order_id, ot)
+    
+    def test_61_batch_create_contract_tonnage(self):
+        """Test dépassement du tonnage contrat détecté sur l'ensemble du lot"""
+        formules = self._create_formules(3)
+        # 3 x 80 T > 200 T: le troisième OT dépasse le contrat
+        with self.assertRaises(ValidationError):
+            self.env['potting.transit.order'].create(self._ot_vals(formules, tonnage=80.0))
+        self.assertFalse(self.customer_order.transit_order_ids)
+    
+    def test_62_batch_create_queries_per_ot(self):
+        """Test création groupée: seule la liaison des formules croît avec le nombre d'OT,
+        au plus LINK_MAX_QUERIES_PER_OT requêtes par OT"""
+        TransitOrder = self.env['potting.transit.order'].with_context(mail_create_nolog=True)
+        
+        def count_queries(size):
+            vals_list = self._ot_vals(self._create_formules(size))
+            self.env.flush_all()
+            self.env.invalidate_all()
+            start = self.env.cr.sql_log_count
+            TransitOrder.create(vals_list)
+            self.env.flush_all()
+            return self.env.cr.sql_log_count - start
+        
+        # Premier appel pour chauffer les caches (ormcache, références)
+        count_queries(2)
+        # Création, numérotation et contrôle des contrats groupés ; une écriture ORM par OT
+        self.assertLessEqual(count_queries(50) - count_queries(5), 45 * LINK_MAX_QUERIES_PER_OT)
+    
+    def test_70_forwarding_agent_grouped_stats(self):
+        """Test statistiques transitaires calculées en requêtes groupées"""
+        agents = self.env['potting.forwarding.agent'].create([{
+            'partner_id': self.env['res.partner'].create({
+                'name': 'Transitaire Stats Test %d' % i,
+                'is_company': True,
+            }).id,
+            'commission_rate': 1.0,
+        } for i in range(2)])
+        ots = self.env['potting.transit.order'].create(self._ot_vals(self._create_formules(2), tonnage=10.0))
+        ots.write({'forwarding_agent_id': agents[0].id, 'state': 'in_progress'})
+        self.env['potting.forwarding.agent.payment'].create([{
+            'forwarding_agent_id': agents[0].id,
+            'payment_type': 'advance',
+            'amount': 1000.0,
+            'state': 'confirmed',
+        }, {
+            'forwarding_agent_id': agents[0].id,
+            'payment_type': 'partial',
+            'amount': 500.0,
+            'state': 'draft',
+        }])
+        
+        fee = ots[0].subtotal_amount * 0.01
+        self.assertAlmostEqual(ots[0].forwarding_agent_fee, fee, places=2)
+        self.assertEqual(agents[0].transit_order_count, 2)
+        self.assertEqual(agents[0].active_transit_order_count, 2)
+        self.assertAlmostEqual(agents[0].total_invoiced, sum(ots.mapped('forwarding_agent_fee')), places=2)
+        self.assertAlmostEqual(agents[0].total_paid, 1000.0)
+        self.assertAlmostEqual(agents[0].total_advances, 1000.0)
+        self.assertEqual(agents[1].transit_order_count, 0)
+        self.assertAlmostEqual(agents[1].total_paid, 0.0)
+        
+        # Les frais enregistrés suivent le taux de commission du transitaire
+        agents[0].commission_rate = 2.0
+        self.assertAlmostEqual(ots[0].forwarding_agent_fee, fee * 2, places=2)
+        self.assertAlmostEqual(agents[0].total_invoiced, sum(ots.mapped('forwarding_agent_fee')), places=2)
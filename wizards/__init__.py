@@ -16,3 +16,8 @@ from . import potting_forwarding_invoice_reject_wizard
 from . import potting_ot_payment_wizards
 from . import potting_cv_tonnage_transfer_wizard
 from . import potting_quick_delivery_wizard
+from . import potting_ot_allocation_wizard
+from . import potting_container_planning_wizard
+from . import potting_bulk_delivery_note_wizard
+from . import potting_batch_invoice_wizard
+from . import potting_dataset_generator_wizard
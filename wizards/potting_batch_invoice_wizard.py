@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+"""
+Wizard de facturation groupée
+
+Génère en une fois les factures client d'un ensemble d'OT (reste à facturer)
+ou de BL confirmés (tonnage livré), avec regroupement optionnel par client
+et devise en factures consolidées.
+"""
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+
+
+class PottingBatchInvoiceWizard(models.TransientModel):
+    """Wizard de facturation groupée des OT et BL"""
+    _name = 'potting.batch.invoice.wizard'
+    _description = 'Facturation groupée des OT et BL'
+
+    # =========================================================================
+    # CHAMPS
+    # =========================================================================
+
+    state = fields.Selection([
+        ('draft', 'Paramètres'),
+        ('done', 'Terminé'),
+    ], string="État", default='draft')
+
+    transit_order_ids = fields.Many2many(
+        'potting.transit.order',
+        'potting_batch_invoice_wizard_ot_rel',
+        'wizard_id', 'transit_order_id',
+        string="OT",
+        domain="[('state', 'in', ['in_progress', 'ready_validation', 'done']), ('is_fully_invoiced', '=', False)]",
+        help="Facturer le reste à facturer de ces OT"
+    )
+
+    delivery_note_ids = fields.Many2many(
+        'potting.delivery.note',
+        'potting_batch_invoice_wizard_note_rel',
+        'wizard_id', 'delivery_note_id',
+        string="BL",
+        domain="[('state', 'in', ['confirmed', 'delivered']), ('invoice_id', '=', False)]",
+        help="Facturer le tonnage livré de ces BL"
+    )
+
+    consolidate = fields.Boolean(
+        string="Factures consolidées",
+        help="Regrouper sur une seule facture les OT et BL d'un même client dans une même devise"
+    )
+
+    invoice_ids = fields.Many2many(
+        'account.move',
+        'potting_batch_invoice_wizard_move_rel',
+        'wizard_id', 'move_id',
+        string="Factures créées",
+        readonly=True
+    )
+
+    result_message = fields.Text(
+        string="Résultat",
+        readonly=True
+    )
+
+    # =========================================================================
+    # DEFAULTS
+    # =========================================================================
+
+    @api.model
+    def default_get(self, fields_list):
+        res = super().default_get(fields_list)
+        active_ids = self.env.context.get('active_ids')
+        active_model = self.env.context.get('active_model')
+        if active_ids and active_model == 'potting.transit.order':
+            res['transit_order_ids'] = [(6, 0, active_ids)]
+        elif active_ids and active_model == 'potting.delivery.note':
+            res['delivery_note_ids'] = [(6, 0, active_ids)]
+        return res
+
+    # =========================================================================
+    # ACTIONS
+    # =========================================================================
+
+    def _get_invoice_requests(self):
+        """Demandes de facturation (OT, tonnage, BL) et BL écartés."""
+        requests = []
+        skipped = []
+        for note in self.delivery_note_ids:
+            if note.state not in ('confirmed', 'delivered'):
+                skipped.append(_("%s : BL non confirmé") % note.name)
+            elif note.invoice_id:
+                skipped.append(_("%s : BL déjà facturé") % note.name)
+            else:
+                requests.append((note.transit_order_id, note.total_tonnage, note))
+        for order in self.transit_order_ids:
+            requests.append((order, order.remaining_to_invoice, False))
+        return requests, skipped
+
+    def action_create_invoices(self):
+        """Créer toutes les factures puis afficher le récapitulatif."""
+        self.ensure_one()
+        if not self.transit_order_ids and not self.delivery_note_ids:
+            raise UserError(_("Sélectionnez des OT ou des BL à facturer."))
+        if 'account.move' not in self.env:
+            raise UserError(_(
+                "Le module de comptabilité doit être installé pour créer des factures."
+            ))
+
+        requests, skipped = self._get_invoice_requests()
+        result = self.env['potting.transit.order']._create_invoices_batch(
+            requests, consolidate=self.consolidate
+        )
+        skipped += [
+            _("%s : %s") % (note.name if note else order.name, reason)
+            for order, note, reason in result['skipped']
+        ]
+
+        invoices = result['invoices']
+        lines = [_("%d facture(s) créée(s) pour %.3f T.") % (
+            len(invoices), sum(invoices.mapped('potting_invoiced_tonnage')),
+        )] + skipped
+        self.write({
+            'invoice_ids': [(6, 0, invoices.ids)],
+            'result_message': '\n'.join(lines),
+            'state': 'done',
+        })
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
+
+    def action_view_invoices(self):
+        """Ouvrir les factures créées."""
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _('Factures'),
+            'res_model': 'account.move',
+            'view_mode': 'tree,form',
+            'domain': [('id', 'in', self.invoice_ids.ids)],
+        }
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+Wizard de création groupée des bons de livraison
+
+Au départ d'un navire, crée en une fois un BL par OT (navire, booking ou
+sélection d'OT) avec tous les lots empotés non encore livrés, puis lance la
+facturation automatique en une étape groupée et affiche un récapitulatif.
+"""
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+
+
+class PottingBulkDeliveryNoteWizard(models.TransientModel):
+    """Wizard de création groupée des bons de livraison"""
+    _name = 'potting.bulk.delivery.note.wizard'
+    _description = 'Création groupée des bons de livraison'
+
+    # =========================================================================
+    # CHAMPS
+    # =========================================================================
+
+    state = fields.Selection([
+        ('draft', 'Paramètres'),
+        ('done', 'Terminé'),
+    ], string="État", default='draft')
+
+    vessel_id = fields.Many2one(
+        'potting.vessel',
+        string="Navire",
+        help="Créer les BL de tous les OT de ce navire"
+    )
+
+    booking_number = fields.Char(
+        string="N° Booking",
+        help="Créer le BL de l'OT de ce booking"
+    )
+
+    transit_order_ids = fields.Many2many(
+        'potting.transit.order',
+        'potting_bulk_delivery_note_wizard_ot_rel',
+        'wizard_id', 'transit_order_id',
+        string="OT",
+        domain="[('state', 'in', ['in_progress', 'ready_validation', 'done'])]",
+        help="Laisser vide pour prendre les OT du navire ou du booking"
+    )
+
+    date_delivery = fields.Date(
+        string="Date de livraison",
+        default=fields.Date.context_today,
+        required=True
+    )
+
+    date_shipment = fields.Date(
+        string="Date d'embarquement"
+    )
+
+    bl_date = fields.Date(
+        string="Date BL"
+    )
+
+    transport_mode = fields.Selection([
+        ('maritime', 'Maritime'),
+        ('road', 'Routier'),
+        ('air', 'Aérien'),
+        ('rail', 'Ferroviaire'),
+    ], string="Mode de transport", default='maritime')
+
+    carrier_name = fields.Char(
+        string="Transporteur"
+    )
+
+    create_invoices = fields.Boolean(
+        string="Générer les factures",
+        default=True,
+        help="Générer les factures automatiques des BL créés (OT dont les droits "
+             "d'exportation sont encaissés)"
+    )
+
+    delivery_note_ids = fields.Many2many(
+        'potting.delivery.note',
+        'potting_bulk_delivery_note_wizard_note_rel',
+        'wizard_id', 'delivery_note_id',
+        string="BL créés",
+        readonly=True
+    )
+
+    result_message = fields.Text(
+        string="Résultat",
+        readonly=True
+    )
+
+    # =========================================================================
+    # DEFAULTS
+    # =========================================================================
+
+    @api.model
+    def default_get(self, fields_list):
+        res = super().default_get(fields_list)
+        if self.env.context.get('active_model') == 'potting.transit.order' and self.env.context.get('active_ids'):
+            res['transit_order_ids'] = [(6, 0, self.env.context['active_ids'])]
+        return res
+
+    # =========================================================================
+    # ACTIONS
+    # =========================================================================
+
+    def _get_transit_orders(self):
+        if self.transit_order_ids:
+            return self.transit_order_ids
+        if not self.vessel_id and not self.booking_number:
+            raise UserError(_("Sélectionnez un navire, un booking ou des OT."))
+        domain = [('state', 'in', ['in_progress', 'ready_validation', 'done'])]
+        if self.vessel_id:
+            domain.append(('vessel_id', '=', self.vessel_id.id))
+        if self.booking_number:
+            domain.append(('booking_number', '=', self.booking_number.strip()))
+        return self.env['potting.transit.order'].search(domain)
+
+    def _reopen(self):
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
+
+    def action_create_delivery_notes(self):
+        """Créer tous les BL puis afficher le récapitulatif."""
+        self.ensure_one()
+        orders = self._get_transit_orders()
+        if not orders:
+            raise UserError(_("Aucun OT en cours, prêt ou validé pour ce navire ou ce booking."))
+
+        values = {
+            'date_delivery': self.date_delivery,
+            'transport_mode': self.transport_mode,
+        }
+        for field_name in ('date_shipment', 'bl_date', 'carrier_name'):
+            if self[field_name]:
+                values[field_name] = self[field_name]
+        result = self.env['potting.delivery.note'].create_bulk_delivery_notes(
+            orders, values=values, create_invoices=self.create_invoices
+        )
+
+        notes = result['delivery_notes']
+        lines = [_("%d BL créé(s) pour %d lot(s) (%.3f T), %d facture(s) générée(s).") % (
+            len(notes), sum(notes.mapped('lot_count')),
+            sum(notes.mapped('total_tonnage')), len(result['invoiced']),
+        )]
+        lines += [_("%s ignoré : %s") % (name, reason) for name, reason in result['skipped'].items()]
+        self.write({
+            'delivery_note_ids': [(6, 0, notes.ids)],
+            'result_message': '\n'.join(lines),
+            'state': 'done',
+        })
+        return self._reopen()
+
+    def action_view_delivery_notes(self):
+        """Ouvrir les BL créés."""
+        self.ensure_one()
+        return {
+            'type': 'ir.actions.act_window',
+            'name': _('Bons de Livraison'),
+            'res_model': 'potting.delivery.note',
+            'view_mode': 'tree,form',
+            'domain': [('id', 'in', self.delivery_note_ids.ids)],
+        }
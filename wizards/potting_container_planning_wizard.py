@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+"""
+Wizard de planification du chargement des conteneurs
+
+Répartit en une passe les lots prêts d'un ensemble d'OT dans les conteneurs
+disponibles (un seul type de produit par conteneur) en minimisant le nombre
+de conteneurs, affiche le plan puis empote tous les lots en écritures
+groupées.
+"""
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+
+
+class PottingContainerPlanningWizard(models.TransientModel):
+    """Wizard de planification du chargement des lots dans les conteneurs"""
+    _name = 'potting.container.planning.wizard'
+    _description = 'Planification du chargement des conteneurs'
+
+    # =========================================================================
+    # CHAMPS
+    # =========================================================================
+
+    state = fields.Selection([
+        ('draft', 'Paramètres'),
+        ('preview', 'Aperçu'),
+        ('done', 'Terminé'),
+    ], string="État", default='draft')
+
+    transit_order_ids = fields.Many2many(
+        'potting.transit.order',
+        'potting_container_planning_wizard_ot_rel',
+        'wizard_id', 'transit_order_id',
+        string="OT",
+        domain="[('state', 'not in', ['cancelled', 'done'])]",
+        help="Laisser vide pour planifier tous les lots prêts non empotés"
+    )
+
+    container_type = fields.Selection(
+        selection=lambda self: self.env['potting.container']._fields['container_type'].selection,
+        string="Type de conteneur",
+        help="Limiter le plan aux conteneurs de ce type"
+    )
+
+    container_ids = fields.Many2many(
+        'potting.container',
+        'potting_container_planning_wizard_container_rel',
+        'wizard_id', 'container_id',
+        string="Conteneurs",
+        domain="[('state', 'in', ['available', 'loading'])]",
+        help="Laisser vide pour utiliser tous les conteneurs disponibles ou en chargement"
+    )
+
+    line_ids = fields.One2many(
+        'potting.container.planning.wizard.line',
+        'wizard_id',
+        string="Plan de chargement"
+    )
+
+    unplaced_lot_ids = fields.Many2many(
+        'potting.lot',
+        'potting_container_planning_wizard_unplaced_rel',
+        'wizard_id', 'lot_id',
+        string="Lots non placés"
+    )
+
+    container_count = fields.Integer(
+        string="Conteneurs utilisés",
+        compute='_compute_totals'
+    )
+
+    lot_count = fields.Integer(
+        string="Lots placés",
+        compute='_compute_totals'
+    )
+
+    total_tonnage = fields.Float(
+        string="Tonnage placé (T)",
+        compute='_compute_totals',
+        digits='Product Unit of Measure'
+    )
+
+    extra_container_count = fields.Integer(
+        string="Conteneurs supplémentaires nécessaires",
+        readonly=True,
+        help="Estimation du nombre de conteneurs neufs nécessaires pour les lots non placés"
+    )
+
+    result_message = fields.Text(
+        string="Résultat"
+    )
+
+    # =========================================================================
+    # MÉTHODES COMPUTED
+    # =========================================================================
+
+    @api.depends('line_ids.container_id', 'line_ids.tonnage')
+    def _compute_totals(self):
+        for wizard in self:
+            wizard.container_count = len(wizard.line_ids.container_id)
+            wizard.lot_count = len(wizard.line_ids)
+            wizard.total_tonnage = sum(wizard.line_ids.mapped('tonnage'))
+
+    # =========================================================================
+    # ACTIONS
+    # =========================================================================
+
+    def _get_lots(self):
+        domain = [('state', '=', 'ready'), ('container_id', '=', False)]
+        if self.transit_order_ids:
+            domain.append(('transit_order_id', 'in', self.transit_order_ids.ids))
+        return self.env['potting.lot'].search(domain)
+
+    def _get_containers(self):
+        if self.container_ids:
+            return self.container_ids
+        return self.env['potting.container'].get_available_containers(self.container_type)
+
+    def _reopen(self):
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
+
+    def action_compute(self):
+        """Calculer le plan de chargement et afficher l'aperçu."""
+        self.ensure_one()
+        lots = self._get_lots()
+        if not lots:
+            raise UserError(_("Aucun lot prêt pour l'empotage."))
+        containers = self._get_containers()
+        if not containers:
+            raise UserError(_("Aucun conteneur disponible pour le chargement."))
+
+        Container = self.env['potting.container']
+        plan = Container.compute_loading_plan(lots, containers)
+        unplaced = self.env['potting.lot'].browse(plan['unplaced'])
+        self.line_ids = [(5, 0, 0)] + [(0, 0, {
+            'lot_id': lot_id,
+            'container_id': container_id,
+        }) for lot_id, container_id in plan['assignments']]
+        self.unplaced_lot_ids = [(6, 0, unplaced.ids)]
+        self.extra_container_count = Container._estimate_containers_needed([{
+            'id': lot.id,
+            'product_type': lot.product_type,
+            'tonnage': lot.current_tonnage,
+        } for lot in unplaced], self.container_type or '20') if unplaced else 0
+        self.state = 'preview'
+        return self._reopen()
+
+    def action_apply(self):
+        """Empoter tous les lots du plan en écritures groupées."""
+        self.ensure_one()
+        if not self.line_ids:
+            raise UserError(_("Aucun lot à empoter."))
+        lots = self.env['potting.container'].apply_loading_plan([
+            (line.lot_id.id, line.container_id.id) for line in self.line_ids
+        ])
+
+        self.result_message = _(
+            "%d lot(s) empoté(s) dans %d conteneur(s) (%.2f T)."
+        ) % (len(lots), len(lots.container_id), self.total_tonnage)
+        self.state = 'done'
+        return self._reopen()
+
+    def action_back(self):
+        """Revenir aux paramètres."""
+        self.ensure_one()
+        self.line_ids = [(5, 0, 0)]
+        self.unplaced_lot_ids = [(5, 0, 0)]
+        self.state = 'draft'
+        return self._reopen()
+
+
+class PottingContainerPlanningWizardLine(models.TransientModel):
+    """Ligne du plan de chargement"""
+    _name = 'potting.container.planning.wizard.line'
+    _description = 'Ligne du plan de chargement'
+    _order = 'container_id, id'
+
+    wizard_id = fields.Many2one(
+        'potting.container.planning.wizard',
+        string="Wizard",
+        required=True,
+        ondelete='cascade'
+    )
+
+    lot_id = fields.Many2one(
+        'potting.lot',
+        string="Lot",
+        required=True
+    )
+
+    container_id = fields.Many2one(
+        'potting.container',
+        string="Conteneur",
+        required=True
+    )
+
+    transit_order_id = fields.Many2one(
+        related='lot_id.transit_order_id',
+        string="OT"
+    )
+
+    product_type = fields.Selection(
+        related='lot_id.product_type',
+        string="Type de produit"
+    )
+
+    tonnage = fields.Float(
+        related='lot_id.current_tonnage',
+        string="Tonnage (T)"
+    )
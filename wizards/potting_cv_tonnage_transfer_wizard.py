@@ -201,6 +201,11 @@ class PottingCvTonnageTransferWizard(models.TransientModel):
         if self.tonnage_to_transfer <= 0:
             raise UserError(_("Le tonnage à transférer doit être supérieur à 0."))
         
+        # Verrouiller uniquement les deux CV concernées puis relire le solde
+        cvs = self.source_cv_id if self.create_new_cv else (self.source_cv_id | self.target_cv_id)
+        self.env['potting.cv.tonnage.move']._lock_cvs(cvs.ids)
+        cvs.invalidate_recordset(['tonnage_restant', 'tonnage_autorise'])
+        
         if self.tonnage_to_transfer > self.source_cv_id.tonnage_restant:
             raise UserError(_(
                 "Le tonnage à transférer (%.2f T) dépasse le tonnage disponible (%.2f T).",
@@ -211,19 +216,23 @@ class PottingCvTonnageTransferWizard(models.TransientModel):
         # Déterminer le prix
         prix = self.source_cv_id.prix_tonnage if self.keep_original_price else self.new_price
         
-        # Créer ou mettre à jour la CV destination
+        # Créer ou mettre à jour la CV destination (mouvement de report entrant)
+        ledger_self = self.with_context(
+            potting_cv_transfer_from=self.source_cv_id.id,
+            potting_cv_transfer_note=self.note,
+        )
         if self.create_new_cv:
-            target_cv = self._create_new_cv(prix)
+            target_cv = ledger_self._create_new_cv(prix)
         else:
             target_cv = self.target_cv_id
             # Augmenter le tonnage de la CV destination
-            target_cv.write({
+            target_cv.with_context(ledger_self.env.context).write({
                 'tonnage_autorise': target_cv.tonnage_autorise + self.tonnage_to_transfer
             })
         
         # Réduire le tonnage de la CV source
         # On ne modifie pas directement tonnage_autorise, on marque le transfert
-        self._record_transfer(target_cv)
+        self._record_transfer(target_cv.with_context(potting_cv_transfer_from=False))
         
         # Message dans le chatter des deux CV
         transfer_msg = _(
@@ -294,10 +303,5 @@ class PottingCvTonnageTransferWizard(models.TransientModel):
         return new_cv
     
     def _record_transfer(self, target_cv):
-        """Enregistrer le transfert pour traçabilité"""
-        # Créer une allocation négative virtuelle ou simplement noter le transfert
-        # Pour l'instant, on enregistre juste dans les notes de la CV source
-        
-        # On pourrait aussi créer un modèle potting.cv.transfer pour historiser
-        # mais pour simplifier, on utilise le chatter
-        pass
+        """Enregistrer le transfert pour traçabilité (report sortant au registre de la CV source)"""
+        return self.source_cv_id._transfer_tonnage_to(target_cv, self.tonnage_to_transfer, note=self.note)
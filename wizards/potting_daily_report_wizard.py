@@ -117,6 +117,12 @@ class PottingDailyReportWizard(models.TransientModel):
         string="Aperçu du rapport"
     )
     
+    campaign_id = fields.Many2one(
+        'potting.campaign',
+        string="Campagne",
+        help="Restreindre le rapport aux OT d'une campagne (rapport de campagne)"
+    )
+    
     exclude_fully_delivered = fields.Boolean(
         string="Exclure les OT entièrement livrés",
         default=True,
@@ -139,10 +145,12 @@ class PottingDailyReportWizard(models.TransientModel):
     # COMPUTE METHODS
     # =========================================================================
     
-    @api.depends('date_from', 'date_to', 'exclude_fully_delivered')
+    @api.depends('date_from', 'date_to', 'exclude_fully_delivered', 'campaign_id')
     def _compute_transit_order_ids(self):
         for wizard in self:
             domain = [('state', 'not in', ['draft', 'cancelled'])]
+            if wizard.campaign_id:
+                domain.append(('campaign_id', '=', wizard.campaign_id.id))
             if wizard.date_from:
                 domain.append(('date_created', '>=', wizard.date_from))
             if wizard.date_to:
@@ -167,42 +175,13 @@ class PottingDailyReportWizard(models.TransientModel):
                 wizard.preview_info = '<p class="text-muted">Aucun OT sélectionné</p>'
                 continue
             
-            # Grouper les OT par client
-            ot_by_customer = {}
-            for ot in wizard.transit_order_ids:
-                customer_key = (ot.customer_id.parent_id.name or ot.customer_id.name, 
-                               ot.consignee_id.name if ot.consignee_id else '')
-                if customer_key not in ot_by_customer:
-                    ot_by_customer[customer_key] = []
-                ot_by_customer[customer_key].append(ot)
-            
-            # Calculer les statistiques
-            total_tonnage = sum(wizard.transit_order_ids.mapped('tonnage'))
-            total_current = sum(wizard.transit_order_ids.mapped('current_tonnage'))
-            avg_progress = sum(wizard.transit_order_ids.mapped('progress_percentage')) / len(wizard.transit_order_ids) if wizard.transit_order_ids else 0
-            
-            # Compter par état
-            in_tc = len(wizard.transit_order_ids.filtered(lambda o: o.state == 'done'))
-            in_prod_100 = len(wizard.transit_order_ids.filtered(lambda o: o.progress_percentage >= 100 and o.state != 'done'))
-            in_prod = len(wizard.transit_order_ids.filtered(lambda o: o.progress_percentage < 100 and o.state not in ['done', 'cancelled']))
-            
-            # Compter par statut de livraison
-            partial_delivery_count = len(wizard.transit_order_ids.filtered(lambda o: o.delivery_status == 'partial'))
-            fully_delivered_count = len(wizard.transit_order_ids.filtered(lambda o: o.delivery_status == 'fully_delivered'))
-            not_delivered_count = len(wizard.transit_order_ids.filtered(lambda o: o.delivery_status == 'not_delivered'))
-            
-            # Trouver la plage de numéros OT
-            ot_numbers = []
-            for ot in wizard.transit_order_ids:
-                # Extraire le numéro de l'OT (format: XXXX/YYYY-YYYY-XX ou REF-XXXX/YYYY-YYYY-XX)
-                import re
-                match = re.search(r'(\d+)/', ot.name)
-                if match:
-                    ot_numbers.append(int(match.group(1)))
+            data = wizard.get_report_data()
+            stats = data['stats']
+            by_customer = data['by_customer']
             
             ot_range = ""
-            if ot_numbers:
-                ot_range = f"<strong>From OT:</strong> {min(ot_numbers)} <strong>to:</strong> {max(ot_numbers)}"
+            if data['ot_range']:
+                ot_range = f"<strong>From OT:</strong> {data['ot_range']['from']} <strong>to:</strong> {data['ot_range']['to']}"
             
             html = f'''
             <div class="row">
@@ -210,30 +189,30 @@ class PottingDailyReportWizard(models.TransientModel):
                     <h4>📊 Résumé du rapport</h4>
                     <ul>
                         <li><strong>Date:</strong> {wizard.report_date}</li>
-                        <li><strong>Nombre d'OT:</strong> {len(wizard.transit_order_ids)}</li>
+                        <li><strong>Nombre d'OT:</strong> {stats['total_ot']}</li>
                         <li>{ot_range}</li>
-                        <li><strong>Tonnage total:</strong> {total_tonnage:,.0f} Kg</li>
-                        <li><strong>Production actuelle:</strong> {total_current:,.0f} Kg</li>
-                        <li><strong>Progression moyenne:</strong> {avg_progress:.1f}%</li>
+                        <li><strong>Tonnage total:</strong> {stats['total_tonnage_kg'] / 1000:,.0f} Kg</li>
+                        <li><strong>Production actuelle:</strong> {stats['total_current_kg'] / 1000:,.0f} Kg</li>
+                        <li><strong>Progression moyenne:</strong> {stats['avg_progress']:.1f}%</li>
                     </ul>
                 </div>
                 <div class="col-6">
                     <h4>📦 Répartition par état</h4>
                     <ul>
-                        <li><span style="color: green;">●</span> <strong>100% In TC:</strong> {in_tc} OT</li>
-                        <li><span style="color: #DAA520;">●</span> <strong>100% Production:</strong> {in_prod_100} OT</li>
-                        <li><span style="color: red;">●</span> <strong>In Production:</strong> {in_prod} OT</li>
+                        <li><span style="color: green;">●</span> <strong>100% In TC:</strong> {stats['in_tc_count']} OT</li>
+                        <li><span style="color: #DAA520;">●</span> <strong>100% Production:</strong> {stats['prod_100_count']} OT</li>
+                        <li><span style="color: red;">●</span> <strong>In Production:</strong> {stats['in_prod_count']} OT</li>
                     </ul>
                     <h4>� Statut de livraison</h4>
                     <ul>
-                        <li><span style="color: orange;">●</span> <strong>Livraison partielle:</strong> {partial_delivery_count} OT</li>
-                        <li><span style="color: gray;">●</span> <strong>Non livrés:</strong> {not_delivered_count} OT</li>
-                        <li><span style="color: blue;">●</span> <strong>Entièrement livrés:</strong> {fully_delivered_count} OT</li>
+                        <li><span style="color: orange;">●</span> <strong>Livraison partielle:</strong> {stats['partial_delivery_count']} OT</li>
+                        <li><span style="color: gray;">●</span> <strong>Non livrés:</strong> {stats['not_delivered_count']} OT</li>
+                        <li><span style="color: blue;">●</span> <strong>Entièrement livrés:</strong> {stats['fully_delivered_count']} OT</li>
                     </ul>
-                    <h4>�👥 Clients ({len(ot_by_customer)})</h4>
+                    <h4>�👥 Clients ({len(by_customer)})</h4>
                     <ul>
-                        {"".join([f"<li>{c[0]} / {c[1]}: {len(ots)} OT</li>" for c, ots in list(ot_by_customer.items())[:5]])}
-                        {"<li>...</li>" if len(ot_by_customer) > 5 else ""}
+                        {"".join([f"<li>{c['name']}: {c['count']} OT</li>" for c in by_customer[:5]])}
+                        {"<li>...</li>" if len(by_customer) > 5 else ""}
                     </ul>
                 </div>
             </div>
@@ -262,6 +241,19 @@ class PottingDailyReportWizard(models.TransientModel):
         
         return self.env.ref('potting_management.action_report_ot_daily').report_action(self)
     
+    def action_download_xlsx(self):
+        """Télécharger le rapport au format Excel (export en flux)"""
+        self.ensure_one()
+        
+        if not self.transit_order_ids:
+            raise UserError(_("Aucun OT sélectionné pour le rapport."))
+        
+        return {
+            'type': 'ir.actions.act_url',
+            'url': '/potting/report/daily/xlsx/%d' % self.id,
+            'target': 'self',
+        }
+    
     def action_send_email(self):
         """Envoyer le rapport par email au DG"""
         self.ensure_one()
@@ -289,27 +281,20 @@ class PottingDailyReportWizard(models.TransientModel):
             'mimetype': 'application/pdf'
         })
         
-        # Trouver la plage des numéros OT
-        import re
-        ot_numbers = []
-        for ot in self.transit_order_ids:
-            match = re.search(r'(\d+)/', ot.name)
-            if match:
-                ot_numbers.append(int(match.group(1)))
+        # Statistiques et plage des numéros OT
+        data = self.get_report_data()
+        stats = data['stats']
         
         ot_range = ""
-        if ot_numbers:
-            ot_range = f"OT {min(ot_numbers)} à {max(ot_numbers)}"
-        
-        # Calcul des statistiques
-        total_tonnage_kg = sum(self.transit_order_ids.mapped('tonnage')) * 1000
-        total_current_kg = sum(self.transit_order_ids.mapped('current_tonnage')) * 1000
-        avg_progress = sum(self.transit_order_ids.mapped('progress_percentage')) / len(self.transit_order_ids) if self.transit_order_ids else 0
+        if data['ot_range']:
+            ot_range = f"OT {data['ot_range']['from']} à {data['ot_range']['to']}"
         
-        # Comptage par état
-        in_tc_count = len(self.transit_order_ids.filtered(lambda o: o.state == 'done'))
-        prod_100_count = len(self.transit_order_ids.filtered(lambda o: o.progress_percentage >= 100 and o.state != 'done'))
-        in_prod_count = len(self.transit_order_ids.filtered(lambda o: o.progress_percentage < 100 and o.state not in ['done', 'cancelled']))
+        total_tonnage_kg = stats['total_tonnage_kg']
+        total_current_kg = stats['total_current_kg']
+        avg_progress = stats['avg_progress']
+        in_tc_count = stats['in_tc_count']
+        prod_100_count = stats['prod_100_count']
+        in_prod_count = stats['in_prod_count']
         
         # Préparer le corps de l'email avec design professionnel
         body_html = f'''
@@ -349,7 +334,7 @@ class PottingDailyReportWizard(models.TransientModel):
                         <table width="100%" cellspacing="8" cellpadding="0" style="margin-bottom: 25px;">
                             <tr>
                                 <td style="width: 25%; text-align: center; background: linear-gradient(180deg, #1a5f2a, #27ae60); padding: 15px 10px; border-radius: 8px;">
-                                    <span style="color: #fff; font-size: 28px; font-weight: bold;">{len(self.transit_order_ids)}</span><br/>
+                                    <span style="color: #fff; font-size: 28px; font-weight: bold;">{stats['total_ot']}</span><br/>
                                     <span style="color: #e8f5e9; font-size: 11px; text-transform: uppercase;">Total OT</span>
                                 </td>
                                 <td style="width: 25%; text-align: center; background: linear-gradient(180deg, #8B4513, #D2691E); padding: 15px 10px; border-radius: 8px;">
@@ -474,159 +459,41 @@ class PottingDailyReportWizard(models.TransientModel):
     # HELPER METHODS FOR REPORT
     # =========================================================================
     
+    def get_report_data(self):
+        """Retourne les lignes OT/lots et les statistiques du rapport.
+        
+        Les données sont construites en une seule passe par
+        potting.daily.report.data (nombre de requêtes constant).
+        """
+        self.ensure_one()
+        return self.env['potting.daily.report.data'].build(self.transit_order_ids)
+    
     def get_ot_data_for_report(self):
         """Prépare les données groupées par OT pour le rapport"""
         self.ensure_one()
-        
-        result = []
-        for ot in self.transit_order_ids.sorted(key=lambda o: o.name):
-            # Extraire le numéro OT
-            import re
-            match = re.search(r'(\d+)/', ot.name)
-            ot_number = match.group(1) if match else ot.name
-            
-            # Calculer les informations de production
-            total_kg = ot.tonnage * 1000  # Convertir en kg
-            current_kg = ot.current_tonnage * 1000
-            progress = (current_kg / total_kg * 100) if total_kg > 0 else 0
-            
-            # Déterminer le type d'unité
-            product_config = {
-                'cocoa_mass': 'Box of liquor',
-                'cocoa_butter': 'Box of butter',
-                'cocoa_cake': 'Big Bag',
-                'cocoa_powder': 'Sac'
-            }
-            unit_name = product_config.get(ot.product_type, 'Unités')
-            
-            # Calculer le nombre d'unités
-            unit_weight = {
-                'cocoa_mass': 25,  # kg
-                'cocoa_butter': 25,
-                'cocoa_cake': 1000,
-                'cocoa_powder': 25
-            }
-            weight = unit_weight.get(ot.product_type, 25)
-            total_units = int(total_kg / weight) if weight > 0 else 0
-            
-            # Déterminer l'état de couleur
-            if ot.state == 'done':
-                color_status = 'green'  # 100% In TC
-            elif progress >= 100:
-                color_status = 'yellow'  # 100% Production
-            else:
-                color_status = 'red'  # In Production
-            
-            # Client et consignee
-            customer_name = ot.customer_id.parent_id.name if ot.customer_id.parent_id else ot.customer_id.name
-            consignee_name = ot.consignee_id.name if ot.consignee_id else ''
-            
-            # Certification suffix
-            cert_suffix = ''
-            if ot.lot_ids and ot.lot_ids[0].certification_id:
-                cert_suffix = ot.lot_ids[0].certification_id.suffix or ''
-            
-            # Préparer les données des lots
-            lots_data = []
-            for lot in ot.lot_ids.sorted(key=lambda l: l.name):
-                lot_data = {
-                    'name': lot.name,
-                    'contract_number': lot.contract_number or '',
-                    'bl_number': lot.bl_number or '',
-                    'bl_date': lot.bl_date,
-                    'container_number': lot.container_id.name if lot.container_id else '',
-                    'vessel_name': ot.vessel_name or '',
-                    'booking_number': ot.booking_number or '',
-                    'eta': lot.container_id.date_arrival if lot.container_id else None,
-                    'etd': lot.container_id.date_departure if lot.container_id else None,
-                    'shipping_line': lot.container_id.shipping_line if lot.container_id else '',
-                    'destination': lot.destination or ot.pod or '',
-                    'date_potted': lot.date_potted.date() if lot.date_potted else None,
-                    'date_production_end': lot.date_production_end,
-                    'quantity_kg': lot.current_tonnage * 1000,
-                }
-                lots_data.append(lot_data)
-            
-            ot_data = {
-                'ot_number': ot_number,
-                'name': ot.name,
-                'customer_name': customer_name,
-                'consignee_name': consignee_name,
-                'total_kg': total_kg,
-                'total_units': total_units,
-                'unit_name': unit_name,
-                'certification': cert_suffix,
-                'progress': progress,
-                'current_kg': current_kg,
-                'color_status': color_status,
-                'lots': lots_data,
-                # Delivery status info
-                'delivery_status': ot.delivery_status,
-                'is_partial_delivery': ot.delivery_status == 'partial',
-                'delivered_lot_count': ot.delivered_lot_count,
-                'delivered_tonnage_kg': ot.delivered_tonnage * 1000,
-                'remaining_to_deliver_kg': ot.remaining_to_deliver_tonnage * 1000,
-            }
-            result.append(ot_data)
-        
-        return result
+        return self.get_report_data()['ots']
     
     def get_ot_number_range(self):
         """Retourne la plage des numéros OT"""
-        import re
-        ot_numbers = []
-        for ot in self.transit_order_ids:
-            match = re.search(r'(\d+)/', ot.name)
-            if match:
-                ot_numbers.append(int(match.group(1)))
-        
-        if ot_numbers:
-            return {'from': min(ot_numbers), 'to': max(ot_numbers)}
-        return {'from': 0, 'to': 0}
+        self.ensure_one()
+        return self.get_report_data()['ot_range'] or {'from': 0, 'to': 0}
     
     def get_report_statistics(self):
         """Retourne les statistiques globales du rapport pour l'en-tête"""
         self.ensure_one()
-        
-        total_ot = len(self.transit_order_ids)
-        total_tonnage_kg = sum(self.transit_order_ids.mapped('tonnage')) * 1000
-        total_current_kg = sum(self.transit_order_ids.mapped('current_tonnage')) * 1000
-        
-        # Calcul de la progression moyenne
-        if total_ot > 0:
-            avg_progress = sum(self.transit_order_ids.mapped('progress_percentage')) / total_ot
-        else:
-            avg_progress = 0
-        
-        # Comptage par état
-        in_tc_count = len(self.transit_order_ids.filtered(lambda o: o.state == 'done'))
-        prod_100_count = len(self.transit_order_ids.filtered(
-            lambda o: o.progress_percentage >= 100 and o.state != 'done'
-        ))
-        in_prod_count = len(self.transit_order_ids.filtered(
-            lambda o: o.progress_percentage < 100 and o.state not in ['done', 'cancelled']
-        ))
-        
-        # Comptage par statut de livraison
-        partial_delivery_count = len(self.transit_order_ids.filtered(
-            lambda o: o.delivery_status == 'partial'
-        ))
-        fully_delivered_count = len(self.transit_order_ids.filtered(
-            lambda o: o.delivery_status == 'fully_delivered'
-        ))
-        not_delivered_count = len(self.transit_order_ids.filtered(
-            lambda o: o.delivery_status == 'not_delivered'
-        ))
-        
-        return {
-            'total_ot': total_ot,
-            'total_tonnage_kg': total_tonnage_kg,
-            'total_current_kg': total_current_kg,
-            'avg_progress': avg_progress,
-            'in_tc_count': in_tc_count,
-            'prod_100_count': prod_100_count,
-            'in_prod_count': in_prod_count,
-            'partial_delivery_count': partial_delivery_count,
-            'fully_delivered_count': fully_delivered_count,
-            'not_delivered_count': not_delivered_count,
-        }
+        return self.get_report_data()['stats']
+    
+    def get_xlsx_filename(self):
+        """Nom du fichier Excel du rapport"""
+        self.ensure_one()
+        if self.campaign_id:
+            return "Rapport_Campagne_%s.xlsx" % self.campaign_id.name.replace('/', '-').replace(' ', '_')
+        return "Rapport_OT_%s.xlsx" % self.report_date.strftime('%Y%m%d')
+    
+    def export_xlsx(self, fileobj):
+        """Écrire le rapport Excel dans fileobj, retourne le nombre de lignes"""
+        self.ensure_one()
+        title = self.campaign_id.name if self.campaign_id else self.report_date.strftime('%d-%m-%Y')
+        return self.env['potting.report.xlsx.export'].export_transit_orders(
+            self.transit_order_ids, fileobj, title=title
+        )
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Wizard de génération d'un jeu de données de campagne
+
+Interface (mode développeur, administrateurs) du générateur
+``potting.dataset.generator`` : volumes, graine et taille des paquets.
+Réservé aux bases de test et de recette.
+"""
+
+from odoo import fields, models, _
+from odoo.exceptions import UserError
+
+
+class PottingDatasetGeneratorWizard(models.TransientModel):
+    """Wizard de génération d'une campagne synthétique"""
+    _name = 'potting.dataset.generator.wizard'
+    _description = 'Génération d\'un jeu de données de campagne'
+
+    # =========================================================================
+    # CHAMPS
+    # =========================================================================
+
+    state = fields.Selection([
+        ('draft', 'Paramètres'),
+        ('done', 'Terminé'),
+    ], string="État", default='draft')
+
+    seed = fields.Integer(
+        string="Graine",
+        default=42,
+        help="Une même graine et les mêmes volumes produisent le même jeu de données"
+    )
+
+    customers = fields.Integer(string="Clients", default=50)
+    consignees = fields.Integer(string="Destinataires", default=80)
+    confirmations = fields.Integer(string="Confirmations de vente", default=20)
+    customer_orders = fields.Integer(string="Contrats", default=400)
+    transit_orders = fields.Integer(string="OT", default=2000)
+    production_lines = fields.Integer(string="Lignes de production", default=100000)
+
+    invoiced_ratio = fields.Float(
+        string="Part des BL facturés",
+        default=0.5,
+        help="Part des BL des OT expédiés à facturer (si la comptabilité est configurée)"
+    )
+
+    chunk_size = fields.Integer(
+        string="Taille des paquets",
+        default=2000,
+        help="Nombre d'enregistrements créés par appel"
+    )
+
+    result_message = fields.Text(
+        string="Résultat",
+        readonly=True
+    )
+
+    # =========================================================================
+    # ACTIONS
+    # =========================================================================
+
+    def action_generate(self):
+        """Générer la campagne puis afficher le récapitulatif."""
+        self.ensure_one()
+        volumes = ('customers', 'consignees', 'confirmations', 'customer_orders', 'transit_orders')
+        if any(self[fname] <= 0 for fname in volumes) or self.production_lines < 0 or self.chunk_size <= 0:
+            raise UserError(_("Les volumes et la taille des paquets doivent être positifs."))
+        if not 0 <= self.invoiced_ratio <= 1:
+            raise UserError(_("La part des BL facturés doit être comprise entre 0 et 1."))
+
+        result = self.env['potting.dataset.generator'].generate(
+            seed=self.seed,
+            customers=self.customers,
+            consignees=self.consignees,
+            confirmations=self.confirmations,
+            customer_orders=self.customer_orders,
+            transit_orders=self.transit_orders,
+            production_lines=self.production_lines,
+            invoiced_ratio=self.invoiced_ratio,
+            chunk_size=self.chunk_size,
+        )
+        lines = [_("%s générée en %.0f s.") % (result['campaign'].name, result['duration'])]
+        lines += ["%s : %d" % (model, count) for model, count in result['counts'].items()]
+        self.write({
+            'result_message': '\n'.join(lines),
+            'state': 'done',
+        })
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
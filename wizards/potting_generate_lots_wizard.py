@@ -174,13 +174,15 @@ class PottingGenerateLotsWizard(models.TransientModel):
                 'state': 'draft',
             })
         
-        self.env['potting.lot'].create(lot_vals_list)
-        transit_order.state = 'lots_generated'
-        transit_order.message_post(
-            body=_("%d lots générés pour cet OT (tonnage max par lot: %.2f T).") % (
-                num_lots, max_tonnage
+        # Mode groupé : un seul message récapitulatif sur l'OT (voir potting.bulk.mixin)
+        with transit_order._bulk_mode() as bulk_order:
+            bulk_order.env['potting.lot'].create(lot_vals_list)
+            bulk_order.state = 'lots_generated'
+            bulk_order.message_post(
+                body=_("%d lots générés pour cet OT (tonnage max par lot: %.2f T).") % (
+                    num_lots, max_tonnage
+                )
             )
-        )
         
         return {
             'type': 'ir.actions.client',
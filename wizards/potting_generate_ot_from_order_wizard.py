@@ -307,12 +307,10 @@ class PottingGenerateOTFromOrderWizard(models.TransientModel):
         if not default_consignee:
             raise ValidationError(_("Veuillez spécifier un destinataire."))
         
-        # Générer les OT (1 OT par Formule)
-        created_ots = self.env['potting.transit.order']
-        
-        for formule in self.formule_ids:
-            # Créer l'OT avec les données de la Formule
-            ot_vals = {
+        # Générer les OT (1 OT par Formule) en un seul appel create, en mode
+        # groupé ; le récapitulatif est posté une fois sur la commande
+        with self.env['potting.transit.order']._bulk_mode() as TransitOrder:
+            created_ots = TransitOrder.create([{
                 'formule_id': formule.id,
                 'customer_order_id': self.customer_order_id.id,
                 'campaign_id': self.campaign_id.id,
@@ -324,10 +322,7 @@ class PottingGenerateOTFromOrderWizard(models.TransientModel):
                 'container_size': self.container_size,
                 'note': self.note,
                 'is_created_from_order': True,
-            }
-            
-            ot = self.env['potting.transit.order'].create(ot_vals)
-            created_ots |= ot
+            } for formule in self.formule_ids])
         
         # Message de succès sur la commande
         self.customer_order_id.message_post(
@@ -2,6 +2,7 @@
 
 import base64
 import io
+import logging
 from datetime import datetime
 
 from odoo import api, fields, models, _
@@ -14,6 +15,11 @@ try:
 except ImportError:
     OPENPYXL_AVAILABLE = False
 
+_logger = logging.getLogger(__name__)
+
+# Nombre de contrats créés par appel à create() lors de l'import
+IMPORT_CHUNK_SIZE = 500
+
 
 class PottingImportContractsWizard(models.TransientModel):
     """Wizard pour importer des contrats (Contrats clients) depuis un fichier Excel."""
@@ -277,7 +283,13 @@ class PottingImportContractsWizard(models.TransientModel):
         }
 
     def action_parse_file(self):
-        """Parse the uploaded Excel file and show preview."""
+        """Parse the uploaded Excel file and show preview.
+        
+        The workbook is opened in read_only mode (rows are streamed, not
+        loaded into memory) and every reference (contracts, customers,
+        currencies, certifications) is resolved against lookup dicts
+        built with one query each.
+        """
         self.ensure_one()
         
         if not OPENPYXL_AVAILABLE:
@@ -292,29 +304,30 @@ class PottingImportContractsWizard(models.TransientModel):
         if not self.file_name or not self.file_name.endswith('.xlsx'):
             raise UserError(_("Le fichier doit être au format Excel (.xlsx)."))
         
-        # Parse file
+        # Stream rows (skip header and empty rows)
         try:
             file_content = base64.b64decode(self.file_data)
-            wb = openpyxl.load_workbook(io.BytesIO(file_content))
-            ws = wb.active
+            wb = openpyxl.load_workbook(io.BytesIO(file_content), read_only=True, data_only=True)
+            try:
+                ws = wb.active
+                rows = [
+                    (row_idx, row)
+                    for row_idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2)
+                    if any(row)
+                ]
+            finally:
+                wb.close()
         except Exception as e:
             raise UserError(_("Erreur lors de la lecture du fichier: %s") % str(e))
         
+        if not rows:
+            raise UserError(_("Le fichier ne contient aucune donnée à importer."))
+        
         # Clear existing preview lines
         self.preview_line_ids.unlink()
         
-        # Parse rows (skip header)
-        lines_vals = []
-        for row_idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-            # Skip empty rows
-            if not any(row):
-                continue
-            
-            line_vals = self._parse_row(row, row_idx)
-            lines_vals.append((0, 0, line_vals))
-        
-        if not lines_vals:
-            raise UserError(_("Le fichier ne contient aucune donnée à importer."))
+        lookups = self._build_lookups(rows)
+        lines_vals = [(0, 0, self._parse_row(row, row_idx, lookups)) for row_idx, row in rows]
         
         self.write({
             'preview_line_ids': lines_vals,
@@ -329,9 +342,54 @@ class PottingImportContractsWizard(models.TransientModel):
             'target': 'new',
         }
 
-    def _parse_row(self, row, row_idx):
+    def _build_lookups(self, rows):
+        """Load every reference needed by the rows, one query per model.
+        
+        :param rows: list of (row_idx, row values)
+        :return: dict of lookup tables used by _parse_row
+        """
+        contract_numbers = {str(row[0]).strip() for _idx, row in rows if row[0]}
+        existing_contracts = set()
+        if contract_numbers:
+            existing_contracts = {
+                order['contract_number']
+                for order in self.env['potting.customer.order'].with_context(active_test=False).search_read(
+                    [('contract_number', 'in', list(contract_numbers))], ['contract_number']
+                )
+            }
+        
+        # Keep the default search order: the first match wins, as with search(limit=1)
+        partners = self.env['res.partner'].search_read([('is_company', '=', True)], ['name'])
+        certifications = self.env['potting.certification'].search_read([], ['name'])
+        currencies = self.env['res.currency'].search_read([], ['name'])
+        
+        return {
+            'existing_contracts': existing_contracts,
+            'seen_contracts': set(),
+            'partners': [(p['id'], (p['name'] or '').lower()) for p in partners],
+            'certifications': [(c['id'], (c['name'] or '').lower()) for c in certifications],
+            'currencies': {c['name'].upper(): c['id'] for c in currencies},
+            # name -> id cache for the ilike resolutions
+            'partner_cache': {},
+            'certification_cache': {},
+        }
+
+    @staticmethod
+    def _match_ilike(name, candidates, cache):
+        """Resolve name like an 'ilike' search: exact (case-insensitive) match
+        first, then the first candidate containing it. Results are cached."""
+        key = name.lower()
+        if key not in cache:
+            match_id = next((cid for cid, cname in candidates if cname == key), False)
+            if not match_id:
+                match_id = next((cid for cid, cname in candidates if key in cname), False)
+            cache[key] = match_id
+        return cache[key]
+
+    def _parse_row(self, row, row_idx, lookups):
         """Parse a single row from the Excel file."""
         errors = []
+        row = tuple(row) + (None,) * (12 - len(row))
         
         # Extract values
         contract_number = str(row[0]).strip() if row[0] else ''
@@ -345,30 +403,25 @@ class PottingImportContractsWizard(models.TransientModel):
         campaign = str(row[8]).strip() if row[8] else ''
         certifications_str = str(row[9]).strip() if row[9] else ''
         export_duty_rate_str = row[10]
-        notes = str(row[11]).strip() if len(row) > 11 and row[11] else ''
+        notes = str(row[11]).strip() if row[11] else ''
         
         # Validate contract number
         if not contract_number:
             errors.append(_("Numéro de contrat manquant"))
+        elif contract_number in lookups['existing_contracts']:
+            errors.append(_("Contrat '%s' existe déjà") % contract_number)
+        elif contract_number in lookups['seen_contracts']:
+            errors.append(_("Contrat '%s' en double dans le fichier") % contract_number)
         else:
-            existing = self.env['potting.customer.order'].search([
-                ('contract_number', '=', contract_number)
-            ], limit=1)
-            if existing:
-                errors.append(_("Contrat '%s' existe déjà") % contract_number)
+            lookups['seen_contracts'].add(contract_number)
         
         # Validate customer
         customer_id = False
         if not customer_name:
             errors.append(_("Nom du client manquant"))
         else:
-            customer = self.env['res.partner'].search([
-                ('name', 'ilike', customer_name),
-                ('is_company', '=', True)
-            ], limit=1)
-            if customer:
-                customer_id = customer.id
-            else:
+            customer_id = self._match_ilike(customer_name, lookups['partners'], lookups['partner_cache'])
+            if not customer_id:
                 errors.append(_("Client '%s' non trouvé") % customer_name)
         
         # Validate product type
@@ -401,12 +454,8 @@ class PottingImportContractsWizard(models.TransientModel):
         # Validate currency
         currency_id = False
         if currency_code:
-            currency = self.env['res.currency'].search([
-                ('name', '=', currency_code.upper())
-            ], limit=1)
-            if currency:
-                currency_id = currency.id
-            else:
+            currency_id = lookups['currencies'].get(currency_code.upper(), False)
+            if not currency_id:
                 errors.append(_("Devise '%s' non trouvée") % currency_code)
         
         # Parse dates
@@ -436,11 +485,11 @@ class PottingImportContractsWizard(models.TransientModel):
             cert_names = [c.strip() for c in certifications_str.split(',')]
             for cert_name in cert_names:
                 if cert_name:
-                    cert = self.env['potting.certification'].search([
-                        ('name', 'ilike', cert_name)
-                    ], limit=1)
-                    if cert:
-                        certification_ids.append(cert.id)
+                    cert_id = self._match_ilike(
+                        cert_name, lookups['certifications'], lookups['certification_cache']
+                    )
+                    if cert_id:
+                        certification_ids.append(cert_id)
         
         return {
             'row_number': row_idx,
@@ -453,6 +502,7 @@ class PottingImportContractsWizard(models.TransientModel):
             'currency_id': currency_id or self.env.company.currency_id.id,
             'date_order': date_order or fields.Date.context_today(self),
             'date_expected': date_expected,
+            'campaign_period': campaign,
             'certification_ids': [(6, 0, certification_ids)] if certification_ids else False,
             'export_duty_rate': export_duty_rate,
             'notes': notes,
@@ -482,49 +532,52 @@ class PottingImportContractsWizard(models.TransientModel):
             return f"{year - 1}-{year}"
 
     def action_import(self):
-        """Import valid contracts."""
+        """Import valid contracts.
+        
+        Orders are created in chunks of IMPORT_CHUNK_SIZE, each chunk in its
+        own savepoint. When a chunk fails, its rows are retried one by one
+        so that only the faulty rows are reported and skipped.
+        """
         self.ensure_one()
         
         valid_lines = self.preview_line_ids.filtered('is_valid')
         if not valid_lines:
             raise UserError(_("Aucune ligne valide à importer."))
         
-        created_orders = self.env['potting.customer.order']
+        line_data = valid_lines.read([
+            'row_number', 'contract_number', 'customer_id', 'product_type', 'tonnage',
+            'date_order', 'date_expected', 'currency_id', 'unit_price',
+            'export_duty_rate', 'notes', 'certification_ids',
+        ], load=None)
+        
+        created_ids = []
         errors = []
         
-        for line in valid_lines:
-            try:
-                order_vals = {
-                    'contract_number': line.contract_number,
-                    'customer_id': line.customer_id.id,
-                    'product_type': line.product_type,
-                    'contract_tonnage': line.tonnage,  # Le tonnage du fichier devient le tonnage du contrat
-                    'date_order': line.date_order,
-                    'date_expected': line.date_expected,
-                    'currency_id': line.currency_id.id,
-                    'unit_price': line.unit_price,
-                    'export_duty_rate': line.export_duty_rate,
-                    'note': line.notes,
-                }
-                
-                # Create order
-                order = self.env['potting.customer.order'].create(order_vals)
-                
-                # Add certifications
-                if line.certification_ids:
-                    order.certification_ids = line.certification_ids
-                
-                # Note: Les OT seront créés par l'utilisateur Shipping ultérieurement
-                # Le contrat est créé avec le tonnage prévu (contract_tonnage)
-                
-                created_orders |= order
+        # Mode groupé : chatter des contrats créés publié en une fois à la fin
+        with self.env['potting.customer.order']._bulk_mode() as Order:
+            for start in range(0, len(line_data), IMPORT_CHUNK_SIZE):
+                chunk = line_data[start:start + IMPORT_CHUNK_SIZE]
+                vals_list = [self._prepare_order_vals(line) for line in chunk]
+                try:
+                    with self.env.cr.savepoint():
+                        created_ids += Order.create(vals_list).ids
+                    continue
+                except Exception:
+                    _logger.info("Import contrats: échec du lot de %d lignes, reprise ligne par ligne", len(chunk))
                 
-            except Exception as e:
-                errors.append(_("Ligne %s: %s") % (line.row_number, str(e)))
+                for line, vals in zip(chunk, vals_list):
+                    try:
+                        with self.env.cr.savepoint():
+                            created_ids += Order.create(vals).ids
+                    except Exception as e:
+                        errors.append(_("Ligne %s: %s") % (line['row_number'], str(e)))
+        
+        # Note: Les OT seront créés par l'utilisateur Shipping ultérieurement
+        # Le contrat est créé avec le tonnage prévu (contract_tonnage)
         
         # Prepare result message
         result_msg = _("Import terminé.\n\n")
-        result_msg += _("✅ %s contrat(s) créé(s) avec succès.\n") % len(created_orders)
+        result_msg += _("✅ %s contrat(s) créé(s) avec succès.\n") % len(created_ids)
         result_msg += _("ℹ️ Les OT peuvent maintenant être générés par l'équipe Shipping.\n")
         
         if errors:
@@ -544,6 +597,24 @@ class PottingImportContractsWizard(models.TransientModel):
             'target': 'new',
         }
 
+    def _prepare_order_vals(self, line):
+        """Values of the customer order created from a preview line (read() dict)."""
+        vals = {
+            'contract_number': line['contract_number'],
+            'customer_id': line['customer_id'],
+            'product_type': line['product_type'],
+            'contract_tonnage': line['tonnage'],  # Le tonnage du fichier devient le tonnage du contrat
+            'date_order': line['date_order'],
+            'date_expected': line['date_expected'],
+            'currency_id': line['currency_id'],
+            'unit_price': line['unit_price'],
+            'export_duty_rate': line['export_duty_rate'],
+            'note': line['notes'],
+        }
+        if line['certification_ids']:
+            vals['certification_ids'] = [(6, 0, line['certification_ids'])]
+        return vals
+
     def action_view_orders(self):
         """View created orders."""
         return {
@@ -0,0 +1,223 @@
+# -*- coding: utf-8 -*-
+"""
+Wizard d'allocation automatique OT → Contrats
+
+Calcule en une passe la répartition du tonnage non alloué d'un ensemble
+d'OT sur les contrats ouverts de même type de produit, affiche un aperçu
+puis crée toutes les allocations en un seul appel.
+"""
+
+from odoo import api, fields, models, _
+from odoo.exceptions import UserError
+
+
+class PottingOtAllocationWizard(models.TransientModel):
+    """Wizard d'allocation automatique du tonnage des OT sur les contrats"""
+    _name = 'potting.ot.allocation.wizard'
+    _description = 'Allocation automatique OT → Contrats'
+
+    # =========================================================================
+    # CHAMPS
+    # =========================================================================
+
+    state = fields.Selection([
+        ('draft', 'Paramètres'),
+        ('preview', 'Aperçu'),
+        ('done', 'Terminé'),
+    ], string="État", default='draft')
+
+    campaign_id = fields.Many2one(
+        'potting.campaign',
+        string="Campagne",
+        help="Limiter les OT (et les contrats si 'Même campagne') à cette campagne"
+    )
+
+    transit_order_ids = fields.Many2many(
+        'potting.transit.order',
+        'potting_ot_allocation_wizard_ot_rel',
+        'wizard_id', 'transit_order_id',
+        string="OT à allouer",
+        domain="[('state', 'not in', ['cancelled', 'done']), ('tonnage_non_alloue', '>', 0)]",
+        help="Laisser vide pour traiter tous les OT non entièrement alloués "
+             "(de la campagne sélectionnée le cas échéant)"
+    )
+
+    customer_order_ids = fields.Many2many(
+        'potting.customer.order',
+        'potting_ot_allocation_wizard_order_rel',
+        'wizard_id', 'customer_order_id',
+        string="Contrats",
+        domain="[('state', 'in', ['confirmed', 'in_progress']), ('contract_tonnage', '>', 0)]",
+        help="Laisser vide pour utiliser tous les contrats ouverts"
+    )
+
+    price_priority = fields.Selection([
+        ('none', 'Date du contrat'),
+        ('high', 'Prix le plus élevé d\'abord'),
+        ('low', 'Prix le plus bas d\'abord'),
+    ], string="Priorité des contrats", default='none', required=True)
+
+    same_campaign = fields.Boolean(
+        string="Même campagne",
+        default=False,
+        help="N'allouer à un OT que des contrats de sa propre campagne"
+    )
+
+    line_ids = fields.One2many(
+        'potting.ot.allocation.wizard.line',
+        'wizard_id',
+        string="Allocations proposées"
+    )
+
+    allocation_count = fields.Integer(
+        string="Nombre d'allocations",
+        compute='_compute_totals'
+    )
+
+    total_tonnage = fields.Float(
+        string="Tonnage alloué (T)",
+        compute='_compute_totals',
+        digits='Product Unit of Measure'
+    )
+
+    result_message = fields.Text(
+        string="Résultat"
+    )
+
+    # =========================================================================
+    # MÉTHODES COMPUTED
+    # =========================================================================
+
+    @api.depends('line_ids.tonnage_alloue')
+    def _compute_totals(self):
+        for wizard in self:
+            wizard.allocation_count = len(wizard.line_ids)
+            wizard.total_tonnage = sum(wizard.line_ids.mapped('tonnage_alloue'))
+
+    # =========================================================================
+    # ACTIONS
+    # =========================================================================
+
+    def _get_transit_orders(self):
+        if self.transit_order_ids:
+            return self.transit_order_ids
+        domain = [('state', 'not in', ['cancelled', 'done']), ('tonnage_non_alloue', '>', 0)]
+        if self.campaign_id:
+            domain.append(('campaign_id', '=', self.campaign_id.id))
+        return self.env['potting.transit.order'].search(domain)
+
+    def _get_customer_orders(self, transit_orders):
+        if self.customer_order_ids:
+            return self.customer_order_ids
+        domain = [
+            ('state', 'in', ['confirmed', 'in_progress']),
+            ('contract_tonnage', '>', 0),
+            ('product_type', 'in', list(set(transit_orders.mapped('product_type')))),
+        ]
+        if self.same_campaign and self.campaign_id:
+            # Le contrat n'a pas de campagne : on passe par celle de ses OT
+            domain.append(('transit_order_ids.campaign_id', '=', self.campaign_id.id))
+        return self.env['potting.customer.order'].search(domain)
+
+    def _reopen(self):
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
+
+    def action_compute(self):
+        """Calculer la répartition et afficher l'aperçu."""
+        self.ensure_one()
+        transit_orders = self._get_transit_orders()
+        if not transit_orders:
+            raise UserError(_("Aucun OT à allouer."))
+        customer_orders = self._get_customer_orders(transit_orders)
+        if not customer_orders:
+            raise UserError(_("Aucun contrat ouvert ne correspond aux types de produit des OT."))
+
+        vals_list = self.env['potting.ot.contract.allocation'].compute_allocations(
+            transit_orders, customer_orders,
+            price_priority=self.price_priority,
+            same_campaign=self.same_campaign,
+        )
+        if not vals_list:
+            raise UserError(_("Aucun tonnage de contrat disponible pour les OT sélectionnés."))
+
+        self.line_ids = [(5, 0, 0)] + [(0, 0, vals) for vals in vals_list]
+        self.state = 'preview'
+        return self._reopen()
+
+    def action_apply(self):
+        """Créer toutes les allocations de l'aperçu en un seul appel."""
+        self.ensure_one()
+        if not self.line_ids:
+            raise UserError(_("Aucune allocation à créer."))
+        allocations = self.env['potting.ot.contract.allocation'].create_allocations([{
+            'transit_order_id': line.transit_order_id.id,
+            'customer_order_id': line.customer_order_id.id,
+            'tonnage_alloue': line.tonnage_alloue,
+        } for line in self.line_ids])
+
+        self.result_message = _(
+            "%d allocation(s) créée(s) pour %d OT (%.2f T)."
+        ) % (len(allocations), len(allocations.transit_order_id), self.total_tonnage)
+        self.state = 'done'
+        return self._reopen()
+
+    def action_back(self):
+        """Revenir aux paramètres."""
+        self.ensure_one()
+        self.line_ids = [(5, 0, 0)]
+        self.state = 'draft'
+        return self._reopen()
+
+
+class PottingOtAllocationWizardLine(models.TransientModel):
+    """Ligne d'aperçu de l'allocation automatique"""
+    _name = 'potting.ot.allocation.wizard.line'
+    _description = 'Ligne d\'allocation automatique'
+    _order = 'transit_order_id, id'
+
+    wizard_id = fields.Many2one(
+        'potting.ot.allocation.wizard',
+        string="Wizard",
+        required=True,
+        ondelete='cascade'
+    )
+
+    transit_order_id = fields.Many2one(
+        'potting.transit.order',
+        string="OT",
+        required=True
+    )
+
+    customer_order_id = fields.Many2one(
+        'potting.customer.order',
+        string="Contrat",
+        required=True
+    )
+
+    product_type = fields.Selection(
+        related='transit_order_id.product_type',
+        string="Type de produit"
+    )
+
+    unit_price = fields.Monetary(
+        related='customer_order_id.unit_price',
+        string="Prix unitaire",
+        currency_field='currency_id'
+    )
+
+    currency_id = fields.Many2one(
+        related='customer_order_id.currency_id',
+        string="Devise"
+    )
+
+    tonnage_alloue = fields.Float(
+        string="Tonnage alloué (T)",
+        required=True,
+        digits='Product Unit of Measure'
+    )
@@ -8,6 +8,12 @@ from odoo.exceptions import UserError, ValidationError
 
 _logger = logging.getLogger(__name__)
 
+# Nombre d'OT rendus (template + PDF) par passe en mode "un email par OT"
+REPORT_RENDER_BATCH_SIZE = 50
+
+# Champs du template rendus pour chaque OT
+MAIL_RENDER_FIELDS = ['subject', 'body_html', 'email_from', 'email_to', 'email_cc', 'reply_to']
+
 
 class PottingSendReportWizard(models.TransientModel):
     """Wizard pour l'envoi de rapports par email.
@@ -16,6 +22,10 @@ class PottingSendReportWizard(models.TransientModel):
     - Rapport journalier: activité sur une période donnée
     - Rapport par OT: détails d'ordres de transit spécifiques
     - Rapport de synthèse: résumé d'une commande client
+    
+    Les rapports journalier et par OT sont envoyés soit en un seul email
+    récapitulatif (digest), soit en un email par OT mis en file d'attente
+    pour le cron d'envoi des emails.
     """
     _name = 'potting.send.report.wizard'
     _description = "Assistant d'envoi de rapport"
@@ -43,6 +53,14 @@ class PottingSendReportWizard(models.TransientModel):
         help="Date de fin pour le rapport journalier."
     )
     
+    send_mode = fields.Selection([
+        ('digest', 'Un seul email récapitulatif'),
+        ('per_record', 'Un email par OT'),
+    ], string="Mode d'envoi", required=True, default='digest',
+       help="Récapitulatif: un rapport combiné et un seul email pour tous les OT.\n"
+            "Un email par OT: les emails sont préparés par lots et envoyés "
+            "par la file d'attente des emails.")
+    
     transit_order_ids = fields.Many2many(
         'potting.transit.order',
         string="Ordres de Transit",
@@ -102,6 +120,17 @@ class PottingSendReportWizard(models.TransientModel):
         compute='_compute_can_send',
         string="Peut envoyer"
     )
+    
+    # Avancement de l'envoi un email par OT (mis à jour après chaque lot)
+    queued_count = fields.Integer(
+        string="Emails en file d'attente",
+        readonly=True
+    )
+    
+    failed_count = fields.Integer(
+        string="Échecs",
+        readonly=True
+    )
 
     # =========================================================================
     # DEFAULT METHODS
@@ -375,6 +404,106 @@ class PottingSendReportWizard(models.TransientModel):
                 self.report_type, record.name, str(e)
             )
             return False
+    
+    def _get_report_transit_orders(self):
+        """OT concernés par le rapport journalier ou par OT."""
+        self.ensure_one()
+        if self.report_type == 'ot':
+            return self.transit_order_ids
+        domain = [
+            ('state', 'not in', ('draft', 'cancelled')),
+            ('date_created', '>=', self.date_from),
+            ('date_created', '<=', self.date_to),
+        ]
+        return self.env['potting.transit.order'].search(domain)
+    
+    def _send_digest_report(self, transit_orders):
+        """Envoie un seul email avec le rapport combiné de tous les OT.
+        
+        Le rendu et l'envoi sont délégués au rapport quotidien OT
+        (potting.daily.report.wizard): un seul PDF, un seul email.
+        """
+        self.ensure_one()
+        daily_wizard = self.env['potting.daily.report.wizard'].create({
+            'report_date': fields.Date.context_today(self),
+            'date_from': False,
+            'date_to': False,
+            'exclude_fully_delivered': False,
+            'transit_order_ids': [(6, 0, transit_orders.ids)],
+            'recipient_id': self.recipient_id.id,
+            'cc_partner_ids': [(6, 0, self.cc_partner_ids.ids)],
+            'include_pdf': self.include_pdf,
+            'note': self.note,
+        })
+        daily_wizard.action_send_email()
+        _logger.info(
+            "Rapport récapitulatif envoyé - %d OT, Dest: %s",
+            len(transit_orders), self.recipient_id.email
+        )
+    
+    def _queue_per_record_reports(self, template, transit_orders, ctx):
+        """Prépare un email par OT et le met en file d'attente.
+        
+        Les templates et les PDF sont rendus par lots de
+        REPORT_RENDER_BATCH_SIZE OT ; les mail.mail sont créés en une fois
+        par lot et envoyés par le cron de la file d'attente des emails.
+        Après chaque lot, les compteurs du wizard sont mis à jour et une
+        note est ajoutée au chatter des OT mis en file.
+        
+        :return: tuple (nombre d'emails en file, nombre d'échecs)
+        """
+        self.ensure_one()
+        template = template.with_context(ctx)
+        report = self.env.ref('potting_management.action_report_potting_daily')
+        total = len(transit_orders)
+        queued_count = 0
+        failed_count = 0
+        
+        for start in range(0, total, REPORT_RENDER_BATCH_SIZE):
+            batch = transit_orders[start:start + REPORT_RENDER_BATCH_SIZE]
+            try:
+                with self.env.cr.savepoint():
+                    rendered = template._generate_template(batch.ids, MAIL_RENDER_FIELDS)
+                    
+                    attachment_by_ot = {}
+                    if self.include_pdf:
+                        streams = report._render_qweb_pdf_prepare_streams(report.report_name, {}, res_ids=batch.ids)
+                        attachments = self.env['ir.attachment'].create([{
+                            'name': 'Rapport_OT_%s.pdf' % ot.name.replace('/', '-'),
+                            'type': 'binary',
+                            'raw': streams[ot.id]['stream'].getvalue(),
+                            'res_model': 'mail.message',
+                            'mimetype': 'application/pdf',
+                        } for ot in batch])
+                        attachment_by_ot = dict(zip(batch.ids, attachments.ids))
+                    
+                    self.env['mail.mail'].sudo().create([{
+                        **{field: rendered[ot.id].get(field) for field in MAIL_RENDER_FIELDS},
+                        'model': ot._name,
+                        'res_id': ot.id,
+                        'auto_delete': template.auto_delete,
+                        'attachment_ids': [(4, attachment_by_ot[ot.id])] if ot.id in attachment_by_ot else [],
+                    } for ot in batch])
+                    batch._message_log_batch(bodies={
+                        ot.id: _("Rapport mis en file d'attente pour %s") % self.recipient_id.email
+                        for ot in batch
+                    })
+                queued_count += len(batch)
+            except Exception as e:
+                failed_count += len(batch)
+                _logger.exception(
+                    "Erreur préparation rapports - OT: %s, Erreur: %s",
+                    ', '.join(batch.mapped('name')), str(e)
+                )
+            self.write({'queued_count': queued_count, 'failed_count': failed_count})
+            _logger.info(
+                "Préparation des rapports par OT: %d/%d (en file: %d, échecs: %d)",
+                min(start + REPORT_RENDER_BATCH_SIZE, total), total, queued_count, failed_count
+            )
+        
+        if queued_count:
+            self.env.ref('mail.ir_cron_mail_scheduler_action')._trigger()
+        return queued_count, failed_count
 
     # =========================================================================
     # ACTION METHODS
@@ -401,30 +530,17 @@ class PottingSendReportWizard(models.TransientModel):
         failed_count = 0
         
         try:
-            if self.report_type == 'daily':
-                template = self._get_email_template('daily')
+            if self.report_type in ('daily', 'ot'):
+                transit_orders = self._get_report_transit_orders()
                 
-                domain = [
-                    ('state', 'not in', ('draft', 'cancelled')),
-                    ('date_created', '>=', self.date_from),
-                    ('date_created', '<=', self.date_to),
-                ]
-                transit_orders = self.env['potting.transit.order'].search(domain)
-                
-                for ot in transit_orders:
-                    if self._send_single_report(template, ot, ctx):
-                        sent_count += 1
-                    else:
-                        failed_count += 1
-                        
-            elif self.report_type == 'ot':
-                template = self._get_email_template('ot')
-                
-                for ot in self.transit_order_ids:
-                    if self._send_single_report(template, ot, ctx):
-                        sent_count += 1
-                    else:
-                        failed_count += 1
+                if self.send_mode == 'digest':
+                    self._send_digest_report(transit_orders)
+                    sent_count = 1
+                else:
+                    template = self._get_email_template(self.report_type)
+                    sent_count, failed_count = self._queue_per_record_reports(
+                        template, transit_orders, ctx
+                    )
                         
             elif self.report_type == 'summary':
                 template = self._get_email_template('summary')
@@ -441,6 +557,12 @@ class PottingSendReportWizard(models.TransientModel):
                     "%d échec(s)."
                 ) % (sent_count, failed_count)
                 notification_type = 'warning'
+            elif self.report_type in ('daily', 'ot') and self.send_mode == 'per_record':
+                message = _(
+                    "%d rapport(s) mis en file d'attente pour %s. "
+                    "Ils seront envoyés par la file d'attente des emails."
+                ) % (sent_count, self.recipient_id.name)
+                notification_type = 'success'
             else:
                 message = _(
                     "%d rapport(s) envoyé(s) avec succès à %s."